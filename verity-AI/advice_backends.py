@@ -0,0 +1,425 @@
+"""
+Latency-budgeted maintenance advice with a rule-based fallback.
+
+`/maintenance-advice` answers from a primary advice backend (the LLM by default) within a
+per-request latency budget. The LLM call starts right away; when it misses the budget, fails,
+or the circuit breaker is open after repeated LLM failures, the request is answered at once by
+the rule-based assistant (`verity_assistant_ai.rule_based_advice`, knowledge base protocols by
+risk level) and marked with `advice_source: "rule_based"` and a `fallback_reason`. An LLM
+answer that arrives after the budget is still written to the advice cache, so the next request
+for a similar machine gets LLM prose from the cache. A call that has not started when its
+budget runs out (all worker threads busy) is cancelled, and every budget miss counts as a
+failure for the circuit breaker, so a slow LLM opens it just like a failing one.
+
+Backends are looked up by name in BACKENDS; `register_backend()` adds one. A backend has
+`advise(machine_id, failure_probability, features)` and `advise_async(...)` and raises on
+failure.
+
+Configuration (environment variables):
+    ADVICE_BACKEND            Primary backend: "llm" (default) or "rule_based"
+    ADVICE_LATENCY_BUDGET_S   Seconds a request waits for the primary backend (default 5; 0 waits
+                              as long as the LLM client allows)
+    ADVICE_FALLBACK           "rule_based" (default) or "none" to return the error message instead
+    ADVICE_CACHE_LATE         "true" (default): cache LLM answers that arrive after the budget
+    ADVICE_BREAKER_FAILURES   Consecutive primary failures that open the breaker (default 5)
+    ADVICE_BREAKER_RESET_S    Seconds the breaker stays open before one trial call (default 30)
+"""
+
+import asyncio
+import concurrent.futures
+import contextvars
+import os
+import threading
+import time
+
+import manual_index
+import metrics
+import verity_assistant_ai
+import verity_assistant_ai_llm as llm_assistant
+
+
+class RuleBasedBackend:
+    """Instant template advice from the rule-based assistant's knowledge base."""
+
+    name = "rule_based"
+    cacheable = False
+
+    def advise(self, machine_id, failure_probability, features):
+        passages = manual_index.retrieve_for_advice(failure_probability)
+        return verity_assistant_ai.rule_based_advice(machine_id, failure_probability, passages=passages)
+
+    async def advise_async(self, machine_id, failure_probability, features):
+        return self.advise(machine_id, failure_probability, features)
+
+
+class LLMBackend:
+    """OpenAI chat completion advice (verity_assistant_ai_llm); raises on errors and timeouts."""
+
+    name = "llm"
+    cacheable = True
+
+    def advise(self, machine_id, failure_probability, features):
+        return llm_assistant.get_llm_maintenance_advice(
+            machine_id, failure_probability, features, use_cache=False, raise_errors=True
+        )
+
+    async def advise_async(self, machine_id, failure_probability, features):
+        return await llm_assistant.get_llm_maintenance_advice_async(
+            machine_id, failure_probability, features, use_cache=False, raise_errors=True
+        )
+
+
+BACKENDS = {"llm": LLMBackend, "rule_based": RuleBasedBackend}
+
+
+def register_backend(name, factory):
+    """Make a backend class (or zero-argument factory) available as ADVICE_BACKEND=name."""
+    BACKENDS[name] = factory
+
+
+class CircuitBreaker:
+    """
+    Stops calling a failing backend for a while.
+
+    Closed: calls pass. After `failure_threshold` consecutive failures it opens and calls are
+    refused for `reset_timeout_s`; then one trial call is let through (half open), which closes
+    the breaker on success or opens it again on failure.
+
+    Args:
+        failure_threshold (int): Consecutive failures that open the breaker
+        reset_timeout_s (float): Seconds to stay open before a trial call
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout_s=30.0, clock=time.monotonic):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout_s = reset_timeout_s
+        self.clock = clock
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """True if a call may go to the backend now."""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and self.clock() - self.opened_at >= self.reset_timeout_s:
+                self.state = "half_open"
+                self._trial_in_flight = False
+            if self.state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.times_opened += 1
+                self.state = "open"
+                self.opened_at = self.clock()
+
+    def stats(self):
+        with self._lock:
+            return {"state": self.state, "consecutive_failures": self.failures,
+                    "failure_threshold": self.failure_threshold, "reset_timeout_s": self.reset_timeout_s,
+                    "times_opened": self.times_opened}
+
+
+class AdviceRouter:
+    """
+    Answer from the primary backend within a latency budget, else from the fallback.
+
+    Args:
+        primary: Backend tried first (e.g. LLMBackend)
+        fallback: Backend used when the primary misses the budget, fails or is cut off by the
+            breaker; None returns the primary's error message instead
+        budget_s (float): Seconds to wait for the primary; 0 or less waits without a budget
+        breaker (CircuitBreaker, optional): Breaker around the primary
+        cache_late (bool): Cache primary answers that arrive after the budget
+        max_workers (int): Threads running primary calls for the synchronous path
+    """
+
+    def __init__(self, primary, fallback=None, budget_s=5.0, breaker=None, cache_late=True, max_workers=64):
+        self.primary = primary
+        self.fallback = fallback
+        self.budget_s = budget_s
+        self.breaker = breaker
+        self.cache_late = cache_late
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+        self.sources = {}
+        self.fallback_reasons = {}
+        self.late_cached = 0
+
+    def _pool(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = concurrent.futures.ThreadPoolExecutor(
+                        max_workers=self.max_workers, thread_name_prefix="advice"
+                    )
+        return self._executor
+
+    def _cache_key(self, failure_probability, features):
+        cache = llm_assistant.get_advice_cache() if getattr(self.primary, "cacheable", False) else None
+        if cache is None:
+            return None, None
+        return cache, cache.key(failure_probability, features)
+
+    def _finished(self, state, error, advice=None):
+        """Bookkeeping when a primary call completes, whether or not the request still waits."""
+        if isinstance(error, (asyncio.CancelledError, concurrent.futures.CancelledError)):
+            return
+        with self._lock:
+            state["finished"] = True
+            abandoned = state["abandoned"]
+        # A call that missed its budget was already counted as a failure; a late success must
+        # not close the breaker again
+        if self.breaker is not None and not abandoned:
+            if error is None:
+                self.breaker.record_success()
+            else:
+                self.breaker.record_failure()
+        cache, key, machine_id = state["cache"], state["key"], state["machine_id"]
+        if error is None and cache is not None and (not abandoned or self.cache_late):
+            if state.get("loop") is not None:
+                # Called on the event loop: keep the SQLite write off it
+                state["loop"].run_in_executor(None, cache.put, key, machine_id, advice)
+            else:
+                cache.put(key, machine_id, advice)
+            if abandoned:
+                with self._lock:
+                    self.late_cached += 1
+
+    def _answer(self, advice, source, reason=None):
+        with self._lock:
+            self.sources[source] = self.sources.get(source, 0) + 1
+            if reason is not None:
+                self.fallback_reasons[reason] = self.fallback_reasons.get(reason, 0) + 1
+        if metrics.METRICS_ENABLED:
+            metrics.registry.inc("verity_advice_responses_total", source=source, fallback_reason=reason or "")
+        return advice, source, reason
+
+    def _budget_missed(self, state):
+        """
+        Abandon a call that missed the budget and count the miss, unless it finished meanwhile.
+
+        Returns:
+            bool: False when the call completed first; its result is then the answer
+        """
+        with self._lock:
+            if state["finished"]:
+                return False
+            state["abandoned"] = True
+        if self.breaker is not None:
+            self.breaker.record_failure()
+        return True
+
+    def _fall_back(self, reason, error, machine_id, failure_probability, features):
+        if self.fallback is None:
+            message = str(error) if error is not None else reason.replace("_", " ")
+            return self._answer(f"Error generating maintenance advice: {message}", "error", reason)
+        return self._answer(self.fallback.advise(machine_id, failure_probability, features), self.fallback.name, reason)
+
+    def advise(self, machine_id, failure_probability, features):
+        """
+        Advice for one scored machine.
+
+        Returns:
+            tuple: (advice text, source, fallback reason or None); source is the primary's
+                name, "cache", the fallback's name or "error"; reason is "budget_exceeded",
+                "circuit_open" or "error"
+        """
+        cache, key = self._cache_key(failure_probability, features)
+        cached = cache.get(key, machine_id) if cache is not None else None
+        if cached is not None:
+            return self._answer(cached, "cache")
+        if self.breaker is not None and not self.breaker.allow():
+            return self._fall_back("circuit_open", None, machine_id, failure_probability, features)
+
+        state = {"cache": cache, "key": key, "machine_id": machine_id, "abandoned": False,
+                 "finished": False}
+        if self.budget_s <= 0:
+            try:
+                advice = self.primary.advise(machine_id, failure_probability, features)
+            except Exception as e:
+                self._finished(state, e)
+                return self._fall_back("error", e, machine_id, failure_probability, features)
+            self._finished(state, None, advice)
+            return self._answer(advice, self.primary.name)
+
+        # Run the call in a worker thread (carrying the request's contextvars for metrics labels)
+        future = self._pool().submit(
+            contextvars.copy_context().run, self.primary.advise, machine_id, failure_probability, features
+        )
+        future.add_done_callback(
+            lambda f: self._finished(state, f.exception(), None if f.exception() else f.result())
+            if not f.cancelled() else None
+        )
+        try:
+            advice = future.result(timeout=self.budget_s)
+        except concurrent.futures.TimeoutError as e:
+            if future.done():
+                # The backend itself timed out within the budget
+                return self._fall_back("error", e, machine_id, failure_probability, features)
+            if self._budget_missed(state):
+                # A call still queued behind busy threads is dropped; a running one keeps its
+                # thread and its answer is cached when it arrives
+                future.cancel()
+                return self._fall_back("budget_exceeded", None, machine_id, failure_probability, features)
+            # The call finished between the timeout and the check: answer with its result
+            try:
+                advice = future.result()
+            except Exception as e:
+                return self._fall_back("error", e, machine_id, failure_probability, features)
+        except Exception as e:
+            return self._fall_back("error", e, machine_id, failure_probability, features)
+        return self._answer(advice, self.primary.name)
+
+    async def advise_async(self, machine_id, failure_probability, features):
+        """Asyncio version of advise(); without cache_late a late call is cancelled."""
+        cache, key = self._cache_key(failure_probability, features)
+        cached = await cache.get_async(key, machine_id) if cache is not None else None
+        if cached is not None:
+            return self._answer(cached, "cache")
+        if self.breaker is not None and not self.breaker.allow():
+            return self._fall_back("circuit_open", None, machine_id, failure_probability, features)
+
+        state = {"cache": cache, "key": key, "machine_id": machine_id, "abandoned": False,
+                 "finished": False, "loop": asyncio.get_running_loop()}
+        task = asyncio.ensure_future(self.primary.advise_async(machine_id, failure_probability, features))
+        task.add_done_callback(
+            lambda t: self._finished(state, t.exception(), None if t.exception() else t.result())
+            if not t.cancelled() else None
+        )
+        try:
+            if self.budget_s > 0:
+                advice = await asyncio.wait_for(asyncio.shield(task), timeout=self.budget_s)
+            else:
+                advice = await task
+        except asyncio.TimeoutError as e:
+            if task.done():
+                return self._fall_back("error", e, machine_id, failure_probability, features)
+            self._budget_missed(state)
+            if not self.cache_late:
+                task.cancel()
+            return self._fall_back("budget_exceeded", None, machine_id, failure_probability, features)
+        except Exception as e:
+            return self._fall_back("error", e, machine_id, failure_probability, features)
+        return self._answer(advice, self.primary.name)
+
+    def stats(self):
+        with self._lock:
+            out = {
+                "primary": self.primary.name,
+                "fallback": self.fallback.name if self.fallback is not None else None,
+                "budget_s": self.budget_s,
+                "cache_late": self.cache_late,
+                "sources": dict(self.sources),
+                "fallback_reasons": dict(self.fallback_reasons),
+                "late_cached": self.late_cached,
+            }
+        out["breaker"] = self.breaker.stats() if self.breaker is not None else None
+        return out
+
+
+def advice_router_from_env():
+    """Build the AdviceRouter described by the ADVICE_* environment variables."""
+    primary_name = os.getenv("ADVICE_BACKEND", "llm")
+    fallback_name = os.getenv("ADVICE_FALLBACK", "rule_based")
+    if primary_name not in BACKENDS:
+        raise ValueError(f"unknown ADVICE_BACKEND {primary_name!r}; choose from {sorted(BACKENDS)}")
+    if fallback_name not in BACKENDS and fallback_name != "none":
+        raise ValueError(f"unknown ADVICE_FALLBACK {fallback_name!r}; choose from {sorted(BACKENDS) + ['none']}")
+    return AdviceRouter(
+        BACKENDS[primary_name](),
+        fallback=BACKENDS[fallback_name]() if fallback_name != "none" else None,
+        budget_s=float(os.getenv("ADVICE_LATENCY_BUDGET_S", "5")),
+        breaker=CircuitBreaker(
+            failure_threshold=int(os.getenv("ADVICE_BREAKER_FAILURES", "5")),
+            reset_timeout_s=float(os.getenv("ADVICE_BREAKER_RESET_S", "30")),
+        ),
+        cache_late=os.getenv("ADVICE_CACHE_LATE", "true").lower() in ("1", "true"),
+        max_workers=llm_assistant.LLM_MAX_CONCURRENCY,
+    )
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_advice_router():
+    """Return the process-wide AdviceRouter, built from the environment on first use."""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = advice_router_from_env()
+    return _router
+
+
+def _response(machine_id, failure_probability, feature_dict, answer):
+    advice, source, reason = answer
+    result = {
+        "machine_id": machine_id,
+        "failure_probability": round(failure_probability, 2),
+        "feature_values": feature_dict,
+        "maintenance_advice": advice,
+        "advice_source": source,
+        "status": "success",
+    }
+    if reason is not None:
+        result["fallback_reason"] = reason
+    return result
+
+
+def get_maintenance_advice_api(machine_id, feature_dict, ml_model, schema=None, router=None):
+    """
+    Budgeted version of verity_assistant_ai_llm.get_maintenance_advice_api().
+
+    Args:
+        machine_id (str): Unique identifier for the machine
+        feature_dict (dict): Dictionary of feature values
+        ml_model: Trained ML model with predict_proba method
+        schema (FeatureSchema, optional): Feature order of ml_model. Defaults to model_features.json.
+        router (AdviceRouter, optional): Defaults to the process-wide router
+
+    Returns:
+        dict: machine_id, failure_probability, maintenance_advice, advice_source (and
+            fallback_reason when the fallback answered)
+    """
+    router = router or get_advice_router()
+    try:
+        failure_probability = llm_assistant.predict_failure_probability(feature_dict, ml_model, schema)
+        answer = router.advise(machine_id, failure_probability, feature_dict)
+        return _response(machine_id, failure_probability, feature_dict, answer)
+    except Exception as e:
+        return {"machine_id": machine_id, "error": str(e), "status": "error"}
+
+
+async def get_maintenance_advice_api_async(machine_id, feature_dict, ml_model, schema=None, router=None):
+    """Asyncio version of get_maintenance_advice_api() for the async server (asgi.py)."""
+    router = router or get_advice_router()
+    try:
+        loop = asyncio.get_running_loop()
+        failure_probability = await loop.run_in_executor(
+            None, contextvars.copy_context().run, llm_assistant.predict_failure_probability,
+            feature_dict, ml_model, schema
+        )
+        answer = await router.advise_async(machine_id, failure_probability, feature_dict)
+        return _response(machine_id, failure_probability, feature_dict, answer)
+    except Exception as e:
+        return {"machine_id": machine_id, "error": str(e), "status": "error"}
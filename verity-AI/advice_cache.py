@@ -0,0 +1,286 @@
+"""
+Cache for LLM maintenance advice.
+
+Advice for machines in a similar state is nearly identical, so the cache key is the
+failure-probability bucket plus a quantized copy of the feature values rather than the exact
+prompt. Entries live in an in-process LRU with TTL and size limits; optionally a local SQLite
+file sits behind it so cached advice survives restarts and is shared by all workers on a pod.
+SQLite errors (a locked or corrupt file) count as misses; coroutines use get_async()/put_async(),
+which run the SQLite calls in the default executor instead of on the event loop.
+
+Configuration (environment variables):
+    ADVICE_CACHE_ENABLED      "false" disables the cache (default "true")
+    ADVICE_CACHE_MAX_ENTRIES  Max entries kept in memory (default 10000)
+    ADVICE_CACHE_MAX_BYTES    Max total advice text kept in memory (default 16 MiB)
+    ADVICE_CACHE_TTL_S        Seconds an entry stays valid (default 3600)
+    ADVICE_CACHE_BUCKET_PCT   Width of the failure-probability buckets in percent (default 10)
+    ADVICE_CACHE_PATH         SQLite file for the shared on-disk store (default: memory only)
+"""
+
+import asyncio
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Quantization step per feature; values are rounded to the nearest multiple
+DEFAULT_QUANTA = {
+    "vibration": 2.0,
+    "temperature": 2.0,
+    "operating_hours": 250.0,
+    "temp_vibration_interaction": 200.0,
+    "vibration_rate_of_change": 2.0,
+    "temp_rolling_avg": 2.0,
+}
+
+
+def make_key(failure_probability, feature_values, bucket_pct=10.0, quanta=None):
+    """
+    Build a cache key from the risk bucket and quantized feature values.
+
+    Args:
+        failure_probability (float): Predicted failure probability (0-100)
+        feature_values (dict): Feature name to value
+        bucket_pct (float): Width of a failure-probability bucket in percent
+        quanta (dict, optional): Quantization step per feature (default DEFAULT_QUANTA, else 1.0)
+
+    Returns:
+        str: Cache key
+    """
+    quanta = DEFAULT_QUANTA if quanta is None else quanta
+    bucket = int(float(failure_probability) // bucket_pct)
+    parts = [f"b{bucket}"]
+    for name in sorted(feature_values):
+        value = feature_values[name]
+        try:
+            step = quanta.get(name, 1.0)
+            parts.append(f"{name}={int(round(float(value) / step))}")
+        except (TypeError, ValueError):
+            parts.append(f"{name}={value}")
+    return "|".join(parts)
+
+
+def for_machine(advice, from_machine_id, to_machine_id):
+    """
+    Rewrite the "Machine <id>" references of advice generated for another machine.
+
+    Only whole ids are replaced, so advice for machine M1 leaves "Machine M10" alone.
+    """
+    if str(from_machine_id) == str(to_machine_id):
+        return advice
+    pattern = rf"\bMachine {re.escape(str(from_machine_id))}(?![\w-])"
+    return re.sub(pattern, lambda _: f"Machine {to_machine_id}", advice)
+
+
+class SqliteAdviceStore:
+    """
+    Advice store in a local SQLite file, shared by every process that opens the same path.
+
+    Args:
+        path (str): SQLite database file
+        ttl_s (float): Seconds an entry stays valid
+        max_entries (int): Entries kept on disk; the least recently used are deleted first
+    """
+
+    def __init__(self, path, ttl_s=3600.0, max_entries=100000):
+        self.path = path
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self._local = threading.local()
+
+    def _conn(self):
+        # SQLite connections must not cross threads or forks
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS advice ("
+                "key TEXT PRIMARY KEY, machine_id TEXT, advice TEXT, created REAL, accessed REAL)"
+            )
+            # Pruning walks the rows by last access
+            conn.execute("CREATE INDEX IF NOT EXISTS advice_accessed ON advice (accessed)")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def get(self, key):
+        now = time.time()
+        conn = self._conn()
+        row = conn.execute("SELECT machine_id, advice, created FROM advice WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        if now - row[2] > self.ttl_s:
+            conn.execute("DELETE FROM advice WHERE key = ?", (key,))
+            return None
+        conn.execute("UPDATE advice SET accessed = ? WHERE key = ?", (now, key))
+        return row[0], row[1], row[2]
+
+    def put(self, key, machine_id, advice, created):
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO advice (key, machine_id, advice, created, accessed) VALUES (?, ?, ?, ?, ?)",
+            (key, machine_id, advice, created, created),
+        )
+        conn.execute(
+            "DELETE FROM advice WHERE key IN (SELECT key FROM advice ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+
+class AdviceCache:
+    """
+    In-process LRU cache of advice text with TTL, entry and byte limits, and hit/miss counters.
+
+    Args:
+        max_entries (int): Maximum number of entries kept in memory
+        max_bytes (int): Maximum total size of cached advice text
+        ttl_s (float): Seconds an entry stays valid
+        bucket_pct (float): Width of the failure-probability buckets used in keys
+        store (SqliteAdviceStore, optional): Shared on-disk store consulted on memory misses
+    """
+
+    def __init__(self, max_entries=10000, max_bytes=16 * 1024 * 1024, ttl_s=3600.0, bucket_pct=10.0, store=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self.bucket_pct = bucket_pct
+        self.store = store
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.disk_errors = 0
+
+    def key(self, failure_probability, feature_values):
+        return make_key(failure_probability, feature_values, bucket_pct=self.bucket_pct)
+
+    def get(self, key, machine_id):
+        """
+        Return cached advice for `key`, rewritten for `machine_id`, or None on a miss.
+        """
+        advice = self._memory_get(key, machine_id)
+        if advice is not None:
+            return advice
+        return self._store_get(key, machine_id)
+
+    async def get_async(self, key, machine_id):
+        """get() for coroutines: a memory miss reads the SQLite store in the default executor."""
+        advice = self._memory_get(key, machine_id)
+        if advice is not None:
+            return advice
+        if self.store is None:
+            return self._store_get(key, machine_id)
+        return await asyncio.get_running_loop().run_in_executor(None, self._store_get, key, machine_id)
+
+    def put(self, key, machine_id, advice):
+        entry = (str(machine_id), advice, time.time())
+        with self._lock:
+            self._insert(key, entry)
+        if self.store is not None:
+            self._store_put(key, entry)
+
+    async def put_async(self, key, machine_id, advice):
+        """put() for coroutines: the SQLite write runs in the default executor."""
+        if self.store is None:
+            self.put(key, machine_id, advice)
+        else:
+            await asyncio.get_running_loop().run_in_executor(None, self.put, key, machine_id, advice)
+
+    def _memory_get(self, key, machine_id):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[2] > self.ttl_s:
+                self._remove(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return self._for_machine(entry, machine_id)
+
+    def _store_get(self, key, machine_id):
+        entry = None
+        if self.store is not None:
+            try:
+                entry = self.store.get(key)
+            except sqlite3.Error:
+                with self._lock:
+                    self.disk_errors += 1
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._insert(key, entry)
+        return self._for_machine(entry, machine_id)
+
+    def _store_put(self, key, entry):
+        try:
+            self.store.put(key, *entry)
+        except sqlite3.Error:
+            # The entry is still cached in memory; other workers just miss it
+            with self._lock:
+                self.disk_errors += 1
+
+    @staticmethod
+    def _for_machine(entry, machine_id):
+        # Advice was generated for another machine in the same state; fix the machine reference
+        cached_machine_id, advice, _ = entry
+        return for_machine(advice, cached_machine_id, machine_id)
+
+    def _insert(self, key, entry):
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = entry
+        self._bytes += len(entry[1])
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= len(entry[1])
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_s": self.ttl_s,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "disk_errors": self.disk_errors,
+                "disk_store": self.store.path if self.store is not None else None,
+            }
+
+
+def advice_cache_from_env():
+    """Build the AdviceCache described by the ADVICE_CACHE_* environment variables, or None."""
+    if os.getenv("ADVICE_CACHE_ENABLED", "true").lower() not in ("1", "true"):
+        return None
+    ttl_s = float(os.getenv("ADVICE_CACHE_TTL_S", "3600"))
+    path = os.getenv("ADVICE_CACHE_PATH")
+    store = SqliteAdviceStore(path, ttl_s=ttl_s) if path else None
+    return AdviceCache(
+        max_entries=int(os.getenv("ADVICE_CACHE_MAX_ENTRIES", "10000")),
+        max_bytes=int(os.getenv("ADVICE_CACHE_MAX_BYTES", str(16 * 1024 * 1024))),
+        ttl_s=ttl_s,
+        bucket_pct=float(os.getenv("ADVICE_CACHE_BUCKET_PCT", "10")),
+        store=store,
+    )
@@ -1,9 +1,11 @@
+import atexit
+import hmac
 import os
-import json
 import sys
+import time
 from typing import Any, Dict
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from dotenv import load_dotenv
 import joblib
 import numpy as np
@@ -11,95 +13,572 @@ import numpy as np
 # Add parent directory to Python path to import verity modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+# Required: the server cannot load or serve a model without these
+import metrics
+import model_registry
+from feature_schema import FeatureValidationError
+
+# These modules are side-effect free on import: no synthetic data, no training, no LLM calls.
 try:
     import verity_assistant_ai_llm as llm_assistant
     import utils
+    import batching
+    import forest_engine
+    import fleet_advice
+    import feature_store
+    import payload_formats
+    import advice_backends
+    import prediction_cache
+    import profiling
 except ImportError as e:
     llm_assistant = None
     utils = None
+    batching = None
+    forest_engine = None
+    fleet_advice = None
+    feature_store = None
+    payload_formats = None
+    advice_backends = None
+    prediction_cache = None
+    profiling = None
     print(f"Warning: Could not import modules: {e}")
 
 # Load environment variables from .env if present
 load_dotenv()
 
+# Either a pickled estimator (model.joblib) or a packed forest directory (model_packed/)
 MODEL_PATH = os.getenv("MODEL_PATH", "../verity-AI/model.joblib")
+# Memory-map model arrays read-only so all workers on a pod share one physical copy
+MODEL_MMAP = os.getenv("MODEL_MMAP", "false").lower() in ("1", "true")
+# The feature list is saved next to the model by save_model.py
+MODEL_FEATURES_PATH = os.getenv(
+    "MODEL_FEATURES_PATH", os.path.join(os.path.dirname(os.path.normpath(MODEL_PATH)), "model_features.json")
+)
+# Poll MODEL_PATH for new artifacts and hot-reload them (0 disables the watcher)
+MODEL_WATCH_INTERVAL_S = float(os.getenv("MODEL_WATCH_INTERVAL_S", "0"))
+# Required in the X-Admin-Token header of /admin/* calls; the endpoints are disabled without it
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+# Collapsed stacks and reports of profiled requests are written here on demand and at exit
+PROFILE_DIR = os.getenv("PROFILE_DIR")
 
 app = Flask(__name__)
-model = None
-model_feature_names = None
+# Seconds spent in each startup step, reported by /health
+startup_timings: Dict[str, float] = {}
 
 
-def load_model(path: str):
+def load_model(path: str, mmap: bool = MODEL_MMAP):
     if not os.path.exists(path):
         raise FileNotFoundError(f"Model file not found at {path}")
-    return joblib.load(path)
+    mmap_mode = "r" if mmap else None
+    if forest_engine is not None and forest_engine.is_packed_model(path):
+        return forest_engine.load_packed_forest(path, mmap_mode=mmap_mode)
+    # joblib can memory-map numpy arrays in the pickle, but sklearn trees copy their node
+    # arrays when unpickled, so only the packed format fully shares the model across workers.
+    return joblib.load(path, mmap_mode=mmap_mode)
+
+
+registry = model_registry.ModelRegistry(
+    load_model, MODEL_PATH, features_path=MODEL_FEATURES_PATH, probe_path=os.getenv("MODEL_PROBE_PATH")
+)
+
+
+def load_artifacts(model_path: str = MODEL_PATH) -> None:
+    """
+    Artifact-only startup: load, warm up and validate the model and `model_features.json`.
+
+    Args:
+        model_path (str): Pickled model, packed model directory, or directory of model versions
+    """
+    try:
+        bundle = registry.load(*model_registry.resolve_artifact(model_path))
+        registry.activate(bundle)
+        app.logger.info(f"Loaded model {bundle.version} from {bundle.path}")
+    except Exception as e:
+        app.logger.exception("Failed to load model")
+        registry.last_error = str(e)
+    startup_timings.update(registry.last_timings)
 
 
 # Load the model at module import time (safer across Flask versions)
-try:
-    model = load_model(MODEL_PATH)
-    app.logger.info(f"Loaded model from {MODEL_PATH}")
-    # attempt to load a companion feature list
+load_artifacts()
+
+
+def active_model():
+    """
+    The serving ModelBundle, or None. Read it once per request and use that bundle throughout,
+    so a hot reload mid-request cannot mix the old model with the new feature list.
+    """
+    return registry.active
+
+
+def __getattr__(name):
+    # `app.model` and `app.model_feature_names` used to be plain globals
+    if name in ("model", "model_feature_names"):
+        bundle = registry.active
+        if bundle is None:
+            return None
+        return bundle.model if name == "model" else bundle.feature_names
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Opt-in coalescing of concurrent single-row scoring calls (MICROBATCH_MAX_WAIT_MS > 0).
+# Each row is scored by the bundle its request resolved (see scoring_model).
+batcher = batching.batcher_from_env() if batching else None
+
+
+# Exact-match LRU of probabilities for repeated feature rows (PREDICTION_CACHE_MAX_ENTRIES)
+result_cache = prediction_cache.prediction_cache_from_env() if prediction_cache else None
+
+
+def cached_predict_proba(bundle, arr: np.ndarray, predict_fn) -> np.ndarray:
+    """predict_proba through the prediction cache: only rows not seen with this model version are scored."""
+    if result_cache is None:
+        return predict_fn(arr)
+    return result_cache.predict_proba(bundle.version, arr, predict_fn)
+
+
+def scoring_model(bundle=None):
+    """Model used for single-row scoring: the bundle's model, through the micro-batcher when enabled."""
+    bundle = bundle or registry.active
+    if bundle is None:
+        return None
+    if batcher is not None:
+        return batcher.for_model(bundle.model.predict_proba, getattr(bundle.model, "n_features_in_", None))
+    return bundle.model
+
+
+def start_model_watcher():
+    """Start this process's MODEL_PATH watcher (called after fork by gunicorn.conf.py)."""
+    registry.start_watcher(MODEL_WATCH_INTERVAL_S)
+
+
+def with_version(body: Dict[str, Any], bundle) -> Dict[str, Any]:
+    """Add the model version that produced a response."""
+    if bundle is not None:
+        body["model_version"] = bundle.version
+    return body
+
+
+def load_feature_store():
+    """Per-worker store of raw-reading feature state, restored from its snapshot if configured."""
+    if feature_store is None:
+        return None
+    start = time.perf_counter()
     try:
-        feature_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "model_features.json")
-        if os.path.exists(feature_path):
-            with open(feature_path, "r") as fh:
-                model_feature_names = json.load(fh)
-                app.logger.info(f"Loaded feature list from {feature_path}")
+        store = feature_store.feature_store_from_env()
     except Exception:
-        app.logger.exception("Failed to load feature list")
-except Exception:
-    app.logger.exception("Failed to load model")
-    model = None
+        app.logger.exception("Failed to restore feature store snapshot, starting empty")
+        store = feature_store.FeatureStore()
+    startup_timings["feature_store_restore_s"] = time.perf_counter() - start
+    return store
+
+
+store = load_feature_store()
+
+
+def start_feature_store_snapshots():
+    """Snapshot this process's feature store at exit (called after fork by gunicorn.conf.py)."""
+    # Registered after fork: with GUNICORN_PRELOAD the master's copy of the store never sees an
+    # /ingest, and snapshotting it at shutdown would overwrite the worker's snapshot.
+    if store is not None and store.snapshot_path:
+        atexit.register(store.snapshot)
+
+
+def stored_features(machine_id):
+    """Latest engineered features of a machine from /ingest readings, or None."""
+    return store.get_features(machine_id) if store is not None and machine_id is not None else None
+
+
+def not_ingested_error(machine_ids) -> str:
+    """Error for machine ids without readings in this worker's feature store."""
+    # Every worker has its own store, so with several workers this is often a routing problem
+    return (f"no ingested readings for machine_id {list(machine_ids)[:10]} in this worker (pid {os.getpid()}); "
+            "the feature store is per worker process, so readings and scoring calls must reach the same "
+            "single-worker instance (GUNICORN_WORKERS=1)")
+
+
+def collect_serving_metrics(reg) -> None:
+    """Refresh startup, model and reload metrics from their sources before a snapshot."""
+    for step, seconds in startup_timings.items():
+        reg.set_gauge("verity_startup_seconds", seconds, step=step)
+    for step, seconds in registry.last_timings.items():
+        reg.set_gauge("verity_model_load_seconds", seconds, step=step)
+    reg.clear("verity_model_info")
+    bundle = registry.active
+    if bundle is not None:
+        reg.set_gauge("verity_model_info", 1, version=bundle.version)
+    reg.set_counter("verity_model_reloads_total", registry.reloads, status="reloaded")
+    reg.set_counter("verity_model_reloads_total", registry.failed_reloads, status="failed")
+    if result_cache is not None:
+        cache_stats = result_cache.stats()
+        reg.set_counter("verity_prediction_cache_lookups_total", cache_stats["hits"], result="hit")
+        reg.set_counter("verity_prediction_cache_lookups_total", cache_stats["misses"], result="miss")
+        reg.set_counter("verity_prediction_cache_evictions_total", cache_stats["evictions"])
+        reg.set_gauge("verity_prediction_cache_entries", cache_stats["entries"])
+
+
+metrics.registry.collectors.append(collect_serving_metrics)
+
+
+# Sampling profiler for one in PROFILE_SAMPLE_EVERY requests or X-Profile: 1 (off by default)
+profiler = profiling.profiler_from_env() if profiling else None
+if profiler is not None and PROFILE_DIR:
+    atexit.register(profiler.dump, PROFILE_DIR)
+
+
+@app.before_request
+def start_request_timer() -> None:
+    g.request_start = time.perf_counter()
+    endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    metrics.begin_request(endpoint)
+    if profiler is not None and profiler.should_profile(request.headers):
+        g.profile_token = profiler.begin(endpoint)
+
+
+@app.after_request
+def record_request_metrics(response: Response) -> Response:
+    # Streaming responses are timed to the first byte
+    start = g.get("request_start")
+    if start is not None:
+        endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        metrics.observe_request(endpoint, request.method, response.status_code, time.perf_counter() - start)
+    return response
+
+
+@app.teardown_request
+def stop_request_profile(_exc) -> None:
+    token = g.pop("profile_token", None)
+    if token is not None:
+        profiler.end(token)
+
+
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics() -> Any:
+    """Prometheus text format; sums every worker's values when METRICS_DIR is shared."""
+    return Response(metrics.registry.render(), mimetype="text/plain; version=0.0.4")
 
 
 @app.route("/health", methods=["GET"])
 def health() -> Any:
-    return jsonify({"status": "ok", "model_loaded": model is not None})
+    return jsonify({
+        "status": "ok",
+        "model_loaded": registry.active is not None,
+        "model": registry.stats(),
+        "startup_timings": {k: round(v, 4) for k, v in startup_timings.items()},
+    })
+
+
+@app.route("/stats/batching", methods=["GET"])
+def batching_stats() -> Any:
+    """Micro-batching batch-size and queue-wait statistics for this worker."""
+    if batcher is None:
+        return jsonify({"enabled": False})
+    return jsonify(dict(batcher.stats(), enabled=True, pid=os.getpid()))
+
+
+@app.route("/stats/prediction-cache", methods=["GET"])
+def prediction_cache_stats() -> Any:
+    """Hit/miss counters and size of this worker's prediction cache."""
+    if result_cache is None:
+        return jsonify({"enabled": False})
+    return jsonify(dict(result_cache.stats(), enabled=True, pid=os.getpid()))
+
+
+@app.route("/stats/memory", methods=["GET"])
+def memory_stats() -> Any:
+    """Resident memory of the worker that served this request (MiB)."""
+    if utils is None:
+        return jsonify({"error": "utils module not available"}), 500
+    return jsonify(dict(utils.process_memory(), pid=os.getpid(), model_mmap=MODEL_MMAP))
+
+
+@app.route("/stats/advice-cache", methods=["GET"])
+def advice_cache_stats() -> Any:
+    """Hit/miss counters and size of this worker's LLM advice cache."""
+    cache = llm_assistant.get_advice_cache() if llm_assistant is not None else None
+    if cache is None:
+        return jsonify({"enabled": False})
+    return jsonify(dict(cache.stats(), enabled=True, pid=os.getpid()))
+
+
+@app.route("/stats/advice-backend", methods=["GET"])
+def advice_backend_stats() -> Any:
+    """Answers by source, fallbacks by reason and circuit breaker state of this worker."""
+    if advice_backends is None:
+        return jsonify({"error": "advice backends not available"}), 500
+    return jsonify(dict(advice_backends.get_advice_router().stats(), pid=os.getpid()))
 
 
 @app.route("/predict", methods=["POST"])
 def predict() -> Any:
-    if model is None:
+    bundle = active_model()
+    if bundle is None:
         return jsonify({"error": "model not loaded"}), 500
+    model = bundle.model
+    timer = metrics.StageTimer("/predict")
 
-    payload: Dict[str, Any] = request.get_json(force=True)
-    # Expect either {"features": [v1, v2, ...]} or {"features": {"feature_name": value, ...}}
-    features = payload.get("features")
-    if features is None:
-        return jsonify({"error": "features key is required"}), 400
+    # Binary bodies (raw floats, .npy, Arrow IPC) carry the feature matrix itself; JSON is the default
+    request_fmt = payload_formats.request_format(request.mimetype) if payload_formats else None
+    response_fmt = payload_formats.response_format(request.accept_mimetypes, request_fmt) if payload_formats else None
+    if request_fmt is not None:
+        schema = bundle.schema
+        n_features = len(schema) if schema is not None else model.n_features_in_
+        try:
+            arr = payload_formats.decode_matrix(request.get_data(cache=False), request_fmt, n_features,
+                                                schema.names if schema is not None else None)
+            if schema is not None:
+                schema.validate_matrix(arr)
+        except ImportError as e:
+            return jsonify({"error": str(e)}), 415
+        except FeatureValidationError as e:
+            return jsonify({"error": str(e), "invalid_features": e.invalid}), 400
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+    else:
+        payload: Dict[str, Any] = request.get_json(force=True)
+        if not isinstance(payload, dict):
+            return jsonify({"error": "JSON object body is required"}), 400
+        # Expect either {"features": [v1, v2, ...]} or {"features": {"feature_name": value, ...}},
+        # or just {"machine_id": ...} for a machine whose raw readings were sent to /ingest
+        features = payload.get("features")
+        if features is None and payload.get("machine_id") is not None:
+            features = stored_features(payload["machine_id"])
+            if features is None:
+                return jsonify({"error": not_ingested_error([payload["machine_id"]])}), 404
+        if features is None:
+            return jsonify({"error": "features key is required"}), 400
+    timer.mark("parse")
 
     try:
         # Handle both list and dict formats for features
-        if isinstance(features, list):
-            # Features provided as list - use directly
-            feature_values = features
+        if request_fmt is not None:
+            feature_values = arr
+        elif isinstance(features, list):
+            # Features provided as list, in model order: one row or a list of rows
+            try:
+                feature_values = list_feature_matrix(features, bundle)
+            except FeatureValidationError as e:
+                return jsonify({"error": str(e), "invalid_features": e.invalid}), 400
+            except (ValueError, TypeError) as e:
+                return jsonify({"error": f"invalid features: {e}"}), 400
         elif isinstance(features, dict):
-            # Features provided as dict - convert to ordered list
-            feature_names = model_feature_names if model_feature_names is not None else getattr(model, "feature_names_in_", None)
-            print(f"DEBUG: feature_names = {feature_names}")
-            print(f"DEBUG: features dict = {features}")
-            if feature_names is not None:
-                feature_values = [features.get(k, 0.0) for k in feature_names]
-                print(f"DEBUG: feature_values = {feature_values}")
+            # Features provided as dict - convert to an ordered row with the model's compiled schema
+            schema = bundle.schema
+            if schema is not None:
+                feature_values = schema.row(features, fill_missing=True)
             else:
                 return jsonify({"error": "Model has no feature names - please provide features as a list"}), 400
         else:
             return jsonify({"error": "features must be a list or dict"}), 400
 
-        # Convert to numpy array and make prediction
-        arr = np.asarray(feature_values, dtype=float)
+        # Convert to numpy array and make prediction (binary bodies keep their float32/float64 dtype)
+        arr = feature_values if request_fmt is not None else np.asarray(feature_values, dtype=float)
         if arr.ndim == 1:
             arr = arr.reshape(1, -1)
-        preds = model.predict_proba(arr) if hasattr(model, "predict_proba") else model.predict(arr)
-        # Convert numpy arrays to Python lists for JSON
-        out = np.asarray(preds).tolist()
-        return jsonify({"predictions": out})
+        timer.mark("features")
+        if hasattr(model, "predict_proba"):
+            predict_fn = scoring_model(bundle).predict_proba if arr.shape[0] == 1 else model.predict_proba
+            preds = cached_predict_proba(bundle, arr, predict_fn)
+        else:
+            preds = model.predict(arr)
+        timer.mark("predict_proba")
+        if response_fmt is not None:
+            response = binary_response(preds, response_fmt, bundle)
+        else:
+            # Convert numpy arrays to Python lists for JSON
+            out = np.asarray(preds).tolist()
+            response = jsonify(with_version({"predictions": out}, bundle))
+        timer.mark("serialize")
+        if metrics.sample_log():
+            metrics.log_request(
+                "predict", model_version=bundle.version, rows=int(arr.shape[0]),
+                request_format=request_fmt or "json", response_format=response_fmt or "json",
+                stages_ms={k: round(v * 1000, 3) for k, v in timer.timings.items()},
+                features=features if request_fmt is None and isinstance(features, dict) else None,
+            )
+        return response
+    except FeatureValidationError as e:
+        return jsonify({"error": str(e), "invalid_features": e.invalid}), 400
     except Exception as e:
         app.logger.exception("Prediction failed")
         return jsonify({"error": str(e)}), 500
 
 
+def list_feature_matrix(features: list, bundle) -> np.ndarray:
+    """
+    Ordered feature values from a JSON list (one row, or a list of rows) as a checked float matrix.
+
+    Raises:
+        FeatureValidationError: Non-finite or out-of-bounds values
+        ValueError: No rows, wrong row width or values that are not numbers
+    """
+    rows = features if features and isinstance(features[0], list) else [features]
+    if bundle.schema is not None:
+        return bundle.schema.matrix(rows=rows)
+    arr = np.asarray(rows, dtype=float)
+    n_features = bundle.model.n_features_in_
+    if arr.ndim != 2 or arr.shape[1] != n_features:
+        raise ValueError(f"features must have {n_features} values per row, got shape {arr.shape}")
+    if not np.isfinite(arr).all():
+        raise ValueError("feature values must be finite numbers")
+    return arr
+
+
+def binary_response(preds: Any, fmt: str, bundle) -> Response:
+    """Predictions as a binary body (see payload_formats.py), with the model version in a header."""
+    preds = np.asarray(preds)
+    if preds.ndim == 1:
+        preds, names = preds.reshape(-1, 1), ["prediction"]
+    else:
+        classes = getattr(bundle.model, "classes_", range(preds.shape[1]))
+        names = [f"probability_{c}" for c in classes]
+    body, headers = payload_formats.encode_matrix(preds, fmt, column_names=names)
+    headers["X-Model-Version"] = str(bundle.version)
+    return Response(body, content_type=headers.pop("Content-Type"), headers=headers)
+
+
+@app.route("/predict/batch", methods=["POST"])
+def predict_batch() -> Any:
+    """
+    Score many machines with a single model call.
+
+    Expected payload (one of "rows" or "columns"):
+    {
+        "rows": [{"machine_id": "M001", "vibration": 25.5, ...}, ...]
+    }
+    {
+        "rows": [[25.5, 75.2, 1200, 1900.6, 2.1, 74.8], ...],
+        "machine_ids": ["M001", ...]
+    }
+    {
+        "columns": {"vibration": [25.5, ...], "temperature": [75.2, ...], ...},
+        "machine_ids": ["M001", ...]
+    }
+    {
+        "machine_ids": ["M001", ...]      (latest features from /ingest readings)
+    }
+    """
+    bundle = active_model()
+    if bundle is None:
+        return jsonify({"error": "model not loaded"}), 500
+    if utils is None:
+        return jsonify({"error": "utils module not available"}), 500
+    model = bundle.model
+    timer = metrics.StageTimer("/predict/batch")
+
+    payload: Dict[str, Any] = request.get_json(force=True)
+    timer.mark("parse")
+    if not isinstance(payload, dict):
+        return jsonify({"error": "JSON object body is required"}), 400
+    rows = payload.get("rows")
+    columns = payload.get("columns")
+    from_store = rows is None and columns is None and isinstance(payload.get("machine_ids"), list)
+    if rows is None and columns is None and not from_store:
+        return jsonify({"error": "rows or columns key is required"}), 400
+
+    schema = bundle.schema
+    if schema is None:
+        return jsonify({"error": "Model has no feature names - cannot order batch features"}), 400
+
+    if from_store:
+        if store is None:
+            return jsonify({"error": "feature store not available"}), 500
+        not_stored = [f for f in schema.names if f not in feature_store.FEATURE_NAMES]
+        if not_stored:
+            return jsonify({"error": f"model features {not_stored} are not computed from ingested readings; "
+                                     "send rows or columns instead"}), 400
+        arr, unknown = store.feature_matrix(payload["machine_ids"])
+        if unknown:
+            return jsonify({"error": not_ingested_error(unknown)}), 404
+        arr = arr[:, [feature_store.FEATURE_NAMES.index(f) for f in schema.names]]
+    else:
+        try:
+            arr = schema.matrix(rows=rows, columns=columns)
+        except FeatureValidationError as e:
+            return jsonify({"error": str(e), "missing_features": e.missing, "invalid_features": e.invalid}), 400
+        except (ValueError, TypeError, AttributeError) as e:
+            return jsonify({"error": str(e)}), 400
+
+    machine_ids = payload.get("machine_ids")
+    if machine_ids is None:
+        if rows and isinstance(rows[0], dict):
+            machine_ids = [r.get("machine_id") for r in rows]
+        else:
+            machine_ids = list(range(len(arr)))
+    if len(machine_ids) != len(arr):
+        return jsonify({"error": f"machine_ids has {len(machine_ids)} entries for {len(arr)} rows"}), 400
+
+    try:
+        if len(arr) == 0:
+            return jsonify(with_version({"results": [], "count": 0}, bundle))
+        timer.mark("features")
+        # One predict_proba call for the rows of the batch that are not cached
+        probabilities = np.asarray(cached_predict_proba(bundle, arr, model.predict_proba))
+        timer.mark("predict_proba")
+        failure_probability = np.round(probabilities[:, 1] * 100, 2).tolist()
+        results = [
+            {"machine_id": mid, "failure_probability": fp, "probabilities": probs}
+            for mid, fp, probs in zip(machine_ids, failure_probability, probabilities.tolist())
+        ]
+        response = jsonify(with_version({"results": results, "count": len(results)}, bundle))
+        timer.mark("serialize")
+        return response
+    except Exception as e:
+        app.logger.exception("Batch prediction failed")
+        return jsonify({"error": str(e)}), 500
+
+
+def check_advice_request(payload: Dict[str, Any], bundle=None):
+    """
+    Validate a maintenance advice payload; shared by the Flask and async (asgi.py) endpoints.
+
+    Args:
+        payload (dict): Request body
+        bundle (ModelBundle, optional): Model whose feature schema applies (default: active model)
+
+    Returns:
+        tuple: (error_body, status_code), or (None, None) when the request is valid
+    """
+    bundle = bundle or registry.active
+    if bundle is None:
+        return {"error": "model not loaded"}, 500
+
+    if llm_assistant is None:
+        return {"error": "LLM assistant not available"}, 500
+
+    if not isinstance(payload, dict):
+        return {"error": "JSON object body is required"}, 400
+
+    # Validate required fields
+    machine_id = payload.get("machine_id")
+    features = payload.get("features")
+
+    if not machine_id:
+        return {"error": "machine_id is required"}, 400
+
+    if features is None:
+        # Score from the feature store when the machine's raw readings were sent to /ingest
+        features = stored_features(machine_id)
+        if features is None:
+            return {"error": f"features dict is required ({not_ingested_error([machine_id])})"}, 400
+        payload["features"] = features
+
+    if not features or not isinstance(features, dict):
+        return {"error": "features dict is required"}, 400
+
+    # Every feature present and a finite number within bounds, checked in one pass
+    schema = bundle.schema
+    if schema is not None:
+        is_valid, missing_features, invalid_features = schema.validate(features)
+        if not is_valid:
+            return {
+                "error": str(schema.error(missing_features, invalid_features)),
+                "required_features": schema.to_list()
+            }, 400
+
+    return None, None
+
+
 @app.route("/maintenance-advice", methods=["POST"])
 def maintenance_advice() -> Any:
     """
@@ -118,40 +597,26 @@ def maintenance_advice() -> Any:
         }
     }
     """
-    if model is None:
-        return jsonify({"error": "model not loaded"}), 500
-    
-    if llm_assistant is None:
-        return jsonify({"error": "LLM assistant not available"}), 500
-
+    timer = metrics.StageTimer("/maintenance-advice")
     payload: Dict[str, Any] = request.get_json(force=True)
-    
-    # Validate required fields
+    timer.mark("parse")
+    bundle = active_model()
+    error, status = check_advice_request(payload, bundle)
+    timer.mark("validate")
+    if error is not None:
+        return jsonify(error), status
+
     machine_id = payload.get("machine_id")
     features = payload.get("features")
-    
-    if not machine_id:
-        return jsonify({"error": "machine_id is required"}), 400
-    
-    if not features or not isinstance(features, dict):
-        return jsonify({"error": "features dict is required"}), 400
-
-    # Validate features if utils is available
-    if utils:
-        is_valid, missing_features = utils.validate_feature_dict(features)
-        if not is_valid:
-            return jsonify({
-                "error": f"Missing required features: {missing_features}",
-                "required_features": utils.load_feature_names()
-            }), 400
 
     try:
-        # Use the API-friendly function from LLM assistant
-        result = llm_assistant.get_maintenance_advice_api(
+        # LLM advice within the latency budget, rule-based advice when it misses it or fails
+        result = with_version(advice_backends.get_maintenance_advice_api(
             machine_id=str(machine_id),
             feature_dict=features,
-            ml_model=model
-        )
+            ml_model=scoring_model(bundle),
+            schema=bundle.schema
+        ), bundle)
         
         if result.get("status") == "error":
             return jsonify(result), 500
@@ -166,7 +631,260 @@ def maintenance_advice() -> Any:
         }), 500
 
 
+def check_fleet_request(payload: Dict[str, Any], bundle):
+    """
+    Validate a fleet advice payload; shared by the Flask and async (asgi.py) endpoints.
+
+    Returns:
+        tuple: (error_body, status_code, options), error_body is None when the request is valid
+    """
+    if bundle is None:
+        return {"error": "model not loaded"}, 500, None
+    if fleet_advice is None:
+        return {"error": "fleet advice not available"}, 500, None
+    if not isinstance(payload, dict):
+        return {"error": "JSON object body is required"}, 400, None
+
+    machines = payload.get("machines")
+    if not isinstance(machines, list) or not all(isinstance(m, dict) for m in machines):
+        return {"error": "machines must be a list of {machine_id, features} objects"}, 400, None
+    missing_ids = [i for i, m in enumerate(machines) if not m.get("machine_id")]
+    if missing_ids:
+        return {"error": f"machine_id is required for machines at positions {missing_ids[:10]}"}, 400, None
+    for m in machines:
+        if m.get("features") is None:
+            m["features"] = stored_features(m["machine_id"])
+    unknown = [m["machine_id"] for m in machines if m["features"] is None]
+    if unknown:
+        return {"error": f"features are required ({not_ingested_error(unknown)})"}, 400, None
+    not_objects = [m["machine_id"] for m in machines if not isinstance(m["features"], dict)]
+    if not_objects:
+        return {"error": f"features must be an object for machines {not_objects[:10]}"}, 400, None
+    try:
+        utils.feature_schema(bundle.schema).matrix(rows=[m["features"] for m in machines])
+    except FeatureValidationError as e:
+        return {"error": str(e), "missing_features": e.missing, "invalid_features": e.invalid}, 400, None
+    except (ValueError, TypeError) as e:
+        return {"error": f"invalid features: {e}"}, 400, None
+
+    try:
+        options = fleet_advice.request_options(payload)
+    except ValueError as e:
+        return {"error": str(e)}, 400, None
+    return None, None, options
+
+
+@app.route("/maintenance-advice/fleet", methods=["POST"])
+def maintenance_advice_fleet() -> Any:
+    """
+    Maintenance advice for many machines with one model call and a bounded LLM fan-out.
+
+    Expected payload:
+    {
+        "machines": [{"machine_id": "M001", "features": {...}}, ...],
+        "low_risk_threshold": 30        (optional, % below which template advice is used)
+    }
+    Optional max_concurrency, rate_limit_per_s and max_retries are capped at server-side maxima
+    (see fleet_advice.REQUEST_OPTIONS).
+    """
+    payload: Dict[str, Any] = request.get_json(force=True)
+    bundle = active_model()
+    error, status, options = check_fleet_request(payload, bundle)
+    if error is not None:
+        return jsonify(error), status
+
+    try:
+        report = fleet_advice.get_fleet_advice_api(
+            payload["machines"], bundle.model, feature_names=bundle.schema, **options
+        )
+        return jsonify(with_version(report, bundle))
+    except Exception as e:
+        app.logger.exception("Fleet advice failed")
+        return jsonify({"error": str(e), "status": "error"}), 500
+
+
+@app.route("/ingest", methods=["POST"])
+def ingest() -> Any:
+    """
+    Feed raw sensor readings into this worker's feature store.
+
+    Expected payload (one of "readings" or "columns"; timestamps are ISO 8601 or epoch seconds):
+    {
+        "readings": [
+            {"machine_id": "M001", "timestamp": "2025-01-01T10:00:00", "vibration": 25.5,
+             "temperature": 75.2, "operating_hours": 1200},
+            ...
+        ]
+    }
+    {
+        "columns": {"machine_id": [...], "timestamp": [...], "vibration": [...],
+                    "temperature": [...], "operating_hours": [...]}
+    }
+
+    Afterwards /predict, /predict/batch and the /maintenance-advice endpoints accept just the
+    machine_id(s) and use each machine's latest engineered features.
+    """
+    if store is None:
+        return jsonify({"error": "feature store not available"}), 500
+
+    payload: Dict[str, Any] = request.get_json(force=True)
+    if not isinstance(payload, dict):
+        return jsonify({"error": "JSON object body is required"}), 400
+    try:
+        readings = feature_store.parse_readings(payload)
+    except (ValueError, TypeError) as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        result = store.ingest(readings["machine_id"], readings["timestamp"], readings["vibration"],
+                              readings["temperature"], readings["operating_hours"])
+        store.maybe_snapshot()
+    except Exception as e:
+        app.logger.exception("Ingest failed")
+        return jsonify({"error": str(e)}), 500
+    return jsonify(dict(result, machines=store.n_machines))
+
+
+@app.route("/stats/feature-store", methods=["GET"])
+def feature_store_stats() -> Any:
+    """Tracked machines, memory per machine and snapshot state of this worker's feature store."""
+    if store is None:
+        return jsonify({"enabled": False})
+    return jsonify(dict(store.stats(), enabled=True, pid=os.getpid()))
+
+
+@app.route("/feature-store/snapshot", methods=["POST"])
+def feature_store_snapshot() -> Any:
+    """Write the feature store to its snapshot file now."""
+    if store is None or not store.snapshot_path:
+        return jsonify({"error": "feature store snapshots are not configured"}), 400
+    try:
+        path = store.snapshot()
+    except Exception as e:
+        app.logger.exception("Feature store snapshot failed")
+        return jsonify({"error": str(e)}), 500
+    return jsonify({"snapshot_path": path, "machines": store.n_machines})
+
+
+def check_admin_token():
+    """A 403 response unless ADMIN_TOKEN is set and sent in X-Admin-Token, otherwise None."""
+    if not ADMIN_TOKEN:
+        return jsonify({"error": "admin endpoints are disabled: ADMIN_TOKEN is not set"}), 403
+    if not hmac.compare_digest(request.headers.get("X-Admin-Token", ""), ADMIN_TOKEN):
+        return jsonify({"error": "invalid admin token"}), 403
+    return None
+
+
+@app.route("/admin/reload", methods=["POST"])
+def admin_reload() -> Any:
+    """
+    Load, validate and swap in new model artifacts in this worker without dropping requests.
+
+    Optional payload: {"path": "/models/2025-06-01", "force": false}. Without a path the
+    current MODEL_PATH is re-resolved (the newest version in a directory of versions). A path
+    must lie inside the versions directory of MODEL_PATH: loading a pickle runs its code.
+    """
+    denied = check_admin_token()
+    if denied is not None:
+        return denied
+    payload = request.get_json(force=True, silent=True) or {}
+    if not isinstance(payload, dict):
+        return jsonify({"error": "JSON object body is required"}), 400
+    path = payload.get("path")
+    if path is not None:
+        root = model_registry.versions_root(MODEL_PATH)
+        if not isinstance(path, str) or not model_registry.is_within(path, root):
+            return jsonify({"error": f"path must be inside the model directory {root}"}), 400
+        path = os.path.realpath(path)
+    result = registry.reload(path=path, force=bool(payload.get("force", False)))
+    status = {"busy": 409, "failed": 422}.get(result["status"], 200)
+    return jsonify(dict(result, pid=os.getpid())), status
+
+
+@app.route("/admin/profile", methods=["GET", "POST"])
+def admin_profile() -> Any:
+    """
+    Samples of profiled requests in this worker, and on-demand profiling settings.
+
+    GET query parameters: format=json (per-endpoint counts, default), collapsed (flamegraph.pl /
+    speedscope input) or text (top functions), and endpoint=/predict to select one endpoint.
+
+    POST payload (all optional): {"sample_every": 100, "header_enabled": true, "reset": true,
+    "dump": true}; "dump" writes the profiles to PROFILE_DIR.
+    """
+    denied = check_admin_token()
+    if denied is not None:
+        return denied
+    if profiler is None:
+        return jsonify({"error": "profiling module not available"}), 500
+    if request.method == "GET":
+        fmt = request.args.get("format", "json")
+        endpoint = request.args.get("endpoint")
+        if fmt == "collapsed":
+            return Response(profiler.collapsed(endpoint), mimetype="text/plain")
+        if fmt == "text":
+            return Response(profiler.report(endpoint), mimetype="text/plain")
+        return jsonify(dict(profiler.stats(), pid=os.getpid()))
+
+    payload = request.get_json(force=True, silent=True) or {}
+    if not isinstance(payload, dict):
+        return jsonify({"error": "JSON object body is required"}), 400
+    written = []
+    if payload.get("dump"):
+        if not PROFILE_DIR:
+            return jsonify({"error": "PROFILE_DIR is not set"}), 400
+        written = profiler.dump(PROFILE_DIR)
+    if payload.get("reset"):
+        profiler.reset()
+    if "sample_every" in payload:
+        try:
+            profiler.sample_every = max(0, int(payload["sample_every"]))
+        except (TypeError, ValueError):
+            return jsonify({"error": "sample_every must be an integer"}), 400
+    if "header_enabled" in payload:
+        profiler.header_enabled = bool(payload["header_enabled"])
+    return jsonify(dict(profiler.stats(), written=written, pid=os.getpid()))
+
+
+def versioned_event(event: str, data: Any, bundle) -> Any:
+    """Tag the "prediction" event of an advice stream with the model version."""
+    if event == "prediction" and isinstance(data, dict):
+        return with_version(dict(data), bundle)
+    return data
+
+
+# Headers that keep proxies (nginx ingress) from buffering the event stream
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+@app.route("/maintenance-advice/stream", methods=["POST"])
+def maintenance_advice_stream() -> Any:
+    """
+    Stream maintenance advice as Server-Sent Events.
+
+    Same payload as /maintenance-advice. Emits a "prediction" event with the failure
+    probability immediately, "advice" events with text chunks as the LLM produces them,
+    and finally "done" (with the full advice) or "error".
+    """
+    payload: Dict[str, Any] = request.get_json(force=True)
+    bundle = active_model()
+    error, status = check_advice_request(payload, bundle)
+    if error is not None:
+        return jsonify(error), status
+
+    events = llm_assistant.iter_maintenance_advice_events(
+        machine_id=str(payload.get("machine_id")),
+        feature_dict=payload.get("features"),
+        ml_model=scoring_model(bundle),
+        schema=bundle.schema
+    )
+    body = (utils.format_sse(event, versioned_event(event, data, bundle)) for event, data in events)
+    return Response(stream_with_context(body), mimetype="text/event-stream", headers=SSE_HEADERS)
+
+
 if __name__ == "__main__":
     # Useful for local debugging; in production run via gunicorn
+    start_model_watcher()
+    start_feature_store_snapshots()
     port = int(os.getenv("PORT", 6000))
     app.run(host="0.0.0.0", port=port, debug=os.getenv("FLASK_DEBUG", "false").lower() in ("1", "true"))
@@ -0,0 +1,132 @@
+"""
+Async (ASGI) entry point for the Verity AI server.
+
+`/maintenance-advice` is served by an asyncio endpoint: the LLM call is awaited on the event
+loop, so thousands of advice requests can wait on the LLM without pinning a worker. Every
+other route (`/predict`, `/health`, ...) is the existing Flask app, mounted through a WSGI
+adapter that runs it in a thread pool, so slow LLM calls never block model scoring.
+
+Run with an async-capable gunicorn worker:
+    GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker gunicorn -c gunicorn.conf.py asgi:app
+
+Tuning (environment variables):
+    LLM_MAX_CONCURRENCY  Max LLM calls in flight per worker (default 64)
+    LLM_TIMEOUT_S        Per-call LLM timeout in seconds (default 30)
+    ADVICE_LATENCY_BUDGET_S  Seconds before the rule-based fallback answers (see advice_backends.py)
+"""
+
+import time
+from typing import Any
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.middleware.wsgi import WSGIMiddleware
+
+import app as flask_app
+import metrics
+import utils
+
+app = FastAPI(title="Verity AI", docs_url=None, redoc_url=None, openapi_url=None)
+
+ASYNC_PATHS = ("/maintenance-advice", "/maintenance-advice/stream", "/maintenance-advice/fleet")
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next) -> Any:
+    # Mounted Flask routes record their own metrics (app.py before/after_request hooks)
+    path = request.url.path
+    if path not in ASYNC_PATHS:
+        return await call_next(request)
+    start = time.perf_counter()
+    metrics.begin_request(path)
+    # Profiled like the Flask routes, but sampling the event-loop thread (see profiling.py);
+    # streaming responses are profiled to the first byte
+    profiler = flask_app.profiler
+    profile_token = profiler.begin(path) if profiler is not None and profiler.should_profile(request.headers) else None
+    try:
+        response = await call_next(request)
+    finally:
+        if profile_token is not None:
+            profiler.end(profile_token)
+    metrics.observe_request(path, request.method, response.status_code, time.perf_counter() - start)
+    return response
+
+
+@app.post("/maintenance-advice")
+async def maintenance_advice(request: Request) -> Any:
+    """Async version of the Flask /maintenance-advice endpoint; same payload and response."""
+    try:
+        payload = await request.json()
+    except ValueError:
+        return JSONResponse({"error": "request body must be valid JSON"}, status_code=400)
+
+    bundle = flask_app.active_model()
+    error, status = flask_app.check_advice_request(payload, bundle)
+    if error is not None:
+        return JSONResponse(error, status_code=status)
+
+    machine_id = payload.get("machine_id")
+    try:
+        result = flask_app.with_version(await flask_app.advice_backends.get_maintenance_advice_api_async(
+            machine_id=str(machine_id),
+            feature_dict=payload.get("features"),
+            ml_model=flask_app.scoring_model(bundle),
+            schema=bundle.schema,
+        ), bundle)
+    except Exception as e:
+        flask_app.app.logger.exception("Maintenance advice failed")
+        return JSONResponse({"machine_id": machine_id, "error": str(e), "status": "error"}, status_code=500)
+
+    return JSONResponse(result, status_code=500 if result.get("status") == "error" else 200)
+
+
+@app.post("/maintenance-advice/stream")
+async def maintenance_advice_stream(request: Request) -> Any:
+    """Async version of the Flask /maintenance-advice/stream endpoint (Server-Sent Events)."""
+    try:
+        payload = await request.json()
+    except ValueError:
+        return JSONResponse({"error": "request body must be valid JSON"}, status_code=400)
+
+    bundle = flask_app.active_model()
+    error, status = flask_app.check_advice_request(payload, bundle)
+    if error is not None:
+        return JSONResponse(error, status_code=status)
+
+    async def body():
+        async for event, data in flask_app.llm_assistant.iter_maintenance_advice_events_async(
+            machine_id=str(payload.get("machine_id")),
+            feature_dict=payload.get("features"),
+            ml_model=flask_app.scoring_model(bundle),
+            schema=bundle.schema,
+        ):
+            yield utils.format_sse(event, flask_app.versioned_event(event, data, bundle))
+
+    return StreamingResponse(body(), media_type="text/event-stream", headers=flask_app.SSE_HEADERS)
+
+
+@app.post("/maintenance-advice/fleet")
+async def maintenance_advice_fleet(request: Request) -> Any:
+    """Async version of the Flask /maintenance-advice/fleet endpoint."""
+    try:
+        payload = await request.json()
+    except ValueError:
+        return JSONResponse({"error": "request body must be valid JSON"}, status_code=400)
+
+    bundle = flask_app.active_model()
+    error, status, options = flask_app.check_fleet_request(payload, bundle)
+    if error is not None:
+        return JSONResponse(error, status_code=status)
+
+    try:
+        report = await flask_app.fleet_advice.get_fleet_advice_async(
+            payload["machines"], bundle.model, feature_names=bundle.schema, **options
+        )
+    except Exception as e:
+        flask_app.app.logger.exception("Fleet advice failed")
+        return JSONResponse({"error": str(e), "status": "error"}, status_code=500)
+    return JSONResponse(flask_app.with_version(report, bundle))
+
+
+# Everything else is served by the Flask app in a thread pool
+app.mount("/", WSGIMiddleware(flask_app.app))
@@ -0,0 +1,218 @@
+"""
+Server-side dynamic micro-batching for model scoring.
+
+Concurrent single-row requests in one worker process are held for a short window (or until
+a maximum batch size is reached), stacked into one array and scored with a single
+`predict_proba` call. Each request then gets its own row of the result back.
+
+Requests only coalesce when a worker serves several requests at once, e.g. gunicorn's
+gthread worker (`--worker-class gthread --threads 8`).
+
+Each row is queued with the `predict_proba` of the model that should score it (see
+`MicroBatcher.for_model`), and a batch is split per model before scoring, so rows queued just
+before a model reload are still scored, and labelled, by the model their request resolved.
+"""
+
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class MicroBatcher:
+    """
+    Coalesce concurrent scoring calls into batched `predict_proba` calls.
+
+    The batcher exposes `predict_proba(X)` so it can be passed anywhere a model is expected;
+    `for_model()` returns the same kind of view for a specific model.
+
+    Args:
+        predict_fn (callable, optional): Default function mapping a 2-D array to a 2-D array of
+            probabilities, used for rows submitted without their own
+        max_batch_size (int): Maximum number of rows scored in one call
+        max_wait_ms (float): How long the first queued row waits for others to join its batch
+        stats_window (int): Number of recent batches kept for percentile statistics
+        n_features (int, optional): Row width accepted by submit(); any width if None
+        result_timeout_s (float): Longest a caller waits for its row to be scored
+    """
+
+    def __init__(self, predict_fn=None, max_batch_size=64, max_wait_ms=3.0, stats_window=2048, n_features=None,
+                 result_timeout_s=30.0):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_s = max_wait_ms / 1000.0
+        self.n_features = n_features
+        self.result_timeout_s = result_timeout_s
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._batch_sizes = deque(maxlen=stats_window)
+        self._queue_waits = deque(maxlen=stats_window)
+        self._total_batches = 0
+        self._total_rows = 0
+
+    def _ensure_worker(self):
+        # Threads do not survive fork, so start the worker lazily in the process that uses it
+        # (e.g. after gunicorn --preload forks the workers).
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+                self._thread.start()
+
+    def submit(self, row, predict_fn=None, n_features=None):
+        """
+        Queue one row for scoring and block until its batch has been scored.
+
+        Args:
+            row (array-like): Feature values for a single row, in model order
+            predict_fn (callable, optional): Model that scores this row (default: the batcher's)
+            n_features (int, optional): Row width that model expects (default: the batcher's)
+
+        Returns:
+            numpy.ndarray: Probabilities for the row
+
+        Raises:
+            ValueError: If the row does not have n_features values
+        """
+        predict_fn = predict_fn or self.predict_fn
+        n_features = n_features or self.n_features
+        if predict_fn is None:
+            raise ValueError("No predict_fn to score the row with")
+        row = np.asarray(row, dtype=np.float64).ravel()
+        if row.size == 0:
+            raise ValueError("Cannot score an empty row")
+        if n_features is not None and row.size != n_features:
+            raise ValueError(f"X has {row.size} features, but the model expects {n_features}")
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((row, time.perf_counter(), future, predict_fn))
+        return future.result(timeout=self.result_timeout_s)
+
+    def predict_proba(self, X):
+        """Model-compatible entry point; single rows are batched, larger arrays go straight through."""
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 2 and X.shape[0] != 1:
+            return self.predict_fn(X)
+        return self.submit(X).reshape(1, -1)
+
+    def for_model(self, predict_fn, n_features=None):
+        """
+        Model-compatible view whose single rows are batched here but scored by `predict_fn`.
+
+        Args:
+            predict_fn (callable): The model's predict_proba
+            n_features (int, optional): Row width the model expects
+
+        Returns:
+            BoundBatcher: Object with a `predict_proba(X)` method
+        """
+        return BoundBatcher(self, predict_fn, n_features)
+
+    def _run(self):
+        q = self._queue
+        while True:
+            first = q.get()
+            batch = [first]
+            deadline = first[1] + self.max_wait_s
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(q.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            dispatched = time.perf_counter()
+            # Rows for different models, or of different widths, cannot share a call
+            groups = {}
+            for item in batch:
+                groups.setdefault((item[3], item[0].size), []).append(item)
+            for (predict_fn, _), group in groups.items():
+                self._score(predict_fn, group)
+
+            with self._lock:
+                self._total_batches += 1
+                self._total_rows += len(batch)
+                self._batch_sizes.append(len(batch))
+                self._queue_waits.extend(dispatched - item[1] for item in batch)
+
+    def _score(self, predict_fn, group):
+        """Score one group of queued rows; every future is resolved, whatever happens."""
+        try:
+            probabilities = np.asarray(predict_fn(np.stack([item[0] for item in group])))
+            if len(probabilities) != len(group):
+                raise ValueError(f"predict_fn returned {len(probabilities)} rows for {len(group)}")
+        except Exception as e:
+            for item in group:
+                item[2].set_exception(e)
+        else:
+            for i, item in enumerate(group):
+                item[2].set_result(probabilities[i])
+
+    def stats(self):
+        """
+        Batch-size and queue-wait statistics for tuning the window against p99 latency.
+
+        Returns:
+            dict: Settings, totals and percentiles over the recent window
+        """
+        with self._lock:
+            sizes = np.asarray(self._batch_sizes, dtype=np.float64)
+            waits = np.asarray(self._queue_waits, dtype=np.float64) * 1000.0
+            total_batches, total_rows = self._total_batches, self._total_rows
+
+        def percentiles(values):
+            if values.size == 0:
+                return {"mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            return {"mean": round(float(values.mean()), 3), "p50": round(float(p50), 3),
+                    "p95": round(float(p95), 3), "p99": round(float(p99), 3), "max": round(float(values.max()), 3)}
+
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_s * 1000.0,
+            "total_batches": total_batches,
+            "total_rows": total_rows,
+            "queue_depth": self._queue.qsize(),
+            "batch_size": percentiles(sizes),
+            "queue_wait_ms": percentiles(waits),
+        }
+
+
+class BoundBatcher:
+    """A MicroBatcher seen as one model: single rows are batched, then scored by `predict_fn`."""
+
+    def __init__(self, batcher, predict_fn, n_features=None):
+        self.batcher = batcher
+        self.predict_fn = predict_fn
+        self.n_features = n_features
+
+    def predict_proba(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 2 and X.shape[0] != 1:
+            return self.predict_fn(X)
+        return self.batcher.submit(X, self.predict_fn, self.n_features).reshape(1, -1)
+
+
+def batcher_from_env(predict_fn=None):
+    """
+    Build a MicroBatcher from environment settings, or return None when batching is off.
+
+    MICROBATCH_MAX_WAIT_MS enables batching when set above 0 (e.g. 2-5 ms).
+    MICROBATCH_MAX_SIZE caps the rows per batch (default 64).
+    """
+    max_wait_ms = float(os.getenv("MICROBATCH_MAX_WAIT_MS", "0") or 0)
+    if max_wait_ms <= 0:
+        return None
+    max_batch_size = int(os.getenv("MICROBATCH_MAX_SIZE", "64"))
+    return MicroBatcher(predict_fn, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Feature engineering time: pandas groupby/rolling vs the NumPy segment-wise backend.
+
+Generates synthetic fleets of several sizes, runs `engineer_features()` with both backends on
+copies of the same frame, and reports the median wall time, speedup and the largest difference
+between the two outputs.
+
+Usage:
+    python verity-AI/benchmarks/bench_engineer_features.py --machines 10,1000,10000 --days 30
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import engineer_feature as ef  # noqa: E402
+import generate_data as gd  # noqa: E402
+
+ENGINEERED = ["temp_vibration_interaction", "vibration_rate_of_change", "temp_rolling_avg"]
+
+
+def time_backend(df, backend, repeats):
+    """Median seconds per call and the last output frame."""
+    samples = []
+    for _ in range(repeats):
+        frame = df.copy()
+        start = time.perf_counter()
+        out = ef.engineer_features(frame, backend=backend)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples), out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--machines", default="10,1000,10000")
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", help="Write results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'machines':>10}{'rows':>12}{'pandas (s)':>14}{'numpy (s)':>14}{'speedup':>10}{'max |diff|':>12}")
+    print("=" * 72)
+    for n in (int(m) for m in args.machines.split(",")):
+        df = gd.generate_synthetic_data(num_machines=n, duration_days=args.days, seed=0)
+        pandas_s, expected = time_backend(df, "pandas", args.repeats)
+        numpy_s, actual = time_backend(df, "numpy", args.repeats)
+        diff = max(float(np.abs(actual[c].to_numpy() - expected[c].to_numpy()).max()) for c in ENGINEERED)
+        results.append({"machines": n, "rows": len(df), "pandas_s": pandas_s, "numpy_s": numpy_s,
+                        "speedup": pandas_s / numpy_s, "max_abs_diff": diff})
+        print(f"{n:>10}{len(df):>12,}{pandas_s:>14.4f}{numpy_s:>14.4f}{pandas_s / numpy_s:>9.1f}x{diff:>12.1e}")
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump({"days": args.days, "results": results}, fh, indent=2)
+        print(f"\nSaved results to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Per-request feature validation cost: JSON re-reads vs the compiled FeatureSchema.
+
+"before" replays what a /maintenance-advice request used to do: `validate_feature_dict()` and
+`predict_failure_probability()` each re-opened and parsed `model_features.json`, then built the
+row with a list comprehension. "after" is the cached schema: one validation pass and one
+dict -> ndarray conversion, looked up by path (one stat call) or held on the model bundle as
+app.py does.
+
+Usage:
+    python verity-AI/benchmarks/bench_feature_schema.py --requests 20000
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import feature_schema as fs  # noqa: E402
+
+ROW = {"vibration": 52.1, "temperature": 71.4, "operating_hours": 1200, "temp_vibration_interaction": 3720.0,
+       "vibration_rate_of_change": -1.5, "temp_rolling_avg": 70.9}
+
+
+def _read_names(path):
+    with open(path, "r") as fh:
+        return json.load(fh)
+
+
+def before(features, path):
+    # validate_feature_dict() -> load_feature_names()
+    names = _read_names(path)
+    missing = [f for f in names if f not in features]
+    if missing:
+        raise ValueError(missing)
+    # predict_failure_probability() -> load_feature_names() again
+    order = _read_names(path)
+    return np.array([features.get(f, 0.0) for f in order]).reshape(1, -1)
+
+
+def after(features, path):
+    schema = fs.load_feature_schema(path)
+    is_valid, missing, invalid = schema.validate(features)
+    if not is_valid:
+        raise schema.error(missing, invalid)
+    return schema.row(features)
+
+
+def per_call_us(fn, args, number):
+    return min(timeit.repeat(lambda: fn(*args), number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000, help="Calls per timing round")
+    parser.add_argument("--output", help="Write results as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "model_features.json")
+        with open(path, "w") as fh:
+            json.dump(fs.DEFAULT_FEATURES, fh)
+        np.testing.assert_array_equal(before(ROW, path), after(ROW, path))
+
+        before_us = per_call_us(before, (ROW, path), args.requests)
+        after_us = per_call_us(after, (ROW, path), args.requests)
+        schema = fs.load_feature_schema(path)
+        # Steady state in app.py: the schema is already on the model bundle, no cache lookup
+        bundle_us = per_call_us(lambda f: schema.row(f), (ROW,), args.requests)
+
+    results = {"before_us": before_us, "after_us": after_us, "bundle_schema_us": bundle_us}
+    print(f"{'path':<34}{'before (us)':>14}{'after (us)':>14}{'speedup':>10}")
+    print("=" * 72)
+    print(f"{'validate + dict->row (1 request)':<34}{before_us:>14.2f}{after_us:>14.2f}{before_us / after_us:>9.1f}x")
+    print(f"{'  schema held on the bundle':<34}{'':>14}{bundle_us:>14.2f}{before_us / bundle_us:>9.1f}x")
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(results, fh, indent=2)
+        print(f"\nSaved results to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Latency comparison: sklearn RandomForestClassifier vs the packed forest engine.
+
+Measures single-row latency (the /predict path) and batch latency at several sizes for both
+scorers on the same model, and checks the probabilities match.
+
+Usage:
+    python verity-AI/benchmarks/bench_forest_engine.py --model-path verity-AI/model.joblib
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+import warnings
+
+import joblib
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import forest_engine  # noqa: E402
+
+
+def time_call(fn, X, repeats):
+    """Return per-call latencies in milliseconds."""
+    fn(X)  # warm up
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(X)
+        samples.append((time.perf_counter() - start) * 1000.0)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    default_model = os.getenv("MODEL_PATH", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "model.joblib"))
+    parser.add_argument("--model-path", default=default_model)
+    parser.add_argument("--repeats", type=int, default=200, help="Calls per single-row measurement")
+    parser.add_argument("--batch-sizes", default="1,10,100,1000,10000")
+    args = parser.parse_args()
+
+    clf = joblib.load(args.model_path)
+    packed = forest_engine.PackedForest(forest_engine.export_forest(clf))
+    rng = np.random.default_rng(0)
+
+    # Plausible sensor ranges around the synthetic data distribution
+    def sample_rows(n):
+        vibration = rng.normal(52, 6, n)
+        temperature = rng.normal(71, 3, n)
+        hours = rng.uniform(0, 4320, n)
+        return np.column_stack([vibration, temperature, hours, vibration * temperature,
+                                rng.normal(0, 7, n), temperature + rng.normal(0, 0.6, n)])
+
+    print(f"Model: {args.model_path} ({packed.n_trees} trees, {len(packed.feature)} nodes, max depth {packed.max_depth})")
+    print("=" * 72)
+    print(f"{'rows':>8}{'sklearn p50 (ms)':>20}{'packed p50 (ms)':>20}{'speedup':>12}{'max |diff|':>12}")
+    print("=" * 72)
+    with warnings.catch_warnings():
+        # sklearn warns on every call when the model was fitted with feature names
+        warnings.simplefilter("ignore")
+        for n in (int(b) for b in args.batch_sizes.split(",")):
+            X = sample_rows(n)
+            repeats = max(3, args.repeats // max(1, n // 10))
+            sk = statistics.median(time_call(clf.predict_proba, X, repeats))
+            pk = statistics.median(time_call(packed.predict_proba, X, repeats))
+            diff = float(np.abs(clf.predict_proba(X) - packed.predict_proba(X)).max())
+            print(f"{n:>8}{sk:>20.3f}{pk:>20.3f}{sk / pk:>11.1f}x{diff:>12.1e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+Concurrent load test of the Verity AI server with a local LLM stand-in.
+
+Starts the LLM stub (llm_stub.py) and the app under gunicorn (via gunicorn.conf.py, with
+OPENAI_BASE_URL pointing at the stub), then drives a weighted mix of requests from
+--concurrency closed-loop clients for --duration seconds after a --warmup period:
+
+    predict        POST /predict, one machine as a feature dict
+    batch          POST /predict/batch, --batch-rows machines
+    advice         POST /maintenance-advice (scoring + one LLM call)
+    advice_stream  POST /maintenance-advice/stream, read to the end of the event stream
+
+Features are drawn from a pool of random rows and the advice cache is off by default, so
+every advice request reaches the stub. While the load runs, the CPU time and RSS of the
+gunicorn master and workers are sampled from /proc. The report has RPS, p50/p95/p99/max
+latency and error rate per request type, worker CPU and RSS, and is written with --output as
+JSON (with the git commit) so runs can be compared across commits. Linux only.
+
+Usage:
+    python verity-AI/benchmarks/bench_load.py --mix predict=7,batch=1,advice=2 --concurrency 32 --duration 30
+    python verity-AI/benchmarks/bench_load.py --worker-class uvicorn.workers.UvicornWorker --mix advice=1
+    python verity-AI/benchmarks/bench_load.py --url http://localhost:6000 --mix predict=1 --output load.json
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+
+VERITY_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, VERITY_DIR)
+
+import utils  # noqa: E402
+from bench_worker_memory import free_port, wait_for_health, worker_pids  # noqa: E402
+from feature_schema import DEFAULT_FEATURES  # noqa: E402
+from llm_stub import StubLLMServer  # noqa: E402
+
+REQUEST_TYPES = ("predict", "batch", "advice", "advice_stream")
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+
+
+def parse_mix(text):
+    """'predict=7,advice=3' -> {"predict": 7.0, "advice": 3.0}."""
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in REQUEST_TYPES:
+            raise SystemExit(f"unknown request type {name!r}; choose from {', '.join(REQUEST_TYPES)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def feature_pool(n_rows, seed=0):
+    """Random but plausible feature dicts in model order."""
+    rng = np.random.default_rng(seed)
+    vibration = rng.normal(52, 8, n_rows)
+    temperature = rng.normal(71, 4, n_rows)
+    columns = [vibration, temperature, rng.uniform(0, 4000, n_rows), vibration * temperature,
+               rng.normal(0, 7, n_rows), temperature + rng.normal(0, 1, n_rows)]
+    return [{name: round(float(col[i]), 3) for name, col in zip(DEFAULT_FEATURES, columns)} for i in range(n_rows)]
+
+
+def build_request(kind, rng, pool, batch_rows):
+    """(path, JSON payload) of one request of the given type."""
+    i = rng.randrange(len(pool))
+    if kind == "predict":
+        return "/predict", {"features": pool[i]}
+    if kind == "batch":
+        rows = [dict(pool[(i + j) % len(pool)], machine_id=f"M{(i + j) % 10000:04d}") for j in range(batch_rows)]
+        return "/predict/batch", {"rows": rows}
+    path = "/maintenance-advice/stream" if kind == "advice_stream" else "/maintenance-advice"
+    return path, {"machine_id": f"M{i % 10000:04d}", "features": pool[i]}
+
+
+class ProcessSampler:
+    """Sample CPU seconds and RSS of a gunicorn master and its workers from /proc."""
+
+    def __init__(self, master_pid, interval_s=0.5):
+        self.master_pid = master_pid
+        self.interval_s = interval_s
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampler", daemon=True)
+
+    def _cpu_seconds(self, pid):
+        try:
+            with open(f"/proc/{pid}/stat", "r") as fh:
+                fields = fh.read().rsplit(")", 1)[1].split()
+            return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+        except (OSError, IndexError):
+            return None
+
+    def sample(self):
+        pids = [self.master_pid]
+        try:
+            pids += worker_pids(self.master_pid)
+        except OSError:
+            pass
+        procs = {}
+        for pid in pids:
+            cpu = self._cpu_seconds(pid)
+            if cpu is not None:
+                procs[pid] = {"cpu_s": cpu, "rss_mib": utils.process_memory(pid).get("rss", 0.0)}
+        return {"t": time.perf_counter(), "procs": procs}
+
+    def _run(self):
+        while not self._stop.wait(self.interval_s):
+            self.samples.append(self.sample())
+
+    def start(self):
+        self.samples.append(self.sample())
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.samples.append(self.sample())
+
+    def report(self, start, end):
+        """CPU utilisation and RSS per process between two perf_counter times."""
+        window = [s for s in self.samples if start <= s["t"] <= end] or self.samples[-2:]
+        first, last = window[0], window[-1]
+        elapsed = max(last["t"] - first["t"], 1e-9)
+        processes = []
+        for pid, end_stats in last["procs"].items():
+            begin = first["procs"].get(pid)
+            rss = [s["procs"][pid]["rss_mib"] for s in window if pid in s["procs"]]
+            processes.append({
+                "pid": pid,
+                "role": "master" if pid == self.master_pid else "worker",
+                "cpu_pct": round(100 * (end_stats["cpu_s"] - begin["cpu_s"]) / elapsed, 1) if begin else None,
+                "rss_mib_max": round(max(rss), 1),
+                "rss_mib_end": round(end_stats["rss_mib"], 1),
+            })
+        workers = [p for p in processes if p["role"] == "worker"] or processes
+        return {
+            "processes": processes,
+            "cpu_cores_total": round(sum(p["cpu_pct"] or 0.0 for p in processes) / 100, 2),
+            "worker_cpu_pct_avg": round(sum(p["cpu_pct"] or 0.0 for p in workers) / len(workers), 1),
+            "worker_rss_mib_max": max(p["rss_mib_max"] for p in workers),
+            "rss_mib_total": round(sum(p["rss_mib_end"] for p in processes), 1),
+        }
+
+
+def run_load(base_url, mix, concurrency, duration_s, warmup_s, batch_rows, timeout_s, seed=0):
+    """
+    Drive the request mix with closed-loop client threads.
+
+    Returns:
+        tuple: (records, measure_start, measure_end); records are (kind, start, seconds, ok)
+            for requests started after the warmup
+    """
+    import requests
+
+    pool = feature_pool(1000, seed)
+    kinds, weights = list(mix), list(mix.values())
+    records = []
+    lock = threading.Lock()
+    t0 = time.perf_counter()
+    measure_start = t0 + warmup_s
+    deadline = measure_start + duration_s
+
+    def client(worker_id):
+        rng = random.Random(seed * 1000 + worker_id)
+        session = requests.Session()
+        local = []
+        while True:
+            start = time.perf_counter()
+            if start >= deadline:
+                break
+            kind = rng.choices(kinds, weights)[0]
+            path, payload = build_request(kind, rng, pool, batch_rows)
+            try:
+                response = session.post(base_url + path, json=payload, timeout=timeout_s,
+                                        stream=kind == "advice_stream")
+                if kind == "advice_stream":
+                    body = b"".join(response.iter_content(chunk_size=None))
+                    ok = response.status_code == 200 and b"event: done" in body
+                else:
+                    response.content
+                    ok = response.status_code == 200
+            except requests.RequestException:
+                ok = False
+            if start >= measure_start:
+                local.append((kind, start, time.perf_counter() - start, ok))
+        with lock:
+            records.extend(local)
+
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return records, measure_start, deadline
+
+
+def summarize(records, elapsed_s):
+    """RPS, latency percentiles and error rate per request type and overall."""
+    def stats(rows):
+        if not rows:
+            return {"requests": 0}
+        latency_ms = np.array([r[2] for r in rows]) * 1000
+        errors = sum(1 for r in rows if not r[3])
+        p50, p95, p99 = np.percentile(latency_ms, [50, 95, 99])
+        return {
+            "requests": len(rows), "errors": errors, "error_rate": round(errors / len(rows), 4),
+            "rps": round(len(rows) / elapsed_s, 1), "p50_ms": round(float(p50), 2),
+            "p95_ms": round(float(p95), 2), "p99_ms": round(float(p99), 2),
+            "max_ms": round(float(latency_ms.max()), 2),
+        }
+
+    by_kind = {kind: stats([r for r in records if r[0] == kind]) for kind in REQUEST_TYPES}
+    summary = {kind: s for kind, s in by_kind.items() if s["requests"]}
+    summary["all"] = stats(records)
+    return summary
+
+
+def start_server(args, stub_url):
+    """Start gunicorn on a free port; return (process, base URL)."""
+    port = free_port()
+    env = dict(
+        os.environ, PORT=str(port), MODEL_PATH=os.path.abspath(args.model_path),
+        GUNICORN_WORKERS=str(args.workers), GUNICORN_WORKER_CLASS=args.worker_class,
+        GUNICORN_THREADS=str(args.threads), OPENAI_BASE_URL=stub_url,
+        OPENAI_API_KEY=os.getenv("OPENAI_API_KEY", "stub"), REQUEST_LOG_SAMPLE_RATE="0",
+    )
+    if not args.advice_cache:
+        env["ADVICE_CACHE_ENABLED"] = "false"
+    target = "asgi:app" if "uvicorn" in args.worker_class.lower() else "app:app"
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", target],
+        cwd=VERITY_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_for_health(port)
+    except RuntimeError:
+        proc.terminate()
+        raise
+    return proc, f"http://127.0.0.1:{port}"
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=VERITY_DIR,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-path", default=os.getenv("MODEL_PATH", os.path.join(VERITY_DIR, "model.joblib")))
+    parser.add_argument("--url", help="Load an already running server instead of starting gunicorn")
+    parser.add_argument("--server-pid", type=int, help="With --url: gunicorn master pid to sample CPU/RSS from")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("GUNICORN_WORKERS", "2")))
+    parser.add_argument("--worker-class", default=os.getenv("GUNICORN_WORKER_CLASS", "sync"))
+    parser.add_argument("--threads", type=int, default=int(os.getenv("GUNICORN_THREADS", "1")))
+    parser.add_argument("--mix", default="predict=7,batch=1,advice=2",
+                        help=f"Weighted request mix over {', '.join(REQUEST_TYPES)}")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent closed-loop clients")
+    parser.add_argument("--duration", type=float, default=20.0, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=3.0, help="Unmeasured seconds before --duration")
+    parser.add_argument("--batch-rows", type=int, default=100)
+    parser.add_argument("--timeout", type=float, default=60.0, help="Client timeout per request")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Stub seconds before the first token")
+    parser.add_argument("--llm-tokens", type=int, default=60)
+    parser.add_argument("--llm-token-interval", type=float, default=0.01)
+    parser.add_argument("--llm-jitter", type=float, default=0.1)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--advice-cache", action="store_true", help="Keep the server's advice cache on")
+    parser.add_argument("--label", help="Free-form name of this run in the JSON output")
+    parser.add_argument("--output", help="Write results as JSON")
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+
+    stub = None
+    proc = None
+    if args.url:
+        base_url, master_pid = args.url.rstrip("/"), args.server_pid
+    else:
+        stub = StubLLMServer(("127.0.0.1", 0), args.llm_latency, args.llm_tokens, args.llm_token_interval,
+                             args.llm_jitter, args.llm_error_rate).start()
+        proc, base_url = start_server(args, stub.base_url)
+        master_pid = proc.pid
+
+    sampler = ProcessSampler(master_pid) if master_pid else None
+    try:
+        if sampler:
+            sampler.start()
+        records, measure_start, measure_end = run_load(
+            base_url, mix, args.concurrency, args.duration, args.warmup, args.batch_rows, args.timeout
+        )
+        if sampler:
+            sampler.stop()
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=30)
+        if stub is not None:
+            stub.shutdown()
+
+    elapsed = max(measure_end - measure_start, 1e-9)
+    summary = summarize(records, elapsed)
+    resources = sampler.report(measure_start, measure_end) if sampler else None
+
+    print(f"{args.concurrency} clients, {args.duration:.0f}s, mix {args.mix}"
+          + (f", {args.workers} x {args.worker_class} workers" if not args.url else f", {base_url}"))
+    print("=" * 78)
+    print(f"{'type':<15}{'requests':>9}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'errors':>8}")
+    print("=" * 78)
+    for kind, s in summary.items():
+        print(f"{kind:<15}{s['requests']:>9}{s['rps']:>9.1f}{s['p50_ms']:>10.1f}{s['p95_ms']:>10.1f}"
+              f"{s['p99_ms']:>10.1f}{s['max_ms']:>10.1f}{s['error_rate']:>8.1%}")
+    if resources:
+        print(f"\nserver CPU {resources['cpu_cores_total']:.2f} cores, worker CPU avg "
+              f"{resources['worker_cpu_pct_avg']:.0f}%, worker RSS max {resources['worker_rss_mib_max']:.0f} MiB, "
+              f"total RSS {resources['rss_mib_total']:.0f} MiB")
+    if stub is not None:
+        print(f"LLM stub calls: {stub.calls}")
+
+    if args.output:
+        result = {
+            "label": args.label, "commit": git_commit(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "config": {k: v for k, v in vars(args).items() if k != "output"},
+            "results": summary, "server": resources, "llm_stub_calls": stub.calls if stub else None,
+        }
+        with open(args.output, "w") as fh:
+            json.dump(result, fh, indent=2)
+        print(f"\nSaved results to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Build time and query latency of the manual retrieval index.
+
+Generates synthetic manual passages (40-80 words, half from one of 500 topic word lists and half
+drawn with a Zipf distribution from a maintenance vocabulary plus part codes), builds an index with manual_index.build_index() in a
+temporary directory, then times single top-k queries (embedding + cosine scan of the
+memory-mapped matrix + top-k) and batched queries, cold (first query after opening) and warm.
+Indexes large enough for IVF partitioning (manual_index.IVF_MIN_PASSAGES) also report recall@k of
+the probed search against an exact scan of the same queries.
+
+Usage:
+    python verity-AI/benchmarks/bench_manual_index.py --passages 10000,1000000
+    python verity-AI/benchmarks/bench_manual_index.py --passages 100000 --dim 512 --queries 200
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import manual_index  # noqa: E402
+
+BASE_WORDS = (
+    "bearing vibration temperature motor mount alignment lubricate grease seal shaft coupling belt tension "
+    "pump impeller valve pressure sensor calibrate replace inspect torque bolt fastener gearbox oil filter "
+    "coolant fan overheating noise wear crack corrosion spindle rotor stator winding insulation voltage current "
+    "fuse relay controller firmware diagnostic shutdown startup procedure interval hours schedule lockout "
+    "tagout safety clearance tolerance runout balance resonance frequency amplitude thermal imaging ultrasound"
+).split()
+
+
+VOCAB = np.array(BASE_WORDS + [f"part-{i:05d}" for i in range(5000)] + [f"term{i}" for i in range(20000)])
+N_TOPICS = 500
+TOPIC_WORDS = 30
+
+
+def topic_words(seed=0):
+    """Per-topic word lists: manuals cluster by subsystem, so passages share topical vocabulary."""
+    rng = np.random.default_rng(seed)
+    return rng.choice(VOCAB, size=(N_TOPICS, TOPIC_WORDS))
+
+
+def synthetic_passages(n, seed=0):
+    rng = np.random.default_rng(seed)
+    topics = topic_words(seed)
+    ranks = np.arange(1, len(VOCAB) + 1)
+    p = 1.0 / ranks ** 1.1
+    p /= p.sum()
+    lengths = rng.integers(40, 81, n)
+    # Half of each passage comes from its topic, the rest is Zipf background text
+    background = VOCAB[rng.choice(len(VOCAB), size=int(lengths.sum()), p=p)]
+    passage_topics = rng.integers(0, N_TOPICS, n)
+    bounds = np.concatenate([[0], np.cumsum(lengths)])
+    for i in range(n):
+        words = background[bounds[i]:bounds[i + 1]].copy()
+        half = len(words) // 2
+        words[:half] = rng.choice(topics[passage_topics[i]], half)
+        rng.shuffle(words)
+        yield {"id": f"M-{i // 100:05d} §{i % 100}", "title": f"Section {i % 100}", "text": " ".join(words)}
+
+
+def time_queries(index, queries, k, nprobe=None):
+    samples = []
+    for q in queries:
+        start = time.perf_counter()
+        index.search(q, k=k, nprobe=nprobe)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--passages", default="10000,1000000")
+    parser.add_argument("--dim", type=int, default=manual_index.DEFAULT_DIM)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--batch", type=int, default=32, help="Queries per batched search")
+    parser.add_argument("--nprobe", type=int, help="IVF clusters scanned per query (default: the index default)")
+    parser.add_argument("--work-dir", help="Where to build the indexes (default: a temporary directory)")
+    parser.add_argument("--output", help="Write results as JSON")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    topics = topic_words()
+    queries = [" ".join(rng.choice(topics[rng.integers(N_TOPICS)], 6)) for _ in range(args.queries)]
+    work_dir = tempfile.mkdtemp(prefix="manual-index-", dir=args.work_dir)
+
+    results = []
+    print(f"{'passages':>10}{'build s':>9}{'passages/s':>12}{'MiB':>8}{'lists':>7}{'cold ms':>9}{'p50 ms':>9}"
+          f"{'p95 ms':>9}{'batch ms/q':>12}{'recall':>8}")
+    print("=" * 93)
+    try:
+        for n in (int(x) for x in args.passages.split(",")):
+            out = os.path.join(work_dir, str(n))
+            stats = manual_index.build_index(synthetic_passages(n), out, dim=args.dim)
+
+            index = manual_index.ManualIndex(out)
+            cold = time_queries(index, queries[:1], args.k, args.nprobe)[0]
+            warm = time_queries(index, queries, args.k, args.nprobe)
+            q_vectors = index.embed(queries[:args.batch])
+            start = time.perf_counter()
+            found, _ = index.search_vectors(q_vectors, args.k, nprobe=args.nprobe)
+            batch_per_query = (time.perf_counter() - start) / len(q_vectors)
+            n_lists = stats["ivf_lists"]
+            recall = 1.0
+            if n_lists:
+                exact, _ = index.search_vectors(q_vectors, args.k, nprobe=n_lists)
+                recall = float(np.mean([len(set(a) & set(b)) / len(b) for a, b in zip(found, exact)]))
+
+            p50 = statistics.median(warm)
+            p95 = float(np.percentile(warm, 95))
+            row = {"passages": n, "dim": args.dim, "build_s": stats["build_seconds"],
+                   "passages_per_s": n / stats["build_seconds"], "index_mib": stats["index_bytes"] / 2 ** 20,
+                   "cold_query_ms": cold * 1000, "p50_ms": p50 * 1000, "p95_ms": p95 * 1000,
+                   "batch_ms_per_query": batch_per_query * 1000, "k": args.k, "ivf_lists": n_lists,
+                   "nprobe": args.nprobe, "recall_at_k": recall}
+            results.append(row)
+            print(f"{n:>10,}{row['build_s']:>9.1f}{row['passages_per_s']:>12,.0f}{row['index_mib']:>8.0f}"
+                  f"{n_lists:>7}{row['cold_query_ms']:>9.2f}{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}"
+                  f"{row['batch_ms_per_query']:>12.2f}{recall:>8.2f}")
+            del index
+            shutil.rmtree(out)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(results, fh, indent=2)
+        print(f"\nSaved results to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Throughput of the online feature engine.
+
+Feeds one reading per machine per step (an hourly fleet tick) through
+`OnlineFeatureEngine.update_batch()` and reports machine-updates per second, with and without
+the machine-id lookup, next to the single-reading `update()` path.
+
+Usage:
+    python verity-AI/benchmarks/bench_online_features.py --machines 10000,100000,1000000 --steps 48
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from online_features import OnlineFeatureEngine  # noqa: E402
+
+
+def run(n_machines, steps, rng):
+    engine = OnlineFeatureEngine(capacity=n_machines)
+    ids = np.arange(n_machines)
+    slots = engine.resolve(ids)
+    vibration = rng.normal(50, 5, (steps, n_machines))
+    temperature = rng.normal(70, 3, (steps, n_machines))
+
+    start = time.perf_counter()
+    for step in range(steps):
+        engine.update_batch(None, vibration[step], temperature[step], np.full(n_machines, step), slots=slots)
+    by_slot = n_machines * steps / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for step in range(steps):
+        engine.update_batch(ids, vibration[step], temperature[step], np.full(n_machines, step))
+    by_id = n_machines * steps / (time.perf_counter() - start)
+    return by_slot, by_id, engine.state_bytes() / n_machines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--machines", default="1000,100000,1000000")
+    parser.add_argument("--steps", type=int, default=48, help="Readings per machine")
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+
+    engine = OnlineFeatureEngine()
+    n_single = 100000
+    values = rng.normal(50, 5, n_single)
+    start = time.perf_counter()
+    for i in range(n_single):
+        engine.update(i % 1000, values[i], 70.0, i)
+    single = n_single / (time.perf_counter() - start)
+
+    print(f"{'machines':>10}{'updates/s (slots)':>20}{'updates/s (ids)':>18}{'bytes/machine':>16}")
+    print("=" * 64)
+    for n in (int(m) for m in args.machines.split(",")):
+        by_slot, by_id, per_machine = run(n, args.steps, rng)
+        print(f"{n:>10}{by_slot:>20,.0f}{by_id:>18,.0f}{per_machine:>16.0f}")
+    print(f"\nSingle-reading update(): {single:,.0f} updates/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+End-to-end /predict throughput per payload format.
+
+Encodes the same feature matrix as JSON, raw float32/float64, `.npy` and Arrow IPC, posts it to
+/predict and decodes the probabilities the server sends back in the same format, so every
+number includes client encode, server decode, scoring, server encode and client decode. Runs
+in-process through the Flask test client by default, or against a live server with --url.
+
+Usage:
+    python verity-AI/benchmarks/bench_predict_formats.py --model-path verity-AI/model.joblib --rows 1,100,10000
+    python verity-AI/benchmarks/bench_predict_formats.py --url http://localhost:6000 --rows 1,100,10000
+"""
+
+import argparse
+import io
+import json
+import os
+import statistics
+import sys
+import time
+import warnings
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import payload_formats as pf  # noqa: E402
+
+
+def encoders(feature_names):
+    """Format name -> (content type, encode(matrix) -> body, decode(body) -> probabilities)."""
+    def json_body(X):
+        return json.dumps({"features": X.tolist()}).encode()
+
+    def npy_body(X):
+        stream = io.BytesIO()
+        np.save(stream, X)
+        return stream.getvalue()
+
+    formats = {
+        "json": (pf.JSON, json_body, lambda body: np.asarray(json.loads(body)["predictions"])),
+        "float64": (pf.FLOAT64, lambda X: X.astype("<f8").tobytes(),
+                    lambda body: np.frombuffer(body, dtype="<f8").reshape(-1, 2)),
+        "float32": (pf.FLOAT32, lambda X: X.astype("<f4").tobytes(),
+                    lambda body: np.frombuffer(body, dtype="<f4").reshape(-1, 2)),
+        "npy": (pf.NPY, npy_body, lambda body: np.load(io.BytesIO(body))),
+    }
+    try:
+        import pyarrow as pa
+    except ImportError:
+        print("pyarrow not installed; skipping Arrow IPC")
+        return formats
+
+    def arrow_body(X):
+        batch = pa.RecordBatch.from_arrays([pa.array(X[:, j]) for j in range(X.shape[1])], names=feature_names)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, batch.schema) as writer:
+            writer.write_batch(batch)
+        return sink.getvalue().to_pybytes()
+
+    def arrow_decode(body):
+        table = pa.ipc.open_stream(body).read_all()
+        return np.column_stack([c.to_numpy() for c in table.columns])
+
+    formats["arrow"] = (pf.ARROW, arrow_body, arrow_decode)
+    return formats
+
+
+def make_poster(url, model_path):
+    """post(body, content_type) -> response bytes, via a live server or the Flask test client."""
+    if url:
+        import requests
+
+        session = requests.Session()
+
+        def post(body, content_type):
+            response = session.post(f"{url}/predict", data=body, headers={"Content-Type": content_type})
+            response.raise_for_status()
+            return response.content
+        return post
+
+    os.environ["MODEL_PATH"] = model_path
+    import app  # noqa: E402
+
+    client = app.app.test_client()
+
+    def post(body, content_type):
+        response = client.post("/predict", data=body, content_type=content_type)
+        if response.status_code != 200:
+            raise RuntimeError(response.get_data(as_text=True))
+        return response.data
+    return post
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    default_model = os.getenv("MODEL_PATH", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "model.joblib"))
+    parser.add_argument("--model-path", default=default_model)
+    parser.add_argument("--url", help="Benchmark a running server instead of the in-process Flask app")
+    parser.add_argument("--rows", default="1,100,10000")
+    parser.add_argument("--seconds", type=float, default=2.0, help="Time budget per format and size")
+    parser.add_argument("--output", help="Write results as JSON")
+    args = parser.parse_args()
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+    from feature_schema import DEFAULT_FEATURES
+
+    post = make_poster(args.url, args.model_path)
+    formats = encoders(DEFAULT_FEATURES)
+    rng = np.random.default_rng(0)
+
+    results = []
+    print(f"{'rows':>7}  {'format':<9}{'req bytes':>12}{'p50 ms':>10}{'rows/s':>14}{'vs json':>9}")
+    print("=" * 61)
+    for n_rows in (int(r) for r in args.rows.split(",")):
+        X = np.column_stack([rng.normal(52, 5, n_rows), rng.normal(71, 3, n_rows), rng.uniform(0, 4000, n_rows),
+                             rng.normal(3700, 400, n_rows), rng.normal(0, 7, n_rows), rng.normal(71, 1, n_rows)])
+        expected = None
+        json_rate = None
+        for name, (content_type, encode, decode) in formats.items():
+            out = decode(post(encode(X), content_type))  # warm up and check
+            if expected is None:
+                expected = out
+            assert np.allclose(out, expected, atol=1e-6), f"{name} predictions differ"
+
+            samples = []
+            deadline = time.perf_counter() + args.seconds
+            while time.perf_counter() < deadline or len(samples) < 3:
+                start = time.perf_counter()
+                decode(post(encode(X), content_type))
+                samples.append(time.perf_counter() - start)
+            p50 = statistics.median(samples)
+            rate = n_rows / p50
+            json_rate = json_rate or rate
+            body_bytes = len(encode(X))
+            results.append({"rows": n_rows, "format": name, "request_bytes": body_bytes, "p50_ms": p50 * 1000,
+                            "rows_per_s": rate})
+            print(f"{n_rows:>7}  {name:<9}{body_bytes:>12,}{p50 * 1000:>10.2f}{rate:>14,.0f}{rate / json_rate:>8.1f}x")
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(results, fh, indent=2)
+        print(f"\nSaved results to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for the Verity AI serving app.
+
+Each measurement runs in a fresh Python process, the same way a new gunicorn worker starts:
+1. Import every library module on its own (they must do no work at import time)
+2. Import `app` (artifact-only startup: load model.joblib and model_features.json)
+3. Serve the first /predict request
+
+The script exits non-zero when the app cold start exceeds the budget, so it can run in CI.
+
+Usage:
+    python verity-AI/benchmarks/bench_startup.py --runs 5 --budget 5.0
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+VERITY_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LIBRARY_MODULES = [
+    "generate_data",
+    "engineer_feature",
+    "verity_pt_model",
+    "verity_assistant_ai",
+    "verity_assistant_ai_llm",
+    "utils",
+]
+
+IMPORT_SNIPPET = """
+import json, time
+start = time.perf_counter()
+import {module}
+print(json.dumps({{"import_s": time.perf_counter() - start}}))
+"""
+
+APP_SNIPPET = """
+import json, time
+start = time.perf_counter()
+import app
+import_s = time.perf_counter() - start
+client = app.app.test_client()
+start = time.perf_counter()
+resp = client.post("/predict", json={"features": [25.5, 75.2, 1200, 1900.6, 2.1, 74.8]})
+first_predict_s = time.perf_counter() - start
+print(json.dumps({"import_s": import_s, "first_predict_s": first_predict_s,
+                  "status": resp.status_code, "model_loaded": app.model is not None}))
+"""
+
+
+def run_snippet(code, env):
+    """Run a snippet in a fresh interpreter and return the JSON it prints last."""
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=VERITY_DIR, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip())
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def ensure_model(model_path):
+    """Train a model into a temporary directory if no model artifact is available."""
+    if model_path and os.path.exists(model_path):
+        return model_path
+    sys.path.insert(0, VERITY_DIR)
+    import save_model
+
+    out_dir = tempfile.mkdtemp(prefix="verity-bench-")
+    print(f"No model found, training one into {out_dir} ...")
+    save_model.main(output_dir=out_dir)
+    return os.path.join(out_dir, "model.joblib")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Cold starts to measure per target")
+    parser.add_argument("--budget", type=float, default=5.0,
+                        help="Max seconds for app import + first prediction (Docker HEALTHCHECK start period)")
+    parser.add_argument("--model-path", default=os.getenv("MODEL_PATH", os.path.join(VERITY_DIR, "model.joblib")))
+    parser.add_argument("--output", help="Optional path to write the results as JSON")
+    args = parser.parse_args()
+
+    model_path = ensure_model(args.model_path)
+    env = dict(os.environ, MODEL_PATH=model_path, PYTHONDONTWRITEBYTECODE="1")
+
+    results = {"modules": {}, "app": {}}
+    print("=" * 60)
+    print(f"{'target':<28}{'median (s)':>14}{'max (s)':>14}")
+    print("=" * 60)
+    for module in LIBRARY_MODULES:
+        times = [run_snippet(IMPORT_SNIPPET.format(module=module), env)["import_s"] for _ in range(args.runs)]
+        results["modules"][module] = {"median_s": statistics.median(times), "max_s": max(times)}
+        print(f"{'import ' + module:<28}{statistics.median(times):>14.3f}{max(times):>14.3f}")
+
+    runs = [run_snippet(APP_SNIPPET, env) for _ in range(args.runs)]
+    if not all(r["model_loaded"] and r["status"] == 200 for r in runs):
+        raise SystemExit(f"App did not serve predictions: {runs[-1]}")
+    cold_starts = [r["import_s"] + r["first_predict_s"] for r in runs]
+    results["app"] = {
+        "import_median_s": statistics.median(r["import_s"] for r in runs),
+        "first_predict_median_s": statistics.median(r["first_predict_s"] for r in runs),
+        "cold_start_median_s": statistics.median(cold_starts),
+        "cold_start_max_s": max(cold_starts),
+        "budget_s": args.budget,
+    }
+    print(f"{'import app':<28}{results['app']['import_median_s']:>14.3f}")
+    print(f"{'first /predict':<28}{results['app']['first_predict_median_s']:>14.3f}")
+    print(f"{'cold start (total)':<28}{statistics.median(cold_starts):>14.3f}{max(cold_starts):>14.3f}")
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+    if max(cold_starts) > args.budget:
+        print(f"\nFAIL: cold start {max(cold_starts):.2f}s exceeds budget of {args.budget:.2f}s")
+        sys.exit(1)
+    print(f"\nOK: cold start within budget of {args.budget:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Per-worker memory of gunicorn workers with and without a shared model.
+
+Starts gunicorn (via gunicorn.conf.py) once per configuration, sends a few /predict requests
+so every worker has touched the model, then reads each worker's Rss/Pss/shared/private
+memory from /proc. Pss is the number to watch: summed over workers it is the pod's footprint
+against the 512Mi memory request. Linux only.
+
+Configurations:
+    joblib          model.joblib, every worker loads its own copy
+    joblib+preload  model.joblib loaded once in the master before forking
+    packed          packed model, every worker reads its own copy
+    packed+mmap     packed model memory-mapped read-only and preloaded in the master
+
+Usage:
+    python verity-AI/benchmarks/bench_worker_memory.py --model-path verity-AI/model.joblib --workers 4
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+VERITY_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, VERITY_DIR)
+
+import utils  # noqa: E402
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def worker_pids(master_pid):
+    with open(f"/proc/{master_pid}/task/{master_pid}/children", "r") as fh:
+        return [int(p) for p in fh.read().split()]
+
+
+def wait_for_health(port, timeout=60.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as resp:
+                if json.load(resp).get("model_loaded"):
+                    return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("server did not become healthy")
+
+
+def measure(name, env_overrides, workers, requests_per_worker=20):
+    port = free_port()
+    env = dict(os.environ, PORT=str(port), GUNICORN_WORKERS=str(workers), **env_overrides)
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app:app"],
+        cwd=VERITY_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_for_health(port)
+        body = json.dumps({"features": [25.5, 75.2, 1200, 1900.6, 2.1, 74.8]}).encode()
+        for _ in range(requests_per_worker * workers):
+            req = urllib.request.Request(f"http://127.0.0.1:{port}/predict", data=body,
+                                         headers={"Content-Type": "application/json"})
+            urllib.request.urlopen(req, timeout=10).read()
+        per_worker = [utils.process_memory(pid) for pid in worker_pids(proc.pid)]
+        master = utils.process_memory(proc.pid)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+    avg = {k: sum(w.get(k, 0.0) for w in per_worker) / len(per_worker) for k in ("rss", "pss", "shared", "private")}
+    total_pss = master.get("pss", 0.0) + sum(w.get("pss", 0.0) for w in per_worker)
+    print(f"{name:<16}{avg['rss']:>10.1f}{avg['pss']:>10.1f}{avg['shared']:>10.1f}{avg['private']:>10.1f}{total_pss:>14.1f}")
+    return {"per_worker": per_worker, "master": master, "avg_worker": avg, "total_pss_mib": total_pss}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-path", default=os.getenv("MODEL_PATH", os.path.join(VERITY_DIR, "model.joblib")))
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--output", help="Optional path to write the results as JSON")
+    args = parser.parse_args()
+
+    import forest_engine
+    import joblib
+
+    model_path = os.path.abspath(args.model_path)
+    packed_path = os.path.join(os.path.dirname(model_path), "model_packed")
+    if not forest_engine.is_packed_model(packed_path):
+        packed_path = tempfile.mkdtemp(prefix="verity-packed-")
+        forest_engine.save_packed_forest(forest_engine.export_forest(joblib.load(model_path)), packed_path)
+    features_path = os.path.join(os.path.dirname(model_path), "model_features.json")
+
+    configs = {
+        "joblib": {"MODEL_PATH": model_path, "GUNICORN_PRELOAD": "false", "MODEL_MMAP": "false"},
+        "joblib+preload": {"MODEL_PATH": model_path, "GUNICORN_PRELOAD": "true", "MODEL_MMAP": "false"},
+        "packed": {"MODEL_PATH": packed_path, "GUNICORN_PRELOAD": "false", "MODEL_MMAP": "false"},
+        "packed+mmap": {"MODEL_PATH": packed_path, "GUNICORN_PRELOAD": "true", "MODEL_MMAP": "true"},
+    }
+    print(f"{args.workers} workers, memory in MiB (averages per worker, total Pss includes the master)")
+    print("=" * 70)
+    print(f"{'config':<16}{'rss':>10}{'pss':>10}{'shared':>10}{'private':>10}{'total pss':>14}")
+    print("=" * 70)
+    results = {}
+    for name, overrides in configs.items():
+        overrides["MODEL_FEATURES_PATH"] = features_path
+        results[name] = measure(name, overrides, args.workers)
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the OpenAI chat completions API, for load tests.
+
+Serves `POST /v1/chat/completions` with the response shapes the openai client expects, both
+plain (with `usage`) and streamed as Server-Sent Events, after a configurable delay. Point
+the app at it with `OPENAI_BASE_URL=http://127.0.0.1:<port>/v1` (any `OPENAI_API_KEY`), and
+the advice endpoints run their real code path without network calls or token costs.
+
+Timing of one call:
+    latency_s (+/- jitter_s)   before the first token (or the whole plain response)
+    token_interval_s           between streamed tokens; a plain response waits for all of them
+
+Usage:
+    python verity-AI/benchmarks/llm_stub.py --port 8089 --latency 0.5 --tokens 60 --token-interval 0.01
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = ("inspect", "bearing", "vibration", "lubricate", "schedule", "maintenance", "within", "48",
+         "hours", "monitor", "temperature", "trend", "replace", "worn", "components", "if", "persists")
+
+
+class StubLLMServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP server answering chat completions after a simulated delay.
+
+    Args:
+        address (tuple): (host, port); port 0 picks a free port
+        latency_s (float): Seconds before the first token
+        tokens (int): Completion tokens per answer
+        token_interval_s (float): Seconds between tokens
+        jitter_s (float): Uniform +/- jitter on latency_s
+        error_rate (float): Fraction of calls answered with HTTP 500
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, latency_s=0.5, tokens=60, token_interval_s=0.01, jitter_s=0.0, error_rate=0.0):
+        super().__init__(address, StubLLMHandler)
+        self.latency_s = latency_s
+        self.tokens = tokens
+        self.token_interval_s = token_interval_s
+        self.jitter_s = jitter_s
+        self.error_rate = error_rate
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def first_token_delay(self):
+        jitter = random.uniform(-self.jitter_s, self.jitter_s) if self.jitter_s else 0.0
+        return max(0.0, self.latency_s + jitter)
+
+    def start(self):
+        """Serve in a daemon thread and return self."""
+        threading.Thread(target=self.serve_forever, name="llm-stub", daemon=True).start()
+        return self
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if not self.path.endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+            return
+        server = self.server
+        with server._lock:
+            server.calls += 1
+        request = json.loads(body or b"{}")
+        if server.error_rate and random.random() < server.error_rate:
+            self._send_json(500, {"error": {"message": "stub error", "type": "server_error"}})
+            return
+
+        model = request.get("model", "stub")
+        prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in request.get("messages", []))
+        words = [WORDS[i % len(WORDS)] for i in range(server.tokens)]
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        time.sleep(server.first_token_delay())
+
+        if not request.get("stream"):
+            time.sleep(server.token_interval_s * max(0, server.tokens - 1))
+            self._send_json(200, {
+                "id": completion_id, "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": " ".join(words)}}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": server.tokens,
+                          "total_tokens": prompt_tokens + server.tokens},
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        for i, word in enumerate(words):
+            if i:
+                time.sleep(server.token_interval_s)
+            self._send_chunk(completion_id, model, {"content": word if i == 0 else f" {word}"}, None)
+        self._send_chunk(completion_id, model, {}, "stop")
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+    def _send_chunk(self, completion_id, model, delta, finish_reason):
+        chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                 "model": model, "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+        self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        self.wfile.flush()
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds before the first token")
+    parser.add_argument("--tokens", type=int, default=60, help="Completion tokens per answer")
+    parser.add_argument("--token-interval", type=float, default=0.01, help="Seconds between tokens")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Uniform +/- jitter on --latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of calls answered with 500")
+    args = parser.parse_args()
+
+    server = StubLLMServer((args.host, args.port), args.latency, args.tokens, args.token_interval,
+                           args.jitter, args.error_rate)
+    print(f"LLM stub listening on {server.base_url} (set OPENAI_BASE_URL to this)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
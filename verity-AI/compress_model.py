@@ -0,0 +1,286 @@
+"""
+Compression search for the Verity RandomForest.
+
+The forest written by `save_model.py` (100 fully grown trees) is far larger than six features
+need. This script derives smaller candidates from it and measures each one:
+
+- tree-count pruning: the first N trees of a fitted forest. The trees are independent bootstrap
+  fits, so any prefix is itself a random forest and needs no retraining.
+- depth/leaf limits: the forest refitted with `max_depth` / `min_samples_leaf` caps, then pruned.
+- compact storage: packed node tables with float32 thresholds and probabilities and narrow
+  integer indices (forest_engine.compact_forest). The packed export already drops everything
+  traversal does not use (impurities, sample counts, per-tree estimator parameters).
+
+For every candidate the report lists the size on disk of `model.joblib` and `model_packed/`, their
+load times, single-row and 1000-row latency of the packed engine, and accuracy plus failure-class
+precision/recall/F1 from `classification_report` on a held-out split. The smallest candidate
+(packed size) whose accuracy and failure recall stay within the tolerances of the baseline is
+selected and can be exported as `model.joblib`, `model_features.json` and `model_packed/`.
+
+Usage:
+    python compress_model.py --output compress.json --export-dir compressed
+    python compress_model.py --model model.joblib --accuracy-tolerance 0.01 --recall-tolerance 0.02
+    python compress_model.py --trees 100,40,20 --limits '[{}, {"max_depth": 10}]'
+"""
+
+import argparse
+import copy
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import time
+import warnings
+
+import joblib
+import numpy as np
+from sklearn.base import clone
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import classification_report
+from sklearn.model_selection import train_test_split
+
+import forest_engine
+import sweep
+import utils
+
+DEFAULT_TREES = (100, 50, 25, 10)
+# Refit caps tried on top of the baseline parameters ({} keeps the baseline forest itself)
+DEFAULT_LIMITS = (
+    {},
+    {"max_depth": 16},
+    {"max_depth": 12},
+    {"max_depth": 8},
+    {"min_samples_leaf": 5},
+    {"min_samples_leaf": 20},
+    {"max_depth": 12, "min_samples_leaf": 5},
+)
+DEFAULT_ACCURACY_TOLERANCE = 0.005
+DEFAULT_RECALL_TOLERANCE = 0.01
+FAILURE_LABEL = 1
+
+
+def baseline_forest():
+    """Unfitted forest with the parameters used by save_model.py."""
+    return RandomForestClassifier(n_estimators=100, class_weight="balanced", random_state=42)
+
+
+def prune_trees(clf, n_trees):
+    """
+    The forest restricted to its first `n_trees` trees (a shallow copy; trees are shared).
+
+    Args:
+        clf: Fitted RandomForestClassifier
+        n_trees (int): Trees to keep
+
+    Returns:
+        RandomForestClassifier: Forest averaging over the kept trees only
+    """
+    pruned = copy.copy(clf)
+    pruned.estimators_ = clf.estimators_[:n_trees]
+    pruned.n_estimators = len(pruned.estimators_)
+    return pruned
+
+
+def _median_ms(fn, repeats):
+    fn()
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000.0)
+    return statistics.median(samples)
+
+
+def _dir_bytes(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def measure_candidate(clf, X_test, y_test, work_dir, compact=True, repeats=5):
+    """
+    Size, load time, latency and classification metrics of one candidate.
+
+    Metrics are computed with the packed engine, which is what serves the exported model.
+
+    Args:
+        clf: Fitted RandomForestClassifier
+        X_test (numpy.ndarray): Held-out features
+        y_test (numpy.ndarray): Held-out labels
+        work_dir (str): Empty directory for the candidate's artifacts
+        compact (bool): Store the packed tables with narrow dtypes
+
+    Returns:
+        dict: Sizes in bytes, timings in milliseconds and the metrics
+    """
+    joblib_path = os.path.join(work_dir, "model.joblib")
+    packed_path = os.path.join(work_dir, "model_packed")
+    joblib.dump(clf, joblib_path)
+    packed = forest_engine.export_forest(clf)
+    forest_engine.save_packed_forest(forest_engine.compact_forest(packed) if compact else packed, packed_path)
+
+    forest = forest_engine.load_packed_forest(packed_path)
+    report = classification_report(y_test, forest.predict(X_test), output_dict=True, zero_division=0)
+    failure = report.get(str(FAILURE_LABEL), {"precision": 0.0, "recall": 0.0, "f1-score": 0.0})
+    return {
+        "n_trees": len(clf.estimators_),
+        "max_depth": clf.max_depth,
+        "min_samples_leaf": clf.min_samples_leaf,
+        "compact": compact,
+        "nodes": int(len(packed["left"])),
+        "joblib_bytes": os.path.getsize(joblib_path),
+        "packed_bytes": _dir_bytes(packed_path),
+        "joblib_load_ms": round(_median_ms(lambda: joblib.load(joblib_path), min(repeats, 3)), 2),
+        "packed_load_ms": round(_median_ms(lambda: forest_engine.load_packed_forest(packed_path), repeats), 2),
+        "predict_1_ms": round(_median_ms(lambda: forest.predict_proba(X_test[:1]), repeats * 6), 3),
+        "predict_1000_ms": round(_median_ms(lambda: forest.predict_proba(X_test[:1000]), repeats), 3),
+        "accuracy": round(float(report["accuracy"]), 4),
+        "precision_failure": round(float(failure["precision"]), 4),
+        "recall_failure": round(float(failure["recall"]), 4),
+        "f1_failure": round(float(failure["f1-score"]), 4),
+        "report": report,
+    }
+
+
+def within_tolerance(result, baseline, accuracy_tolerance, recall_tolerance):
+    """True if a candidate loses at most the allowed accuracy and failure recall."""
+    return (result["accuracy"] >= baseline["accuracy"] - accuracy_tolerance
+            and result["recall_failure"] >= baseline["recall_failure"] - recall_tolerance)
+
+
+def select_smallest(results, baseline, accuracy_tolerance=DEFAULT_ACCURACY_TOLERANCE,
+                    recall_tolerance=DEFAULT_RECALL_TOLERANCE):
+    """
+    Smallest candidate (packed size, then joblib size) within the tolerances of the baseline.
+
+    Returns:
+        dict: The selected result (the baseline itself if nothing smaller qualifies)
+    """
+    eligible = [r for r in results if within_tolerance(r, baseline, accuracy_tolerance, recall_tolerance)]
+    return min(eligible or [baseline], key=lambda r: (r["packed_bytes"], r["joblib_bytes"]))
+
+
+def run_compression(baseline, X_train, y_train, X_test, y_test, trees=DEFAULT_TREES, limits=DEFAULT_LIMITS,
+                    work_dir=None):
+    """
+    Measure the baseline and every (limits, tree count) candidate.
+
+    Args:
+        baseline: Fitted baseline RandomForestClassifier
+        X_train (DataFrame): Training features, used to refit the limited forests
+        y_train: Training labels
+        X_test (numpy.ndarray): Held-out features
+        y_test (numpy.ndarray): Held-out labels
+        trees (iterable): Tree counts to prune to (counts above the forest size are skipped)
+        limits (iterable): Parameter dicts for refitted forests ({} prunes the baseline itself)
+        work_dir (str, optional): Where candidate artifacts are written (default: a temp dir)
+
+    Returns:
+        tuple: (baseline result, candidate results, {id: fitted forest})
+    """
+    work_dir = work_dir or tempfile.mkdtemp(prefix="verity-compress-")
+    models = {}
+
+    def measure(clf, compact):
+        index = len(models)
+        path = os.path.join(work_dir, f"candidate-{index:03d}")
+        os.makedirs(path)
+        result = dict(measure_candidate(clf, X_test, y_test, path, compact=compact), id=index)
+        models[index] = clf
+        return result
+
+    # The baseline as save_model.py stores it: float64 packed tables
+    baseline_result = measure(baseline, compact=False)
+    results = []
+    for limit in limits:
+        forest = baseline
+        if limit:
+            forest = clone(baseline).set_params(**limit)
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                forest.fit(X_train, y_train)
+        for n_trees in sorted({n for n in trees if n <= len(forest.estimators_)}, reverse=True):
+            results.append(measure(prune_trees(forest, n_trees), compact=True))
+    return baseline_result, results, models
+
+
+def print_table(baseline, results, selected):
+    print(f"  {'trees':>5}{'depth':>6}{'leaf':>5}{'nodes':>9}{'joblib MiB':>11}{'packed MiB':>11}"
+          f"{'jl load ms':>11}{'pk load ms':>11}{'1-row ms':>9}{'1k ms':>8}{'acc':>7}{'prec':>7}{'recall':>7}{'F1':>7}")
+    print("=" * 117)
+    for r in [baseline] + sorted(results, key=lambda r: r["packed_bytes"]):
+        mark = "*" if r is selected else ("b" if r is baseline else " ")
+        print(f"{mark} {r['n_trees']:>5}{str(r['max_depth']):>6}{r['min_samples_leaf']:>5}{r['nodes']:>9,}"
+              f"{r['joblib_bytes'] / 2 ** 20:>11.2f}{r['packed_bytes'] / 2 ** 20:>11.2f}"
+              f"{r['joblib_load_ms']:>11.1f}{r['packed_load_ms']:>11.2f}{r['predict_1_ms']:>9.3f}"
+              f"{r['predict_1000_ms']:>8.2f}{r['accuracy']:>7.3f}{r['precision_failure']:>7.3f}"
+              f"{r['recall_failure']:>7.3f}{r['f1_failure']:>7.3f}")
+    print("\nb = baseline (float64 packed tables, as save_model.py writes them), * = selected")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", help="Baseline model.joblib (default: train save_model.py's forest)")
+    parser.add_argument("--data-dir", help="Sharded dataset from generate_data.py --out (default: generate data)")
+    parser.add_argument("--machines", type=int, default=10)
+    parser.add_argument("--days", type=int, default=180)
+    parser.add_argument("--trees", default=",".join(map(str, DEFAULT_TREES)), help="Comma-separated tree counts")
+    parser.add_argument("--limits", help="JSON list of refit parameter dicts (default: depth and leaf caps)")
+    parser.add_argument("--accuracy-tolerance", type=float, default=DEFAULT_ACCURACY_TOLERANCE,
+                        help="Allowed accuracy loss against the baseline")
+    parser.add_argument("--recall-tolerance", type=float, default=DEFAULT_RECALL_TOLERANCE,
+                        help="Allowed loss of recall on the failure class against the baseline")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the report as JSON")
+    parser.add_argument("--export-dir", help="Save the selected model as model.joblib + model_packed/ here")
+    args = parser.parse_args()
+
+    features = utils.load_feature_names()
+    df = sweep.build_dataset(args.data_dir, args.machines, args.days)
+    X_train, X_test, y_train, y_test = train_test_split(
+        df[features], df[sweep.TARGET].to_numpy(), test_size=0.2, random_state=args.seed, stratify=df[sweep.TARGET]
+    )
+    X_test = X_test.to_numpy(dtype=np.float64)
+    del df
+
+    start = time.perf_counter()
+    if args.model:
+        baseline = joblib.load(args.model)
+    else:
+        baseline = baseline_forest()
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            baseline.fit(X_train, y_train)
+    limits = json.loads(args.limits) if args.limits else DEFAULT_LIMITS
+    trees = [int(n) for n in args.trees.split(",")]
+    work_dir = tempfile.mkdtemp(prefix="verity-compress-")
+    try:
+        baseline_result, results, models = run_compression(
+            baseline, X_train, y_train, X_test, y_test, trees=trees, limits=limits, work_dir=work_dir
+        )
+        selected = select_smallest(results, baseline_result, args.accuracy_tolerance, args.recall_tolerance)
+        print(f"Evaluated {len(results)} candidates on {len(y_test):,} held-out rows in "
+              f"{time.perf_counter() - start:.1f}s (tolerances: accuracy {args.accuracy_tolerance}, "
+              f"failure recall {args.recall_tolerance})\n")
+        print_table(baseline_result, results, selected)
+        print(f"\nSelected: {selected['n_trees']} trees, max_depth={selected['max_depth']}, "
+              f"min_samples_leaf={selected['min_samples_leaf']}: packed "
+              f"{baseline_result['packed_bytes'] / selected['packed_bytes']:.1f}x and joblib "
+              f"{baseline_result['joblib_bytes'] / selected['joblib_bytes']:.1f}x smaller than the baseline")
+
+        if args.export_dir:
+            import save_model
+
+            save_model.save_artifacts(models[selected["id"]], features, args.export_dir,
+                                      compact=selected["compact"])
+        if args.output:
+            with open(args.output, "w") as fh:
+                json.dump({"baseline": baseline_result, "selected": selected["id"],
+                           "accuracy_tolerance": args.accuracy_tolerance,
+                           "recall_tolerance": args.recall_tolerance, "candidates": results}, fh, indent=2)
+            print(f"Saved report to: {args.output}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
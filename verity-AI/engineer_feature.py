@@ -1,17 +1,130 @@
+import numpy as np
+import pandas as pd
+
 import generate_data as gd
 
+ROLLING_WINDOW = 24
+
 # creating a feature engineering function to add useful features to the dataset.
 # This will create new columns to the data set
-def engineer_features(df):
+def engineer_features(df, backend="pandas"):
+    if backend == "numpy":
+        return engineer_features_numpy(df)
+    if backend != "pandas":
+        raise ValueError(f"unknown feature engineering backend {backend!r}")
+
     df["temp_vibration_interaction"] = df["temperature"] * df["vibration"]
-    df["vibration_rate_of_change"] = df.groupby("machine_id")["vibration"].diff().fillna(0) 
-    df["temp_rolling_avg"] = df.groupby("machine_id")["temperature"].rolling(window=24, min_periods=1).mean().reset_index(0, drop=True)
+    df["vibration_rate_of_change"] = df.groupby("machine_id")["vibration"].diff().fillna(0)
+    df["temp_rolling_avg"] = df.groupby("machine_id")["temperature"].rolling(window=ROLLING_WINDOW, min_periods=1).mean().reset_index(0, drop=True)
 
     # Drop NaN
     return df.dropna().reset_index(drop=True)
 
-# apply feature engineering to the generated data
-df = gd.generate_synthetic_data(num_machines=10, duration_days=180)
-df_engineered = engineer_features(df)
-print("--- Engineered Features ---")
-print(df_engineered.head())
\ No newline at end of file
+
+def engineer_features_numpy(df, window=ROLLING_WINDOW):
+    """
+    Same features as engineer_features(), computed segment-wise on NumPy arrays.
+
+    Rows are ordered once by (machine_id, timestamp), skipped when the frame is already in that
+    order. Each machine is then a contiguous segment: the rate of change is a shifted difference
+    masked at segment starts, and the rolling mean is a difference of cumulative sums clipped to
+    the segment start. The new columns are written into `df` without copying the frame.
+    Frames with missing sensor values fall back to the pandas implementation.
+
+    Args:
+        df (DataFrame): Readings with machine_id, timestamp, vibration and temperature columns
+        window (int): Readings in the rolling temperature mean
+
+    Returns:
+        DataFrame: `df` with the three engineered columns (NaN rows dropped, index reset)
+    """
+    vibration = df["vibration"].to_numpy(dtype=np.float64)
+    temperature = df["temperature"].to_numpy(dtype=np.float64)
+    if np.isnan(vibration).any() or np.isnan(temperature).any():
+        return engineer_features(df, backend="pandas")
+
+    interaction = temperature * vibration
+    machine = df["machine_id"].to_numpy()
+    n = len(df)
+    if "timestamp" in df:
+        timestamp = df["timestamp"].to_numpy()
+        ordered = n < 2 or bool(np.all((machine[1:] > machine[:-1])
+                                       | ((machine[1:] == machine[:-1]) & (timestamp[1:] >= timestamp[:-1]))))
+        order = None if ordered else np.lexsort((timestamp, machine))
+    else:
+        ordered = n < 2 or bool(np.all(machine[1:] >= machine[:-1]))
+        order = None if ordered else np.argsort(machine, kind="stable")
+    if order is not None:
+        machine, vibration, temperature = machine[order], vibration[order], temperature[order]
+
+    # First row of each machine's segment, and the segment start for every row
+    starts = np.ones(n, dtype=bool)
+    starts[1:] = machine[1:] != machine[:-1]
+    positions = np.arange(n)
+    segment_start = np.maximum.accumulate(np.where(starts, positions, 0))
+
+    rate = np.empty(n)
+    rate[0:1] = 0.0
+    np.subtract(vibration[1:], vibration[:-1], out=rate[1:])
+    rate[starts] = 0.0
+
+    # Centre before the cumulative sum so its magnitude (and rounding error) stays small
+    offset = temperature.mean() if n else 0.0
+    csum = np.zeros(n + 1)
+    np.cumsum(temperature - offset, out=csum[1:])
+    lo = np.maximum(segment_start, positions - (window - 1))
+    rolling = (csum[1:] - csum[lo]) / (positions + 1 - lo) + offset
+
+    if order is not None:
+        # Scatter back to the frame's own row order
+        for values in (rate, rolling):
+            values[order] = values.copy()
+
+    df["temp_vibration_interaction"] = interaction
+    df["vibration_rate_of_change"] = rate
+    df["temp_rolling_avg"] = rolling
+    # vibration, temperature and the new columns are known to be NaN-free
+    unchecked = [c for c in df.columns if c not in ("vibration", "temperature", "temp_vibration_interaction",
+                                                    "vibration_rate_of_change", "temp_rolling_avg")]
+    if df[unchecked].isna().values.any():
+        df = df.dropna()
+    if not isinstance(df.index, pd.RangeIndex) or df.index.start != 0 or df.index.step != 1:
+        df = df.reset_index(drop=True)
+    return df
+
+
+def build_engineered_dataset(num_machines=10, duration_days=180, backend="pandas"):
+    """
+    Generate synthetic data and apply feature engineering to it.
+
+    Args:
+        num_machines (int): Number of machines to simulate
+        duration_days (int): Number of days of hourly readings per machine
+        backend (str): "pandas" or "numpy" (see engineer_features_numpy)
+
+    Returns:
+        DataFrame: Engineered dataset ready for training
+    """
+    df = gd.generate_synthetic_data(num_machines=num_machines, duration_days=duration_days)
+    return engineer_features(df, backend=backend)
+
+
+_df_engineered = None
+
+
+def __getattr__(name):
+    # `df_engineered` used to be built at import time; keep it available for notebooks
+    # and scripts, but only generate the data the first time it is actually accessed.
+    global _df_engineered
+    if name == "df_engineered":
+        if _df_engineered is None:
+            _df_engineered = build_engineered_dataset()
+        return _df_engineered
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+if __name__ == "__main__":
+    # apply feature engineering to the generated data
+    df_engineered = build_engineered_dataset(num_machines=10, duration_days=180)
+    print("--- Engineered Features ---")
+    print(df_engineered.head())
@@ -0,0 +1,356 @@
+"""
+Compiled feature schema for the Verity model.
+
+`model_features.json` is read once per process (and again only when the file changes) into a
+`FeatureSchema` that holds the ordered feature names, a name -> column map, per-feature dtypes
+and bounds. The schema validates a request and converts it to the model's float matrix in one
+pass, so request handlers never touch the JSON file.
+
+`model_features.json` is either the plain ordered list written by `save_model.py`:
+    ["vibration", "temperature", ...]
+or a list of specs with optional dtype and bounds:
+    {"features": [{"name": "operating_hours", "dtype": "int", "min": 0}, ...]}
+"""
+
+import json
+import math
+import os
+import threading
+
+import numpy as np
+
+DEFAULT_FEATURES = [
+    "vibration",
+    "temperature",
+    "operating_hours",
+    "temp_vibration_interaction",
+    "vibration_rate_of_change",
+    "temp_rolling_avg",
+]
+DEFAULT_FEATURES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "model_features.json")
+_INFINITIES = (math.inf, -math.inf)
+DTYPES = {"float": float, "float64": float, "float32": float, "int": int, "int64": int, "int32": int}
+
+
+class FeatureValidationError(ValueError):
+    """A feature dict or matrix that does not match the schema."""
+
+    def __init__(self, message, missing=None, invalid=None):
+        super().__init__(message)
+        self.missing = missing or []
+        self.invalid = invalid or []
+
+
+class FeatureSchema:
+    """
+    Ordered model features with dtypes and bounds.
+
+    Args:
+        names (list): Feature names in model column order
+        dtypes (dict, optional): Feature name to "float" or "int" (default "float")
+        bounds (dict, optional): Feature name to (min, max); None for an open end
+    """
+
+    def __init__(self, names, dtypes=None, bounds=None):
+        self.names = tuple(names)
+        if len(set(self.names)) != len(self.names):
+            raise ValueError("feature names must be unique")
+        self.index = {name: j for j, name in enumerate(self.names)}
+        dtypes = dtypes or {}
+        bounds = bounds or {}
+        self.dtypes = {name: dtypes.get(name, "float") for name in self.names}
+        for name, dtype in self.dtypes.items():
+            if dtype not in DTYPES:
+                raise ValueError(f"unsupported dtype {dtype!r} for feature {name}")
+        self.bounds = {}
+        for name in self.names:
+            low, high = bounds.get(name) or (None, None)
+            self.bounds[name] = (-math.inf if low is None else float(low), math.inf if high is None else float(high))
+        self.lower = np.array([self.bounds[n][0] for n in self.names])
+        self.upper = np.array([self.bounds[n][1] for n in self.names])
+        self._int_columns = [j for j, n in enumerate(self.names) if DTYPES[self.dtypes[n]] is int]
+        # Per-column checks as one flat tuple so the single-row loop does no dict lookups
+        self._columns = tuple(
+            (j, name, DTYPES[self.dtypes[name]] is int, self.bounds[name][0], self.bounds[name][1])
+            for j, name in enumerate(self.names)
+        )
+
+    @classmethod
+    def from_spec(cls, spec):
+        """Schema from the parsed contents of model_features.json (a list or {"features": [...]})."""
+        if isinstance(spec, dict):
+            spec = spec.get("features")
+        if not isinstance(spec, list) or not spec:
+            raise ValueError("expected a non-empty list of features")
+        names, dtypes, bounds = [], {}, {}
+        for item in spec:
+            if isinstance(item, str):
+                names.append(item)
+                continue
+            name = item["name"]
+            names.append(name)
+            if "dtype" in item:
+                dtypes[name] = item["dtype"]
+            if "min" in item or "max" in item:
+                bounds[name] = (item.get("min"), item.get("max"))
+        return cls(names, dtypes=dtypes, bounds=bounds)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __repr__(self):
+        return f"FeatureSchema({list(self.names)!r})"
+
+    def to_list(self):
+        return list(self.names)
+
+    def to_spec(self):
+        """Contents for model_features.json: the plain name list, or specs when any feature has a dtype or bounds."""
+        specs = []
+        for name in self.names:
+            spec = {"name": name}
+            if self.dtypes[name] != "float":
+                spec["dtype"] = self.dtypes[name]
+            low, high = self.bounds[name]
+            if low != -math.inf:
+                spec["min"] = low
+            if high != math.inf:
+                spec["max"] = high
+            specs.append(spec)
+        if all(len(spec) == 1 for spec in specs):
+            return self.to_list()
+        return {"features": specs}
+
+    def with_names(self, names):
+        """Schema for `names`, keeping this schema's dtypes and bounds for the names they share."""
+        return FeatureSchema(
+            names,
+            dtypes={n: self.dtypes[n] for n in names if n in self.index},
+            bounds={n: self.bounds[n] for n in names if n in self.index},
+        )
+
+    def check(self, feature_dict):
+        """
+        Validate a feature dict and convert it to a row in one pass.
+
+        Returns:
+            tuple: (row as a list of floats in model order, missing names, invalid names)
+        """
+        row = [0.0] * len(self.names)
+        missing, invalid = [], []
+        for j, name, is_int, low, high in self._columns:
+            value = feature_dict.get(name)
+            if value is None:
+                missing.append(name)
+                continue
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                invalid.append(name)
+                continue
+            if not (low <= value <= high) or (is_int and not value.is_integer()) or value in _INFINITIES:
+                # NaN fails the bounds comparison as well
+                invalid.append(name)
+                continue
+            row[j] = value
+        return row, missing, invalid
+
+    def validate(self, feature_dict):
+        """
+        Check that a feature dict has every feature, each a number of the right dtype in bounds.
+
+        Returns:
+            tuple: (is_valid, missing_features, invalid_features)
+        """
+        _, missing, invalid = self.check(feature_dict)
+        return not missing and not invalid, missing, invalid
+
+    def row(self, feature_dict, fill_missing=False):
+        """
+        One feature dict as a (1, n_features) float64 array.
+
+        Args:
+            feature_dict (dict): Feature name to value
+            fill_missing (bool): Use 0.0 for missing features instead of raising
+
+        Raises:
+            FeatureValidationError: Missing (unless fill_missing) or invalid features
+        """
+        row, missing, invalid = self.check(feature_dict)
+        if invalid or (missing and not fill_missing):
+            raise self.error(missing if not fill_missing else [], invalid)
+        return np.array(row, dtype=np.float64).reshape(1, -1)
+
+    def error(self, missing, invalid):
+        parts = []
+        if missing:
+            parts.append(f"Missing required features: {missing}")
+        if invalid:
+            parts.append(f"Invalid feature values (must be finite numbers within bounds): {invalid}")
+        return FeatureValidationError("; ".join(parts), missing=missing, invalid=invalid)
+
+    def matrix(self, rows=None, columns=None):
+        """
+        Convert many rows of features into one 2-D float array in model feature order.
+
+        Accepts any one of:
+            rows as a list of dicts: [{"vibration": 25.5, ...}, ...]
+            rows as a list of lists: [[25.5, 75.2, ...], ...] (already in model order)
+            columns as a dict of arrays: {"vibration": [25.5, ...], ...}
+
+        Every feature is required, and every value must be a finite number of the feature's
+        dtype within its bounds, as for row().
+
+        Returns:
+            numpy.ndarray: Array of shape (n_rows, n_features) with dtype float64
+
+        Raises:
+            FeatureValidationError: Missing or invalid features (the message names the rows)
+            ValueError: Rows or columns of the wrong shape
+        """
+        n_features = len(self.names)
+
+        if columns is not None:
+            if not isinstance(columns, dict):
+                raise ValueError("columns must be a dict of feature name to list of values")
+            lengths = {len(v) for v in columns.values()}
+            if len(lengths) > 1:
+                raise ValueError("all columns must have the same length")
+            n_rows = lengths.pop() if lengths else 0
+            missing = [name for name in self.names if columns.get(name) is None]
+            if missing and n_rows:
+                raise self.error(missing, [])
+            matrix = np.zeros((n_rows, n_features), dtype=np.float64)
+            invalid = []
+            for j, name in enumerate(self.names):
+                if name in columns:
+                    try:
+                        matrix[:, j] = np.asarray(columns[name], dtype=np.float64)
+                    except (TypeError, ValueError):
+                        invalid.append(name)
+            if invalid:
+                raise self.error([], invalid)
+            return self.validate_matrix(matrix)
+
+        if rows is None:
+            raise ValueError("either rows or columns is required")
+        if not isinstance(rows, list):
+            raise ValueError("rows must be a list of dicts or a list of lists")
+        if not rows:
+            return np.empty((0, n_features), dtype=np.float64)
+
+        if isinstance(rows[0], dict):
+            # One pass per feature column instead of one Python list per row; a missing feature
+            # reads as NaN, so the bounds check below catches it with the invalid values
+            matrix = np.empty((len(rows), n_features), dtype=np.float64)
+            try:
+                for j, name in enumerate(self.names):
+                    matrix[:, j] = np.fromiter((r.get(name, math.nan) for r in rows), dtype=np.float64,
+                                               count=len(rows))
+            except (TypeError, ValueError, AttributeError):
+                raise self._rows_error(rows, range(len(rows))) from None
+            bad = self.invalid_rows(matrix)
+            if bad.any():
+                raise self._rows_error(rows, np.flatnonzero(bad))
+            return matrix
+
+        matrix = np.asarray(rows, dtype=np.float64)
+        if matrix.ndim != 2 or matrix.shape[1] != n_features:
+            raise ValueError(f"rows must have shape (n_rows, {n_features}), got {matrix.shape}")
+        return self.validate_matrix(matrix)
+
+    def validate_matrix(self, matrix):
+        """
+        Check every value of a matrix already in model order, as row() checks a dict.
+
+        Returns:
+            numpy.ndarray: The matrix, unchanged
+
+        Raises:
+            FeatureValidationError: Non-finite, out-of-bounds or non-integer values (rows named)
+        """
+        bad = np.flatnonzero(self.invalid_rows(matrix))
+        if len(bad):
+            invalid_columns = ~self._valid_values(matrix[bad]).all(axis=0)
+            error = self.error([], [n for n, bad_column in zip(self.names, invalid_columns) if bad_column])
+            raise FeatureValidationError(f"{error} in rows {bad[:10].tolist()}", invalid=error.invalid)
+        return matrix
+
+    def _rows_error(self, rows, positions):
+        """FeatureValidationError for the offending dict rows, found with the per-row check."""
+        missing, invalid, bad = set(), set(), []
+        for i in positions:
+            if not isinstance(rows[i], dict):
+                raise ValueError("rows must all be dicts or all be lists")
+            _, row_missing, row_invalid = self.check(rows[i])
+            if row_missing or row_invalid:
+                missing.update(row_missing)
+                invalid.update(row_invalid)
+                bad.append(int(i))
+        error = self.error([n for n in self.names if n in missing], [n for n in self.names if n in invalid])
+        return FeatureValidationError(f"{error} in rows {bad[:10]}", missing=error.missing, invalid=error.invalid)
+
+    def out_of_bounds(self, matrix):
+        """Boolean mask of rows with a non-finite or out-of-bounds value."""
+        matrix = np.asarray(matrix)
+        with np.errstate(invalid="ignore"):
+            ok = (matrix >= self.lower) & (matrix <= self.upper)
+        return ~ok.all(axis=1)
+
+    def _valid_values(self, matrix):
+        # Finite, within bounds, and whole numbers in int columns (NaN fails every comparison)
+        with np.errstate(invalid="ignore"):
+            ok = (matrix >= self.lower) & (matrix <= self.upper) & np.isfinite(matrix)
+        if self._int_columns:
+            ok[:, self._int_columns] &= np.mod(matrix[:, self._int_columns], 1) == 0
+        return ok
+
+    def invalid_rows(self, matrix):
+        """Boolean mask of rows that row() would reject: non-finite, out of bounds or not of the dtype."""
+        return ~self._valid_values(np.asarray(matrix, dtype=np.float64)).all(axis=1)
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def load_feature_schema(file_path=None):
+    """
+    Cached FeatureSchema for a model_features.json file.
+
+    The file is parsed once per process and again only if its mtime or size changes; a missing
+    or unreadable file gives the default six-feature schema.
+
+    Args:
+        file_path (str, optional): Path to the JSON file. If None, uses the file next to this module.
+
+    Returns:
+        FeatureSchema: The compiled schema
+    """
+    file_path = os.path.abspath(file_path or DEFAULT_FEATURES_PATH)
+    try:
+        st = os.stat(file_path)
+        stamp = (st.st_mtime_ns, st.st_size)
+    except OSError:
+        stamp = None
+
+    cached = _cache.get(file_path)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+
+    with _cache_lock:
+        if stamp is None:
+            print(f"Warning: model_features.json not found at {file_path}, using default feature list")
+            schema = FeatureSchema(DEFAULT_FEATURES)
+        else:
+            try:
+                with open(file_path, "r") as fh:
+                    schema = FeatureSchema.from_spec(json.load(fh))
+            except Exception as e:
+                print(f"Error loading features from JSON: {e}, using default feature list")
+                schema = FeatureSchema(DEFAULT_FEATURES)
+        _cache[file_path] = (stamp, schema)
+    return schema
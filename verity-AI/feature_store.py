@@ -0,0 +1,244 @@
+"""
+In-process feature store for raw sensor readings.
+
+`POST /ingest` feeds raw readings (machine_id, timestamp, vibration, temperature,
+operating_hours) into a `FeatureStore`, which keeps the online feature state of every machine in
+NumPy arrays (see `online_features.py`). Scoring endpoints can then take just a `machine_id`
+and use the machine's latest engineered features.
+
+The store lives in the worker process. It can be snapshotted to a local `.npz` file and
+restored at startup so a restart does not lose the 24-hour temperature windows.
+
+Configuration (environment variables):
+    FEATURE_STORE_SNAPSHOT_PATH        Snapshot file, restored at startup (default: no snapshots)
+    FEATURE_STORE_SNAPSHOT_INTERVAL_S  Min seconds between snapshots taken after /ingest (default 60)
+"""
+
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from online_features import FEATURE_NAMES, OnlineFeatureEngine
+
+READING_FIELDS = ("machine_id", "timestamp", "vibration", "temperature", "operating_hours")
+
+
+def to_epoch_seconds(value):
+    """Timestamp as epoch seconds: numbers pass through, strings are parsed as ISO 8601."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    raise ValueError(f"unsupported timestamp {value!r}")
+
+
+class FeatureStore(OnlineFeatureEngine):
+    """
+    Thread-safe online feature state per machine, with ingestion, snapshot and restore.
+
+    Readings older than (or as old as) the last reading already applied for a machine, and
+    repeats of a machine's timestamp within one batch, are skipped, so retried or replayed
+    batches do not corrupt the rolling windows.
+
+    Args:
+        window (int): Readings in the rolling temperature mean
+        capacity (int): Machines to preallocate state for; grows automatically
+        snapshot_path (str, optional): Local file used by snapshot() and restore()
+        snapshot_interval_s (float): Min seconds between snapshots from maybe_snapshot()
+    """
+
+    STATE_ARRAYS = OnlineFeatureEngine.STATE_ARRAYS + ("last_timestamp",)
+
+    def __init__(self, window=24, capacity=1024, snapshot_path=None, snapshot_interval_s=60.0):
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval_s = snapshot_interval_s
+        self.last_snapshot = None
+        self.readings_ingested = 0
+        self.readings_stale = 0
+        self._lock = threading.Lock()
+        super().__init__(window=window, capacity=capacity)
+
+    def _allocate(self, capacity):
+        super()._allocate(capacity)
+        self.last_timestamp = np.full(capacity, -np.inf)
+
+    def ingest(self, machine_ids, timestamps, vibration, temperature, operating_hours):
+        """
+        Apply a batch of raw readings in timestamp order.
+
+        Args:
+            machine_ids (sequence): Machine id per reading (stored as strings)
+            timestamps (array-like): Epoch seconds per reading
+            vibration, temperature, operating_hours (array-like): Reading values
+
+        Returns:
+            dict: Counts of applied and stale readings
+        """
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        order = np.argsort(timestamps, kind="stable")
+        ids = [str(machine_ids[i]) for i in order]
+        ts = timestamps[order]
+        with self._lock:
+            slots = self.resolve(ids)
+            fresh = ts > self.last_timestamp[slots]
+            # Within the batch, only the first reading of a machine at a given timestamp counts
+            by_machine = np.lexsort((ts, slots))
+            s, t = slots[by_machine], ts[by_machine]
+            fresh[by_machine[1:][(s[1:] == s[:-1]) & (t[1:] == t[:-1])]] = False
+            keep = order[fresh]
+            slots = slots[fresh]
+            self.update_batch(None, np.asarray(vibration, dtype=np.float64)[keep],
+                              np.asarray(temperature, dtype=np.float64)[keep],
+                              np.asarray(operating_hours, dtype=np.float64)[keep], slots=slots)
+            np.maximum.at(self.last_timestamp, slots, timestamps[keep])
+            self.readings_ingested += len(keep)
+            self.readings_stale += len(order) - len(keep)
+        return {"ingested": int(len(keep)), "stale": int(len(order) - len(keep))}
+
+    def get_features(self, machine_id):
+        """Latest features of a machine as a dict, or None if the store has never seen it."""
+        with self._lock:
+            return self.features(str(machine_id))
+
+    def feature_matrix(self, machine_ids):
+        """
+        Latest feature rows for several machines.
+
+        Returns:
+            tuple: (matrix of shape (n_known, 6), list of unknown machine ids)
+        """
+        with self._lock:
+            slots = [self._index.get(str(m)) for m in machine_ids]
+            unknown = [m for m, s in zip(machine_ids, slots) if s is None or self.count[s] == 0]
+            known = [s for s in slots if s is not None and self.count[s] > 0]
+            return self.latest[known].copy(), unknown
+
+    def snapshot(self, path=None):
+        """
+        Write the full store state to a `.npz` file, replacing any previous snapshot atomically.
+
+        Returns:
+            str: Path written
+        """
+        path = path or self.snapshot_path
+        if not path:
+            raise ValueError("no snapshot path configured")
+        with self._lock:
+            n = self.n_machines
+            arrays = {name: getattr(self, name)[:n].copy() for name in self.STATE_ARRAYS}
+            machine_ids = np.asarray(self.machine_ids, dtype=str)
+        tmp = f"{path}.tmp-{os.getpid()}.npz"
+        np.savez(tmp, machine_ids=machine_ids, window=self.window, **arrays)
+        os.replace(tmp, path)
+        self.last_snapshot = time.time()
+        return path
+
+    def maybe_snapshot(self):
+        """Snapshot if a path is configured and the snapshot interval has passed."""
+        if self.snapshot_path and (self.last_snapshot is None
+                                   or time.time() - self.last_snapshot >= self.snapshot_interval_s):
+            self.snapshot()
+
+    def restore(self, path=None):
+        """
+        Replace the store state with a snapshot written by snapshot().
+
+        Returns:
+            int: Number of machines restored
+        """
+        path = path or self.snapshot_path
+        with np.load(path) as data:
+            if int(data["window"]) != self.window:
+                raise ValueError(f"snapshot window {int(data['window'])} does not match store window {self.window}")
+            machine_ids = data["machine_ids"].tolist()
+            with self._lock:
+                self._allocate(max(1, len(machine_ids)))
+                for name in self.STATE_ARRAYS:
+                    getattr(self, name)[:len(machine_ids)] = data[name]
+                self.machine_ids = machine_ids
+                self._index = {m: i for i, m in enumerate(machine_ids)}
+        return len(machine_ids)
+
+    def stats(self):
+        with self._lock:
+            n = self.n_machines
+            capacity = len(self.count)
+            state_bytes = self.state_bytes()
+            # Id strings plus the id list and slot index that point at them
+            index_bytes = (sys.getsizeof(self._index) + sys.getsizeof(self.machine_ids)
+                           + sum(sys.getsizeof(m) for m in self.machine_ids))
+        return {
+            "machines": n,
+            "capacity": capacity,
+            "state_bytes": state_bytes,
+            "index_bytes": index_bytes,
+            "array_bytes_per_slot": round(state_bytes / capacity, 1),
+            # Marginal cost of one more tracked machine (preallocated slack excluded)
+            "bytes_per_machine": round(state_bytes / capacity + index_bytes / n, 1) if n else None,
+            "readings_ingested": self.readings_ingested,
+            "readings_stale": self.readings_stale,
+            "window": self.window,
+            "features": FEATURE_NAMES,
+            "snapshot_path": self.snapshot_path,
+            "last_snapshot": self.last_snapshot,
+        }
+
+
+def parse_readings(payload):
+    """
+    Columns of an /ingest payload, from row objects or column lists.
+
+    Accepts {"readings": [{"machine_id": ..., "timestamp": ..., ...}, ...]} or
+    {"columns": {"machine_id": [...], "timestamp": [...], ...}}.
+
+    Returns:
+        dict: machine_id list plus NumPy arrays for the other READING_FIELDS
+
+    Raises:
+        ValueError: If fields are missing, the columns have different lengths, or a timestamp or
+            reading value is not a finite number
+    """
+    readings = payload.get("readings")
+    columns = payload.get("columns")
+    if readings is not None:
+        if not isinstance(readings, list) or not all(isinstance(r, dict) for r in readings):
+            raise ValueError("readings must be a list of objects")
+        missing = sorted({f for r in readings for f in READING_FIELDS if r.get(f) is None})
+        if missing:
+            raise ValueError(f"readings are missing fields: {missing}")
+        columns = {f: [r[f] for r in readings] for f in READING_FIELDS}
+    elif isinstance(columns, dict):
+        missing = [f for f in READING_FIELDS if f not in columns]
+        if missing:
+            raise ValueError(f"columns are missing fields: {missing}")
+        lengths = {len(columns[f]) for f in READING_FIELDS}
+        if len(lengths) != 1:
+            raise ValueError("all columns must have the same length")
+    else:
+        raise ValueError("readings or columns key is required")
+
+    parsed = {"machine_id": list(columns["machine_id"])}
+    parsed["timestamp"] = np.fromiter((to_epoch_seconds(t) for t in columns["timestamp"]), dtype=np.float64,
+                                      count=len(parsed["machine_id"]))
+    for field in ("vibration", "temperature", "operating_hours"):
+        parsed[field] = np.asarray(columns[field], dtype=np.float64)
+    # A NaN or infinity would stay in the machine's rolling window for a whole day
+    for field in ("timestamp", "vibration", "temperature", "operating_hours"):
+        bad = np.flatnonzero(~np.isfinite(parsed[field]))
+        if bad.size:
+            raise ValueError(f"{field} must be a finite number; not in readings {bad[:10].tolist()}")
+    return parsed
+
+
+def feature_store_from_env():
+    """Build the FeatureStore described by the FEATURE_STORE_* variables, restoring any snapshot."""
+    path = os.getenv("FEATURE_STORE_SNAPSHOT_PATH") or None
+    store = FeatureStore(snapshot_path=path,
+                         snapshot_interval_s=float(os.getenv("FEATURE_STORE_SNAPSHOT_INTERVAL_S", "60")))
+    if path and os.path.exists(path):
+        store.restore()
+    return store
@@ -0,0 +1,292 @@
+"""
+Fleet-wide maintenance advice for every machine in a plant.
+
+Instead of one /maintenance-advice call per machine, the fleet path:
+1. Scores all machines with one vectorized model call
+2. Answers low-risk machines from the rule-based template instead of the LLM
+3. Deduplicates machines that would produce the same prompt (same advice cache key)
+4. Sends the remaining LLM requests concurrently through a bounded pool with rate limiting
+   and retry with exponential backoff
+
+It reports wall time, LLM calls made and calls saved.
+
+Usage:
+    python fleet_advice.py --input machines.json --output report.json
+    python fleet_advice.py --demo 200          # latest readings from synthetic machines
+
+The input file holds {"machines": [{"machine_id": "M001", "features": {...}}, ...]}.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import time
+
+import numpy as np
+
+import advice_cache
+import utils
+import verity_assistant_ai
+import verity_assistant_ai_llm as llm_assistant
+
+# Defaults, overridable per call or through the environment
+FLEET_LOW_RISK_THRESHOLD = float(os.getenv("FLEET_LOW_RISK_THRESHOLD", "30"))
+FLEET_MAX_CONCURRENCY = int(os.getenv("FLEET_MAX_CONCURRENCY", "8"))
+FLEET_RATE_LIMIT_PER_S = float(os.getenv("FLEET_RATE_LIMIT_PER_S", "10"))
+FLEET_MAX_RETRIES = int(os.getenv("FLEET_MAX_RETRIES", "3"))
+
+# Options a request may set: (type, minimum, maximum); larger values are capped at the maximum
+REQUEST_OPTIONS = {
+    "low_risk_threshold": ((int, float), 0, 100),
+    "max_concurrency": (int, 1, int(os.getenv("FLEET_MAX_CONCURRENCY_LIMIT", "64"))),
+    "rate_limit_per_s": ((int, float), 0.1, float(os.getenv("FLEET_RATE_LIMIT_PER_S_LIMIT", "50"))),
+    "max_retries": (int, 0, int(os.getenv("FLEET_MAX_RETRIES_LIMIT", "5"))),
+}
+
+
+class AsyncRateLimiter:
+    """
+    Spaces out calls so no more than `rate_per_s` start per second.
+
+    Args:
+        rate_per_s (float): Maximum call starts per second; 0 or less disables limiting
+    """
+
+    def __init__(self, rate_per_s):
+        self.interval = 1.0 / rate_per_s if rate_per_s > 0 else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.interval == 0.0:
+            return
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            now = loop.time()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+def request_options(payload):
+    """
+    Fleet options set in a request body, checked and capped at the server-side maxima.
+
+    Args:
+        payload (dict): Request body
+
+    Returns:
+        dict: Keyword arguments for get_fleet_advice_async()
+
+    Raises:
+        ValueError: An option that is not a number of the right type, or below its minimum
+    """
+    options = {}
+    for name, (kind, minimum, maximum) in REQUEST_OPTIONS.items():
+        if name not in payload:
+            continue
+        value = payload[name]
+        if isinstance(value, bool) or not isinstance(value, kind) or not math.isfinite(value):
+            raise ValueError(f"{name} must be {'an integer' if kind is int else 'a number'}, got {value!r}")
+        if value < minimum:
+            raise ValueError(f"{name} must be at least {minimum}, got {value!r}")
+        options[name] = min(value, maximum)
+    return options
+
+
+def template_advice(machine_id, failure_probability):
+    """Rule-based advice for low-risk machines, from the assistant's knowledge base."""
+    action = verity_assistant_ai.knowledge_base_data.get("normal_operation_protocol")
+    return (f"Machine {machine_id}: operating normally (failure probability {failure_probability:.1f}%). "
+            f"Continue regular monitoring. Protocol: '{action}'.")
+
+
+async def _advice_with_retry(machine_id, failure_probability, features, limiter, semaphore, max_retries, counters):
+    for attempt in range(max_retries + 1):
+        async with semaphore:
+            await limiter.acquire()
+            counters["llm_calls"] += 1
+            try:
+                return await llm_assistant.get_llm_maintenance_advice_async(
+                    machine_id, failure_probability, features, use_cache=False, raise_errors=True
+                )
+            except Exception as e:
+                error = e
+        if attempt < max_retries:
+            counters["retries"] += 1
+            # Exponential backoff with jitter: ~0.5s, 1s, 2s, ...
+            await asyncio.sleep(0.5 * (2 ** attempt) * (0.5 + random.random()))
+    counters["failures"] += 1
+    return f"Error generating maintenance advice: {str(error)}"
+
+
+async def get_fleet_advice_async(machines, ml_model, feature_names=None, low_risk_threshold=None,
+                                 max_concurrency=None, rate_limit_per_s=None, max_retries=None):
+    """
+    Maintenance advice for a whole fleet with one model call and a bounded LLM fan-out.
+
+    Args:
+        machines (list): [{"machine_id": ..., "features": {...}}, ...]
+        ml_model: Trained ML model with predict_proba method
+        feature_names (list or FeatureSchema, optional): Ordered feature names. If None, loads from JSON.
+        low_risk_threshold (float, optional): Machines below this failure probability (%) get
+            template advice instead of an LLM call
+        max_concurrency (int, optional): Max LLM calls in flight
+        rate_limit_per_s (float, optional): Max LLM calls started per second
+        max_retries (int, optional): Retries per LLM call after the first attempt
+
+    Returns:
+        dict: Per-machine results plus a "summary" with wall time and LLM call counts
+    """
+    start = time.perf_counter()
+    low_risk_threshold = FLEET_LOW_RISK_THRESHOLD if low_risk_threshold is None else low_risk_threshold
+    max_concurrency = FLEET_MAX_CONCURRENCY if max_concurrency is None else max_concurrency
+    rate_limit_per_s = FLEET_RATE_LIMIT_PER_S if rate_limit_per_s is None else rate_limit_per_s
+    max_retries = FLEET_MAX_RETRIES if max_retries is None else max_retries
+    schema = utils.feature_schema(feature_names)
+
+    machine_ids = [str(m.get("machine_id")) for m in machines]
+    features = [m.get("features") or {} for m in machines]
+
+    # One vectorized model call for the whole fleet
+    loop = asyncio.get_running_loop()
+    matrix = schema.matrix(rows=features)
+    if len(matrix):
+        probabilities = await loop.run_in_executor(None, ml_model.predict_proba, matrix)
+        failure_probability = np.asarray(probabilities)[:, 1] * 100
+    else:
+        failure_probability = np.empty(0)
+    scored_at = time.perf_counter()
+
+    advice = [None] * len(machines)
+    sources = [None] * len(machines)
+    cache = llm_assistant.get_advice_cache()
+    groups = {}
+    for i, (machine_id, fp) in enumerate(zip(machine_ids, failure_probability)):
+        if fp < low_risk_threshold:
+            advice[i], sources[i] = template_advice(machine_id, fp), "template"
+            continue
+        key = advice_cache.make_key(fp, features[i]) if cache is None else cache.key(fp, features[i])
+        cached = await cache.get_async(key, machine_id) if cache is not None else None
+        if cached is not None:
+            advice[i], sources[i] = cached, "cache"
+            continue
+        groups.setdefault(key, []).append(i)
+
+    # One LLM call per distinct prompt, fanned out through a bounded, rate-limited pool
+    counters = {"llm_calls": 0, "retries": 0, "failures": 0}
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    limiter = AsyncRateLimiter(rate_limit_per_s)
+    keys = list(groups)
+    answers = await asyncio.gather(*(
+        _advice_with_retry(machine_ids[groups[k][0]], failure_probability[groups[k][0]], features[groups[k][0]],
+                           limiter, semaphore, max_retries, counters)
+        for k in keys
+    ))
+    for key, answer in zip(keys, answers):
+        leader = groups[key][0]
+        failed = answer.startswith("Error generating maintenance advice")
+        if cache is not None and not failed:
+            await cache.put_async(key, machine_ids[leader], answer)
+        for i in groups[key]:
+            advice[i] = advice_cache.for_machine(answer, machine_ids[leader], machine_ids[i])
+            sources[i] = "error" if failed else ("llm" if i == leader else "deduplicated")
+
+    results = [
+        {
+            "machine_id": machine_ids[i],
+            "failure_probability": round(float(failure_probability[i]), 2),
+            "maintenance_advice": advice[i],
+            "advice_source": sources[i],
+        }
+        for i in range(len(machines))
+    ]
+    distinct_prompts = len(keys)
+    summary = {
+        "machines": len(machines),
+        "wall_time_s": round(time.perf_counter() - start, 3),
+        "scoring_time_s": round(scored_at - start, 4),
+        "llm_calls": counters["llm_calls"],
+        "llm_calls_saved": len(machines) - distinct_prompts,
+        "templated_low_risk": sources.count("template"),
+        "cache_hits": sources.count("cache"),
+        "deduplicated": sources.count("deduplicated"),
+        "retries": counters["retries"],
+        "failures": counters["failures"],
+    }
+    return {"results": results, "summary": summary}
+
+
+def get_fleet_advice_api(machines, ml_model, **kwargs):
+    """Synchronous wrapper around get_fleet_advice_async() for scripts and sync servers."""
+    async def run():
+        try:
+            return await get_fleet_advice_async(machines, ml_model, **kwargs)
+        finally:
+            # The loop ends with this call; close its LLM client while the loop can still run
+            await llm_assistant.close_async_client()
+
+    return asyncio.run(run())
+
+
+def demo_machines(num_machines):
+    """Latest engineered reading of each synthetic machine, in the fleet input format."""
+    import engineer_feature as ef
+
+    df = ef.build_engineered_dataset(num_machines=num_machines, duration_days=30)
+    latest = df.groupby("machine_id").tail(1)
+    feature_names = utils.load_feature_names()
+    return [
+        {"machine_id": f"M{int(row['machine_id']):04d}", "features": {f: float(row[f]) for f in feature_names}}
+        for _, row in latest.iterrows()
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--input", help="JSON file with {\"machines\": [...]}")
+    source.add_argument("--demo", type=int, help="Use the latest reading of N synthetic machines")
+    parser.add_argument("--model-path", default=os.getenv("MODEL_PATH", os.path.join(os.path.dirname(__file__), "model.joblib")))
+    parser.add_argument("--output", help="Write the full report as JSON")
+    parser.add_argument("--low-risk-threshold", type=float, default=FLEET_LOW_RISK_THRESHOLD)
+    parser.add_argument("--max-concurrency", type=int, default=FLEET_MAX_CONCURRENCY)
+    parser.add_argument("--rate-limit", type=float, default=FLEET_RATE_LIMIT_PER_S, help="Max LLM calls started per second")
+    parser.add_argument("--max-retries", type=int, default=FLEET_MAX_RETRIES)
+    args = parser.parse_args()
+
+    import forest_engine
+    import joblib
+
+    if forest_engine.is_packed_model(args.model_path):
+        ml_model = forest_engine.load_packed_forest(args.model_path)
+    else:
+        ml_model = joblib.load(args.model_path)
+    if args.input:
+        with open(args.input, "r") as fh:
+            machines = json.load(fh)["machines"]
+    else:
+        machines = demo_machines(args.demo)
+
+    report = get_fleet_advice_api(
+        machines, ml_model,
+        low_risk_threshold=args.low_risk_threshold,
+        max_concurrency=args.max_concurrency,
+        rate_limit_per_s=args.rate_limit,
+        max_retries=args.max_retries,
+    )
+    print("--- Fleet Advice Summary ---")
+    for key, value in report["summary"].items():
+        print(f"{key:<22}{value}")
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"Saved report to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+"""
+Array-based inference engine for the Verity RandomForest.
+
+`export_forest()` flattens a trained `RandomForestClassifier` into packed NumPy node tables
+(one row per node across all trees) and `PackedForest` scores one row or a batch across all
+trees at once with vectorized traversal. This skips sklearn's per-call input validation and
+per-estimator dispatch, which dominate single-row latency.
+
+Packed models are stored as a directory of `.npy` files plus `meta.json`:
+
+    model_packed/
+    ├── meta.json        # classes, feature names, tree count, max depth
+    ├── feature.npy      # int32   split feature per node (0 for leaves)
+    ├── threshold.npy    # float64 split threshold per node
+    ├── left.npy         # int32   global index of the left child (leaves point to themselves)
+    ├── right.npy        # int32   global index of the right child (leaves point to themselves)
+    ├── value.npy        # float64 class probabilities per node
+    └── roots.npy        # int32   global index of each tree's root node
+
+`compact_forest()` narrows the tables for storage (float32 thresholds and probabilities,
+int8/int16 features and child indices where they fit); the engine reads either layout.
+
+Usage:
+    python forest_engine.py model.joblib model_packed
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+
+PACKED_ARRAYS = ("feature", "threshold", "left", "right", "value", "roots")
+
+
+def export_forest(clf):
+    """
+    Flatten a fitted RandomForestClassifier into packed node tables.
+
+    Args:
+        clf: Fitted sklearn RandomForestClassifier (single output)
+
+    Returns:
+        dict: Packed arrays keyed by PACKED_ARRAYS plus a "meta" dict
+    """
+    if not hasattr(clf, "estimators_") or not hasattr(clf, "classes_"):
+        raise ValueError("export_forest expects a fitted RandomForestClassifier")
+    if getattr(clf, "n_outputs_", 1) != 1:
+        raise ValueError("multi-output forests are not supported")
+
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for estimator in clf.estimators_:
+        tree = estimator.tree_
+        n_nodes = tree.node_count
+        node_ids = np.arange(n_nodes, dtype=np.int64)
+        is_leaf = tree.children_left == -1
+
+        # Leaves point to themselves, which is how traversal tells a row has finished
+        left = np.where(is_leaf, node_ids, tree.children_left) + offset
+        right = np.where(is_leaf, node_ids, tree.children_right) + offset
+        feature = np.where(is_leaf, 0, tree.feature)
+
+        # tree_.value holds (weighted) class counts; predict_proba normalizes them per node
+        value = tree.value[:, 0, :].astype(np.float64)
+        totals = value.sum(axis=1, keepdims=True)
+        totals[totals == 0] = 1.0
+
+        features.append(feature)
+        thresholds.append(np.where(is_leaf, 0.0, tree.threshold))
+        lefts.append(left)
+        rights.append(right)
+        values.append(value / totals)
+        roots.append(offset)
+        offset += n_nodes
+        max_depth = max(max_depth, tree.max_depth)
+
+    feature_names = getattr(clf, "feature_names_in_", None)
+    return {
+        "feature": np.concatenate(features).astype(np.int32),
+        "threshold": np.concatenate(thresholds).astype(np.float64),
+        "left": np.concatenate(lefts).astype(np.int32),
+        "right": np.concatenate(rights).astype(np.int32),
+        "value": np.ascontiguousarray(np.concatenate(values)),
+        "roots": np.asarray(roots, dtype=np.int32),
+        "meta": {
+            "format": "verity-packed-forest",
+            "version": 1,
+            "n_trees": len(clf.estimators_),
+            "n_features": int(clf.n_features_in_),
+            "max_depth": int(max_depth),
+            "classes": np.asarray(clf.classes_).tolist(),
+            "feature_names": list(feature_names) if feature_names is not None else None,
+        },
+    }
+
+
+def _smallest_int(max_value):
+    for dtype in (np.int8, np.int16, np.int32):
+        if max_value <= np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def compact_forest(packed):
+    """
+    Narrow packed node tables to the smallest dtypes that keep predictions intact.
+
+    Thresholds are rounded down to float32: inputs are compared as float32, and for any float32
+    x, `x <= t` holds exactly when `x <= t32` for the largest float32 t32 not above t, so every
+    split decision is unchanged. Leaf probabilities are stored as float32 (within 1e-7 of the
+    float64 values).
+
+    Args:
+        packed (dict): Output of export_forest()
+
+    Returns:
+        dict: Packed arrays and meta in the same layout, with narrower dtypes
+    """
+    threshold = packed["threshold"].astype(np.float32)
+    above = threshold.astype(np.float64) > packed["threshold"]
+    threshold[above] = np.nextafter(threshold[above], np.float32(-np.inf))
+    node_dtype = _smallest_int(len(packed["left"]) - 1)
+    return {
+        "feature": packed["feature"].astype(_smallest_int(packed["meta"]["n_features"] - 1)),
+        "threshold": threshold,
+        "left": packed["left"].astype(node_dtype),
+        "right": packed["right"].astype(node_dtype),
+        "value": packed["value"].astype(np.float32),
+        "roots": packed["roots"].astype(node_dtype),
+        "meta": dict(packed["meta"]),
+    }
+
+
+class PackedForest:
+    """
+    Vectorized random forest scorer over packed node tables.
+
+    Mirrors the parts of the sklearn estimator API the serving code uses:
+    `predict_proba`, `predict`, `classes_`, `n_features_in_` and `feature_names_in_`.
+    """
+
+    def __init__(self, packed):
+        for name in PACKED_ARRAYS:
+            setattr(self, name, packed[name])
+        self.meta = packed["meta"]
+        self.max_depth = self.meta["max_depth"]
+        self.classes_ = np.asarray(self.meta["classes"])
+        self.n_features_in_ = self.meta["n_features"]
+        if self.meta.get("feature_names") is not None:
+            self.feature_names_in_ = np.asarray(self.meta["feature_names"], dtype=object)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def apply(self, X):
+        """
+        Return the leaf reached in every tree for every row.
+
+        Args:
+            X (array-like): Shape (n_rows, n_features) or a single row of n_features
+
+        Returns:
+            numpy.ndarray: Global leaf indices of shape (n_rows, n_trees)
+        """
+        # sklearn trees compare float32 features against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X has {X.shape[1]} features, but the model expects {self.n_features_in_}")
+        # NaN compares false everywhere and would silently go right at every split; reject it as sklearn does
+        if not np.isfinite(X).all():
+            raise ValueError("Input X contains NaN, infinity or a value too large for dtype('float32').")
+
+        n_rows = X.shape[0]
+        node = np.broadcast_to(self.roots, (n_rows, self.n_trees)).ravel().copy()
+        row = np.repeat(np.arange(n_rows), self.n_trees)
+        # Only (row, tree) pairs still at an internal node take another step
+        active = np.arange(node.size)
+        for _ in range(self.max_depth):
+            current = node[active]
+            go_left = X[row[active], self.feature[current]] <= self.threshold[current]
+            nxt = np.where(go_left, self.left[current], self.right[current])
+            node[active] = nxt
+            active = active[nxt != current]
+            if active.size == 0:
+                break
+        return node.reshape(n_rows, self.n_trees)
+
+    def predict_proba(self, X):
+        """Average the leaf class probabilities over all trees, like RandomForestClassifier."""
+        return self.value[self.apply(X)].mean(axis=1, dtype=np.float64)
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+def save_packed_forest(packed, out_dir):
+    """
+    Write packed node tables as uncompressed `.npy` files plus `meta.json`.
+
+    The tables are written to a hidden sibling directory that is then renamed into place, so an
+    existing `out_dir` is never rewritten: workers that memory-mapped the previous files keep
+    reading the old inodes until they reload, and a loader never sees a mix of old and new files.
+
+    Args:
+        packed (dict): Output of export_forest()
+        out_dir (str): Directory to create or replace
+    """
+    out_dir = os.path.normpath(out_dir)
+    parent, name = os.path.split(out_dir)
+    parent = parent or "."
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=f".{name}.tmp-", dir=parent)
+    try:
+        for array in PACKED_ARRAYS:
+            np.save(os.path.join(tmp_dir, f"{array}.npy"), np.ascontiguousarray(packed[array]))
+        with open(os.path.join(tmp_dir, "meta.json"), "w") as fh:
+            json.dump(packed["meta"], fh)
+        os.chmod(tmp_dir, 0o755)
+        old_dir = None
+        if os.path.exists(out_dir):
+            old_dir = tempfile.mkdtemp(prefix=f".{name}.old-", dir=parent)
+            os.rename(out_dir, os.path.join(old_dir, name))
+        os.rename(tmp_dir, out_dir)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    if old_dir is not None:
+        # Unlinked files stay readable through existing memory maps
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def load_packed_forest(path, mmap_mode=None):
+    """
+    Load a packed model directory written by save_packed_forest().
+
+    With `mmap_mode="r"` the node tables are memory-mapped read-only instead of read into
+    private memory, so every process that maps the same files (gunicorn workers on a pod)
+    shares one physical copy through the page cache.
+
+    Args:
+        path (str): Packed model directory
+        mmap_mode (str, optional): Passed to numpy.load, e.g. "r" for read-only mapping
+
+    Returns:
+        PackedForest: Ready-to-use scorer
+    """
+    with open(os.path.join(path, "meta.json"), "r") as fh:
+        meta = json.load(fh)
+    if meta.get("format") != "verity-packed-forest":
+        raise ValueError(f"{path} is not a packed Verity forest")
+    packed = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode) for name in PACKED_ARRAYS}
+    packed["meta"] = meta
+    return PackedForest(packed)
+
+
+def is_packed_model(path):
+    """True if `path` is a packed model directory."""
+    return os.path.isdir(path) and os.path.exists(os.path.join(path, "meta.json"))
+
+
+if __name__ == "__main__":
+    import joblib
+
+    if len(sys.argv) != 3:
+        print("Usage: python forest_engine.py <model.joblib> <packed_output_dir>")
+        sys.exit(1)
+    model_path, out_dir = sys.argv[1], sys.argv[2]
+    save_packed_forest(export_forest(joblib.load(model_path)), out_dir)
+    print(f"Exported {model_path} to packed format in {out_dir}")
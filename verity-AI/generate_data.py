@@ -1,64 +1,288 @@
+"""
+Synthetic sensor data for the Verity predictive maintenance model.
+
+Every machine gets hourly vibration and temperature readings with noise, a slow degradation
+trend and, for about 20% of machines, a vibration spike and failure label before a failure day.
+All machines in a call are generated at once as 2-D (machine x hour) arrays.
+
+For load tests at fleet scale the data can be produced in chunks of machines. Each machine uses
+its own RNG stream spawned from one seed, so chunks of any size can be generated in any order or
+in parallel processes and still give the same dataset, and they can be streamed to Parquet or
+`.npy` files instead of being held in memory:
+
+    python generate_data.py --machines 10000 --days 730 --out data/fleet --format npy --workers 8
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 
-def generate_synthetic_data(num_machines, duration_days):
-    """Geneate time seried data for multiple machines"""
-    
-    data = []
-
-    for machine_id in range(1, num_machines + 1):
-        start_date = datetime(2025,1,1)
-        end_date = start_date + timedelta(days=duration_days)
-        time_series = pd.date_range(start=start_date, end=end_date, freq='h')
-
-        # Simulate sensor readings
-        baseline_vibrations = np.random.normal(loc=50, scale=5, size=len(time_series))
-        baseline_temp = np.random.normal(loc=70, scale=3, size=len(time_series))
-
-        # Simulate normal degradtion over time
-        vibration_trend = np.linspace(0, 5, len(time_series))
-        temp_trend = np.linspace(0, 2, len(time_series))
-
-        # Simulate failure for small subset of machines
-        if(np.random.rand() < 0.2):  # 20% chance of failure
-            failure_day= np.random.randint(low=duration_days*0.7, high=duration_days)
-            failure_index = failure_day * 24  # Convert days to hours
-
-            # Create a spike in sesonsor readings leading up to failure
-            spike_indices = range(failure_index-48, failure_index)
-            vibration_trend[spike_indices] += np.linspace(3, 10, len(spike_indices))
-
-            #label data as failing in the days before failure
-            fail_label_indices = range(failure_index-72, failure_index)
-            failure_labels = np.zeros(len(time_series), dtype=int)
-            failure_labels[fail_label_indices] = 1
-        else:
-            failure_labels = np.zeros(len(time_series), dtype=int)
+COLUMNS = ["machine_id", "timestamp", "vibration", "temperature", "operating_hours", "failure_imminent"]
+START_DATE = datetime(2025, 1, 1)
+
+
+def generate_synthetic_arrays(num_machines, duration_days, seed=None, machine_id_start=1):
+    """
+    Generate hourly readings for many machines as 2-D arrays of shape (machines, hours).
+
+    Args:
+        num_machines (int): Number of machines to simulate
+        duration_days (int): Number of days of hourly readings per machine
+        seed (int or numpy.random.SeedSequence, optional): Seed for the whole fleet; machine `i`
+            always gets the same readings, whichever machines are generated with it
+        machine_id_start (int): Id of the first machine
+
+    Returns:
+        dict: machine_id (machines,), timestamp (hours,) and 2-D vibration, temperature,
+            operating_hours and failure_imminent arrays
+    """
+    start_date = START_DATE
+    end_date = start_date + timedelta(days=duration_days)
+    time_series = pd.date_range(start=start_date, end=end_date, freq='h')
+    n_hours = len(time_series)
+    shape = (num_machines, n_hours)
+
+    # Simulate sensor readings, each machine from its own stream
+    baseline_vibrations = np.empty(shape)
+    baseline_temp = np.empty(shape)
+    fails = np.empty(num_machines, dtype=bool)
+    failure_days = np.empty(num_machines, dtype=np.int64)
+    for i, rng in enumerate(machine_rngs(seed, machine_id_start - 1, num_machines)):
+        rng.standard_normal(out=baseline_vibrations[i])
+        rng.standard_normal(out=baseline_temp[i])
+        fails[i] = rng.random() < 0.2  # 20% chance of failure
+        failure_days[i] = rng.integers(low=int(duration_days * 0.7), high=duration_days)
+    baseline_vibrations *= 5
+    baseline_vibrations += 50
+    baseline_temp *= 3
+    baseline_temp += 70
+
+    # Simulate normal degradtion over time
+    vibration_trend = np.broadcast_to(np.linspace(0, 5, n_hours), shape).copy()
+    temp_trend = np.linspace(0, 2, n_hours)
+
+    # Simulate failure for small subset of machines
+    failing = np.flatnonzero(fails)
+    failure_labels = np.zeros(shape, dtype=int)
+    if failing.size:
+        failure_index = failure_days[failing] * 24  # Convert days to hours
 
+        # Create a spike in sesonsor readings leading up to failure
+        spike_cols = failure_index[:, None] + np.arange(-48, 0)
+        spike_rows = np.broadcast_to(failing[:, None], spike_cols.shape)
+        valid = spike_cols >= 0
+        vibration_trend[spike_rows[valid], spike_cols[valid]] += np.broadcast_to(np.linspace(3, 10, 48), spike_cols.shape)[valid]
+
+        #label data as failing in the days before failure
+        label_cols = failure_index[:, None] + np.arange(-72, 0)
+        label_rows = np.broadcast_to(failing[:, None], label_cols.shape)
+        valid = label_cols >= 0
+        failure_labels[label_rows[valid], label_cols[valid]] = 1
+
+    return {
+        "machine_id": np.arange(machine_id_start, machine_id_start + num_machines),
+        "timestamp": time_series.values,
         # Combine trends and noises
-        vibration_data = baseline_vibrations + vibration_trend 
-        temp_data = baseline_temp + temp_trend
-
-        #Assemble into a data frame
-        machine_df = pd.DataFrame({
-            'machine_id': machine_id,
-            'timestamp': time_series,
-            'vibration': vibration_data,
-            'temperature': temp_data,
-            'operating_hours': np.arange(len(time_series)),
-            'failure_imminent': failure_labels
-        })
-        data.append(machine_df)
-        
-    return pd.concat(data, ignore_index=True)
-
-
-#Generate data for 10 machines over 180 days
-df = generate_synthetic_data(num_machines=10, duration_days=180)
-print("--- Generated Synthetic Data Sample ---")
-print(df.head())
-print("\n--- Failure Distribution ---")
-print(df['failure_imminent'].value_counts())        
-
-        
\ No newline at end of file
+        "vibration": baseline_vibrations + vibration_trend,
+        "temperature": baseline_temp + temp_trend,
+        "operating_hours": np.broadcast_to(np.arange(n_hours), shape),
+        "failure_imminent": failure_labels,
+    }
+
+
+def arrays_to_frame(arrays):
+    """Flatten generated (machine x hour) arrays into the long DataFrame used for training."""
+    num_machines, n_hours = arrays["vibration"].shape
+    return pd.DataFrame({
+        'machine_id': np.repeat(arrays["machine_id"], n_hours),
+        'timestamp': np.tile(arrays["timestamp"], num_machines),
+        'vibration': arrays["vibration"].ravel(),
+        'temperature': arrays["temperature"].ravel(),
+        'operating_hours': arrays["operating_hours"].ravel(),
+        'failure_imminent': arrays["failure_imminent"].ravel(),
+    })
+
+
+def generate_synthetic_data(num_machines, duration_days, seed=None):
+    """Geneate time seried data for multiple machines"""
+    return arrays_to_frame(generate_synthetic_arrays(num_machines, duration_days, seed=seed))
+
+
+def machine_rngs(seed, first, count):
+    """
+    Independent, reproducible RNG streams for machines `first` to `first + count - 1`.
+
+    Machine `i` gets the `i`-th child of the seed's SeedSequence, the stream `spawn()` would
+    return for it, without spawning the children of the machines before it.
+
+    Args:
+        seed (int or numpy.random.SeedSequence, optional): Seed for the whole fleet
+        first (int): Index of the first machine (its id minus one)
+        count (int): Number of machines
+
+    Returns:
+        list: One numpy.random.Generator per machine
+    """
+    root = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    return [np.random.default_rng(np.random.SeedSequence(root.entropy, spawn_key=root.spawn_key + (i,)))
+            for i in range(first, first + count)]
+
+
+def generate_synthetic_chunks(num_machines, duration_days, chunk_machines=256, seed=None):
+    """
+    Generate the dataset chunk by chunk, yielding one DataFrame per group of machines.
+
+    Args:
+        num_machines (int): Total number of machines
+        duration_days (int): Number of days of hourly readings per machine
+        chunk_machines (int): Machines per chunk
+        seed (int, optional): Seed for the whole dataset; the chunks concatenate to
+            `generate_synthetic_data(num_machines, duration_days, seed)` whatever their size
+
+    Yields:
+        DataFrame: Readings for up to `chunk_machines` machines
+    """
+    # Unseeded chunks must still come from one fleet seed
+    root = np.random.SeedSequence(seed)
+    for first in range(0, num_machines, chunk_machines):
+        count = min(chunk_machines, num_machines - first)
+        yield arrays_to_frame(generate_synthetic_arrays(count, duration_days, seed=root, machine_id_start=first + 1))
+
+
+def _write_chunk(out_dir, index, count, duration_days, seed_seq, machine_id_start, fmt):
+    arrays = generate_synthetic_arrays(count, duration_days, seed=seed_seq, machine_id_start=machine_id_start)
+    frame = arrays_to_frame(arrays)
+    if fmt == "parquet":
+        path = os.path.join(out_dir, f"part-{index:05d}.parquet")
+        frame.to_parquet(path, index=False)
+    else:
+        # One directory per chunk with a .npy file per column (memory-mappable)
+        path = os.path.join(out_dir, f"part-{index:05d}")
+        os.makedirs(path, exist_ok=True)
+        for column in COLUMNS:
+            np.save(os.path.join(path, f"{column}.npy"), frame[column].to_numpy())
+    return path, len(frame)
+
+
+def write_synthetic_dataset(out_dir, num_machines, duration_days, chunk_machines=256, seed=None,
+                            fmt="parquet", workers=1):
+    """
+    Stream the dataset to columnar files, one file (or directory) per chunk of machines.
+
+    Args:
+        out_dir (str): Output directory
+        num_machines (int): Total number of machines
+        duration_days (int): Number of days of hourly readings per machine
+        chunk_machines (int): Machines per chunk; bounds peak memory per worker
+        seed (int, optional): Seed for the whole dataset
+        fmt (str): "parquet" (requires pyarrow) or "npy"
+        workers (int): Processes generating chunks in parallel
+
+    Returns:
+        dict: Manifest written to `out_dir/manifest.json`
+    """
+    if fmt not in ("parquet", "npy"):
+        raise ValueError("fmt must be 'parquet' or 'npy'")
+    if fmt == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as e:
+            raise ImportError("Parquet output requires pyarrow; install it or use fmt='npy'") from e
+
+    os.makedirs(out_dir, exist_ok=True)
+    # Record the root entropy so an unseeded dataset can be regenerated exactly
+    root = np.random.SeedSequence(seed)
+    jobs = []
+    for i, first in enumerate(range(0, num_machines, chunk_machines)):
+        jobs.append((out_dir, i, min(chunk_machines, num_machines - first), duration_days, root, first + 1, fmt))
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            written = list(pool.map(_write_chunk, *zip(*jobs)))
+    else:
+        written = [_write_chunk(*job) for job in jobs]
+
+    manifest = {
+        "num_machines": num_machines,
+        "duration_days": duration_days,
+        "chunk_machines": chunk_machines,
+        "seed": root.entropy,
+        "format": fmt,
+        "columns": COLUMNS,
+        "rows": sum(rows for _, rows in written),
+        "shards": [os.path.basename(path) for path, _ in written],
+    }
+    with open(os.path.join(out_dir, "manifest.json"), "w") as fh:
+        json.dump(manifest, fh, indent=2)
+    return manifest
+
+
+def load_manifest(data_dir):
+    """Manifest of a dataset written by write_synthetic_dataset()."""
+    with open(os.path.join(data_dir, "manifest.json"), "r") as fh:
+        return json.load(fh)
+
+
+def read_synthetic_shard(data_dir, shard, fmt=None, columns=None):
+    """
+    Read one shard of a dataset written by write_synthetic_dataset().
+
+    Args:
+        data_dir (str): Dataset directory
+        shard (str): Shard name from the manifest
+        fmt (str, optional): "parquet" or "npy"; read from the manifest if None
+        columns (list, optional): Columns to read (default: all)
+
+    Returns:
+        DataFrame: The shard's readings
+    """
+    fmt = fmt or load_manifest(data_dir)["format"]
+    columns = columns or COLUMNS
+    path = os.path.join(data_dir, shard)
+    if fmt == "parquet":
+        return pd.read_parquet(path, columns=columns)
+    return pd.DataFrame({c: np.load(os.path.join(path, f"{c}.npy"), mmap_mode="r") for c in columns})
+
+
+def iter_synthetic_shards(data_dir, columns=None):
+    """Yield (shard name, DataFrame) for every shard of a dataset, one at a time."""
+    manifest = load_manifest(data_dir)
+    for shard in manifest["shards"]:
+        yield shard, read_synthetic_shard(data_dir, shard, fmt=manifest["format"], columns=columns)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--machines", type=int, default=10)
+    parser.add_argument("--days", type=int, default=180)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--out", help="Write chunked columnar files to this directory instead of printing a sample")
+    parser.add_argument("--format", choices=["parquet", "npy"], default="parquet")
+    parser.add_argument("--chunk-machines", type=int, default=256)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.out:
+        start = time.perf_counter()
+        manifest = write_synthetic_dataset(args.out, args.machines, args.days, chunk_machines=args.chunk_machines,
+                                           seed=args.seed, fmt=args.format, workers=args.workers)
+        print(f"Wrote {manifest['rows']:,} rows in {len(manifest['shards'])} shards to {args.out} "
+              f"in {time.perf_counter() - start:.1f}s")
+        return
+
+    #Generate data for 10 machines over 180 days
+    df = generate_synthetic_data(num_machines=args.machines, duration_days=args.days, seed=args.seed)
+    print("--- Generated Synthetic Data Sample ---")
+    print(df.head())
+    print("\n--- Failure Distribution ---")
+    print(df['failure_imminent'].value_counts())
+
+
+if __name__ == "__main__":
+    main()
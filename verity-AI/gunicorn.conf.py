@@ -0,0 +1,62 @@
+"""
+Gunicorn settings for the Verity AI server.
+
+Run with:
+    gunicorn -c gunicorn.conf.py app:app
+
+or, for the asyncio /maintenance-advice path (see asgi.py):
+    GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker gunicorn -c gunicorn.conf.py asgi:app
+
+With GUNICORN_PRELOAD enabled the master imports app.py (and loads the model) once before
+forking, so workers start with the model already in copy-on-write shared pages. Combined with
+MODEL_MMAP and a packed model (MODEL_PATH=/app/model_packed) the node tables are file-backed
+and stay shared for the life of the workers.
+
+With MODEL_WATCH_INTERVAL_S > 0 every worker polls MODEL_PATH and hot-reloads new model
+artifacts (see model_registry.py).
+
+With METRICS_DIR set, workers share their Prometheus metrics through that directory (see
+metrics.py); it is cleared when the server starts.
+
+The /ingest feature store lives in the worker process: with several workers, readings and the
+scoring calls that use them land on different stores (scoring by machine_id then answers 404 from
+the other workers; see the README), and every worker's snapshot replaces the others' at the same
+path. FEATURE_STORE_SNAPSHOT_PATH therefore runs a single worker (scale it with GUNICORN_THREADS);
+set GUNICORN_WORKERS=1 for an instance that takes /ingest without snapshots.
+"""
+
+import gc
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '6000')}"
+workers = int(os.getenv("GUNICORN_WORKERS", "2"))
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "sync")
+threads = int(os.getenv("GUNICORN_THREADS", "1"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() in ("1", "true")
+
+if os.getenv("FEATURE_STORE_SNAPSHOT_PATH") and workers > 1:
+    print(f"FEATURE_STORE_SNAPSHOT_PATH is set: running 1 worker instead of {workers}")
+    workers = 1
+
+
+def on_starting(server):
+    # Drop worker metric files left over from a previous run of the server
+    import metrics
+
+    metrics.reset_metrics_dir()
+
+
+def pre_fork(server, worker):
+    # Move everything allocated so far (imported modules, the loaded model) into the permanent
+    # generation; otherwise the first garbage collection in each worker writes to every
+    # object header and un-shares those pages.
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Watcher threads do not survive fork; start the MODEL_PATH watcher in each worker
+    import app
+
+    app.start_model_watcher()
+    app.start_feature_store_snapshots()
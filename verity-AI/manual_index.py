@@ -0,0 +1,532 @@
+"""
+Retrieval index over maintenance manual passages.
+
+Builds, offline and without network access, a hashed TF-IDF embedding of every manual passage
+into a memory-mapped float32 matrix, and answers top-k cosine queries with one NumPy
+matrix-vector product. The advice prompt and the rule-based advice quote the passages retrieved
+for a machine's risk level, so "refer to manual M-456" comes with the actual manual text.
+
+Embedding: lowercase word and word-bigram tokens are hashed (blake2b) into `dim` signed
+buckets, term counts are dampened to 1 + log(tf), weighted by a per-bucket IDF computed at
+build time, and each row is L2-normalized, so a dot product is the cosine similarity. Queries
+use the same hashing and IDF. No vocabulary is stored; any text can be queried.
+
+Indexes of IVF_MIN_PASSAGES passages or more are also partitioned into about sqrt(n) clusters
+by spherical k-means, with the rows of each cluster stored contiguously: a query scores the
+centroids and then only the rows of the nearest MANUAL_NPROBE clusters. A full float32 scan is
+memory-bandwidth bound (about 250 ms per query at 1M x 256); probing 1/8 of the clusters cuts
+that to about 30 ms.
+
+Index directory:
+    vectors.npy     (n_passages, dim) float32, opened with mmap_mode="r"
+    idf.npy         (dim,) float32 bucket IDF
+    passages.jsonl  {"id", "title", "text"} per passage, in source order
+    offsets.npy     byte offset of each row's passage line, for random access
+    centroids.npy   (n_lists, dim) float32 cluster centroids (IVF indexes only)
+    list_offsets.npy  (n_lists + 1,) first row of each cluster (IVF indexes only)
+    meta.json       dim, passage count, bigrams, IVF lists, build time
+
+Sources are a JSONL file of {"id", "title", "text"} objects, or a directory of `.md`/`.txt`
+manuals split into passages at headings and blank lines.
+
+Usage:
+    python manual_index.py build --source manuals/ --out manual_index
+    python manual_index.py search --index manual_index "bearing vibration high temperature" -k 5
+
+Serving: set MANUAL_INDEX_PATH to the index directory (MANUAL_TOP_K passages per request,
+default 3; MANUAL_NPROBE clusters per query). Without it, advice is generated exactly as before.
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+import metrics
+
+MANUAL_INDEX_PATH = os.getenv("MANUAL_INDEX_PATH")
+MANUAL_TOP_K = int(os.getenv("MANUAL_TOP_K", "3"))
+# Coarse clusters probed per query in IVF indexes (0: 1/8 of the lists)
+MANUAL_NPROBE = int(os.getenv("MANUAL_NPROBE", "0"))
+DEFAULT_DIM = 256
+IVF_MIN_PASSAGES = 50000
+SNIPPET_CHARS = 400
+
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-.][a-z0-9]+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from if in into is it of on or the this to with within be not no "
+    "do does can should must will all any each per than then there these those when which".split()
+)
+
+# Query terms by risk level, the same tiers as verity_assistant_ai.rule_based_advice
+RISK_QUERIES = (
+    (70.0, "urgent failure imminent shutdown high vibration bearing alignment motor mounts replacement"),
+    (30.0, "scheduled maintenance diagnostic check loose bolts vibration temperature monitoring"),
+    (float("-inf"), "normal operation routine inspection preventive maintenance monitoring"),
+)
+
+
+def tokenize(text, bigrams=True):
+    """Lowercase word tokens without stopwords, plus adjacent word bigrams."""
+    words = [w for w in TOKEN_RE.findall(text.lower()) if w not in STOPWORDS]
+    if bigrams and len(words) > 1:
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    return words
+
+
+class HashingEmbedder:
+    """
+    Map text to signed hashed term-frequency vectors.
+
+    Args:
+        dim (int): Number of hash buckets (vector width)
+        bigrams (bool): Also hash adjacent word pairs
+    """
+
+    def __init__(self, dim=DEFAULT_DIM, bigrams=True):
+        self.dim = dim
+        self.bigrams = bigrams
+        # token -> id; bucket and sign per id, grown as new tokens are seen
+        self._ids = {}
+        self._bucket = np.empty(1024, dtype=np.int64)
+        self._sign = np.empty(1024, dtype=np.float32)
+
+    def _token_ids(self, tokens):
+        ids = self._ids
+        out = []
+        for token in tokens:
+            tid = ids.get(token)
+            if tid is None:
+                tid = ids[token] = len(ids)
+                if tid >= len(self._bucket):
+                    self._bucket = np.resize(self._bucket, 2 * len(self._bucket))
+                    self._sign = np.resize(self._sign, 2 * len(self._sign))
+                h = int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "little")
+                self._bucket[tid] = h % self.dim
+                self._sign[tid] = 1.0 if h >> 63 else -1.0
+            out.append(tid)
+        return out
+
+    def transform(self, texts):
+        """
+        Raw (not IDF-weighted, not normalized) vectors of a list of texts.
+
+        Returns:
+            numpy.ndarray: (len(texts), dim) float32
+        """
+        doc, tok = [], []
+        for i, text in enumerate(texts):
+            ids = self._token_ids(tokenize(text, self.bigrams))
+            tok.extend(ids)
+            doc.extend([i] * len(ids))
+        n = len(texts)
+        if not tok:
+            return np.zeros((n, self.dim), dtype=np.float32)
+        # Count each (passage, token) pair once, then add 1 + log(tf) into its signed bucket
+        pairs, counts = np.unique((np.asarray(doc, dtype=np.int64) << 32) | np.asarray(tok, dtype=np.int64),
+                                  return_counts=True)
+        rows, tids = pairs >> 32, pairs & 0xFFFFFFFF
+        weights = self._sign[tids] * (1.0 + np.log(counts))
+        flat = np.bincount(rows * self.dim + self._bucket[tids], weights=weights, minlength=n * self.dim)
+        return flat.reshape(n, self.dim).astype(np.float32)
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return matrix
+
+
+def _split_passages(text, source_name):
+    """Split a manual into passages at markdown headings and blank lines."""
+    title = source_name
+    passages = []
+    for block in re.split(r"\n\s*\n", text):
+        block = block.strip()
+        if not block:
+            continue
+        lines = block.splitlines()
+        if lines[0].startswith("#"):
+            title = lines[0].lstrip("#").strip() or title
+            block = "\n".join(lines[1:]).strip()
+            if not block:
+                continue
+        passages.append((title, block))
+    return passages
+
+
+def iter_passages(source):
+    """
+    Yield {"id", "title", "text"} passages from a JSONL file or a directory of manuals.
+
+    Args:
+        source (str): `.jsonl` file, or directory searched recursively for `.md` and `.txt` files
+    """
+    if os.path.isdir(source):
+        paths = sorted(glob.glob(os.path.join(source, "**", "*.md"), recursive=True)
+                       + glob.glob(os.path.join(source, "**", "*.txt"), recursive=True))
+        for path in paths:
+            name = os.path.splitext(os.path.relpath(path, source))[0]
+            with open(path, "r", encoding="utf-8") as fh:
+                for n, (title, text) in enumerate(_split_passages(fh.read(), name)):
+                    yield {"id": f"{name}#{n}", "title": title, "text": text}
+        return
+    with open(source, "r", encoding="utf-8") as fh:
+        for n, line in enumerate(fh):
+            if line.strip():
+                passage = json.loads(line)
+                yield {"id": str(passage.get("id", n)), "title": passage.get("title", ""), "text": passage["text"]}
+
+
+def ivf_lists(n_passages):
+    """Number of coarse clusters for an index of n passages (0: exact scan only)."""
+    if n_passages < IVF_MIN_PASSAGES:
+        return 0
+    return int(min(1024, round(np.sqrt(n_passages))))
+
+
+def train_ivf(vectors, n_lists, iterations=10, sample_per_list=64, chunk_rows=8192, seed=0):
+    """
+    Spherical k-means on a sample of the rows, then assign every row to its nearest centroid.
+
+    Args:
+        vectors (numpy.ndarray): (n, dim) L2-normalized rows (may be a memmap)
+        n_lists (int): Number of clusters
+
+    Returns:
+        tuple: (centroids (n_lists, dim) float32, assignment (n,) int64)
+    """
+    rng = np.random.default_rng(seed)
+    n = len(vectors)
+    sample_idx = np.sort(rng.choice(n, size=min(n, n_lists * sample_per_list), replace=False))
+    sample = np.asarray(vectors[sample_idx], dtype=np.float32)
+    centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        nearest = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, nearest, sample)
+        empty = np.bincount(nearest, minlength=n_lists) == 0
+        # Re-seed empty clusters with random sample rows
+        sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()), replace=False)]
+        centroids = _normalize(sums)
+    assignment = np.empty(n, dtype=np.int64)
+    for lo in range(0, n, chunk_rows):
+        assignment[lo:lo + chunk_rows] = np.argmax(np.asarray(vectors[lo:lo + chunk_rows]) @ centroids.T, axis=1)
+    return centroids, assignment
+
+
+def build_index(passages, out_dir, dim=DEFAULT_DIM, bigrams=True, chunk_rows=8192, ivf=True):
+    """
+    Embed passages into an index directory with bounded memory.
+
+    Raw vectors are written chunk by chunk while document frequencies are counted; a second
+    pass over the raw file applies the IDF and normalizes the rows, which are then written to
+    `vectors.npy`, grouped by IVF cluster for large indexes.
+
+    Args:
+        passages (iterable): {"id", "title", "text"} dicts (e.g. from iter_passages())
+        out_dir (str): Index directory (created, or replaced as a whole)
+        dim (int): Vector width
+        bigrams (bool): Also embed word bigrams
+        chunk_rows (int): Passages embedded per chunk
+        ivf (bool): Group rows into coarse clusters for probed search (from IVF_MIN_PASSAGES up)
+
+    Returns:
+        dict: Passage count, dim, build seconds and index size in bytes
+    """
+    # The index is written to a hidden sibling directory that then replaces out_dir, so a
+    # serving process keeps reading the previous files through its memory map, and no file of
+    # a previous build (e.g. centroids.npy of an IVF index) is left next to the new one
+    out_dir = os.path.normpath(out_dir)
+    parent, name = os.path.split(out_dir)
+    parent = parent or "."
+    os.makedirs(parent, exist_ok=True)
+    build_dir = tempfile.mkdtemp(prefix=f".{name}.tmp-", dir=parent)
+    try:
+        stats = _write_index(passages, build_dir, dim, bigrams, chunk_rows, ivf)
+        os.chmod(build_dir, 0o755)
+        old_dir = None
+        if os.path.exists(out_dir):
+            old_dir = tempfile.mkdtemp(prefix=f".{name}.old-", dir=parent)
+            os.rename(out_dir, os.path.join(old_dir, name))
+        os.rename(build_dir, out_dir)
+    except BaseException:
+        shutil.rmtree(build_dir, ignore_errors=True)
+        raise
+    if old_dir is not None:
+        shutil.rmtree(old_dir, ignore_errors=True)
+    return stats
+
+
+def _write_index(passages, out_dir, dim, bigrams, chunk_rows, ivf):
+    """Write every index file into the empty directory `out_dir` (see build_index())."""
+    start = time.perf_counter()
+    embedder = HashingEmbedder(dim, bigrams)
+    df = np.zeros(dim, dtype=np.int64)
+    offsets = []
+    n = 0
+
+    raw_fd, raw_path = tempfile.mkstemp(prefix="vectors-", suffix=".raw", dir=out_dir)
+    try:
+        with os.fdopen(raw_fd, "wb") as raw, open(os.path.join(out_dir, "passages.jsonl"), "wb") as text_out:
+            chunk = []
+
+            def flush(chunk):
+                vectors = embedder.transform([p["text"] if not p.get("title") else f"{p['title']}\n{p['text']}"
+                                              for p in chunk])
+                df[:] += np.count_nonzero(vectors, axis=0)
+                raw.write(vectors.tobytes())
+
+            for passage in passages:
+                offsets.append(text_out.tell())
+                text_out.write(json.dumps({"id": passage["id"], "title": passage.get("title", ""),
+                                           "text": passage["text"]}).encode() + b"\n")
+                chunk.append(passage)
+                n += 1
+                if len(chunk) == chunk_rows:
+                    flush(chunk)
+                    chunk = []
+            if chunk:
+                flush(chunk)
+
+        idf = (np.log((1.0 + n) / (1.0 + df)) + 1.0).astype(np.float32)
+        raw_vectors = np.memmap(raw_path, dtype=np.float32, mode="r+", shape=(n, dim)) if n else np.zeros((0, dim), np.float32)
+        for lo in range(0, n, chunk_rows):
+            raw_vectors[lo:lo + chunk_rows] = _normalize(raw_vectors[lo:lo + chunk_rows] * idf)
+
+        # Large indexes are stored grouped by coarse cluster, so a query scans a few lists only
+        n_lists = ivf_lists(n) if ivf else 0
+        order = None
+        if n_lists > 1:
+            centroids, assignment = train_ivf(raw_vectors, n_lists, chunk_rows=chunk_rows)
+            order = np.argsort(assignment, kind="stable")
+            list_offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=n_lists))])
+            np.save(os.path.join(out_dir, "centroids.npy"), centroids)
+            np.save(os.path.join(out_dir, "list_offsets.npy"), list_offsets.astype(np.int64))
+
+        vectors = np.lib.format.open_memmap(os.path.join(out_dir, "vectors.npy"), mode="w+",
+                                            dtype=np.float32, shape=(n, dim))
+        for lo in range(0, n, chunk_rows):
+            rows = order[lo:lo + chunk_rows] if order is not None else slice(lo, lo + chunk_rows)
+            vectors[lo:lo + chunk_rows] = raw_vectors[rows]
+        vectors.flush()
+        del vectors, raw_vectors
+    finally:
+        os.remove(raw_path)
+
+    offsets = np.asarray(offsets, dtype=np.int64)
+    np.save(os.path.join(out_dir, "idf.npy"), idf)
+    np.save(os.path.join(out_dir, "offsets.npy"), offsets[order] if order is not None else offsets)
+    seconds = time.perf_counter() - start
+    meta = {"dim": dim, "passages": n, "bigrams": bigrams, "ivf_lists": n_lists if n_lists > 1 else 0,
+            "build_seconds": round(seconds, 3), "built_at": time.strftime("%Y-%m-%dT%H:%M:%S%z")}
+    with open(os.path.join(out_dir, "meta.json"), "w") as fh:
+        json.dump(meta, fh, indent=2)
+    size = sum(os.path.getsize(os.path.join(out_dir, f)) for f in os.listdir(out_dir))
+    return dict(meta, index_bytes=size)
+
+
+def _top_k(scores, k):
+    """Best k rows of each column of a (n, q) score matrix, as (q, k) indices and scores."""
+    n_queries = scores.shape[1]
+    if k == 0:
+        return np.empty((n_queries, 0), np.int64), np.empty((n_queries, 0), np.float32)
+    top = np.argpartition(-scores, k - 1, axis=0)[:k].T  # (q, k), unordered
+    top_scores = np.take_along_axis(scores.T, top, axis=1)
+    order = np.argsort(-top_scores, axis=1)
+    return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+
+class ManualIndex:
+    """
+    A built index opened read-only; the vector matrix is memory-mapped, not read into memory.
+
+    Args:
+        path (str): Index directory written by build_index()
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), "r") as fh:
+            self.meta = json.load(fh)
+        self.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        self.idf = np.load(os.path.join(path, "idf.npy"))
+        self.offsets = np.load(os.path.join(path, "offsets.npy"))
+        ivf = self.meta.get("ivf_lists", 0) > 1
+        self.centroids = np.load(os.path.join(path, "centroids.npy")) if ivf else None
+        self.list_offsets = np.load(os.path.join(path, "list_offsets.npy")) if ivf else None
+        self.embedder = HashingEmbedder(self.meta["dim"], self.meta.get("bigrams", True))
+        self._embed_lock = threading.Lock()
+        # Advice queries repeat (one per risk level), so their vectors are kept
+        self._query_vectors = {}
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def embed(self, queries):
+        """Normalized query vectors, shape (len(queries), dim)."""
+        # The embedder grows its token table on new words; keep that single-threaded
+        with self._embed_lock:
+            raw = self.embedder.transform(list(queries))
+        return _normalize(raw * self.idf)
+
+    def search_vectors(self, query_vectors, k, nprobe=None):
+        """
+        Top-k rows by cosine similarity for each query vector.
+
+        Flat indexes are scanned exactly. IVF indexes score only the rows of the `nprobe`
+        clusters nearest to each query; nprobe >= the number of lists is an exact scan.
+
+        Args:
+            query_vectors (numpy.ndarray): (n_queries, dim) normalized vectors
+            k (int): Results per query
+            nprobe (int, optional): Clusters scanned per query (default MANUAL_NPROBE, or 1/8
+                of the lists)
+
+        Returns:
+            tuple: (indices, scores), each of shape (n_queries, k), best first; rows with fewer
+                than k candidates are padded with index -1 and score -inf
+        """
+        q = np.ascontiguousarray(np.atleast_2d(query_vectors), dtype=np.float32)
+        k = min(k, len(self.vectors))
+        if self.centroids is None or k == 0:
+            return _top_k(self.vectors @ q.T, k)
+        n_lists = len(self.centroids)
+        nprobe = nprobe or MANUAL_NPROBE or max(1, n_lists // 8)
+        if nprobe >= n_lists:
+            return _top_k(self.vectors @ q.T, k)
+
+        indices = np.full((len(q), k), -1, dtype=np.int64)
+        scores = np.full((len(q), k), -np.inf, dtype=np.float32)
+        probes = np.argpartition(-(q @ self.centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+        bounds = self.list_offsets
+        for j, lists in enumerate(probes):
+            lists = np.sort(lists)
+            # Each cluster is a contiguous block of rows; score the blocks one by one
+            part_scores = np.concatenate([self.vectors[bounds[c]:bounds[c + 1]] @ q[j] for c in lists])
+            rows = np.concatenate([np.arange(bounds[c], bounds[c + 1]) for c in lists])
+            top, top_scores = _top_k(part_scores[:, None], min(k, len(rows)))
+            indices[j, :top.shape[1]] = rows[top[0]]
+            scores[j, :top.shape[1]] = top_scores[0]
+        return indices, scores
+
+    def passage(self, i):
+        """Passage dict of row i, read from passages.jsonl at its offset."""
+        with open(os.path.join(self.path, "passages.jsonl"), "rb") as fh:
+            fh.seek(int(self.offsets[i]))
+            return json.loads(fh.readline())
+
+    def search(self, query, k=MANUAL_TOP_K, min_score=0.0, nprobe=None):
+        """
+        Passages most similar to a text query.
+
+        Args:
+            query (str): Free-text query
+            k (int): Maximum number of passages
+            min_score (float): Drop passages scoring at or below this cosine similarity
+            nprobe (int, optional): IVF clusters to scan (see search_vectors)
+
+        Returns:
+            list: {"id", "title", "text", "score"} dicts, best first
+        """
+        vector = self._query_vectors.get(query)
+        if vector is None:
+            vector = self.embed([query])
+            if len(self._query_vectors) < 1024:
+                self._query_vectors[query] = vector
+        indices, scores = self.search_vectors(vector, k, nprobe=nprobe)
+        return [dict(self.passage(i), score=round(float(s), 4))
+                for i, s in zip(indices[0], scores[0]) if i >= 0 and s > min_score]
+
+
+_index = None
+_index_loaded = False
+_index_lock = threading.Lock()
+
+
+def get_manual_index():
+    """Return the index at MANUAL_INDEX_PATH, opened on first use, or None if not configured."""
+    global _index, _index_loaded
+    if not _index_loaded:
+        with _index_lock:
+            if not _index_loaded:
+                if MANUAL_INDEX_PATH and os.path.exists(os.path.join(MANUAL_INDEX_PATH, "meta.json")):
+                    _index = ManualIndex(MANUAL_INDEX_PATH)
+                elif MANUAL_INDEX_PATH:
+                    print(f"Warning: no manual index at MANUAL_INDEX_PATH={MANUAL_INDEX_PATH}")
+                _index_loaded = True
+    return _index
+
+
+def advice_query(failure_probability):
+    """Query text for the manual sections relevant to a machine's risk level."""
+    for threshold, terms in RISK_QUERIES:
+        if failure_probability > threshold:
+            return terms
+    return RISK_QUERIES[-1][1]
+
+
+def retrieve_for_advice(failure_probability, k=None):
+    """
+    Manual passages for an advice request; empty when no index is configured.
+
+    Returns:
+        list: {"id", "title", "text", "score"} dicts, best first
+    """
+    index = get_manual_index()
+    if index is None:
+        return []
+    start = time.perf_counter()
+    passages = index.search(advice_query(failure_probability), k=MANUAL_TOP_K if k is None else k)
+    metrics.observe_stage("retrieve", time.perf_counter() - start)
+    return passages
+
+
+def snippet(text, max_chars=SNIPPET_CHARS):
+    """Passage text shortened to max_chars at a word boundary."""
+    text = " ".join(text.split())
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars].rsplit(" ", 1)[0] + " ..."
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Embed manual passages into an index directory")
+    build.add_argument("--source", required=True, help="JSONL file or directory of .md/.txt manuals")
+    build.add_argument("--out", required=True, help="Index directory")
+    build.add_argument("--dim", type=int, default=DEFAULT_DIM)
+    build.add_argument("--no-bigrams", action="store_true")
+    search = sub.add_parser("search", help="Query an index")
+    search.add_argument("--index", default=MANUAL_INDEX_PATH, required=MANUAL_INDEX_PATH is None)
+    search.add_argument("query")
+    search.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        stats = build_index(iter_passages(args.source), args.out, dim=args.dim, bigrams=not args.no_bigrams)
+        print(f"Indexed {stats['passages']:,} passages ({stats['dim']} dims) in {stats['build_seconds']:.1f}s, "
+              f"{stats['index_bytes'] / 2 ** 20:.1f} MiB -> {args.out}")
+        return
+
+    index = ManualIndex(args.index)
+    start = time.perf_counter()
+    results = index.search(args.query, k=args.k)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    for r in results:
+        print(f"{r['score']:.3f}  [{r['id']}] {r['title']}: {snippet(r['text'], 160)}")
+    print(f"\n{len(results)} results from {len(index):,} passages in {elapsed_ms:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
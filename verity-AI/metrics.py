@@ -0,0 +1,371 @@
+"""
+Prometheus metrics for the serving path, aggregated across gunicorn workers.
+
+Request handlers record per-endpoint request latency, per-stage latency (JSON parsing, feature
+ordering, `predict_proba`, serialization, the LLM call), error counts and LLM token usage into
+fixed-bucket histograms and counters held in plain dicts; recording a value is a dict lookup and
+a list increment under one lock. `GET /metrics` renders them in the Prometheus text format.
+
+Each gunicorn worker keeps its own values. With `METRICS_DIR` set (a directory shared by the
+workers of a pod, e.g. an emptyDir), every worker writes its values to `<dir>/<pid>.json` at
+most every `METRICS_FLUSH_INTERVAL_S` seconds, and the worker that serves a scrape sums the
+files of all workers, so counters and histograms cover the whole pod whichever worker answers.
+Files of exited workers are kept so totals never go backwards; their gauges are dropped.
+`gunicorn.conf.py` clears the directory when the server starts.
+
+`/predict` also emits sampled structured logs (one JSON line per logged request) instead of
+per-request debug prints.
+
+Configuration (environment variables):
+    METRICS_ENABLED           "false" turns recording off (default "true")
+    METRICS_DIR               Directory shared by the workers of a pod (default: this process only)
+    METRICS_FLUSH_INTERVAL_S  Max age of a worker's file in METRICS_DIR (default 1)
+    REQUEST_LOG_SAMPLE_RATE   Fraction of /predict requests logged as JSON (default 0.01)
+"""
+
+import atexit
+import bisect
+import contextvars
+import glob
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true")
+METRICS_DIR = os.getenv("METRICS_DIR") or None
+METRICS_FLUSH_INTERVAL_S = float(os.getenv("METRICS_FLUSH_INTERVAL_S", "1"))
+REQUEST_LOG_SAMPLE_RATE = float(os.getenv("REQUEST_LOG_SAMPLE_RATE", "0.01"))
+
+# Seconds; stages run from microseconds (feature ordering) to tens of seconds (LLM calls)
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0)
+
+# name: (type, help)
+METRICS = {
+    "verity_http_request_duration_seconds": ("histogram", "Request latency by endpoint, method and status"),
+    "verity_stage_duration_seconds": ("histogram", "Latency of each serving stage by endpoint"),
+    "verity_http_errors_total": ("counter", "Responses with status >= 400 by endpoint and status"),
+    "verity_llm_request_duration_seconds": ("histogram", "LLM call latency by mode and outcome"),
+    "verity_llm_requests_total": ("counter", "LLM advice lookups by mode and outcome (ok, error, timeout, cached)"),
+    "verity_llm_tokens_total": ("counter", "LLM tokens reported by the API, by type"),
+    "verity_advice_responses_total": ("counter", "Advice answers by source (llm, cache, rule_based) and fallback reason"),
+    "verity_model_reloads_total": ("counter", "Model hot reloads by status"),
+    "verity_prediction_cache_lookups_total": ("counter", "Prediction cache row lookups by result (hit, miss)"),
+    "verity_prediction_cache_evictions_total": ("counter", "Rows evicted from the prediction cache"),
+    "verity_prediction_cache_entries": ("gauge", "Rows held in the prediction cache of a worker"),
+    "verity_startup_seconds": ("gauge", "Seconds spent in each startup step of a worker"),
+    "verity_model_load_seconds": ("gauge", "Seconds spent loading and validating the active model, by step"),
+    "verity_model_info": ("gauge", "Active model version of a worker (value is always 1)"),
+}
+
+# Endpoint of the request being served, for stages recorded outside the handler (LLM module)
+current_endpoint = contextvars.ContextVar("verity_endpoint", default="none")
+
+request_log = logging.getLogger("verity.requests")
+if not request_log.handlers:
+    _handler = logging.StreamHandler(sys.stdout)
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    request_log.addHandler(_handler)
+    request_log.setLevel(logging.INFO)
+    request_log.propagate = False
+
+
+def _label_str(labels):
+    return ",".join(f'{k}="{str(v)}"' for k, v in labels)
+
+
+class MetricsRegistry:
+    """
+    Counters, gauges and fixed-bucket histograms for one process.
+
+    Args:
+        metrics_dir (str, optional): Directory shared by all workers for aggregation
+        flush_interval_s (float): Max seconds between writes of this worker's file
+        buckets (tuple): Histogram bucket upper bounds in seconds
+    """
+
+    def __init__(self, metrics_dir=None, flush_interval_s=1.0, buckets=LATENCY_BUCKETS):
+        self.metrics_dir = metrics_dir
+        self.flush_interval_s = flush_interval_s
+        self.buckets = buckets
+        self.collectors = []
+        self._reset()
+
+    def _reset(self):
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self._label_cache = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._dirty = False
+        self._flusher = None
+
+    def _key(self, name, labels):
+        # Label strings are cached per call site's label tuple
+        label_str = self._label_cache.get(labels)
+        if label_str is None:
+            label_str = self._label_cache[labels] = _label_str(labels)
+        return name, label_str
+
+    def inc(self, name, value=1.0, **labels):
+        """Add to a counter."""
+        key = self._key(name, tuple(labels.items()))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0.0) + value
+            self._dirty = True
+
+    def set_counter(self, name, value, **labels):
+        """Set a counter kept elsewhere (e.g. a reload count) to its current total."""
+        key = self._key(name, tuple(labels.items()))
+        with self._lock:
+            self.counters[key] = float(value)
+            self._dirty = True
+
+    def set_gauge(self, name, value, **labels):
+        """Set a per-process gauge; exported with a pid label."""
+        key = self._key(name, tuple(labels.items()))
+        with self._lock:
+            self.gauges[key] = float(value)
+            self._dirty = True
+
+    def clear(self, name):
+        """Drop every series of a gauge (e.g. the info gauge of a replaced model version)."""
+        with self._lock:
+            for key in [k for k in self.gauges if k[0] == name]:
+                del self.gauges[key]
+
+    def observe(self, name, seconds, **labels):
+        """Record one value in a histogram."""
+        key = self._key(name, tuple(labels.items()))
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                # One count per bucket, then +Inf, then the sum
+                hist = self.histograms[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            hist[index] += 1
+            hist[-1] += seconds
+            self._dirty = True
+
+    def snapshot(self):
+        """This process's values as a JSON-serializable dict."""
+        for collect in self.collectors:
+            collect(self)
+        with self._lock:
+            return {
+                "counters": [[n, labels, v] for (n, labels), v in self.counters.items()],
+                "gauges": [[n, labels, v] for (n, labels), v in self.gauges.items()],
+                "histograms": [[n, labels, list(h)] for (n, labels), h in self.histograms.items()],
+                "buckets": list(self.buckets),
+            }
+
+    def flush(self):
+        """Write this worker's values to METRICS_DIR (atomic replace)."""
+        if not self.metrics_dir:
+            return
+        os.makedirs(self.metrics_dir, exist_ok=True)
+        path = os.path.join(self.metrics_dir, f"{os.getpid()}.json")
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as fh:
+            json.dump(self.snapshot(), fh)
+        os.replace(tmp, path)
+        self._dirty = False
+
+    def start_flusher(self):
+        """Flush this worker's file in the background (once per process, restarted after fork)."""
+        if not self.metrics_dir:
+            return
+        if self._pid != os.getpid():
+            # Forked: locks and threads of the parent do not carry over; values start from zero
+            self._reset()
+        if self._flusher is not None:
+            return
+
+        def run():
+            while True:
+                time.sleep(self.flush_interval_s)
+                if self._dirty:
+                    try:
+                        self.flush()
+                    except OSError:
+                        pass
+
+        self._flusher = threading.Thread(target=run, name="metrics-flusher", daemon=True)
+        self._flusher.start()
+        atexit.register(self.flush)
+
+    def collect(self):
+        """
+        Values of every worker sharing METRICS_DIR (or just this process), merged.
+
+        Returns:
+            dict: {"counters": {...}, "gauges": {...}, "histograms": {...}} keyed by (name, labels)
+        """
+        own = self.snapshot()
+        snapshots = [(os.getpid(), own)]
+        if self.metrics_dir:
+            for path in glob.glob(os.path.join(self.metrics_dir, "*.json")):
+                pid = int(os.path.basename(path).split(".")[0])
+                if pid == os.getpid():
+                    continue
+                try:
+                    with open(path, "r") as fh:
+                        snapshots.append((pid, json.load(fh)))
+                except (OSError, ValueError):
+                    continue
+
+        counters, gauges, histograms = {}, {}, {}
+        for pid, snap in snapshots:
+            if snap.get("buckets") != list(self.buckets):
+                continue
+            for name, labels, value in snap["counters"]:
+                counters[(name, labels)] = counters.get((name, labels), 0.0) + value
+            if pid == os.getpid() or _alive(pid):
+                for name, labels, value in snap["gauges"]:
+                    gauges[(name, ",".join(filter(None, (labels, f'pid="{pid}"'))))] = value
+            for name, labels, hist in snap["histograms"]:
+                merged = histograms.get((name, labels))
+                histograms[(name, labels)] = hist if merged is None else [a + b for a, b in zip(merged, hist)]
+        return {"counters": counters, "gauges": gauges, "histograms": histograms}
+
+    def render(self):
+        """All workers' metrics in the Prometheus text exposition format."""
+        values = self.collect()
+        series = {}
+        for kind in ("counters", "gauges", "histograms"):
+            for (name, labels), value in values[kind].items():
+                series.setdefault(name, []).append((labels, value))
+
+        lines = []
+        for name in sorted(series):
+            kind, help_text = METRICS.get(name, ("untyped", name))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in sorted(series[name], key=lambda s: s[0]):
+                if kind != "histogram":
+                    lines.append(f"{name}{{{labels}}} {_fmt(value)}" if labels else f"{name} {_fmt(value)}")
+                    continue
+                cumulative = 0
+                prefix = f"{labels}," if labels else ""
+                for bound, count in zip(list(self.buckets) + ["+Inf"], value[:-1]):
+                    cumulative += count
+                    le = bound if bound == "+Inf" else _fmt(bound)
+                    lines.append(f'{name}_bucket{{{prefix}le="{le}"}} {cumulative}')
+                lines.append(f"{name}_sum{{{labels}}} {_fmt(value[-1])}" if labels else f"{name}_sum {_fmt(value[-1])}")
+                lines.append(f"{name}_count{{{labels}}} {cumulative}" if labels else f"{name}_count {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+def _fmt(value):
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+registry = MetricsRegistry(METRICS_DIR, METRICS_FLUSH_INTERVAL_S)
+
+
+def begin_request(endpoint):
+    """Mark the endpoint being served, for stages recorded deeper in the call stack."""
+    current_endpoint.set(endpoint)
+    if METRICS_ENABLED:
+        registry.start_flusher()
+
+
+def observe_request(endpoint, method, status, seconds):
+    """Record one served request (and an error count for status >= 400)."""
+    if not METRICS_ENABLED:
+        return
+    registry.observe("verity_http_request_duration_seconds", seconds,
+                     endpoint=endpoint, method=method, status=status)
+    if status >= 400:
+        registry.inc("verity_http_errors_total", endpoint=endpoint, status=status)
+
+
+def observe_stage(stage, seconds, endpoint=None):
+    """Record the latency of one serving stage of the current (or given) endpoint."""
+    if METRICS_ENABLED:
+        registry.observe("verity_stage_duration_seconds", seconds,
+                         endpoint=endpoint or current_endpoint.get(), stage=stage)
+
+
+class StageTimer:
+    """
+    Time consecutive stages of one request: each mark() records the time since the last one.
+
+    Args:
+        endpoint (str): Endpoint label for the stages
+    """
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.last = time.perf_counter()
+        self.timings = {}
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        seconds = now - self.last
+        self.last = now
+        self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+        observe_stage(stage, seconds, self.endpoint)
+        return seconds
+
+    def skip(self):
+        """Restart the clock without recording (e.g. after work that belongs to no stage)."""
+        self.last = time.perf_counter()
+
+
+def observe_llm(mode, outcome, seconds=None, usage=None):
+    """
+    Record one LLM advice lookup.
+
+    Args:
+        mode (str): "sync", "async", "stream" or "stream_async"
+        outcome (str): "ok", "error", "timeout" or "cached"
+        seconds (float, optional): Call latency (not recorded for cache hits)
+        usage (optional): The API response's usage object, for token counts
+    """
+    if not METRICS_ENABLED:
+        return
+    registry.inc("verity_llm_requests_total", mode=mode, outcome=outcome)
+    if seconds is not None:
+        registry.observe("verity_llm_request_duration_seconds", seconds, mode=mode, outcome=outcome)
+        observe_stage("llm", seconds)
+    if usage is not None:
+        for kind in ("prompt", "completion"):
+            tokens = getattr(usage, f"{kind}_tokens", None)
+            if tokens:
+                registry.inc("verity_llm_tokens_total", tokens, type=kind)
+
+
+def sample_log():
+    """True for the fraction REQUEST_LOG_SAMPLE_RATE of calls."""
+    return REQUEST_LOG_SAMPLE_RATE > 0 and random.random() < REQUEST_LOG_SAMPLE_RATE
+
+
+def log_request(event, **fields):
+    """Write one structured (JSON) request log line."""
+    request_log.info(json.dumps(dict(event=event, pid=os.getpid(), **fields), default=str))
+
+
+def reset_metrics_dir(metrics_dir=METRICS_DIR):
+    """Remove worker files left from a previous run (gunicorn on_starting)."""
+    if metrics_dir:
+        for path in glob.glob(os.path.join(metrics_dir, "*.json*")):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,296 @@
+"""
+Versioned model artifacts with validated, zero-downtime hot reload.
+
+The serving model is held in a `ModelBundle` (model, feature names, version). Requests read
+`registry.active` once and use that bundle to the end, so swapping in a new bundle is a single
+reference assignment: in-flight requests finish on the model they started with, new requests
+get the new one, and nothing is dropped.
+
+A reload loads the new artifacts in the background, warms them up and validates them against a
+probe set before the swap; a model that fails to load or validate never serves traffic.
+
+`MODEL_PATH` may point at:
+    model.joblib / model_packed/   a single artifact; reloaded when its files change
+    models/                        a directory of version directories (e.g. models/2025-06-01/),
+                                   each holding model.joblib or model_packed/ plus
+                                   model_features.json; the last version by name is served
+
+Configuration (environment variables):
+    MODEL_WATCH_INTERVAL_S  Seconds between checks for new artifacts (default 0: no watcher)
+    MODEL_PROBE_PATH        JSON file {"rows": [[...], ...]} of probe feature rows (default: synthetic)
+"""
+
+import json
+import os
+import threading
+import time
+import warnings
+from datetime import datetime, timezone
+
+import numpy as np
+
+from feature_schema import FeatureSchema, load_feature_schema
+
+MODEL_FILES = ("model_packed", "model.joblib")
+
+
+class ModelBundle:
+    """
+    A loaded model with the feature schema it expects and the version it was loaded from.
+
+    Args:
+        model: Estimator with predict_proba (sklearn forest or PackedForest)
+        feature_names (list, optional): Ordered feature names from model_features.json
+        version (str): Version label reported in responses
+        path (str): Artifact path the model was loaded from
+        schema (FeatureSchema, optional): Compiled schema; built from feature_names if None
+    """
+
+    def __init__(self, model, feature_names, version, path, schema=None):
+        self.model = model
+        self.feature_names = feature_names
+        # Compiled once per model version; falls back to the names the model was fitted with
+        names = feature_names if feature_names is not None else getattr(model, "feature_names_in_", None)
+        if schema is None and names is not None:
+            schema = FeatureSchema(list(names))
+        self.schema = schema
+        self.version = version
+        self.path = path
+        self.loaded_at = time.time()
+
+    def info(self):
+        return {
+            "model_version": self.version,
+            "model_path": self.path,
+            "loaded_at": datetime.fromtimestamp(self.loaded_at, timezone.utc).isoformat(),
+        }
+
+
+def resolve_artifact(path):
+    """
+    Model artifact and version label for MODEL_PATH.
+
+    Returns:
+        tuple: (artifact path, version string)
+    """
+    path = os.path.normpath(path)
+    if os.path.isdir(path) and not os.path.exists(os.path.join(path, "meta.json")):
+        # A directory of version directories: serve the last version by name
+        versions = sorted(
+            d for d in os.listdir(path)
+            if not d.startswith(".") and any(os.path.exists(os.path.join(path, d, f)) for f in MODEL_FILES)
+        )
+        if versions:
+            version_dir = os.path.join(path, versions[-1])
+            artifact = next(os.path.join(version_dir, f) for f in MODEL_FILES
+                            if os.path.exists(os.path.join(version_dir, f)))
+            return artifact, versions[-1]
+    return path, f"{os.path.basename(path)}@{artifact_stamp(path)}"
+
+
+def versions_root(path):
+    """
+    Directory that holds the model versions of MODEL_PATH: the path itself when it is a directory
+    of versions, otherwise the directory the artifact sits in.
+    """
+    path = os.path.realpath(path)
+    if os.path.isdir(path) and not os.path.exists(os.path.join(path, "meta.json")):
+        return path
+    return os.path.dirname(path)
+
+
+def is_within(path, root):
+    """True if `path` resolves (symlinks followed) to `root` or a path below it."""
+    path, root = os.path.realpath(path), os.path.realpath(root)
+    return os.path.commonpath([path, root]) == root
+
+
+def artifact_stamp(path):
+    """Modification time of an artifact (newest file for a packed directory), as YYYYmmddHHMMSS."""
+    try:
+        if os.path.isdir(path):
+            mtime = max(os.stat(os.path.join(path, f)).st_mtime for f in os.listdir(path))
+        else:
+            mtime = os.stat(path).st_mtime
+    except (OSError, ValueError):
+        return "unknown"
+    return datetime.fromtimestamp(mtime, timezone.utc).strftime("%Y%m%d%H%M%S")
+
+
+def features_path_for(artifact):
+    """model_features.json saved next to an artifact by save_model.py."""
+    return os.path.join(os.path.dirname(os.path.normpath(artifact)), "model_features.json")
+
+
+def probe_rows(n_features, path=None):
+    """
+    Probe feature rows used to warm up and validate a model before it serves traffic.
+
+    Args:
+        n_features (int): Number of model features
+        path (str, optional): JSON file with {"rows": [[...], ...]}; synthetic rows if None
+
+    Returns:
+        numpy.ndarray: Probe matrix of shape (n_rows, n_features)
+    """
+    if path:
+        with open(path, "r") as fh:
+            return np.asarray(json.load(fh)["rows"], dtype=np.float64)
+    # Plausible readings around the synthetic training distribution, healthy to failing
+    rng = np.random.default_rng(0)
+    vibration = np.r_[rng.normal(52, 4, 24), rng.normal(62, 3, 8)]
+    temperature = rng.normal(71, 3, len(vibration))
+    hours = rng.uniform(0, 4320, len(vibration))
+    rows = np.column_stack([vibration, temperature, hours, vibration * temperature,
+                            rng.normal(0, 7, len(vibration)), temperature + rng.normal(0, 0.6, len(vibration))])
+    return rows[:, :n_features] if n_features <= rows.shape[1] else np.pad(rows, ((0, 0), (0, n_features - rows.shape[1])))
+
+
+def validate_model(model, feature_names, probe):
+    """
+    Check a freshly loaded model on probe rows; raises ValueError if it must not serve.
+
+    Returns:
+        numpy.ndarray: Probe probabilities (also used to warm the model up)
+    """
+    n_features = getattr(model, "n_features_in_", None)
+    if feature_names is not None and n_features is not None and len(feature_names) != n_features:
+        raise ValueError(f"model expects {n_features} features but model_features.json lists {len(feature_names)}")
+    if not hasattr(model, "predict_proba"):
+        raise ValueError("model has no predict_proba")
+    with warnings.catch_warnings():
+        # Probe rows are a bare array; sklearn warns when the model was fitted on a DataFrame
+        warnings.simplefilter("ignore", UserWarning)
+        proba = np.asarray(model.predict_proba(probe))
+    if proba.shape != (len(probe), 2):
+        raise ValueError(f"expected probabilities of shape {(len(probe), 2)}, got {proba.shape}")
+    if not np.all(np.isfinite(proba)) or proba.min() < 0 or proba.max() > 1:
+        raise ValueError("probe probabilities are not finite values in [0, 1]")
+    if not np.allclose(proba.sum(axis=1), 1.0, atol=1e-6):
+        raise ValueError("probe probabilities do not sum to 1")
+    return proba
+
+
+class ModelRegistry:
+    """
+    Holds the active ModelBundle and swaps in validated new versions.
+
+    Args:
+        load_fn (callable): Loads a model from an artifact path
+        path (str): MODEL_PATH (an artifact or a directory of versions)
+        features_path (str, optional): Fallback feature list when none sits next to the artifact
+        probe_path (str, optional): JSON probe rows for validation
+        warmup_rounds (int): predict_proba calls on the probe set before the swap
+    """
+
+    def __init__(self, load_fn, path, features_path=None, probe_path=None, warmup_rounds=3):
+        self.load_fn = load_fn
+        self.path = path
+        self.features_path = features_path
+        self.probe_path = probe_path
+        self.warmup_rounds = warmup_rounds
+        self.active = None
+        self.reloads = 0
+        self.failed_reloads = 0
+        self.last_error = None
+        self.last_timings = {}
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+        self._watch_pid = None
+
+    def load(self, artifact=None, version=None, validate=True):
+        """
+        Load, warm up and (optionally) validate a bundle without activating it.
+
+        Returns:
+            ModelBundle: The loaded bundle
+        """
+        if artifact is None:
+            artifact, version = resolve_artifact(self.path)
+        timings = {}
+        start = time.perf_counter()
+        model = self.load_fn(artifact)
+        timings["model_load_s"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        schema = None
+        for candidate in (features_path_for(artifact), self.features_path):
+            if candidate and os.path.exists(candidate):
+                schema = load_feature_schema(candidate)
+                break
+        feature_names = schema.to_list() if schema is not None else None
+        timings["features_load_s"] = time.perf_counter() - start
+
+        if validate:
+            start = time.perf_counter()
+            n_features = getattr(model, "n_features_in_", None) or len(feature_names or [])
+            probe = probe_rows(n_features, self.probe_path)
+            for _ in range(self.warmup_rounds):
+                validate_model(model, feature_names, probe)
+            timings["validate_s"] = time.perf_counter() - start
+        self.last_timings = timings
+        return ModelBundle(model, feature_names, version or artifact_stamp(artifact), artifact, schema=schema)
+
+    def activate(self, bundle):
+        # A single reference assignment: requests holding the old bundle keep using it
+        self.active = bundle
+
+    def reload(self, path=None, force=False):
+        """
+        Load, validate and swap in the current artifacts of `path` (default MODEL_PATH).
+
+        Args:
+            path (str, optional): Artifact or version directory to load instead
+            force (bool): Reload even if the version is unchanged
+
+        Returns:
+            dict: {"status": "reloaded" | "unchanged" | "busy" | "failed", ...}
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            return {"status": "busy"}
+        try:
+            artifact, version = resolve_artifact(path or self.path)
+            current = self.active
+            if not force and current is not None and current.path == artifact and current.version == version:
+                return {"status": "unchanged", "model_version": version}
+            try:
+                bundle = self.load(artifact, version)
+            except Exception as e:
+                self.failed_reloads += 1
+                self.last_error = f"{artifact}: {e}"
+                return {"status": "failed", "error": str(e), "model_path": artifact}
+            self.activate(bundle)
+            self.reloads += 1
+            self.last_error = None
+            return dict(bundle.info(), status="reloaded",
+                        previous_version=current.version if current is not None else None,
+                        timings={k: round(v, 4) for k, v in self.last_timings.items()})
+        finally:
+            self._reload_lock.release()
+
+    def start_watcher(self, interval_s):
+        """Poll MODEL_PATH every `interval_s` seconds and reload on change (once per process)."""
+        if interval_s <= 0 or (self._watcher is not None and self._watch_pid == os.getpid()):
+            return
+        self._watch_pid = os.getpid()
+
+        def watch():
+            while True:
+                time.sleep(interval_s)
+                try:
+                    self.reload()
+                except Exception as e:
+                    self.last_error = str(e)
+
+        self._watcher = threading.Thread(target=watch, name="model-watcher", daemon=True)
+        self._watcher.start()
+
+    def stats(self):
+        bundle = self.active
+        return dict(
+            bundle.info() if bundle is not None else {"model_version": None},
+            reloads=self.reloads,
+            failed_reloads=self.failed_reloads,
+            last_error=self.last_error,
+            watching=self._watcher is not None and self._watch_pid == os.getpid(),
+        )
@@ -0,0 +1,201 @@
+"""
+Incremental feature engine for live per-machine sensor streams.
+
+`engineer_features()` recomputes the rate of change and the 24-hour rolling temperature mean
+over a machine's whole history. `OnlineFeatureEngine` instead keeps a small state per machine
+(last vibration, a ring buffer of the last 24 temperatures and their running sum) and updates
+all six model features in O(1) per new reading, with the same values as `engineer_features()`
+on the same sequence.
+
+State lives in preallocated NumPy arrays indexed by a per-machine slot, so `update_batch()`
+applies a whole batch of readings with a handful of vectorized operations.
+"""
+
+import numpy as np
+
+# Output column order, matching model_features.json
+FEATURE_NAMES = [
+    "vibration",
+    "temperature",
+    "operating_hours",
+    "temp_vibration_interaction",
+    "vibration_rate_of_change",
+    "temp_rolling_avg",
+]
+
+
+class OnlineFeatureEngine:
+    """
+    Per-machine streaming feature state with O(1) updates.
+
+    Args:
+        window (int): Readings in the rolling temperature mean (24 hourly readings)
+        capacity (int): Machines to preallocate state for; grows automatically
+    """
+
+    # Per-machine arrays, one row per slot
+    STATE_ARRAYS = ("last_vibration", "temp_ring", "temp_sum", "count", "latest")
+
+    def __init__(self, window=24, capacity=1024):
+        self.window = window
+        self._index = {}
+        self.machine_ids = []
+        self._allocate(max(1, capacity))
+
+    def _allocate(self, capacity):
+        self.last_vibration = np.zeros(capacity)
+        self.temp_ring = np.zeros((capacity, self.window))
+        self.temp_sum = np.zeros(capacity)
+        self.count = np.zeros(capacity, dtype=np.int64)
+        # Latest feature row per machine, in FEATURE_NAMES order
+        self.latest = np.zeros((capacity, len(FEATURE_NAMES)))
+
+    def _grow(self, needed):
+        capacity = len(self.count)
+        while capacity < needed:
+            capacity *= 2
+        old = {name: getattr(self, name) for name in self.STATE_ARRAYS}
+        self._allocate(capacity)
+        for name, prev in old.items():
+            getattr(self, name)[:len(prev)] = prev
+
+    @property
+    def n_machines(self):
+        return len(self.machine_ids)
+
+    def resolve(self, machine_ids):
+        """
+        Map machine ids to state slots, adding slots for machines seen for the first time.
+
+        Args:
+            machine_ids (iterable): Machine ids (any hashable)
+
+        Returns:
+            numpy.ndarray: Slot index per id
+        """
+        if not hasattr(machine_ids, "__getitem__"):
+            machine_ids = list(machine_ids)
+        index = self._index
+        slots = np.fromiter((index.get(m, -1) for m in machine_ids), dtype=np.int64)
+        new = np.flatnonzero(slots < 0)
+        if new.size:
+            for i in new:
+                machine_id = machine_ids[i]
+                slot = index.get(machine_id)
+                if slot is None:
+                    slot = index[machine_id] = len(self.machine_ids)
+                    self.machine_ids.append(machine_id)
+                slots[i] = slot
+            if self.n_machines > len(self.count):
+                self._grow(self.n_machines)
+        return slots
+
+    def update(self, machine_id, vibration, temperature, operating_hours):
+        """
+        Apply one reading and return the machine's updated features.
+
+        Returns:
+            dict: Feature name to value
+        """
+        slot = self._index.get(machine_id)
+        if slot is None:
+            slot = self.resolve([machine_id])[0]
+        vibration, temperature = float(vibration), float(temperature)
+
+        n = self.count[slot]
+        pos = n % self.window
+        ring = self.temp_ring[slot]
+        if n >= self.window:
+            self.temp_sum[slot] -= ring[pos]
+        ring[pos] = temperature
+        self.temp_sum[slot] += temperature
+        if pos == self.window - 1:
+            # Re-sum once per window so rounding error cannot build up over long streams
+            self.temp_sum[slot] = ring.sum()
+
+        row = self.latest[slot]
+        row[0] = vibration
+        row[1] = temperature
+        row[2] = operating_hours
+        row[3] = temperature * vibration
+        row[4] = vibration - self.last_vibration[slot] if n else 0.0
+        row[5] = self.temp_sum[slot] / min(n + 1, self.window)
+        self.last_vibration[slot] = vibration
+        self.count[slot] = n + 1
+        return dict(zip(FEATURE_NAMES, row.tolist()))
+
+    def update_batch(self, machine_ids, vibration, temperature, operating_hours, slots=None):
+        """
+        Apply a batch of readings and return the features for every reading.
+
+        Readings for the same machine are applied in batch order. A batch with one reading per
+        machine is a single vectorized pass; repeated machines take one extra pass per repeat.
+
+        Args:
+            machine_ids (sequence): Machine id per reading (ignored when `slots` is given)
+            vibration, temperature, operating_hours (array-like): Reading values
+            slots (array-like, optional): Precomputed slots from resolve(), skipping id lookups
+
+        Returns:
+            numpy.ndarray: Feature matrix of shape (n_readings, 6) in FEATURE_NAMES order
+        """
+        slots = self.resolve(machine_ids) if slots is None else np.asarray(slots, dtype=np.int64)
+        vibration = np.asarray(vibration, dtype=np.float64)
+        temperature = np.asarray(temperature, dtype=np.float64)
+        operating_hours = np.asarray(operating_hours, dtype=np.float64)
+        out = np.empty((len(slots), len(FEATURE_NAMES)))
+        if len(slots) == 0:
+            return out
+
+        if np.bincount(slots).max() == 1:
+            self._apply(np.arange(len(slots)), slots, vibration, temperature, operating_hours, out)
+            return out
+
+        # Occurrence rank of each reading within its machine, keeping batch order
+        order = np.argsort(slots, kind="stable")
+        sorted_slots = slots[order]
+        starts = np.r_[True, sorted_slots[1:] != sorted_slots[:-1]]
+        group_start = np.maximum.accumulate(np.where(starts, np.arange(len(slots)), 0))
+        rank = np.empty(len(slots), dtype=np.int64)
+        rank[order] = np.arange(len(slots)) - group_start
+
+        for r in range(int(rank.max()) + 1):
+            idx = np.flatnonzero(rank == r)
+            self._apply(idx, slots[idx], vibration[idx], temperature[idx], operating_hours[idx], out)
+        return out
+
+    def _apply(self, idx, slots, vibration, temperature, operating_hours, out):
+        # Every slot appears at most once here, so fancy-indexed writes do not collide
+        n = self.count[slots]
+        pos = n % self.window
+        full = n >= self.window
+        self.temp_sum[slots] -= np.where(full, self.temp_ring[slots, pos], 0.0)
+        self.temp_ring[slots, pos] = temperature
+        self.temp_sum[slots] += temperature
+        wrapped = slots[pos == self.window - 1]
+        if wrapped.size:
+            self.temp_sum[wrapped] = self.temp_ring[wrapped].sum(axis=1)
+
+        rows = np.column_stack([
+            vibration,
+            temperature,
+            operating_hours,
+            temperature * vibration,
+            np.where(n > 0, vibration - self.last_vibration[slots], 0.0),
+            self.temp_sum[slots] / np.minimum(n + 1, self.window),
+        ])
+        self.latest[slots] = rows
+        out[idx] = rows
+        self.last_vibration[slots] = vibration
+        self.count[slots] = n + 1
+
+    def features(self, machine_id):
+        """Latest features of a machine as a dict, or None if it has no readings yet."""
+        slot = self._index.get(machine_id)
+        if slot is None or self.count[slot] == 0:
+            return None
+        return dict(zip(FEATURE_NAMES, self.latest[slot].tolist()))
+
+    def state_bytes(self):
+        """Bytes of per-machine array state currently allocated."""
+        return sum(getattr(self, name).nbytes for name in self.STATE_ARRAYS)
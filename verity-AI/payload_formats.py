@@ -0,0 +1,184 @@
+"""
+Binary request and response bodies for high-volume scoring on /predict.
+
+For large batches, parsing JSON lists into Python floats and serializing predictions back with
+`tolist()` costs more than the model itself. These formats carry the feature matrix as packed
+floats instead and are decoded into NumPy arrays without copying the body:
+
+    application/x-float32                 raw little-endian float32, row-major, n_features columns
+    application/x-float64                 raw little-endian float64, row-major, n_features columns
+    application/x-npy                     a `.npy` file (np.save) of shape (n_rows, n_features)
+    application/vnd.apache.arrow.stream   Arrow IPC stream, one float column per feature name
+                                          (requires pyarrow)
+
+The request format is picked by Content-Type; JSON stays the default. The response format
+follows the Accept header and defaults to the request's format. Binary responses hold the class
+probabilities, shape (n_rows, n_classes): raw floats (in the request dtype) with an `X-Shape`
+header, a `.npy` file, or an Arrow stream with one `probability_<class>` column per class.
+"""
+
+import io
+
+import numpy as np
+
+JSON = "application/json"
+FLOAT32 = "application/x-float32"
+FLOAT64 = "application/x-float64"
+NPY = "application/x-npy"
+ARROW = "application/vnd.apache.arrow.stream"
+
+RAW_DTYPES = {FLOAT32: np.dtype("<f4"), FLOAT64: np.dtype("<f8")}
+BINARY_TYPES = (FLOAT32, FLOAT64, NPY, ARROW)
+
+
+def request_format(mimetype):
+    """Binary format of a request body from its Content-Type, or None for JSON."""
+    return mimetype if mimetype in BINARY_TYPES else None
+
+
+def response_format(accept, request_fmt=None):
+    """
+    Response format from the Accept header.
+
+    Args:
+        accept (werkzeug.datastructures.MIMEAccept): Parsed Accept header
+        request_fmt (str, optional): Binary format of the request, preferred for */* or no Accept
+
+    Returns:
+        str or None: Binary response format, or None for JSON
+    """
+    preferred = request_fmt or JSON
+    candidates = [preferred] + [t for t in (JSON,) + BINARY_TYPES if t != preferred]
+    best = accept.best_match(candidates, default=preferred)
+    return best if best in BINARY_TYPES else None
+
+
+def _check_float(dtype):
+    if dtype.kind != "f":
+        raise ValueError(f"feature matrix must hold floats, got dtype {dtype}")
+
+
+def _as_matrix(arr, n_features):
+    if arr.ndim == 1 and arr.size == n_features:
+        arr = arr.reshape(1, -1)
+    if arr.ndim != 2 or arr.shape[1] != n_features:
+        raise ValueError(f"feature matrix must have shape (n_rows, {n_features}), got {arr.shape}")
+    return arr
+
+
+def decode_matrix(body, fmt, n_features, feature_names=None):
+    """
+    Decode a binary request body into a feature matrix in model column order.
+
+    Raw and `.npy` bodies become read-only views of the request bytes; Arrow columns are
+    zero-copy views stacked into one matrix.
+
+    Args:
+        body (bytes): Request body
+        fmt (str): One of BINARY_TYPES
+        n_features (int): Number of model features
+        feature_names (list, optional): Model feature order, used to pick Arrow columns by name
+
+    Returns:
+        numpy.ndarray: Array of shape (n_rows, n_features), at least one row, all values finite
+
+    Raises:
+        ValueError: Malformed body, wrong shape, no rows or a NaN/infinite value
+        ImportError: Arrow body without pyarrow installed
+    """
+    if not body:
+        raise ValueError("request body is empty")
+    arr = _decode(body, fmt, n_features, feature_names)
+    if arr.shape[0] == 0:
+        raise ValueError("request body holds no feature rows")
+    finite = np.isfinite(arr).all(axis=1)
+    if not finite.all():
+        raise ValueError(f"feature values must be finite; NaN or infinity in rows {np.flatnonzero(~finite)[:10].tolist()}")
+    return arr
+
+
+def _decode(body, fmt, n_features, feature_names):
+    if fmt in RAW_DTYPES:
+        dtype = RAW_DTYPES[fmt]
+        if len(body) % (dtype.itemsize * n_features):
+            raise ValueError(f"body length {len(body)} is not a whole number of rows of "
+                             f"{n_features} {dtype.name} values")
+        return np.frombuffer(body, dtype=dtype).reshape(-1, n_features)
+
+    if fmt == NPY:
+        stream = io.BytesIO(body)
+        version = np.lib.format.read_magic(stream)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(stream)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(stream)
+        _check_float(dtype)
+        count = int(np.prod(shape))
+        if len(body) - stream.tell() < count * dtype.itemsize:
+            raise ValueError("truncated .npy body")
+        arr = np.frombuffer(body, dtype=dtype, count=count, offset=stream.tell())
+        return _as_matrix(arr.reshape(shape, order="F" if fortran_order else "C"), n_features)
+
+    if fmt == ARROW:
+        try:
+            import pyarrow as pa
+        except ImportError as e:
+            raise ImportError("Arrow IPC payloads require pyarrow") from e
+        try:
+            table = pa.ipc.open_stream(pa.py_buffer(body)).read_all()
+        except pa.ArrowInvalid as e:
+            raise ValueError(f"invalid Arrow IPC stream: {e}") from e
+        names = list(feature_names) if feature_names is not None else table.column_names
+        missing = [n for n in names if n not in table.column_names]
+        if missing:
+            raise ValueError(f"Arrow stream is missing feature columns: {missing}")
+        columns = []
+        for name in names:
+            column = table.column(name)
+            if column.null_count:
+                raise ValueError(f"Arrow column {name} has nulls")
+            values = column.combine_chunks().to_numpy(zero_copy_only=False)
+            _check_float(values.dtype)
+            columns.append(values)
+        if not columns:
+            return np.empty((0, n_features))
+        return _as_matrix(np.column_stack(columns), n_features)
+
+    raise ValueError(f"unsupported binary format {fmt}")
+
+
+def encode_matrix(matrix, fmt, column_names=None, dtype=None):
+    """
+    Encode a result matrix (e.g. class probabilities) as a binary response body.
+
+    Args:
+        matrix (numpy.ndarray): 2-D result array
+        fmt (str): One of BINARY_TYPES
+        column_names (list, optional): Arrow column names (default col_0, col_1, ...)
+        dtype (numpy.dtype, optional): Float dtype for `.npy` and Arrow bodies (default float64)
+
+    Returns:
+        tuple: (body bytes, headers dict)
+    """
+    matrix = np.asarray(matrix)
+    headers = {"Content-Type": fmt, "X-Shape": ",".join(str(d) for d in matrix.shape)}
+    if fmt in RAW_DTYPES:
+        return np.ascontiguousarray(matrix, dtype=RAW_DTYPES[fmt]).tobytes(), headers
+
+    matrix = np.ascontiguousarray(matrix, dtype=dtype or np.float64)
+    if fmt == NPY:
+        stream = io.BytesIO()
+        np.save(stream, matrix, allow_pickle=False)
+        return stream.getvalue(), headers
+
+    if fmt == ARROW:
+        import pyarrow as pa
+
+        names = list(column_names) if column_names is not None else [f"col_{j}" for j in range(matrix.shape[1])]
+        batch = pa.RecordBatch.from_arrays([pa.array(matrix[:, j]) for j in range(matrix.shape[1])], names=names)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, batch.schema) as writer:
+            writer.write_batch(batch)
+        return sink.getvalue().to_pybytes(), headers
+
+    raise ValueError(f"unsupported binary format {fmt}")
@@ -0,0 +1,128 @@
+"""
+Exact-match cache of model probabilities for repeated feature vectors.
+
+Gateways re-poll idle machines whose readings have not changed, so `/predict` and
+`/predict/batch` see byte-identical feature rows again and again. The cache key is the model
+version plus the row as ordered float64 bytes. A float32 body widens to float64 unchanged, so it
+shares entries with JSON and float64 bodies only where its values are exactly representable in
+float32; a reading such as 75.2 gets one entry as JSON/float64 and another as float32. Keys are
+not rounded to float32 because that would let rows that differ in float64 share a score. Only the
+rows that miss are sent to the model, in one call. Entries live in an in-process LRU; all of them are dropped as soon as a
+request for a different model version arrives, so a hot reload never serves stale scores.
+
+Each entry is the key bytes plus the probability row as bytes, about 250 bytes with the
+dictionary overhead, so the default limit bounds the cache to roughly 16 MiB per worker.
+
+Configuration (environment variables):
+    PREDICTION_CACHE_MAX_ENTRIES  Max rows cached per worker (default 65536, 0 disables the cache)
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+class PredictionCache:
+    """
+    In-process LRU of probability rows keyed on (model version, float64 feature bytes).
+
+    Args:
+        max_entries (int): Maximum number of cached rows
+    """
+
+    def __init__(self, max_entries=65536):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def row_keys(version, X):
+        """Cache keys of the rows of a 2-D feature matrix."""
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        raw = X.tobytes()
+        step = X.shape[1] * X.itemsize
+        prefix = f"{version}|".encode()
+        return [prefix + raw[i:i + step] for i in range(0, len(raw), step)]
+
+    def predict_proba(self, version, X, predict_fn):
+        """
+        Probabilities for every row of X, calling `predict_fn` only on the rows not cached.
+
+        Args:
+            version (str): Version of the model behind predict_fn
+            X (numpy.ndarray): Feature matrix of shape (n_rows, n_features)
+            predict_fn (callable): The model's predict_proba
+
+        Returns:
+            numpy.ndarray: Probabilities of shape (n_rows, n_classes), float64
+        """
+        keys = self.row_keys(version, X)
+        cached = []
+        miss_rows = []
+        with self._lock:
+            if version != self._version:
+                if self._entries:
+                    self.invalidations += 1
+                self._entries.clear()
+                self._version = version
+            for i, key in enumerate(keys):
+                value = self._entries.get(key)
+                if value is None:
+                    miss_rows.append(i)
+                else:
+                    self._entries.move_to_end(key)
+                    cached.append((i, value))
+            self.hits += len(cached)
+            self.misses += len(miss_rows)
+
+        if not cached:
+            probabilities = np.asarray(predict_fn(X), dtype=np.float64)
+        else:
+            n_classes = len(cached[0][1]) // 8
+            probabilities = np.empty((len(keys), n_classes), dtype=np.float64)
+            probabilities[[i for i, _ in cached]] = np.frombuffer(
+                b"".join(value for _, value in cached), dtype=np.float64
+            ).reshape(-1, n_classes)
+            if miss_rows:
+                probabilities[miss_rows] = np.asarray(predict_fn(X[miss_rows]), dtype=np.float64)
+
+        if miss_rows:
+            with self._lock:
+                if version == self._version:
+                    for i in miss_rows:
+                        self._entries[keys[i]] = probabilities[i].tobytes()
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+                        self.evictions += 1
+        return probabilities
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "model_version": self._version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+def prediction_cache_from_env():
+    """Build the PredictionCache described by PREDICTION_CACHE_MAX_ENTRIES, or None when disabled."""
+    max_entries = int(os.getenv("PREDICTION_CACHE_MAX_ENTRIES", "65536"))
+    return PredictionCache(max_entries=max_entries) if max_entries > 0 else None
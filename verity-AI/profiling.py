@@ -0,0 +1,234 @@
+"""
+On-demand sampling profiler for live requests.
+
+When a request is selected for profiling (one in `PROFILE_SAMPLE_EVERY` requests, or a request
+carrying `X-Profile: 1` when `PROFILE_HEADER_ENABLED=true`, plus the admin token in
+`X-Admin-Token` when `ADMIN_TOKEN` is set), its thread is registered with a
+background sampler. Every `PROFILE_INTERVAL_MS` the sampler reads the current stack of each
+registered thread from `sys._current_frames()` and counts it under the request's endpoint as a
+collapsed stack (`outer;...;inner`, one line per distinct stack). The profiled code is never
+instrumented or traced, so a profiled request pays only for the sampler thread taking the GIL
+for a few microseconds per sample; the sampler sleeps while no profiled request is running.
+With both triggers off, the per-request cost is one attribute check.
+
+Async routes (asgi.py) run on the event-loop thread, so their samples are that thread's stacks
+while the profiled request is in flight: they include other coroutines the loop runs meanwhile,
+and several profiled requests may be active on the thread at once.
+
+Samples are aggregated per endpoint and exported as:
+- collapsed stacks, the input format of flamegraph.pl, speedscope and inferno
+- a text report of the functions with the most inclusive and self samples
+
+Exports go through the admin endpoints in app.py, or to `PROFILE_DIR` on demand and at exit.
+
+Configuration (environment variables):
+    PROFILE_SAMPLE_EVERY    Profile one in N requests (default 0: off)
+    PROFILE_HEADER_ENABLED  "true" profiles requests sent with `X-Profile: 1` (default "false")
+    PROFILE_INTERVAL_MS     Milliseconds between stack samples (default 5)
+    PROFILE_DIR             Directory for dumped profiles (default: admin endpoints only)
+"""
+
+import itertools
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+PROFILE_HEADER = "X-Profile"
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of the threads serving profiled requests, aggregated per endpoint.
+
+    Args:
+        sample_every (int): Profile one in N requests (0: only header-triggered requests)
+        header_enabled (bool): Profile requests sent with `X-Profile: 1`
+        interval_s (float): Seconds between samples
+        max_depth (int): Innermost frames kept per stack
+        token (str, optional): Value header-triggered requests must send in `X-Admin-Token`
+    """
+
+    def __init__(self, sample_every=0, header_enabled=False, interval_s=0.005, max_depth=64, token=None):
+        self.sample_every = sample_every
+        self.header_enabled = header_enabled
+        self.token = token
+        self.interval_s = interval_s
+        self.max_depth = max_depth
+        self._counter = itertools.count(1)
+        self._keys = itertools.count()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._active = {}
+        self._thread_pid = None
+        self._labels = {}
+        self.stacks = defaultdict(Counter)
+        self.requests = Counter()
+        self.profiled_seconds = Counter()
+
+    @property
+    def enabled(self):
+        return bool(self.sample_every) or self.header_enabled
+
+    def should_profile(self, headers):
+        """True if this request is one of the sampled ones or asked for profiling by header."""
+        if self.header_enabled and headers.get(PROFILE_HEADER) == "1":
+            if self.token is None or headers.get("X-Admin-Token") == self.token:
+                return True
+        return bool(self.sample_every) and next(self._counter) % self.sample_every == 0
+
+    def begin(self, endpoint):
+        """Start sampling the calling thread under `endpoint`; returns a token for end()."""
+        self._ensure_sampler()
+        token = (next(self._keys), endpoint, time.perf_counter())
+        with self._lock:
+            self._active[token[0]] = (threading.get_ident(), endpoint)
+            self.requests[endpoint] += 1
+            self._wake.set()
+        return token
+
+    def end(self, token):
+        key, endpoint, start = token
+        with self._lock:
+            self._active.pop(key, None)
+            self.profiled_seconds[endpoint] += time.perf_counter() - start
+
+    def _ensure_sampler(self):
+        # The sampler is started lazily in each process: threads do not survive a gunicorn fork
+        if self._thread_pid != os.getpid():
+            with self._lock:
+                if self._thread_pid != os.getpid():
+                    threading.Thread(target=self._run, name="request-profiler", daemon=True).start()
+                    self._thread_pid = os.getpid()
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            time.sleep(self.interval_s)
+            frames = sys._current_frames()
+            with self._lock:
+                # One sample per thread and endpoint, however many profiled requests share them
+                for thread_id, endpoint in set(self._active.values()):
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        self.stacks[endpoint][self._collapse(frame)] += 1
+                if not self._active:
+                    self._wake.clear()
+            del frames
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            label = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            self._labels[code] = label
+        return label
+
+    def _collapse(self, frame):
+        labels = []
+        while frame is not None and len(labels) < self.max_depth:
+            labels.append(self._label(frame.f_code))
+            frame = frame.f_back
+        return ";".join(reversed(labels))
+
+    def reset(self):
+        with self._lock:
+            self.stacks.clear()
+            self.requests.clear()
+            self.profiled_seconds.clear()
+
+    def _snapshot(self, endpoint=None):
+        with self._lock:
+            return {e: Counter(c) for e, c in self.stacks.items() if endpoint is None or e == endpoint}
+
+    def collapsed(self, endpoint=None):
+        """
+        Samples in collapsed-stack format, one `stack count` line per distinct stack.
+
+        Stacks are prefixed with their endpoint, so one flame graph can hold every endpoint.
+
+        Args:
+            endpoint (str, optional): Only this endpoint's samples
+
+        Returns:
+            str: Input for flamegraph.pl, speedscope or inferno
+        """
+        lines = []
+        for name, stacks in sorted(self._snapshot(endpoint).items()):
+            for stack, count in stacks.most_common():
+                lines.append(f"{name};{stack} {count}")
+        return "\n".join(lines) + ("\n" if lines else "")
+
+    def report(self, endpoint=None, top=25):
+        """
+        Text report per endpoint: the functions with the most inclusive and self samples.
+
+        Args:
+            endpoint (str, optional): Only this endpoint's samples
+            top (int): Functions listed per endpoint
+
+        Returns:
+            str: Human-readable report
+        """
+        out = []
+        for name, stacks in sorted(self._snapshot(endpoint).items()):
+            total = sum(stacks.values())
+            inclusive, self_samples = Counter(), Counter()
+            for stack, count in stacks.items():
+                frames = stack.split(";")
+                self_samples[frames[-1]] += count
+                for label in set(frames):
+                    inclusive[label] += count
+            with self._lock:
+                requests, seconds = self.requests[name], self.profiled_seconds[name]
+            out.append(f"{name}: {requests} profiled requests, {seconds * 1000:.1f} ms, {total} samples")
+            out.append(f"{'incl %':>8}{'self %':>8}  function")
+            for label, count in inclusive.most_common(top):
+                out.append(f"{100 * count / total:>8.1f}{100 * self_samples[label] / total:>8.1f}  {label}")
+            out.append("")
+        return "\n".join(out) if out else "No samples collected.\n"
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "sample_every": self.sample_every,
+                "header_enabled": self.header_enabled,
+                "interval_ms": self.interval_s * 1000,
+                "endpoints": {
+                    e: {"requests": self.requests[e], "profiled_ms": round(self.profiled_seconds[e] * 1000, 1),
+                        "samples": sum(self.stacks[e].values())}
+                    for e in self.requests
+                },
+            }
+
+    def dump(self, out_dir):
+        """
+        Write every endpoint's collapsed stacks and text report to `out_dir`.
+
+        Files are named `<endpoint>.<pid>.folded` / `.txt` so workers sharing a directory do not
+        overwrite each other.
+
+        Returns:
+            list: Paths written
+        """
+        os.makedirs(out_dir, exist_ok=True)
+        paths = []
+        for name in list(self._snapshot()):
+            base = os.path.join(out_dir, f"{re.sub(r'[^A-Za-z0-9]+', '_', name).strip('_') or 'root'}.{os.getpid()}")
+            for suffix, text in ((".folded", self.collapsed(name)), (".txt", self.report(name))):
+                with open(base + suffix, "w") as fh:
+                    fh.write(text)
+                paths.append(base + suffix)
+        return paths
+
+
+def profiler_from_env():
+    """Build the SamplingProfiler described by the PROFILE_* environment variables."""
+    return SamplingProfiler(
+        sample_every=int(os.getenv("PROFILE_SAMPLE_EVERY", "0")),
+        header_enabled=os.getenv("PROFILE_HEADER_ENABLED", "false").lower() in ("1", "true"),
+        interval_s=float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000.0,
+        token=os.getenv("ADMIN_TOKEN"),
+    )
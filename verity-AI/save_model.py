@@ -1,5 +1,8 @@
 """Train a simple RandomForest on the engineered synthetic data and save it as model.joblib
 
+The same forest is also exported as packed NumPy node tables in `model_packed/` for the
+array-based inference engine in `forest_engine.py`.
+
 This script re-uses existing feature engineering code in `engineer_feature.py` which itself
 generates synthetic data via `generate_data.py`.
 """
@@ -13,6 +16,8 @@ from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, classification_report
 
 import engineer_feature as ef
+import forest_engine
+from feature_schema import FeatureSchema, load_feature_schema
 
 
 def load_or_create_features():
@@ -22,33 +27,19 @@ def load_or_create_features():
     Returns:
         list: List of feature names in the correct order
     """
-    features_path = os.path.join(os.path.dirname(__file__), "model_features.json")
-    
-    # Default features (same as used throughout the codebase)
-    default_features = [
-        "vibration",
-        "temperature",
-        "operating_hours",
-        "temp_vibration_interaction",
-        "vibration_rate_of_change",
-        "temp_rolling_avg",
-    ]
-    
-    try:
-        if os.path.exists(features_path):
-            with open(features_path, "r") as fh:
-                features = json.load(fh)
-            print(f"Loaded features from {features_path}")
-            return features
-        else:
-            print(f"model_features.json not found, using default feature list")
-            return default_features
-    except Exception as e:
-        print(f"Error loading features from JSON: {e}, using default feature list")
-        return default_features
-
-
-def main():
+    return load_feature_schema(os.path.join(os.path.dirname(__file__), "model_features.json")).to_list()
+
+
+def main(output_dir=None):
+    """
+    Train the model and write `model.joblib` and `model_features.json`.
+
+    Args:
+        output_dir (str, optional): Directory for the artifacts. Defaults to this script's directory.
+    """
+    if output_dir is None:
+        output_dir = os.path.dirname(__file__)
+
     # Features expected by other code in the repo
     features = load_or_create_features()
     target = "failure_imminent"
@@ -75,14 +66,42 @@ def main():
     print(f"Accuracy: {accuracy_score(y_test, y_pred):.3f}")
     print(classification_report(y_test, y_pred))
 
-    out_path = os.path.join(os.path.dirname(__file__), "model.joblib")
-    joblib.dump(clf, out_path)
+    save_artifacts(clf, features, output_dir)
+
+
+def save_artifacts(clf, features, output_dir, compact=False):
+    """
+    Write `model.joblib`, `model_features.json` and the packed `model_packed/` directory.
+
+    Dtypes and bounds declared for these features in an existing `model_features.json` (the
+    one in `output_dir`, else the one next to this script) are kept.
+
+    Args:
+        clf: Fitted RandomForestClassifier
+        features (list or FeatureSchema): Feature names in model order
+        output_dir (str): Directory for the artifacts
+        compact (bool): Store the packed tables with narrow dtypes (forest_engine.compact_forest)
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    out_path = os.path.join(output_dir, "model.joblib")
+    # Write next to the target and rename, so a watching server never loads a partial file
+    joblib.dump(clf, out_path + ".tmp")
+    os.replace(out_path + ".tmp", out_path)
     print(f"Saved model to: {out_path}")
     # Save feature names alongside the model so inference code can preserve ordering
-    features_path = os.path.join(os.path.dirname(__file__), "model_features.json")
-    with open(features_path, "w") as fh:
-        json.dump(features, fh)
+    features_path = os.path.join(output_dir, "model_features.json")
+    if not isinstance(features, FeatureSchema):
+        declared = features_path if os.path.exists(features_path) else None
+        features = load_feature_schema(declared).with_names(list(features))
+    with open(features_path + ".tmp", "w") as fh:
+        json.dump(features.to_spec(), fh)
+    os.replace(features_path + ".tmp", features_path)
     print(f"Saved feature names to: {features_path}")
+    # Export the packed node tables used by the array-based inference engine
+    packed_path = os.path.join(output_dir, "model_packed")
+    packed = forest_engine.export_forest(clf)
+    forest_engine.save_packed_forest(forest_engine.compact_forest(packed) if compact else packed, packed_path)
+    print(f"Saved packed model to: {packed_path}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Tests for latency-budgeted advice with the rule-based fallback.
+
+Uses stand-in backends (no LLM calls) to check the budget, late caching, the circuit breaker
+and the async path.
+
+Run with pytest or directly:
+    python verity-AI/test_advice_backends.py
+"""
+
+import asyncio
+import threading
+import time
+
+import advice_backends as ab
+from advice_cache import AdviceCache
+
+FEATURES = {"vibration": 55.0, "temperature": 71.0}
+
+
+class SlowBackend:
+    name = "llm"
+    cacheable = True
+
+    def __init__(self, delay_s=0.0, fail=False):
+        self.delay_s = delay_s
+        self.fail = fail
+        self.calls = 0
+
+    def advise(self, machine_id, failure_probability, features):
+        self.calls += 1
+        time.sleep(self.delay_s)
+        if self.fail:
+            raise RuntimeError("llm down")
+        return f"Machine {machine_id}: llm advice"
+
+    async def advise_async(self, machine_id, failure_probability, features):
+        self.calls += 1
+        await asyncio.sleep(self.delay_s)
+        if self.fail:
+            raise RuntimeError("llm down")
+        return f"Machine {machine_id}: llm advice"
+
+
+def with_cache(monkeypatch_cache):
+    ab.llm_assistant.get_advice_cache = lambda: monkeypatch_cache
+
+
+def test_budget_falls_back_and_caches_late_answer():
+    """A slow LLM answer is replaced by rule-based advice, then served from the cache."""
+    cache = AdviceCache(ttl_s=60)
+    original = ab.llm_assistant.get_advice_cache
+    with_cache(cache)
+    try:
+        router = ab.AdviceRouter(SlowBackend(delay_s=0.3), ab.RuleBasedBackend(), budget_s=0.05)
+        start = time.perf_counter()
+        advice, source, reason = router.advise("M1", 85.0, FEATURES)
+        assert time.perf_counter() - start < 0.25
+        assert (source, reason) == ("rule_based", "budget_exceeded")
+        assert advice.startswith("Machine M1:") and "Immediate maintenance" in advice
+
+        time.sleep(0.4)
+        advice, source, reason = router.advise("M2", 85.0, FEATURES)
+        assert (advice, source, reason) == ("Machine M2: llm advice", "cache", None)
+        assert router.stats()["late_cached"] == 1
+    finally:
+        ab.llm_assistant.get_advice_cache = original
+
+
+def test_breaker_opens_after_repeated_failures():
+    """Consecutive failures open the breaker; then the LLM is not called until the reset timeout."""
+    original = ab.llm_assistant.get_advice_cache
+    with_cache(None)
+    try:
+        now = [0.0]
+        breaker = ab.CircuitBreaker(failure_threshold=3, reset_timeout_s=10, clock=lambda: now[0])
+        backend = SlowBackend(fail=True)
+        router = ab.AdviceRouter(backend, ab.RuleBasedBackend(), budget_s=1.0, breaker=breaker)
+        reasons = [router.advise("M1", 10.0, FEATURES)[2] for _ in range(5)]
+        assert reasons == ["error"] * 3 + ["circuit_open"] * 2
+        assert backend.calls == 3 and breaker.state == "open"
+
+        now[0] = 11.0
+        backend.fail = False
+        assert router.advise("M1", 10.0, FEATURES)[1] == "llm"
+        assert breaker.state == "closed"
+    finally:
+        ab.llm_assistant.get_advice_cache = original
+
+
+def test_budget_misses_cancel_queued_calls_and_open_breaker():
+    """Calls still queued behind busy threads are dropped; repeated misses open the breaker."""
+    original = ab.llm_assistant.get_advice_cache
+    with_cache(None)
+    try:
+        breaker = ab.CircuitBreaker(failure_threshold=2, reset_timeout_s=60)
+        backend = SlowBackend(delay_s=0.3)
+        router = ab.AdviceRouter(backend, ab.RuleBasedBackend(), budget_s=0.05, breaker=breaker, max_workers=1)
+        reasons = [router.advise("M1", 85.0, FEATURES)[2] for _ in range(3)]
+        assert reasons == ["budget_exceeded"] * 2 + ["circuit_open"]
+        assert breaker.state == "open"
+
+        # The second call waited behind the first in the single thread and was cancelled
+        time.sleep(0.4)
+        assert backend.calls == 1 and router._pool()._work_queue.qsize() == 0
+        # The late success of the first call does not close the breaker
+        assert breaker.state == "open"
+
+        _, _, reason = asyncio.run(router.advise_async("M1", 85.0, FEATURES))
+        assert reason == "circuit_open"
+    finally:
+        ab.llm_assistant.get_advice_cache = original
+
+
+def test_call_finishing_at_the_budget_is_counted_once():
+    """A call that completes between the timeout and the budget bookkeeping is a success only."""
+    original = ab.llm_assistant.get_advice_cache
+    with_cache(None)
+    try:
+        release = threading.Event()
+
+        class GatedBackend(SlowBackend):
+            def advise(self, machine_id, failure_probability, features):
+                release.wait(5)
+                return super().advise(machine_id, failure_probability, features)
+
+        breaker = ab.CircuitBreaker(failure_threshold=1, reset_timeout_s=60)
+        router = ab.AdviceRouter(GatedBackend(), ab.RuleBasedBackend(), budget_s=0.05, breaker=breaker)
+        budget_missed = router._budget_missed
+
+        def late_budget_missed(state):
+            # Let the call and its done callback finish before the miss is recorded
+            release.set()
+            deadline = time.monotonic() + 5
+            while not state["finished"] and time.monotonic() < deadline:
+                time.sleep(0.005)
+            return budget_missed(state)
+
+        router._budget_missed = late_budget_missed
+        advice, source, reason = router.advise("M1", 85.0, FEATURES)
+        assert (advice, source, reason) == ("Machine M1: llm advice", "llm", None)
+        assert breaker.stats()["consecutive_failures"] == 0 and breaker.state == "closed"
+    finally:
+        ab.llm_assistant.get_advice_cache = original
+
+
+def test_async_budget_and_no_fallback():
+    """The async path honours the budget; without a fallback the error message is returned."""
+    original = ab.llm_assistant.get_advice_cache
+    with_cache(None)
+    try:
+        router = ab.AdviceRouter(SlowBackend(delay_s=0.5), ab.RuleBasedBackend(), budget_s=0.05)
+        _, source, reason = asyncio.run(router.advise_async("M1", 50.0, FEATURES))
+        assert (source, reason) == ("rule_based", "budget_exceeded")
+
+        router = ab.AdviceRouter(SlowBackend(fail=True), None, budget_s=1.0)
+        advice, source, reason = asyncio.run(router.advise_async("M1", 50.0, FEATURES))
+        assert source == "error" and reason == "error" and "llm down" in advice
+    finally:
+        ab.llm_assistant.get_advice_cache = original
+
+
+def main():
+    """Run all tests."""
+    tests = [test_budget_falls_back_and_caches_late_answer, test_breaker_opens_after_repeated_failures,
+             test_budget_misses_cancel_queued_calls_and_open_breaker, test_call_finishing_at_the_budget_is_counted_once,
+             test_async_budget_and_no_fallback]
+    for test in tests:
+        test()
+        print(f"{test.__name__}: ✓")
+
+
+if __name__ == "__main__":
+    main()
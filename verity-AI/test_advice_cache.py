@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Tests for the LLM advice cache.
+
+Checks key quantization, machine id rewriting, the in-memory limits, the shared SQLite store
+(pruning, errors treated as misses) and the coroutine entry points.
+
+Run with pytest or directly:
+    python verity-AI/test_advice_cache.py
+"""
+
+import asyncio
+import os
+import sqlite3
+import tempfile
+import time
+
+from advice_cache import AdviceCache, SqliteAdviceStore, for_machine, make_key
+
+FEATURES = {"vibration": 25.5, "temperature": 75.2, "operating_hours": 1200}
+
+
+def test_keys_bucket_and_quantize():
+    """Nearby readings in the same risk bucket share a key; another bucket does not."""
+    key = make_key(42.0, FEATURES)
+    assert key == make_key(48.9, dict(FEATURES, vibration=25.9, operating_hours=1210))
+    assert key != make_key(52.0, FEATURES)
+    assert key != make_key(42.0, dict(FEATURES, vibration=40.0))
+
+
+def test_machine_ids_are_rewritten_whole():
+    """Only references to the cached machine change, not ids that merely start with it."""
+    advice = "Machine M1 needs bearings. Compare with Machine M10 and Machine M1-B."
+    assert for_machine(advice, "M1", "M7") == "Machine M7 needs bearings. Compare with Machine M10 and Machine M1-B."
+    assert for_machine(advice, "M1", "M1") is advice
+    assert for_machine("Machine 3.5 ok", "3.5", r"\1") == r"Machine \1 ok"
+
+    cache = AdviceCache()
+    cache.put("k", "M1", advice)
+    assert cache.get("k", "M2").startswith("Machine M2 needs") and "Machine M10" in cache.get("k", "M2")
+
+
+def test_memory_limits_and_ttl():
+    """Entries beyond the entry and byte limits are evicted oldest first; expired ones miss."""
+    cache = AdviceCache(max_entries=2, max_bytes=25)
+    cache.put("a", "M1", "x" * 10)
+    cache.put("b", "M1", "y" * 10)
+    cache.get("a", "M1")
+    cache.put("c", "M1", "z" * 10)
+    assert cache.get("b", "M1") is None and cache.get("a", "M1") and cache.get("c", "M1")
+    cache.put("d", "M1", "w" * 20)
+    assert cache.stats()["bytes"] <= 25 and cache.stats()["evictions"] >= 2
+
+    cache = AdviceCache(ttl_s=0.01)
+    cache.put("a", "M1", "advice")
+    time.sleep(0.02)
+    assert cache.get("a", "M1") is None and cache.stats()["expirations"] == 1
+
+
+def test_sqlite_store_is_shared_and_pruned():
+    """A second cache on the same file gets disk hits; the file keeps the most recent entries."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "advice.sqlite")
+        writer = AdviceCache(store=SqliteAdviceStore(path, max_entries=3))
+        for i in range(5):
+            writer.put(f"k{i}", "M1", f"Machine M1: advice {i}")
+        reader = AdviceCache(store=SqliteAdviceStore(path))
+        assert reader.get("k4", "M2") == "Machine M2: advice 4"
+        assert reader.get("k0", "M2") is None
+        assert reader.stats()["disk_hits"] == 1 and reader.stats()["misses"] == 1
+
+        with sqlite3.connect(path) as conn:
+            assert conn.execute("SELECT COUNT(*) FROM advice").fetchone()[0] == 3
+            plan = conn.execute("EXPLAIN QUERY PLAN SELECT key FROM advice ORDER BY accessed DESC").fetchall()
+            assert any("advice_accessed" in row[-1] for row in plan)
+
+
+def test_sqlite_errors_are_misses():
+    """An unreadable store file makes lookups miss and writes stay in memory, without raising."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "advice.sqlite")
+        with open(path, "wb") as fh:
+            fh.write(b"not a database" * 100)
+        cache = AdviceCache(store=SqliteAdviceStore(path))
+        assert cache.get("k", "M1") is None
+        cache.put("k", "M1", "Machine M1: advice")
+        assert cache.get("k", "M1") == "Machine M1: advice"
+        stats = cache.stats()
+        assert stats["disk_errors"] == 2 and stats["misses"] == 1 and stats["hits"] == 1
+
+
+def test_async_entry_points():
+    """get_async and put_async see the same entries as the blocking calls."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "advice.sqlite")
+        cache = AdviceCache(store=SqliteAdviceStore(path))
+
+        async def roundtrip():
+            await cache.put_async("k", "M1", "Machine M1: advice")
+            return await cache.get_async("k", "M2"), await cache.get_async("missing", "M1")
+
+        assert asyncio.run(roundtrip()) == ("Machine M2: advice", None)
+        other = AdviceCache(store=SqliteAdviceStore(path))
+        assert asyncio.run(other.get_async("k", "M3")) == "Machine M3: advice"
+
+
+def main():
+    """Run all tests."""
+    tests = [
+        test_keys_bucket_and_quantize,
+        test_machine_ids_are_rewritten_whole,
+        test_memory_limits_and_ttl,
+        test_sqlite_store_is_shared_and_pruned,
+        test_sqlite_errors_are_misses,
+        test_async_entry_points,
+    ]
+    for test in tests:
+        test()
+        print(f"{test.__name__}: ✓")
+
+
+if __name__ == "__main__":
+    main()
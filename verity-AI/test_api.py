@@ -5,15 +5,23 @@ Test script for the enhanced Verity AI API with machine ID support.
 This script demonstrates how to:
 1. Call the /health endpoint
 2. Call the /predict endpoint  
-3. Call the new /maintenance-advice endpoint with machine ID
+3. Call the /predict/batch endpoint with many rows
+4. Call the new /maintenance-advice endpoint with machine ID
+5. Hot-reload the model with /admin/reload
 """
 
 import requests
 import json
+import os
+import struct
 
 # Configuration
 BASE_URL = "http://localhost:6000"  # Adjust port as needed
 
+# These checks need a running server and report failures by returning False, so pytest does not
+# collect them; test_app.py covers the endpoints in-process with asserts.
+__test__ = False
+
 def test_health():
     """Test the health endpoint."""
     print("Testing /health endpoint...")
@@ -77,6 +85,126 @@ def test_predict_list():
         print(f"Error: {e}")
         return False
 
+def test_predict_batch():
+    """Test the batch prediction endpoint with row and column formats."""
+    print("\nTesting /predict/batch endpoint...")
+
+    row = {
+        "vibration": 25.5,
+        "temperature": 75.2,
+        "operating_hours": 1200,
+        "temp_vibration_interaction": 1900.6,
+        "vibration_rate_of_change": 2.1,
+        "temp_rolling_avg": 74.8
+    }
+    payloads = [
+        # List of dicts with machine ids inline
+        {"rows": [dict(row, machine_id="M001"), dict(row, machine_id="M002", vibration=45.5)]},
+        # List of ordered lists
+        {"rows": [list(row.values()), list(row.values())], "machine_ids": ["M001", "M002"]},
+        # Column-oriented arrays
+        {"columns": {k: [v, v] for k, v in row.items()}, "machine_ids": ["M001", "M002"]},
+    ]
+
+    try:
+        ok = True
+        for payload in payloads:
+            response = requests.post(
+                f"{BASE_URL}/predict/batch",
+                json=payload,
+                headers={"Content-Type": "application/json"}
+            )
+            print(f"Status: {response.status_code}")
+            print(f"Response: {response.json()}")
+            ok = ok and response.status_code == 200 and response.json().get("count") == 2
+        return ok
+    except Exception as e:
+        print(f"Error: {e}")
+        return False
+
+def test_ingest():
+    """Test raw-reading ingestion and scoring by machine_id from the feature store."""
+    print("\nTesting /ingest endpoint...")
+
+    readings = [
+        {
+            "machine_id": machine_id,
+            "timestamp": f"2025-01-01T{hour:02d}:00:00",
+            "vibration": 25.0 + hour * 0.5,
+            "temperature": 75.0,
+            "operating_hours": 1200 + hour
+        }
+        for hour in range(24) for machine_id in ("M101", "M102")
+    ]
+
+    try:
+        response = requests.post(f"{BASE_URL}/ingest", json={"readings": readings})
+        print(f"Status: {response.status_code}")
+        print(f"Response: {response.json()}")
+        ok = response.status_code == 200
+
+        # Score by machine id only; features come from the ingested readings
+        response = requests.post(f"{BASE_URL}/predict", json={"machine_id": "M101"})
+        print(f"Predict by machine_id: {response.status_code} {response.json()}")
+        ok = ok and response.status_code == 200
+        response = requests.post(f"{BASE_URL}/predict/batch", json={"machine_ids": ["M101", "M102"]})
+        print(f"Batch predict by machine_ids: {response.status_code} {response.json()}")
+        return ok and response.status_code == 200 and response.json().get("count") == 2
+    except Exception as e:
+        print(f"Error: {e}")
+        return False
+
+def test_invalid_requests():
+    """Missing and malformed feature values are rejected with 400, not scored or a server error."""
+    print("\nTesting invalid requests...")
+
+    row = {"vibration": 25.5, "temperature": 75.2, "operating_hours": 1200,
+           "temp_vibration_interaction": 1900.6, "vibration_rate_of_change": 2.1, "temp_rolling_avg": 74.8}
+    partial = {k: v for k, v in row.items() if k != "temperature"}
+    requests_400 = [
+        ("/predict/batch", {"rows": [row, partial]}),
+        ("/predict/batch", {"rows": [row, dict(row, vibration=None)]}),
+        ("/maintenance-advice/fleet", {"machines": [{"machine_id": "M001", "features": {"vibration": "high"}}]}),
+        ("/maintenance-advice/fleet", {"machines": [{"machine_id": "M001", "features": [25.5, 75.2]}]}),
+        ("/maintenance-advice/fleet", {"machines": [{"machine_id": "M001", "features": {"vibration": None}}]}),
+        ("/predict", {"features": []}),
+        ("/predict", {"features": [25.5, 75.2, 1200]}),
+    ]
+    # Binary bodies: empty, and one row holding a NaN
+    binary_400 = [b"", struct.pack("<6d", 25.5, float("nan"), 1200, 1900.6, 2.1, 74.8)]
+
+    try:
+        ok = True
+        for path, payload in requests_400:
+            response = requests.post(f"{BASE_URL}{path}", json=payload)
+            print(f"{path}: {response.status_code} {response.json()}")
+            ok = ok and response.status_code == 400
+        for body in binary_400:
+            response = requests.post(f"{BASE_URL}/predict", data=body, headers={"Content-Type": "application/x-float64"})
+            print(f"/predict ({len(body)} bytes): {response.status_code} {response.json()}")
+            ok = ok and response.status_code == 400
+        return ok
+    except Exception as e:
+        print(f"Error: {e}")
+        return False
+
+def test_admin_reload():
+    """Test that /admin/reload keeps serving and reports the model version."""
+    print("\nTesting /admin/reload endpoint...")
+
+    try:
+        headers = {"X-Admin-Token": os.getenv("ADMIN_TOKEN", "")}
+        response = requests.post(f"{BASE_URL}/admin/reload", headers=headers)
+        print(f"Status: {response.status_code}")
+        print(f"Response: {response.json()}")
+        ok = response.status_code == 200 and response.json().get("status") in ("reloaded", "unchanged")
+
+        response = requests.get(f"{BASE_URL}/health")
+        return ok and response.json().get("model", {}).get("model_version") is not None
+    except Exception as e:
+        print(f"Error: {e}")
+        return False
+
 def test_maintenance_advice():
     """Test the new maintenance advice endpoint with machine ID."""
     print("\nTesting /maintenance-advice endpoint...")
@@ -108,6 +236,35 @@ def test_maintenance_advice():
         print(f"Error: {e}")
         return False
 
+def test_maintenance_advice_stream():
+    """Test the streaming maintenance advice endpoint (Server-Sent Events)."""
+    print("\nTesting /maintenance-advice/stream endpoint...")
+
+    payload = {
+        "machine_id": 8,
+        "features": {
+            "vibration": 45.5,
+            "temperature": 85.2,
+            "operating_hours": 1200,
+            "temp_vibration_interaction": 3850.6,
+            "vibration_rate_of_change": 5.1,
+            "temp_rolling_avg": 84.8
+        }
+    }
+
+    try:
+        events = []
+        with requests.post(f"{BASE_URL}/maintenance-advice/stream", json=payload, stream=True) as response:
+            print(f"Status: {response.status_code}")
+            for line in response.iter_lines(decode_unicode=True):
+                if line and line.startswith("event: "):
+                    events.append(line[len("event: "):])
+        print(f"Events: {events}")
+        return response.status_code == 200 and events[:1] == ["prediction"] and events[-1] == "done"
+    except Exception as e:
+        print(f"Error: {e}")
+        return False
+
 def main():
     """Run all tests."""
     print("=" * 50)
@@ -118,7 +275,12 @@ def main():
     health_ok = test_health()
     predict_dict_ok = test_predict()
     predict_list_ok = test_predict_list()
+    predict_batch_ok = test_predict_batch()
+    ingest_ok = test_ingest()
+    invalid_ok = test_invalid_requests()
+    reload_ok = test_admin_reload()
     advice_ok = test_maintenance_advice()
+    stream_ok = test_maintenance_advice_stream()
     
     # Summary
     print("\n" + "=" * 50)
@@ -126,9 +288,14 @@ def main():
     print(f"Health endpoint: {'✓' if health_ok else '✗'}")
     print(f"Predict endpoint (dict): {'✓' if predict_dict_ok else '✗'}")
     print(f"Predict endpoint (list): {'✓' if predict_list_ok else '✗'}")
+    print(f"Batch predict endpoint: {'✓' if predict_batch_ok else '✗'}")
+    print(f"Ingest endpoint: {'✓' if ingest_ok else '✗'}")
+    print(f"Invalid requests rejected: {'✓' if invalid_ok else '✗'}")
+    print(f"Model reload endpoint: {'✓' if reload_ok else '✗'}")
     print(f"Maintenance advice endpoint: {'✓' if advice_ok else '✗'}")
+    print(f"Streaming advice endpoint: {'✓' if stream_ok else '✗'}")
     
-    if all([health_ok, predict_dict_ok, predict_list_ok, advice_ok]):
+    if all([health_ok, predict_dict_ok, predict_list_ok, predict_batch_ok, ingest_ok, invalid_ok, reload_ok, advice_ok, stream_ok]):
         print("\nAll tests passed! 🎉")
     else:
         print("\nSome tests failed. Check the server logs.")
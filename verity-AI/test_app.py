@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+In-process tests for the HTTP endpoints of app.py.
+
+Trains a small forest into a temporary directory of model versions, points MODEL_PATH at it and
+drives the Flask app through its test client, so every check is an assert that fails under
+pytest (test_api.py needs a running server).
+
+Run with pytest or directly:
+    python verity-AI/test_app.py
+"""
+
+import atexit
+import io
+import os
+import re
+import shutil
+import tempfile
+
+import numpy as np
+
+import payload_formats
+import save_model
+import utils
+from test_forest_engine import train_small_forest
+
+MODEL_ROOT = tempfile.mkdtemp(prefix="verity-test-models-")
+atexit.register(shutil.rmtree, MODEL_ROOT, True)
+ADMIN_TOKEN = "test-admin-token"
+
+
+def _save_version(name):
+    clf, _, _ = train_small_forest()
+    save_model.save_artifacts(clf, utils.load_feature_names(), os.path.join(MODEL_ROOT, name))
+
+
+# app.py loads MODEL_PATH and reads ADMIN_TOKEN when it is imported
+_save_version("2025-01-01")
+os.environ["MODEL_PATH"] = MODEL_ROOT
+os.environ["ADMIN_TOKEN"] = ADMIN_TOKEN
+import app  # noqa: E402
+
+client = app.app.test_client()
+ADMIN = {"X-Admin-Token": ADMIN_TOKEN}
+FEATURES = utils.load_feature_names()
+ROW = {"vibration": 25.5, "temperature": 75.2, "operating_hours": 1200,
+       "temp_vibration_interaction": 1900.6, "vibration_rate_of_change": 2.1, "temp_rolling_avg": 74.8}
+
+
+def _rows(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return [{f: float(v) for f, v in zip(FEATURES, rng.uniform(1, 100, len(FEATURES)))} for _ in range(n)]
+
+
+def _post(path, payload, status=200):
+    response = client.post(path, json=payload)
+    assert response.status_code == status, (path, payload, response.status_code, response.get_data()[:300])
+    return response.get_json()
+
+
+def _binary(body, content_type, status=200):
+    response = client.post("/predict", data=body, content_type=content_type)
+    assert response.status_code == status, (content_type, len(body), response.status_code, response.get_data()[:300])
+    return response
+
+
+def test_binary_bodies_match_json():
+    """float64 and .npy bodies score like JSON and answer in their own format with the model version."""
+    X = np.array([[r[f] for f in FEATURES] for r in _rows(4)])
+    expected = np.array(_post("/predict", {"features": X.tolist()})["predictions"])
+
+    response = _binary(X.astype("<f8").tobytes(), payload_formats.FLOAT64)
+    assert response.mimetype == payload_formats.FLOAT64 and response.headers["X-Shape"] == "4,2"
+    assert response.headers["X-Model-Version"] == app.active_model().version
+    np.testing.assert_allclose(np.frombuffer(response.data, dtype="<f8").reshape(4, 2), expected)
+
+    stream = io.BytesIO()
+    np.save(stream, X)
+    response = _binary(stream.getvalue(), payload_formats.NPY)
+    np.testing.assert_allclose(np.load(io.BytesIO(response.data)), expected)
+
+    response = client.post("/predict", data=X.astype("<f8").tobytes(), content_type=payload_formats.FLOAT64,
+                           headers={"Accept": "application/json"})
+    np.testing.assert_allclose(response.get_json()["predictions"], expected)
+
+
+def test_bad_predict_input_is_400():
+    """Truncated, empty, non-finite and wrong-width inputs are rejected with 400, binary or JSON."""
+    row = np.array([ROW[f] for f in FEATURES])
+    nan_row = row.copy()
+    nan_row[1] = np.nan
+    stream = io.BytesIO()
+    np.save(stream, row.reshape(1, -1))
+    for body, content_type in ((row.astype("<f8").tobytes()[:-8], payload_formats.FLOAT64),
+                               (stream.getvalue()[:-8], payload_formats.NPY),
+                               (b"", payload_formats.FLOAT64),
+                               (nan_row.astype("<f4").tobytes(), payload_formats.FLOAT32),
+                               (np.full(len(FEATURES), np.inf).tobytes(), payload_formats.FLOAT64),
+                               (np.append(row, 1.0).tobytes(), payload_formats.FLOAT64)):
+        assert "error" in _binary(body, content_type, 400).get_json()
+
+    for features in ([], row[:-1].tolist(), [row.tolist(), row[:-1].tolist()], row[:-1].tolist() + ["x"],
+                     dict(ROW, vibration="high")):
+        _post("/predict", {"features": features}, 400)
+    assert _post("/predict", [ROW], 400)["error"] == "JSON object body is required"
+    assert _post("/predict", {"features": row.tolist() + [1.0]}, 400)["error"].startswith("invalid features")
+
+
+def test_batch_keeps_row_order():
+    """Rows, ordered lists and columns give the same per-row results as /predict, in request order."""
+    rows = [dict(r, machine_id=f"M{i}") for i, r in enumerate(_rows(5))]
+    by_rows = _post("/predict/batch", {"rows": rows})
+    assert by_rows["count"] == 5 and [r["machine_id"] for r in by_rows["results"]] == [f"M{i}" for i in range(5)]
+    for row, result in zip(rows, by_rows["results"]):
+        single = _post("/predict", {"features": {f: row[f] for f in FEATURES}})["predictions"][0]
+        np.testing.assert_allclose(result["probabilities"], single)
+
+    ids = [r["machine_id"] for r in rows]
+    as_lists = _post("/predict/batch", {"rows": [[r[f] for f in FEATURES] for r in rows], "machine_ids": ids})
+    as_columns = _post("/predict/batch", {"columns": {f: [r[f] for r in rows] for f in FEATURES},
+                                          "machine_ids": ids})
+    assert as_lists["results"] == by_rows["results"] == as_columns["results"]
+    assert _post("/predict/batch", {"rows": []})["count"] == 0
+
+
+def test_batch_errors_are_400():
+    """Malformed batches are rejected with 400 and say what is wrong, never a 500."""
+    missing = {k: v for k, v in ROW.items() if k != "temperature"}
+    assert _post("/predict/batch", [ROW], 400)["error"] == "JSON object body is required"
+    assert _post("/predict/batch", {}, 400)["error"] == "rows or columns key is required"
+    assert _post("/predict/batch", {"rows": [ROW, missing]}, 400)["missing_features"] == ["temperature"]
+    assert _post("/predict/batch", {"rows": [ROW, dict(ROW, vibration=None)]}, 400)["missing_features"] == ["vibration"]
+    assert _post("/predict/batch", {"rows": [ROW, dict(ROW, vibration="high")]}, 400)["invalid_features"] == ["vibration"]
+    assert "machine_ids" in _post("/predict/batch", {"rows": [ROW, ROW], "machine_ids": ["M1"]}, 400)["error"]
+    _post("/predict/batch", {"rows": [[1.0, 2.0]]}, 400)
+    _post("/predict/batch", {"rows": "M1"}, 400)
+    _post("/predict/batch", {"columns": {"vibration": [1.0]}}, 400)
+
+
+def test_batch_from_store_needs_store_features():
+    """Scoring by machine_ids fails clearly when the model uses a feature the store does not compute."""
+    bundle = app.active_model()
+    saved = bundle.schema
+    bundle.schema = saved.with_names(FEATURES[:-1] + ["pressure"])
+    try:
+        assert "pressure" in _post("/predict/batch", {"machine_ids": ["M1"]}, 400)["error"]
+    finally:
+        bundle.schema = saved
+
+
+def test_ingest_then_score_by_machine_id():
+    """Ingested readings are scored by machine_id alone; bad readings and unknown machines are explained."""
+    readings = [{"machine_id": "ING-1", "timestamp": 1_735_689_600 + 3600 * i, "vibration": 20.0 + i,
+                 "temperature": 70.0 + i % 3, "operating_hours": 100 + i} for i in range(30)]
+    assert _post("/ingest", {"readings": readings}) == {"ingested": 30, "stale": 0, "machines": app.store.n_machines}
+    assert _post("/ingest", {"readings": readings[-2:]})["stale"] == 2
+
+    features = app.store.get_features("ING-1")
+    by_id = _post("/predict", {"machine_id": "ING-1"})["predictions"]
+    assert by_id == _post("/predict", {"features": features})["predictions"]
+    batch = _post("/predict/batch", {"machine_ids": ["ING-1"]})["results"]
+    assert batch[0]["machine_id"] == "ING-1" and batch[0]["probabilities"] == by_id[0]
+
+    bad = dict(readings[-1], timestamp=readings[-1]["timestamp"] + 3600, vibration=float("nan"))
+    assert "vibration" in _post("/ingest", {"readings": [bad]}, 400)["error"]
+    assert app.store.get_features("ING-1") == features
+    assert "per worker process" in _post("/predict", {"machine_id": "ING-404"}, 404)["error"]
+    assert "per worker process" in _post("/predict/batch", {"machine_ids": ["ING-1", "ING-404"]}, 404)["error"]
+
+
+def _metrics():
+    """GET /metrics as {(name, sorted label pairs): value}, checking HELP and TYPE come first."""
+    response = client.get("/metrics")
+    assert response.status_code == 200 and response.mimetype == "text/plain"
+    assert "version=0.0.4" in response.content_type
+    samples, typed = {}, set()
+    for line in response.get_data(as_text=True).splitlines():
+        if line.startswith("# TYPE "):
+            typed.add(line.split()[2])
+            continue
+        if line.startswith("#") or not line:
+            continue
+        match = re.fullmatch(r'([a-z_]+)(?:\{(.*)\})? (\S+)', line)
+        assert match, line
+        name, labels, value = match.groups()
+        assert re.sub(r"_(bucket|sum|count)$", "", name) in typed or name in typed, name
+        pairs = tuple(sorted(re.findall(r'(\w+)="([^"]*)"', labels or "")))
+        samples[(name, pairs)] = float(value)
+    return samples
+
+
+def test_metrics_exposition():
+    """Requests show up in the request, error and stage series in Prometheus text format."""
+    request_count = ("verity_http_request_duration_seconds_count",
+                     (("endpoint", "/predict"), ("method", "POST"), ("status", "200")))
+    errors = ("verity_http_errors_total", (("endpoint", "/predict"), ("status", "400")))
+    before = _metrics()
+    _post("/predict", {"features": ROW})
+    _post("/predict", {"features": []}, 400)
+    after = _metrics()
+
+    assert after[request_count] == before.get(request_count, 0) + 1
+    assert after[errors] == before.get(errors, 0) + 1
+    for stage in ("parse", "features", "predict_proba", "serialize"):
+        assert after[("verity_stage_duration_seconds_count", (("endpoint", "/predict"), ("stage", stage)))] >= 1
+    infinite = request_count[1] + (("le", "+Inf"),)
+    assert after[("verity_http_request_duration_seconds_bucket", tuple(sorted(infinite)))] == after[request_count]
+    info = [labels for name, labels in after if name == "verity_model_info"]
+    assert [dict(labels)["version"] for labels in info] == [app.active_model().version]
+
+
+def test_fleet_options_are_400():
+    """Fleet options that are not numbers, or out of range, are rejected before any scoring."""
+    machines = [{"machine_id": "M1", "features": ROW}]
+    for option in ({"low_risk_threshold": "30"}, {"max_concurrency": "x"}, {"max_retries": -1},
+                   {"rate_limit_per_s": 0}):
+        assert list(option)[0] in _post("/maintenance-advice/fleet", dict(option, machines=machines), 400)["error"]
+
+
+def test_admin_endpoints_need_a_configured_token():
+    """Without ADMIN_TOKEN the admin endpoints are refused; with it, only the right token passes."""
+    saved = app.ADMIN_TOKEN
+    app.ADMIN_TOKEN = None
+    try:
+        assert client.post("/admin/reload", json={}).status_code == 403
+        assert client.post("/admin/reload", json={}, headers={"X-Admin-Token": ""}).status_code == 403
+    finally:
+        app.ADMIN_TOKEN = saved
+    assert client.post("/admin/reload", json={}, headers={"X-Admin-Token": "wrong"}).status_code == 403
+    assert client.post("/admin/reload", json={}, headers=ADMIN).status_code == 200
+
+
+def test_profile_settings_need_the_admin_token():
+    """/admin/profile cannot be read or reconfigured without a configured and matching token."""
+    saved = app.ADMIN_TOKEN, app.profiler.sample_every
+    app.ADMIN_TOKEN = None
+    try:
+        assert client.get("/admin/profile").status_code == 403
+        assert client.post("/admin/profile", json={"sample_every": 1}).status_code == 403
+        app.ADMIN_TOKEN = saved[0]
+        assert client.post("/admin/profile", json={"sample_every": 1}).status_code == 403
+        assert app.profiler.sample_every == saved[1]
+        response = client.post("/admin/profile", json={"sample_every": 7}, headers=ADMIN)
+        assert response.status_code == 200 and response.get_json()["sample_every"] == 7
+    finally:
+        app.ADMIN_TOKEN = saved[0]
+        app.profiler.sample_every = saved[1]
+
+
+def test_reload_paths_stay_in_the_model_directory():
+    """A reload path outside MODEL_PATH's versions directory is rejected before anything is loaded."""
+    outside = tempfile.mkdtemp(prefix="verity-test-outside-")
+    try:
+        shutil.copytree(os.path.join(MODEL_ROOT, "2025-01-01"), os.path.join(outside, "v"))
+        link = os.path.join(MODEL_ROOT, "escape")
+        os.symlink(outside, link)
+        for path in (os.path.join(outside, "v", "model.joblib"),
+                     os.path.join(MODEL_ROOT, "..", os.path.basename(outside)),
+                     os.path.join(link, "v", "model.joblib"),
+                     42):
+            response = client.post("/admin/reload", json={"path": path}, headers=ADMIN)
+            assert response.status_code == 400, path
+        os.remove(link)
+        assert app.registry.failed_reloads == 0
+
+        _save_version("2025-02-01")
+        response = client.post("/admin/reload", json={"path": os.path.join(MODEL_ROOT, "2025-02-01", "model_packed")},
+                               headers=ADMIN)
+        assert response.status_code == 200 and response.get_json()["status"] == "reloaded"
+        assert app.active_model().path == os.path.join(MODEL_ROOT, "2025-02-01", "model_packed")
+    finally:
+        shutil.rmtree(outside)
+
+
+def main():
+    """Run all tests."""
+    tests = [
+        test_binary_bodies_match_json,
+        test_bad_predict_input_is_400,
+        test_batch_keeps_row_order,
+        test_batch_errors_are_400,
+        test_batch_from_store_needs_store_features,
+        test_ingest_then_score_by_machine_id,
+        test_metrics_exposition,
+        test_fleet_options_are_400,
+        test_admin_endpoints_need_a_configured_token,
+        test_profile_settings_need_the_admin_token,
+        test_reload_paths_stay_in_the_model_directory,
+    ]
+    for test in tests:
+        test()
+        print(f"{test.__name__}: ✓")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Tests for the server-side micro-batcher.
+
+Checks that concurrent single rows are coalesced into one call, that rows are scored by the model
+they were submitted for, that rows of the wrong width are rejected before they are queued, and
+that a failing batch resolves every waiting caller without stopping the worker thread.
+
+Run with pytest or directly:
+    python verity-AI/test_batching.py
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from batching import MicroBatcher
+
+
+class RecordingModel:
+    """predict_proba returns [1 - x0, x0] per row and records the size of every call."""
+
+    def __init__(self):
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def predict_proba(self, X):
+        with self._lock:
+            self.calls.append(len(X))
+        return np.column_stack([1 - X[:, 0], X[:, 0]])
+
+
+def test_concurrent_rows_share_one_call():
+    """Rows submitted within the window are scored together; each caller gets its own row."""
+    model = RecordingModel()
+    batcher = MicroBatcher(model.predict_proba, max_batch_size=8, max_wait_ms=200)
+    rows = [[i / 10, 0.0, 0.0] for i in range(8)]
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(batcher.submit, rows))
+    for row, probabilities in zip(rows, results):
+        np.testing.assert_allclose(probabilities, [1 - row[0], row[0]])
+    assert sum(model.calls) == 8 and len(model.calls) < 8
+    assert batcher.stats()["total_rows"] == 8
+
+
+def test_rows_are_scored_by_their_own_model():
+    """Rows bound to different models share a window but each model only sees its own rows."""
+    old = RecordingModel()
+
+    def new_fn(X):
+        return 1 - old.predict_proba(X)
+
+    batcher = MicroBatcher(max_batch_size=8, max_wait_ms=200)
+    views = [batcher.for_model(old.predict_proba, 2), batcher.for_model(new_fn, 3)]
+
+    def score(i):
+        row = [[i / 10, 0.0]] if i % 2 == 0 else [[i / 10, 0.0, 0.0]]
+        return views[i % 2].predict_proba(row)[0]
+
+    with ThreadPoolExecutor(6) as pool:
+        results = list(pool.map(score, range(6)))
+    for i, probabilities in enumerate(results):
+        expected = [1 - i / 10, i / 10] if i % 2 == 0 else [i / 10, 1 - i / 10]
+        np.testing.assert_allclose(probabilities, expected)
+    assert sum(old.calls) == 6
+    try:
+        views[0].predict_proba([[0.1, 0.0, 0.0]])
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("row of the other model's width was accepted")
+
+
+def test_wrong_width_is_rejected_in_submit():
+    """A row of the wrong width fails in the caller and never reaches the queue."""
+    batcher = MicroBatcher(RecordingModel().predict_proba, n_features=3)
+    for row in ([0.1, 0.2], [], [[0.1, 0.2, 0.3, 0.4]]):
+        try:
+            batcher.submit(row)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f"{row!r} was accepted")
+    assert batcher.stats()["total_rows"] == 0
+    np.testing.assert_allclose(batcher.predict_proba([[0.3, 0.0, 0.0]]), [[0.7, 0.3]])
+
+
+def test_mixed_widths_do_not_stop_the_worker():
+    """Rows of different widths in one window are scored separately, and the batcher keeps serving."""
+    model = RecordingModel()
+    batcher = MicroBatcher(model.predict_proba, max_batch_size=8, max_wait_ms=200)
+    rows = [[0.1, 0.0], [0.2, 0.0, 0.0], [0.3, 0.0], [0.4, 0.0, 0.0]]
+    with ThreadPoolExecutor(4) as pool:
+        results = list(pool.map(batcher.submit, rows))
+    assert [round(float(r[1]), 6) for r in results] == [0.1, 0.2, 0.3, 0.4]
+    np.testing.assert_allclose(batcher.submit([0.5, 0.0]), [0.5, 0.5])
+
+
+def test_failing_batch_resolves_every_caller():
+    """An exception from the model is raised in every caller of the batch; later calls still work."""
+    def predict_fn(X):
+        if np.isnan(X).any():
+            raise ValueError("Input contains NaN")
+        return np.column_stack([1 - X[:, 0], X[:, 0]])
+
+    batcher = MicroBatcher(predict_fn, max_batch_size=4, max_wait_ms=200, result_timeout_s=5)
+    errors = []
+
+    def submit(row):
+        try:
+            return batcher.submit(row)
+        except ValueError as e:
+            errors.append(str(e))
+
+    with ThreadPoolExecutor(4) as pool:
+        list(pool.map(submit, [[0.1, 0.0], [np.nan, 0.0], [0.2, 0.0], [0.3, 0.0]]))
+    assert errors and all("NaN" in e for e in errors)
+    np.testing.assert_allclose(batcher.submit([0.25, 0.0]), [0.75, 0.25])
+
+
+def main():
+    """Run all tests."""
+    tests = [
+        test_concurrent_rows_share_one_call,
+        test_rows_are_scored_by_their_own_model,
+        test_wrong_width_is_rejected_in_submit,
+        test_mixed_widths_do_not_stop_the_worker,
+        test_failing_batch_resolves_every_caller,
+    ]
+    for test in tests:
+        test()
+        print(f"{test.__name__}: ✓")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Tests for the model compression search.
+
+Checks tree-count pruning against sklearn, candidate measurement on a small forest, and that
+selection picks the smallest candidate within the accuracy and recall tolerances.
+
+Run with pytest or directly:
+    python verity-AI/test_compress_model.py
+"""
+
+import tempfile
+import warnings
+
+import numpy as np
+
+import compress_model
+from test_forest_engine import train_small_forest
+
+
+def test_prune_trees_averages_the_kept_trees():
+    """A pruned forest predicts the mean of its first n trees and leaves the original intact."""
+    clf, X, _ = train_small_forest()
+    pruned = compress_model.prune_trees(clf, 5)
+    assert len(clf.estimators_) == 20 and pruned.n_estimators == 5
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        expected = np.mean([tree.predict_proba(X) for tree in clf.estimators_[:5]], axis=0)
+        np.testing.assert_allclose(pruned.predict_proba(X), expected, atol=1e-12)
+
+
+def test_measure_and_select():
+    """Candidates report sizes and metrics; the smallest one within tolerance is selected."""
+    clf, X, y = train_small_forest()
+    with tempfile.TemporaryDirectory() as tmp:
+        baseline, results, models = compress_model.run_compression(
+            clf, None, None, X, y, trees=(20, 5), limits=({},), work_dir=tmp
+        )
+    assert [r["n_trees"] for r in results] == [20, 5] and len(models) == 3
+    full = results[0]
+    assert not baseline["compact"] and full["compact"]
+    assert full["packed_bytes"] < baseline["packed_bytes"] and full["joblib_bytes"] == baseline["joblib_bytes"]
+    # Same trees, same decisions: compact storage does not change the metrics
+    assert full["accuracy"] == baseline["accuracy"] and full["recall_failure"] == baseline["recall_failure"]
+    assert set(full["report"]) >= {"0", "1", "accuracy", "macro avg"}
+
+    small = dict(full, id=99, packed_bytes=1, accuracy=baseline["accuracy"] - 0.01)
+    assert compress_model.select_smallest(results + [small], baseline, accuracy_tolerance=0.02) is small
+    assert compress_model.select_smallest(results + [small], baseline, accuracy_tolerance=0.005) is not small
+    worse_recall = dict(small, accuracy=baseline["accuracy"], recall_failure=baseline["recall_failure"] - 0.5)
+    assert compress_model.select_smallest([worse_recall], baseline, recall_tolerance=0.01) is baseline
+
+
+def main():
+    """Run all tests."""
+    tests = [test_prune_trees_averages_the_kept_trees, test_measure_and_select]
+    for test in tests:
+        test()
+        print(f"{test.__name__}: ✓")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Parity tests for the NumPy feature engineering backend.
+
+Checks that `engineer_feature.engineer_features(df, backend="numpy")` produces the same
+columns as the pandas backend, for generator output and for shuffled frames.
+
+Run with pytest or directly:
+    python verity-AI/test_engineer_feature.py
+"""
+
+import numpy as np
+import pandas as pd
+
+import engineer_feature as ef
+import generate_data as gd
+
+ENGINEERED = ["temp_vibration_interaction", "vibration_rate_of_change", "temp_rolling_avg"]
+
+
+def test_numpy_backend_matches_pandas():
+    """Both backends agree on the synthetic dataset as generated."""
+    df = gd.generate_synthetic_data(num_machines=6, duration_days=20, seed=3)
+    expected = ef.engineer_features(df.copy(), backend="pandas")
+    actual = ef.engineer_features(df.copy(), backend="numpy")
+    assert list(actual.columns) == list(expected.columns)
+    pd.testing.assert_index_equal(actual.index, expected.index)
+    for column in ENGINEERED:
+        np.testing.assert_allclose(actual[column], expected[column], rtol=1e-12, atol=1e-9)
+
+
+def test_numpy_backend_sorts_unordered_rows():
+    """Shuffled rows are computed in (machine_id, timestamp) order and returned in frame order."""
+    df = gd.generate_synthetic_data(num_machines=4, duration_days=10, seed=5)
+    expected = ef.engineer_features(df.copy(), backend="pandas")
+    shuffled = df.sample(frac=1.0, random_state=0).reset_index(drop=True)
+    actual = ef.engineer_features(shuffled, backend="numpy")
+    actual = actual.sort_values(["machine_id", "timestamp"]).reset_index(drop=True)
+    for column in ENGINEERED:
+        np.testing.assert_allclose(actual[column], expected[column], rtol=1e-12, atol=1e-9)
+
+
+def main():
+    """Run all tests."""
+    tests = [test_numpy_backend_matches_pandas, test_numpy_backend_sorts_unordered_rows]
+    for test in tests:
+        test()
+        print(f"{test.__name__}: ✓")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Tests for the compiled feature schema.
+
+Checks single-row validation and conversion, batch conversion and validation against the
+ordered lists the endpoints used to build, extended specs with dtypes and bounds (and that saving
+a model keeps them), and that model_features.json is parsed once and re-read only when it changes.
+
+Run with pytest or directly:
+    python verity-AI/test_feature_schema.py
+"""
+
+import json
+import os
+import tempfile
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+import feature_schema as fs
+import save_model
+
+NAMES = fs.DEFAULT_FEATURES
+ROW = {"vibration": 52.1, "temperature": 71.4, "operating_hours": 1200, "temp_vibration_interaction": 3720.0,
+       "vibration_rate_of_change": -1.5, "temp_rolling_avg": 70.9}
+
+
+def test_row_and_validation():
+    """Dicts become rows in model order; missing and invalid features are reported in one pass."""
+    schema = fs.FeatureSchema(NAMES)
+    np.testing.assert_array_equal(schema.row(ROW), [[ROW[n] for n in NAMES]])
+    assert schema.validate(ROW) == (True, [], [])
+
+    partial = dict(ROW, temperature="hot", vibration=float("nan"))
+    del partial["operating_hours"]
+    assert schema.validate(partial) == (False, ["operating_hours"], ["vibration", "temperature"])
+    try:
+        schema.row(partial)
+        raise AssertionError("expected FeatureValidationError")
+    except fs.FeatureValidationError as e:
+        assert e.missing == ["operating_hours"] and "Missing required features" in str(e)
+
+    # /predict fills missing features with 0.0, as before
+    filled = schema.row({"vibration": 1.0}, fill_missing=True)
+    assert filled.shape == (1, 6) and filled[0, 0] == 1.0 and not filled[0, 1:].any()
+
+
+def test_matrix_formats():
+    """Row dicts, ordered lists and columns all produce the same matrix."""
+    schema = fs.FeatureSchema(NAMES)
+    expected = np.array([[ROW[n] for n in NAMES]] * 3)
+    np.testing.assert_array_equal(schema.matrix(rows=[ROW] * 3), expected)
+    np.testing.assert_array_equal(schema.matrix(rows=expected.tolist()), expected)
+    np.testing.assert_array_equal(schema.matrix(columns={n: [ROW[n]] * 3 for n in NAMES}), expected)
+    assert schema.matrix(rows=[]).shape == (0, 6)
+
+
+def _matrix_error(schema, **kwargs):
+    try:
+        schema.matrix(**kwargs)
+    except fs.FeatureValidationError as e:
+        return e
+    raise AssertionError("expected FeatureValidationError")
+
+
+def test_matrix_rejects_missing_and_invalid_values():
+    """Batch rows are checked like single rows: nothing is zero-filled, NaN and bounds are enforced."""
+    spec = {"features": [{"name": n} for n in NAMES]}
+    spec["features"][2].update(dtype="int", min=0)
+    schema = fs.FeatureSchema.from_spec(spec)
+    partial = {n: v for n, v in ROW.items() if n != "temperature"}
+
+    e = _matrix_error(schema, rows=[ROW, partial])
+    assert e.missing == ["temperature"] and "rows [1]" in str(e)
+    e = _matrix_error(schema, rows=[ROW, dict(ROW, vibration=None), dict(ROW, operating_hours=-3)])
+    assert e.missing == ["vibration"] and e.invalid == ["operating_hours"] and "rows [1, 2]" in str(e)
+    e = _matrix_error(schema, rows=[dict(ROW, vibration=float("inf")), dict(ROW, operating_hours=1.5)])
+    assert e.invalid == ["vibration", "operating_hours"]
+
+    ordered = [[ROW[n] for n in NAMES]] * 2
+    ordered[1] = ordered[1][:1] + [float("nan")] + ordered[1][2:]
+    assert _matrix_error(schema, rows=ordered).invalid == ["temperature"]
+    assert _matrix_error(schema, columns={n: [ROW[n]] for n in NAMES if n != "vibration"}).missing == ["vibration"]
+    assert _matrix_error(schema, columns=dict({n: [ROW[n]] for n in NAMES}, temperature=["hot"])).invalid == [
+        "temperature"]
+
+
+def test_spec_dtypes_and_bounds():
+    """Extended specs carry dtypes and bounds."""
+    spec = {"features": [{"name": n} for n in NAMES]}
+    spec["features"][2].update(dtype="int", min=0)
+    schema = fs.FeatureSchema.from_spec(spec)
+    assert schema.bounds["operating_hours"] == (0.0, float("inf"))
+    assert schema.validate(dict(ROW, operating_hours=-1))[2] == ["operating_hours"]
+    assert schema.validate(dict(ROW, operating_hours=1.5))[2] == ["operating_hours"]
+    mask = schema.out_of_bounds(np.array([[ROW[n] for n in NAMES], [1, 1, -5, 1, 1, 1]], dtype=float))
+    assert mask.tolist() == [False, True]
+
+
+def test_save_keeps_declared_spec():
+    """Specs round-trip, and saving a model rewrites model_features.json without losing them."""
+    spec = {"features": [{"name": n} for n in NAMES]}
+    spec["features"][2].update(dtype="int", min=0.0)
+    spec["features"][0].update(max=500.0)
+    schema = fs.FeatureSchema.from_spec(spec)
+    assert schema.to_spec() == spec and fs.FeatureSchema(NAMES).to_spec() == list(NAMES)
+    assert schema.with_names(["operating_hours", "extra"]).to_spec() == {
+        "features": [{"name": "operating_hours", "dtype": "int", "min": 0.0}, {"name": "extra"}]}
+
+    rng = np.random.default_rng(0)
+    clf = RandomForestClassifier(n_estimators=2, random_state=0).fit(rng.random((40, 6)), np.arange(40) % 2)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "model_features.json")
+        with open(path, "w") as fh:
+            json.dump(spec, fh)
+        save_model.save_artifacts(clf, list(NAMES), tmp)
+        with open(path) as fh:
+            assert json.load(fh) == spec
+        assert not [f for f in os.listdir(tmp) if f.endswith(".tmp")]
+
+
+def test_load_is_cached_until_file_changes():
+    """model_features.json is parsed once and re-read after it is rewritten."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "model_features.json")
+        with open(path, "w") as fh:
+            json.dump(NAMES, fh)
+        first = fs.load_feature_schema(path)
+        assert fs.load_feature_schema(path) is first
+        with open(path, "w") as fh:
+            json.dump(NAMES[:3], fh)
+        os.utime(path, ns=(0, 0))
+        assert fs.load_feature_schema(path).names == tuple(NAMES[:3])
+        assert fs.load_feature_schema(os.path.join(tmp, "missing.json")).names == tuple(NAMES)
+
+
+def main():
+    """Run all tests."""
+    tests = [test_row_and_validation, test_matrix_formats, test_matrix_rejects_missing_and_invalid_values,
+             test_spec_dtypes_and_bounds, test_save_keeps_declared_spec, test_load_is_cached_until_file_changes]
+    for test in tests:
+        test()
+        print(f"{test.__name__}: ✓")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Tests for the /ingest feature store.
+
+Checks that ingestion matches the online feature engine and skips stale readings, that a snapshot
+restores the exact state, that /ingest payloads are parsed and rejected as documented, and that
+gunicorn runs a single worker when the store is snapshotted.
+
+Run with pytest or directly:
+    python verity-AI/test_feature_store.py
+"""
+
+import os
+import runpy
+import tempfile
+
+import numpy as np
+
+from feature_store import FeatureStore, parse_readings
+from online_features import OnlineFeatureEngine
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _readings(n=60, machines=("M1", "M2", "M3"), seed=0):
+    rng = np.random.default_rng(seed)
+    return {
+        "machine_id": [machines[i % len(machines)] for i in range(n)],
+        "timestamp": 1_700_000_000.0 + 3600.0 * np.arange(n),
+        "vibration": rng.uniform(10, 40, n),
+        "temperature": rng.uniform(60, 90, n),
+        "operating_hours": np.arange(n, dtype=np.float64),
+    }
+
+
+def _ingest(store, r, rows=slice(None)):
+    return store.ingest(r["machine_id"][rows], r["timestamp"][rows], r["vibration"][rows],
+                        r["temperature"][rows], r["operating_hours"][rows])
+
+
+def test_ingest_matches_engine_and_skips_stale():
+    """Shuffled ingestion gives the engine's features; replayed readings are counted as stale."""
+    r = _readings()
+    engine = OnlineFeatureEngine()
+    for i in range(len(r["machine_id"])):
+        engine.update(r["machine_id"][i], r["vibration"][i], r["temperature"][i], r["operating_hours"][i])
+
+    store = FeatureStore(capacity=1)
+    order = np.random.default_rng(1).permutation(len(r["machine_id"]))
+    shuffled = {k: [v[i] for i in order] if isinstance(v, list) else v[order] for k, v in r.items()}
+    assert _ingest(store, shuffled) == {"ingested": 60, "stale": 0}
+    assert _ingest(store, r, slice(40, 50)) == {"ingested": 0, "stale": 10}
+    for machine in ("M1", "M2", "M3"):
+        assert store.get_features(machine) == engine.features(machine)
+
+    matrix, unknown = store.feature_matrix(["M2", "M9", "M1"])
+    assert unknown == ["M9"] and matrix.shape == (2, 6)
+    assert store.get_features("M9") is None
+
+
+def test_repeated_timestamps_in_one_batch_count_once():
+    """A reading sent twice in the same batch is applied once, like a replay in a later batch."""
+    r = _readings(n=30)
+    # Readings 10-19 again, at the same timestamps but with other values
+    twice = {"machine_id": r["machine_id"] + r["machine_id"][10:20],
+             "timestamp": np.concatenate([r["timestamp"], r["timestamp"][10:20]])}
+    for field in ("vibration", "temperature", "operating_hours"):
+        twice[field] = np.concatenate([r[field], r[field][10:20] + 1])
+    once, store = FeatureStore(), FeatureStore()
+    _ingest(once, r)
+    assert _ingest(store, twice) == {"ingested": 30, "stale": 10}
+    for machine in ("M1", "M2", "M3"):
+        assert store.get_features(machine) == once.get_features(machine)
+
+
+def test_snapshot_round_trip():
+    """A restored store has the same features and keeps rejecting stale readings."""
+    r = _readings()
+    store = FeatureStore()
+    _ingest(store, r, slice(0, 45))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "store.npz")
+        store.snapshot(path)
+        assert sorted(os.listdir(tmp)) == ["store.npz"]
+
+        restored = FeatureStore(snapshot_path=path)
+        assert restored.restore() == 3
+        for machine in ("M1", "M2", "M3"):
+            assert restored.get_features(machine) == store.get_features(machine)
+        assert _ingest(restored, r, slice(40, 60)) == {"ingested": 15, "stale": 5}
+
+        try:
+            FeatureStore(window=12).restore(path)
+        except ValueError as e:
+            assert "window" in str(e)
+        else:
+            raise AssertionError("snapshot with another window was restored")
+
+
+def test_parse_readings():
+    """Row and column payloads give the same columns; missing fields, ragged columns and NaN or
+    infinite values are rejected."""
+    rows = {"readings": [
+        {"machine_id": "M1", "timestamp": "2025-01-01T10:00:00Z", "vibration": 25.5,
+         "temperature": 75.2, "operating_hours": 1200},
+        {"machine_id": 7, "timestamp": 1735729200, "vibration": 26, "temperature": 75, "operating_hours": 1201},
+    ]}
+    parsed = parse_readings(rows)
+    assert parsed["machine_id"] == ["M1", 7]
+    np.testing.assert_allclose(parsed["timestamp"], [1735725600.0, 1735729200.0])
+    columns = parse_readings({"columns": {f: [r[f] for r in rows["readings"]] for f in rows["readings"][0]}})
+    np.testing.assert_allclose(columns["vibration"], parsed["vibration"])
+
+    nan = dict(rows["readings"][0], temperature=float("nan"))
+    for payload in ({}, {"readings": [{"machine_id": "M1"}]}, {"readings": "M1"}, {"readings": [nan]},
+                    {"readings": [dict(rows["readings"][1], vibration=float("inf"))]},
+                    {"readings": [dict(rows["readings"][1], timestamp=float("nan"))]},
+                    {"columns": {"machine_id": ["M1"], "timestamp": [1, 2], "vibration": [1],
+                                 "temperature": [1], "operating_hours": [1]}}):
+        try:
+            parse_readings(payload)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f"{payload!r} was accepted")
+
+
+def test_snapshotted_store_runs_one_worker():
+    """gunicorn.conf.py drops to one worker when the store is snapshotted."""
+    conf = os.path.join(HERE, "gunicorn.conf.py")
+    saved = {k: os.environ.get(k) for k in ("GUNICORN_WORKERS", "FEATURE_STORE_SNAPSHOT_PATH")}
+    try:
+        os.environ["GUNICORN_WORKERS"] = "4"
+        os.environ.pop("FEATURE_STORE_SNAPSHOT_PATH", None)
+        assert runpy.run_path(conf)["workers"] == 4
+        os.environ["FEATURE_STORE_SNAPSHOT_PATH"] = "/tmp/store.npz"
+        assert runpy.run_path(conf)["workers"] == 1
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+def main():
+    """Run all tests."""
+    tests = [
+        test_ingest_matches_engine_and_skips_stale,
+        test_repeated_timestamps_in_one_batch_count_once,
+        test_snapshot_round_trip,
+        test_parse_readings,
+        test_snapshotted_store_runs_one_worker,
+    ]
+    for test in tests:
+        test()
+        print(f"{test.__name__}: ✓")
+
+
+if __name__ == "__main__":
+    main()
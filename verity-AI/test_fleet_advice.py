@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Tests for fleet-wide maintenance advice.
+
+Replaces the LLM call with a local function and checks that low-risk machines get template
+advice, identical prompts are answered once, failed calls are retried, and that repeated
+synchronous calls (one event loop each) get their own AsyncOpenAI client.
+
+Run with pytest or directly:
+    python verity-AI/test_fleet_advice.py
+"""
+
+import asyncio
+import os
+
+import numpy as np
+
+import fleet_advice
+import utils
+import verity_assistant_ai_llm as llm_assistant
+
+FEATURES = {
+    "vibration": 25.5,
+    "temperature": 75.2,
+    "operating_hours": 1200,
+    "temp_vibration_interaction": 1900.6,
+    "vibration_rate_of_change": 2.1,
+    "temp_rolling_avg": 74.8,
+}
+
+
+class VibrationModel:
+    """Failure probability rises with vibration: 0% at 0, 100% at 100."""
+
+    def __init__(self):
+        self.column = utils.load_feature_names().index("vibration")
+
+    def predict_proba(self, X):
+        p = np.clip(X[:, self.column] / 100.0, 0.0, 1.0)
+        return np.column_stack([1 - p, p])
+
+
+class FakeLLM:
+    """Stands in for get_llm_maintenance_advice_async; fails the first `failures` calls."""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.calls = []
+        self.clients = []
+
+    async def __call__(self, machine_id, failure_probability, features, use_cache=True, raise_errors=False):
+        # The client of the running loop, as the real call would use it
+        self.clients.append(llm_assistant.get_async_client())
+        self.calls.append(machine_id)
+        if len(self.calls) <= self.failures:
+            raise RuntimeError("rate limited")
+        return f"Machine {machine_id}: inspect the bearings."
+
+
+def _fleet(llm, machines, **kwargs):
+    saved = llm_assistant.get_llm_maintenance_advice_async, llm_assistant.get_advice_cache
+    saved_key = os.environ.get("OPENAI_API_KEY")
+    llm_assistant.get_llm_maintenance_advice_async = llm
+    llm_assistant.get_advice_cache = lambda: None
+    os.environ.setdefault("OPENAI_API_KEY", "test-key")
+    try:
+        return fleet_advice.get_fleet_advice_api(machines, VibrationModel(), rate_limit_per_s=0, **kwargs)
+    finally:
+        llm_assistant.get_llm_maintenance_advice_async, llm_assistant.get_advice_cache = saved
+        if saved_key is None:
+            os.environ.pop("OPENAI_API_KEY", None)
+
+
+def test_template_and_deduplication():
+    """Low-risk machines are templated; machines with the same prompt share one LLM call."""
+    machines = [
+        {"machine_id": "M1", "features": dict(FEATURES, vibration=10.0)},
+        {"machine_id": "M2", "features": dict(FEATURES, vibration=80.0)},
+        {"machine_id": "M3", "features": dict(FEATURES, vibration=80.0)},
+    ]
+    llm = FakeLLM()
+    report = _fleet(llm, machines, low_risk_threshold=30)
+    sources = [r["advice_source"] for r in report["results"]]
+    assert sources == ["template", "llm", "deduplicated"]
+    assert llm.calls == ["M2"] and report["summary"]["llm_calls"] == 1
+    assert report["results"][2]["maintenance_advice"] == "Machine M3: inspect the bearings."
+
+
+def test_failed_calls_are_retried():
+    """A failed LLM call is retried and counted; exhausted retries give error advice."""
+    machines = [{"machine_id": "M1", "features": dict(FEATURES, vibration=80.0)}]
+    report = _fleet(FakeLLM(failures=1), machines, max_retries=1)
+    assert report["results"][0]["advice_source"] == "llm" and report["summary"]["retries"] == 1
+
+    report = _fleet(FakeLLM(failures=2), machines, max_retries=1)
+    assert report["results"][0]["advice_source"] == "error" and report["summary"]["failures"] == 1
+
+
+def test_each_event_loop_gets_its_own_client():
+    """Synchronous calls run their own loop; each uses a fresh client that is closed afterwards."""
+    machines = [{"machine_id": "M1", "features": dict(FEATURES, vibration=80.0)}]
+    first, second = FakeLLM(), FakeLLM()
+    _fleet(first, machines)
+    _fleet(second, machines)
+    assert first.clients[0] is not second.clients[0]
+    assert first.clients[0].is_closed() and second.clients[0].is_closed()
+    assert not list(llm_assistant._async_clients)
+
+    async def client_twice():
+        return llm_assistant.get_async_client(), llm_assistant.get_async_client()
+
+    saved_key = os.environ.get("OPENAI_API_KEY")
+    os.environ.setdefault("OPENAI_API_KEY", "test-key")
+    try:
+        a, b = asyncio.run(client_twice())
+    finally:
+        if saved_key is None:
+            os.environ.pop("OPENAI_API_KEY", None)
+    assert a is b
+
+
+def test_invalid_features_raise_value_error():
+    """Feature values that are not numbers fail before any LLM call."""
+    machines = [{"machine_id": "M1", "features": dict(FEATURES, vibration="high")}]
+    llm = FakeLLM()
+    try:
+        _fleet(llm, machines)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("non-numeric feature was accepted")
+    assert llm.calls == []
+
+
+def test_request_options_are_checked_and_capped():
+    """Options must be numbers of the right type and at least their minimum; large ones are capped."""
+    limits = fleet_advice.REQUEST_OPTIONS
+    options = fleet_advice.request_options({"low_risk_threshold": 250, "max_concurrency": 10 ** 6,
+                                            "rate_limit_per_s": 1e9, "max_retries": 10 ** 6, "other": "x"})
+    assert options == {"low_risk_threshold": 100, "max_concurrency": limits["max_concurrency"][2],
+                       "rate_limit_per_s": limits["rate_limit_per_s"][2], "max_retries": limits["max_retries"][2]}
+    assert fleet_advice.request_options({"low_risk_threshold": 12.5, "max_retries": 0}) == {
+        "low_risk_threshold": 12.5, "max_retries": 0}
+
+    for bad in ({"low_risk_threshold": "30"}, {"low_risk_threshold": float("nan")}, {"low_risk_threshold": -1},
+                {"max_concurrency": "x"}, {"max_concurrency": 2.5}, {"max_concurrency": 0}, {"max_retries": True},
+                {"max_retries": -1}, {"rate_limit_per_s": 0}, {"rate_limit_per_s": None}):
+        try:
+            fleet_advice.request_options(bad)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f"{bad!r} was accepted")
+
+
+def main():
+    """Run all tests."""
+    tests = [
+        test_template_and_deduplication,
+        test_failed_calls_are_retried,
+        test_each_event_loop_gets_its_own_client,
+        test_invalid_features_raise_value_error,
+        test_request_options_are_checked_and_capped,
+    ]
+    for test in tests:
+        test()
+        print(f"{test.__name__}: ✓")
+
+
+if __name__ == "__main__":
+    main()
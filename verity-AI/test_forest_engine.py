@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Parity tests for the packed forest inference engine.
+
+Checks that `forest_engine.PackedForest` reproduces sklearn's `predict_proba` for single rows
+and batches, and that a saved packed model loads back unchanged.
+
+Run with pytest or directly:
+    python verity-AI/test_forest_engine.py
+"""
+
+import os
+import tempfile
+import warnings
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+import engineer_feature as ef
+import forest_engine
+import utils
+
+
+def train_small_forest():
+    """A 20-tree forest on a short simulated dataset; returns (clf, X, y) as NumPy arrays."""
+    df = ef.build_engineered_dataset(num_machines=4, duration_days=30)
+    X, y = df[utils.load_feature_names()], df["failure_imminent"].copy()
+    # Make sure both classes are present even if no simulated machine failed
+    y.iloc[::50] = 1
+    clf = RandomForestClassifier(n_estimators=20, class_weight="balanced", random_state=42)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        clf.fit(X, y)
+    return clf, X.to_numpy(), y.to_numpy()
+
+
+def test_predict_proba_parity():
+    """Packed engine matches sklearn probabilities for a batch and for single rows."""
+    clf, X, _ = train_small_forest()
+    packed = forest_engine.PackedForest(forest_engine.export_forest(clf))
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        expected = clf.predict_proba(X)
+        np.testing.assert_allclose(packed.predict_proba(X), expected, rtol=0, atol=1e-12)
+        for i in (0, len(X) // 2, len(X) - 1):
+            np.testing.assert_allclose(packed.predict_proba(X[i]), clf.predict_proba(X[i:i + 1]), atol=1e-12)
+        np.testing.assert_array_equal(packed.predict(X), clf.predict(X))
+
+
+def test_non_finite_input_is_rejected():
+    """NaN and infinite values raise like sklearn instead of silently taking a branch."""
+    clf, X, _ = train_small_forest()
+    packed = forest_engine.PackedForest(forest_engine.export_forest(clf))
+    for value in (np.nan, np.inf):
+        row = X[0].copy()
+        row[1] = value
+        try:
+            packed.predict_proba(row)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f"{value} was scored")
+
+
+def test_save_and_load_roundtrip():
+    """A packed model written to disk scores the same after loading."""
+    clf, X, _ = train_small_forest()
+    packed = forest_engine.export_forest(clf)
+    with tempfile.TemporaryDirectory() as out_dir:
+        forest_engine.save_packed_forest(packed, out_dir)
+        assert forest_engine.is_packed_model(out_dir)
+        loaded = forest_engine.load_packed_forest(out_dir)
+        np.testing.assert_array_equal(loaded.predict_proba(X), forest_engine.PackedForest(packed).predict_proba(X))
+        assert list(loaded.feature_names_in_) == list(clf.feature_names_in_)
+
+
+def test_resave_does_not_touch_mapped_model():
+    """Re-exporting into the same directory leaves an already memory-mapped model intact."""
+    clf, X, _ = train_small_forest()
+    with tempfile.TemporaryDirectory() as tmp:
+        out_dir = f"{tmp}/model_packed"
+        forest_engine.save_packed_forest(forest_engine.export_forest(clf), out_dir)
+        mapped = forest_engine.load_packed_forest(out_dir, mmap_mode="r")
+        expected = mapped.predict_proba(X)
+
+        smaller = RandomForestClassifier(n_estimators=3, max_depth=3, random_state=0)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            smaller.fit(X, clf.predict(X))
+        forest_engine.save_packed_forest(forest_engine.export_forest(smaller), out_dir)
+
+        np.testing.assert_array_equal(mapped.predict_proba(X), expected)
+        assert forest_engine.load_packed_forest(out_dir).n_trees == 3
+        assert sorted(os.listdir(tmp)) == ["model_packed"]
+
+
+def test_compact_forest_keeps_decisions():
+    """Narrowed tables reach the same leaves, even for inputs right at the float32 thresholds."""
+    clf, X, _ = train_small_forest()
+    packed = forest_engine.export_forest(clf)
+    full, compact = forest_engine.PackedForest(packed), forest_engine.PackedForest(forest_engine.compact_forest(packed))
+    assert compact.threshold.dtype == np.float32 and compact.value.dtype == np.float32
+    assert compact.feature.dtype == np.int8
+
+    # Rows whose values sit on, just below and just above the thresholds of internal nodes
+    internal = np.flatnonzero(packed["left"] != np.arange(len(packed["left"])))
+    probes = np.repeat(X[:len(internal) % 50 + 50].astype(np.float32), 3, axis=0)
+    for i, node in enumerate(internal[:len(probes) // 3]):
+        t = np.float32(packed["threshold"][node])
+        for j, x in enumerate((np.nextafter(t, -np.inf), t, np.nextafter(t, np.inf))):
+            probes[3 * i + j, packed["feature"][node]] = x
+    for rows in (X, probes):
+        np.testing.assert_array_equal(compact.apply(rows), full.apply(rows))
+        np.testing.assert_allclose(compact.predict_proba(rows), full.predict_proba(rows), atol=1e-6)
+
+
+def main():
+    """Run all tests."""
+    tests = [test_predict_proba_parity, test_non_finite_input_is_rejected, test_save_and_load_roundtrip, test_resave_does_not_touch_mapped_model,
+             test_compact_forest_keeps_decisions]
+    for test in tests:
+        test()
+        print(f"{test.__name__}: ✓")
+
+
+if __name__ == "__main__":
+    main()
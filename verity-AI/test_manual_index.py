@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Tests for the maintenance manual retrieval index.
+
+Builds small indexes in a temporary directory: a few markdown manuals for the advice tiers,
+and a synthetic corpus with a lowered IVF threshold for the probed search.
+
+Run with pytest or directly:
+    python verity-AI/test_manual_index.py
+"""
+
+import os
+import tempfile
+
+import numpy as np
+
+import manual_index
+import verity_assistant_ai
+import verity_assistant_ai_llm
+
+MANUALS = {
+    "M-456.md": (
+        "# Bearing replacement\n\n"
+        "High vibration with failure imminent: shut down the machine, check motor mounts and bearing "
+        "alignment, then order replacement bearings from part list M-456.\n\n"
+        "# Lubrication\n\n"
+        "Grease the spindle bearings every 500 hours of operation.\n"
+    ),
+    "M-200.md": (
+        "# Scheduled diagnostics\n\n"
+        "During scheduled maintenance run a diagnostic check, tighten loose bolts and review vibration "
+        "and temperature monitoring trends.\n\n"
+        "# Routine inspection\n\n"
+        "In normal operation perform the routine inspection and preventive maintenance checklist.\n"
+    ),
+}
+
+
+def build_manuals(tmp):
+    source = os.path.join(tmp, "manuals")
+    os.makedirs(source)
+    for name, text in MANUALS.items():
+        with open(os.path.join(source, name), "w") as fh:
+            fh.write(text)
+    out = os.path.join(tmp, "index")
+    stats = manual_index.build_index(manual_index.iter_passages(source), out)
+    return manual_index.ManualIndex(out), stats
+
+
+def test_build_and_search_by_risk_tier():
+    """Each risk tier's query retrieves the matching manual section first."""
+    with tempfile.TemporaryDirectory() as tmp:
+        index, stats = build_manuals(tmp)
+        assert stats["passages"] == len(index) == 4 and stats["ivf_lists"] == 0
+
+        expected = {90.0: "Bearing replacement", 50.0: "Scheduled diagnostics", 5.0: "Routine inspection"}
+        for probability, title in expected.items():
+            results = index.search(manual_index.advice_query(probability), k=2)
+            assert results[0]["title"] == title
+            assert results[0]["score"] >= results[-1]["score"] > 0
+        assert index.search(manual_index.advice_query(90.0), min_score=0.99) == []
+
+
+def test_advice_quotes_retrieved_passages():
+    """Rule-based advice and the LLM prompt both cite the retrieved passages."""
+    with tempfile.TemporaryDirectory() as tmp:
+        index, _ = build_manuals(tmp)
+        original = manual_index.get_manual_index
+        manual_index.get_manual_index = lambda: index
+        try:
+            passages = manual_index.retrieve_for_advice(85.0, k=1)
+            advice = verity_assistant_ai.rule_based_advice("M1", 85.0, passages=passages)
+            assert "Manual references:" in advice and "M-456#0" in advice
+
+            request = verity_assistant_ai_llm.build_advice_request("M1", 85.0, {"vibration": 60.0})
+            system, prompt = (m["content"] for m in request["messages"])
+            assert "cite them" in system and "[M-456#0] Bearing replacement" in prompt
+        finally:
+            manual_index.get_manual_index = original
+
+
+def test_ivf_search_matches_exact_scan():
+    """A clustered index finds the exact top passages when probing a fraction of its lists."""
+    rng = np.random.default_rng(0)
+    topics = [[f"t{t}w{i}" for i in range(12)] for t in range(40)]
+    passages = [{"id": str(n), "title": "", "text": " ".join(rng.choice(topics[n % 40], 20))}
+                for n in range(2000)]
+    original = manual_index.IVF_MIN_PASSAGES
+    manual_index.IVF_MIN_PASSAGES = 1000
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            stats = manual_index.build_index(passages, tmp, chunk_rows=500)
+            index = manual_index.ManualIndex(tmp)
+            n_lists = stats["ivf_lists"]
+            assert n_lists > 1 and index.centroids.shape == (n_lists, stats["dim"])
+            assert index.list_offsets[-1] == len(index) == 2000
+
+            queries = index.embed([" ".join(topic[:6]) for topic in topics])
+            probed, probed_scores = index.search_vectors(queries, 5, nprobe=max(1, n_lists // 4))
+            exact, exact_scores = index.search_vectors(queries, 5, nprobe=n_lists)
+            np.testing.assert_allclose(probed_scores, exact_scores, rtol=1e-5)
+            # Row order changed at build time; passage ids still point at the right topic
+            for t, rows in enumerate(probed):
+                assert all(int(index.passage(i)["id"]) % 40 == t for i in rows)
+    finally:
+        manual_index.IVF_MIN_PASSAGES = original
+
+
+def test_rebuild_replaces_the_whole_index():
+    """A flat rebuild over an IVF index leaves no IVF files; the open index keeps its old rows."""
+    passages = [{"id": str(n), "title": "", "text": f"part p{n % 50} bearing w{n % 7}"} for n in range(1200)]
+    original = manual_index.IVF_MIN_PASSAGES
+    manual_index.IVF_MIN_PASSAGES = 1000
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            out = os.path.join(tmp, "index")
+            manual_index.build_index(passages, out)
+            old = manual_index.ManualIndex(out)
+            old_rows = np.array(old.vectors[:5])
+
+            stats = manual_index.build_index(passages[:100], out)
+            assert stats["ivf_lists"] == 0 and sorted(os.listdir(tmp)) == ["index"]
+            assert not os.path.exists(os.path.join(out, "centroids.npy"))
+            new = manual_index.ManualIndex(out)
+            assert len(new) == 100 and new.centroids is None
+            np.testing.assert_array_equal(old.vectors[:5], old_rows)
+            assert len(old) == 1200 and old.search("bearing w3", k=1)
+
+            # meta.json, not the presence of a file, says whether the index is clustered
+            np.save(os.path.join(out, "centroids.npy"), old.centroids)
+            assert manual_index.ManualIndex(out).centroids is None
+    finally:
+        manual_index.IVF_MIN_PASSAGES = original
+
+
+def main():
+    """Run all tests."""
+    tests = [test_build_and_search_by_risk_tier, test_advice_quotes_retrieved_passages,
+             test_ivf_search_matches_exact_scan, test_rebuild_replaces_the_whole_index]
+    for test in tests:
+        test()
+        print(f"{test.__name__}: ✓")
+
+
+if __name__ == "__main__":
+    main()
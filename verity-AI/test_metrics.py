@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Tests for the Prometheus metrics registry.
+
+Checks the text exposition format and the merge of per-worker files in METRICS_DIR: counters
+and histograms are summed over all workers, gauges are kept per live worker.
+
+Run with pytest or directly:
+    python verity-AI/test_metrics.py
+"""
+
+import json
+import os
+import tempfile
+
+from metrics import MetricsRegistry, StageTimer
+
+BUCKETS = (0.001, 0.01, 0.1)
+DEAD_PID = 2 ** 22 + 12345  # above the default pid_max, so never a live process
+
+
+def test_render_histogram_and_counters():
+    """Histograms render cumulative buckets, _sum and _count; counters carry their labels."""
+    reg = MetricsRegistry(buckets=BUCKETS)
+    for seconds in (0.0005, 0.005, 0.005, 0.5):
+        reg.observe("verity_stage_duration_seconds", seconds, endpoint="/predict", stage="parse")
+    reg.inc("verity_http_errors_total", endpoint="/predict", status=400)
+    text = reg.render()
+
+    assert "# TYPE verity_stage_duration_seconds histogram" in text
+    labels = 'endpoint="/predict",stage="parse"'
+    assert f'verity_stage_duration_seconds_bucket{{{labels},le="0.001"}} 1' in text
+    assert f'verity_stage_duration_seconds_bucket{{{labels},le="0.01"}} 3' in text
+    assert f'verity_stage_duration_seconds_bucket{{{labels},le="+Inf"}} 4' in text
+    assert f"verity_stage_duration_seconds_count{{{labels}}} 4" in text
+    assert 'verity_http_errors_total{endpoint="/predict",status="400"} 1' in text
+
+
+def test_workers_aggregate_through_metrics_dir():
+    """A scrape on one worker sums every worker's file; dead workers keep counters, not gauges."""
+    with tempfile.TemporaryDirectory() as metrics_dir:
+        reg = MetricsRegistry(metrics_dir, buckets=BUCKETS)
+        reg.inc("verity_llm_requests_total", mode="sync", outcome="ok")
+        reg.observe("verity_http_request_duration_seconds", 0.002, endpoint="/predict")
+        reg.set_gauge("verity_model_info", 1, version="v1")
+
+        other = MetricsRegistry(buckets=BUCKETS)
+        other.inc("verity_llm_requests_total", 2, mode="sync", outcome="ok")
+        other.observe("verity_http_request_duration_seconds", 0.05, endpoint="/predict")
+        other.set_gauge("verity_model_info", 1, version="v0")
+        with open(os.path.join(metrics_dir, f"{DEAD_PID}.json"), "w") as fh:
+            json.dump(other.snapshot(), fh)
+
+        values = reg.collect()
+        assert values["counters"][("verity_llm_requests_total", 'mode="sync",outcome="ok"')] == 3
+        hist = values["histograms"][("verity_http_request_duration_seconds", 'endpoint="/predict"')]
+        assert hist[:-1] == [0, 1, 1, 0]
+        assert list(values["gauges"]) == [("verity_model_info", f'version="v1",pid="{os.getpid()}"')]
+
+        reg.flush()
+        assert os.path.exists(os.path.join(metrics_dir, f"{os.getpid()}.json"))
+
+
+def test_stage_timer():
+    """Each mark() times the stage since the previous mark."""
+    timer = StageTimer("/predict")
+    timer.mark("parse")
+    timer.mark("predict_proba")
+    assert set(timer.timings) == {"parse", "predict_proba"}
+    assert all(t >= 0 for t in timer.timings.values())
+
+
+def main():
+    """Run all tests."""
+    tests = [test_render_histogram_and_counters, test_workers_aggregate_through_metrics_dir, test_stage_timer]
+    for test in tests:
+        test()
+        print(f"{test.__name__}: ✓")
+
+
+if __name__ == "__main__":
+    main()
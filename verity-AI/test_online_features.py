@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Parity tests for the incremental online feature engine.
+
+Replays synthetic readings through `online_features.OnlineFeatureEngine` one at a time and in
+batches, and checks every feature against `engineer_feature.engineer_features` on the same data.
+
+Run with pytest or directly:
+    python verity-AI/test_online_features.py
+"""
+
+import numpy as np
+
+import engineer_feature as ef
+import generate_data as gd
+from online_features import FEATURE_NAMES, OnlineFeatureEngine
+
+
+def _readings():
+    # Interleave machines by timestamp, as readings arrive on a live stream
+    df = gd.generate_synthetic_data(num_machines=5, duration_days=10, seed=7)
+    df = df.sort_values(["timestamp", "machine_id"], kind="stable").reset_index(drop=True)
+    expected = ef.engineer_features(df.copy())
+    return df, expected[FEATURE_NAMES].to_numpy()
+
+
+def test_single_updates_match_engineer_features():
+    """One update() per reading reproduces engineer_features row for row."""
+    df, expected = _readings()
+    engine = OnlineFeatureEngine(capacity=2)
+    rows = [
+        engine.update(m, v, t, h)
+        for m, v, t, h in zip(df["machine_id"], df["vibration"], df["temperature"], df["operating_hours"])
+    ]
+    actual = np.array([[row[f] for f in FEATURE_NAMES] for row in rows])
+    np.testing.assert_allclose(actual, expected, rtol=1e-12, atol=1e-9)
+    assert engine.n_machines == 5
+
+
+def test_batch_updates_match_engineer_features():
+    """update_batch() matches, including batches with several readings per machine."""
+    df, expected = _readings()
+    engine = OnlineFeatureEngine()
+    out = []
+    for start in range(0, len(df), 37):
+        chunk = df.iloc[start:start + 37]
+        out.append(engine.update_batch(chunk["machine_id"].to_numpy(), chunk["vibration"],
+                                       chunk["temperature"], chunk["operating_hours"]))
+    np.testing.assert_allclose(np.vstack(out), expected, rtol=1e-12, atol=1e-9)
+
+    last = df.groupby("machine_id").tail(1).index[0]
+    latest = engine.features(df.loc[last, "machine_id"])
+    np.testing.assert_allclose([latest[f] for f in FEATURE_NAMES], expected[last], atol=1e-9)
+    assert engine.features("unknown") is None
+
+
+def main():
+    """Run all tests."""
+    tests = [test_single_updates_match_engineer_features, test_batch_updates_match_engineer_features]
+    for test in tests:
+        test()
+        print(f"{test.__name__}: ✓")
+
+
+if __name__ == "__main__":
+    main()
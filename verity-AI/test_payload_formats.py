@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Round-trip tests for the binary /predict payload formats.
+
+Encodes a feature matrix in every binary format, decodes it the way /predict does and checks
+the values, the zero-copy views and the content negotiation rules.
+
+Run with pytest or directly:
+    python verity-AI/test_payload_formats.py
+"""
+
+import io
+
+import numpy as np
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+
+import payload_formats as pf
+from feature_schema import DEFAULT_FEATURES
+
+X = np.random.default_rng(3).normal(50, 10, (7, len(DEFAULT_FEATURES)))
+
+
+def test_raw_and_npy_decode_without_copies():
+    """Raw and .npy bodies decode to read-only views of the request bytes."""
+    for fmt, body in ((pf.FLOAT64, X.astype("<f8").tobytes()), (pf.FLOAT32, X.astype("<f4").tobytes())):
+        arr = pf.decode_matrix(body, fmt, len(DEFAULT_FEATURES))
+        np.testing.assert_allclose(arr, X, rtol=1e-6)
+        assert not arr.flags.owndata and not arr.flags.writeable
+
+    stream = io.BytesIO()
+    np.save(stream, X)
+    arr = pf.decode_matrix(stream.getvalue(), pf.NPY, len(DEFAULT_FEATURES))
+    np.testing.assert_array_equal(arr, X)
+    assert not arr.flags.owndata
+
+    try:
+        pf.decode_matrix(X.tobytes()[:-8], pf.FLOAT64, len(DEFAULT_FEATURES))
+        raise AssertionError("expected ValueError")
+    except ValueError:
+        pass
+
+
+def test_empty_and_non_finite_bodies_are_rejected():
+    """Empty bodies, bodies with no rows and NaN or infinite values raise ValueError."""
+    n = len(DEFAULT_FEATURES)
+    stream = io.BytesIO()
+    np.save(stream, np.zeros((0, n)))
+    bad = [(b"", pf.FLOAT64), (b"", pf.NPY), (stream.getvalue(), pf.NPY)]
+    for value in (np.nan, np.inf, -np.inf):
+        rows = X.copy()
+        rows[2, 1] = value
+        bad.append((rows.astype("<f4").tobytes(), pf.FLOAT32))
+    bad.append((np.ones(n + 1).tobytes(), pf.FLOAT64))
+    for body, fmt in bad:
+        try:
+            pf.decode_matrix(body, fmt, n)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f"{fmt} body of {len(body)} bytes was accepted")
+
+
+def test_arrow_columns_by_name():
+    """Arrow columns are picked by feature name, whatever their order in the stream."""
+    try:
+        import pyarrow as pa
+    except ImportError:
+        return
+    names = DEFAULT_FEATURES[::-1]
+    batch = pa.RecordBatch.from_arrays([pa.array(X[:, DEFAULT_FEATURES.index(n)]) for n in names], names=names)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    arr = pf.decode_matrix(sink.getvalue().to_pybytes(), pf.ARROW, len(DEFAULT_FEATURES), DEFAULT_FEATURES)
+    np.testing.assert_array_equal(arr, X)
+
+    body, headers = pf.encode_matrix(X[:, :2], pf.ARROW, column_names=["probability_0", "probability_1"])
+    table = pa.ipc.open_stream(body).read_all()
+    assert table.column_names == ["probability_0", "probability_1"] and headers["X-Shape"] == "7,2"
+
+
+def test_response_negotiation():
+    """Responses follow Accept, default to the request format, and JSON stays the default."""
+    def accept(header):
+        return parse_accept_header(header, MIMEAccept)
+
+    assert pf.response_format(accept(None)) is None
+    assert pf.response_format(accept(None), pf.NPY) == pf.NPY
+    assert pf.response_format(accept("*/*"), pf.FLOAT32) == pf.FLOAT32
+    assert pf.response_format(accept("application/json"), pf.NPY) is None
+    assert pf.response_format(accept(pf.ARROW)) == pf.ARROW
+    assert pf.request_format("application/json") is None
+
+
+def main():
+    """Run all tests."""
+    tests = [test_raw_and_npy_decode_without_copies, test_empty_and_non_finite_bodies_are_rejected,
+             test_arrow_columns_by_name, test_response_negotiation]
+    for test in tests:
+        test()
+        print(f"{test.__name__}: ✓")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Tests for the exact-match prediction cache.
+
+Uses a counting stand-in model to check that only cache misses are scored, that entries are
+dropped when the model version changes, and that the LRU stays within its limit.
+
+Run with pytest or directly:
+    python verity-AI/test_prediction_cache.py
+"""
+
+import numpy as np
+
+from prediction_cache import PredictionCache
+
+
+class CountingModel:
+    """predict_proba of a fake model that records the rows it scores."""
+
+    def __init__(self, offset=0.0):
+        self.offset = offset
+        self.scored = []
+
+    def predict_proba(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        self.scored.append(len(X))
+        p = (np.tanh(X.sum(axis=1) / 100.0 + self.offset) + 1) / 2
+        return np.column_stack([1 - p, p])
+
+
+def test_batch_scores_only_misses():
+    """Repeated rows in later batches come from the cache; results match the model exactly."""
+    model = CountingModel()
+    cache = PredictionCache(max_entries=100)
+    X = np.arange(24, dtype=np.float64).reshape(4, 6)
+
+    first = cache.predict_proba("v1", X, model.predict_proba)
+    mixed = np.vstack([X[2:], X[:1] + 0.5, X[:1]])
+    second = cache.predict_proba("v1", mixed, model.predict_proba)
+    # A float32 body of exactly representable values hits the float64 entries
+    cache.predict_proba("v1", X.astype(np.float32), model.predict_proba)
+    assert model.scored == [4, 1]
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (7, 5, 5)
+
+    reference = CountingModel()
+    np.testing.assert_array_equal(first, reference.predict_proba(X))
+    np.testing.assert_array_equal(second, reference.predict_proba(mixed))
+
+
+def test_float32_rounding_gets_its_own_entry():
+    """A reading float32 cannot represent exactly is cached separately for float32 and float64 bodies."""
+    model = CountingModel()
+    cache = PredictionCache()
+    X = np.full((1, 6), 75.2)
+    assert PredictionCache.row_keys("v1", X) != PredictionCache.row_keys("v1", X.astype(np.float32))
+
+    as_json = cache.predict_proba("v1", X, model.predict_proba)
+    as_float32 = cache.predict_proba("v1", X.astype(np.float32), model.predict_proba)
+    cache.predict_proba("v1", X.astype(np.float32), model.predict_proba)
+    assert model.scored == [1, 1]
+    assert (cache.stats()["hits"], cache.stats()["entries"]) == (1, 2)
+    np.testing.assert_array_equal(as_float32, CountingModel().predict_proba(X.astype(np.float32)))
+    assert not np.array_equal(as_json, as_float32)
+
+
+def test_new_model_version_invalidates():
+    """Rows cached for one model version are not served for the next one."""
+    old, new = CountingModel(), CountingModel(offset=1.0)
+    cache = PredictionCache()
+    X = np.ones((3, 6))
+    cache.predict_proba("v1", X, old.predict_proba)
+    result = cache.predict_proba("v2", X, new.predict_proba)
+    assert new.scored == [3] and cache.stats()["invalidations"] == 1
+    np.testing.assert_array_equal(result, new.predict_proba(X))
+
+
+def test_lru_bound():
+    """The least recently used rows are evicted beyond max_entries."""
+    model = CountingModel()
+    cache = PredictionCache(max_entries=3)
+    rows = np.arange(30, dtype=np.float64).reshape(5, 6)
+    cache.predict_proba("v1", rows[:3], model.predict_proba)
+    cache.predict_proba("v1", rows[:1], model.predict_proba)  # row 0 is now the most recent
+    cache.predict_proba("v1", rows[3:], model.predict_proba)
+    stats = cache.stats()
+    assert stats["entries"] == 3 and stats["evictions"] == 2
+    cache.predict_proba("v1", rows[[0, 3, 4]], model.predict_proba)
+    assert model.scored == [3, 2] and cache.stats()["hits"] == 4
+
+
+def main():
+    """Run all tests."""
+    tests = [test_batch_scores_only_misses, test_float32_rounding_gets_its_own_entry, test_new_model_version_invalidates,
+             test_lru_bound]
+    for test in tests:
+        test()
+        print(f"{test.__name__}: ✓")
+
+
+if __name__ == "__main__":
+    main()
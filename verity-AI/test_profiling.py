@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Tests for the on-demand request profiler.
+
+Profiles a busy function as if it were a request, and checks the request selection (one in N,
+header with admin token), overlapping requests on one event-loop thread, the collapsed-stack and
+text exports, and dumping to a directory.
+
+Run with pytest or directly:
+    python verity-AI/test_profiling.py
+"""
+
+import asyncio
+import os
+import tempfile
+import time
+
+from profiling import SamplingProfiler
+
+
+def busy_handler(seconds):
+    end = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < end:
+        total += sum(range(200))
+    return total
+
+
+def profiled_request(profiler, endpoint, seconds=0.1):
+    token = profiler.begin(endpoint)
+    try:
+        busy_handler(seconds)
+    finally:
+        profiler.end(token)
+
+
+def test_selection():
+    """One in N requests is profiled; the header needs the admin token when one is set."""
+    off = SamplingProfiler()
+    assert not off.enabled and not any(off.should_profile({"X-Profile": "1"}) for _ in range(10))
+
+    every_third = SamplingProfiler(sample_every=3)
+    assert [every_third.should_profile({}) for _ in range(6)] == [False, False, True] * 2
+
+    header = SamplingProfiler(header_enabled=True, token="secret")
+    assert not header.should_profile({"X-Profile": "1"})
+    assert header.should_profile({"X-Profile": "1", "X-Admin-Token": "secret"})
+    assert not header.should_profile({})
+
+
+def test_samples_are_aggregated_per_endpoint():
+    """Stacks of profiled requests land under their endpoint, with the handler in them."""
+    profiler = SamplingProfiler(sample_every=1, interval_s=0.002)
+    profiled_request(profiler, "/predict")
+    profiled_request(profiler, "/maintenance-advice", seconds=0.05)
+
+    stats = profiler.stats()["endpoints"]
+    assert stats["/predict"]["requests"] == 1 and stats["/predict"]["samples"] >= 5
+    assert stats["/maintenance-advice"]["samples"] >= 2
+
+    lines = profiler.collapsed("/predict").splitlines()
+    assert lines and all(line.startswith("/predict;") for line in lines)
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) >= 1 and "busy_handler (test_profiling.py:" in stack
+    assert stack.index("profiled_request") < stack.index("busy_handler")
+
+    report = profiler.report("/predict")
+    assert report.startswith("/predict: 1 profiled requests") and "busy_handler" in report
+
+    # Not profiled: the sampler goes idle and nothing more is recorded
+    samples = stats["/predict"]["samples"]
+    busy_handler(0.05)
+    assert profiler.stats()["endpoints"]["/predict"]["samples"] == samples
+
+
+def test_overlapping_requests_on_one_thread():
+    """Async requests sharing the event-loop thread are each sampled until their own end()."""
+    profiler = SamplingProfiler(sample_every=1, interval_s=0.002)
+
+    async def request(seconds):
+        token = profiler.begin("/maintenance-advice")
+        try:
+            await asyncio.sleep(0)
+            busy_handler(seconds)
+        finally:
+            profiler.end(token)
+
+    async def overlapping():
+        await asyncio.gather(request(0.01), request(0.1))
+
+    asyncio.run(overlapping())
+    stats = profiler.stats()["endpoints"]["/maintenance-advice"]
+    assert stats["requests"] == 2 and stats["samples"] >= 10
+    assert "busy_handler" in profiler.collapsed()
+    assert not profiler._active
+
+
+def test_dump_and_reset():
+    """Profiles are written per endpoint and worker; reset clears them."""
+    profiler = SamplingProfiler(sample_every=1, interval_s=0.002)
+    profiled_request(profiler, "/predict/batch", seconds=0.05)
+    with tempfile.TemporaryDirectory() as out_dir:
+        paths = profiler.dump(out_dir)
+        assert sorted(os.path.basename(p) for p in paths) == [
+            f"predict_batch.{os.getpid()}.folded", f"predict_batch.{os.getpid()}.txt"
+        ]
+        with open(paths[0]) as fh:
+            assert fh.read().startswith("/predict/batch;")
+    profiler.reset()
+    assert profiler.collapsed() == "" and profiler.report() == "No samples collected.\n"
+
+
+def main():
+    """Run all tests."""
+    tests = [test_selection, test_samples_are_aggregated_per_endpoint, test_overlapping_requests_on_one_thread,
+             test_dump_and_reset]
+    for test in tests:
+        test()
+        print(f"{test.__name__}: ✓")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""
+Out-of-core training over a sharded synthetic dataset.
+
+`save_model.main()` engineers the whole dataset in memory before `train_test_split`. This
+module trains from a dataset written by `generate_data.write_synthetic_dataset()` one shard at
+a time instead:
+
+1. Each shard (a group of whole machines) is read and feature-engineered on its own, which is
+   exact because rolling windows never cross machines
+2. Rows are split into train/test per shard and per class, so the split is stratified without
+   ever holding the full dataset
+3. A sub-forest is trained on each shard's training rows, and the sub-forests' trees are merged
+   into one `RandomForestClassifier` at the end
+4. A second pass over the shards scores the held-out rows
+
+Peak memory is bounded by one shard plus the trees, not the dataset. `--compare` runs the
+in-memory path on the same data in a separate process and prints wall time and peak RSS of both.
+
+Usage:
+    python generate_data.py --machines 2000 --days 365 --out data/fleet --format npy --seed 42
+    python train_sharded.py data/fleet --output-dir artifacts --compare
+"""
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score, classification_report, f1_score
+from sklearn.model_selection import train_test_split
+
+import engineer_feature as ef
+import generate_data as gd
+import utils
+
+TARGET = "failure_imminent"
+
+
+def peak_rss_mib():
+    """Peak resident memory of this process so far (MiB, Linux ru_maxrss is in KiB)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def engineered_shard(data_dir, shard, fmt):
+    return ef.engineer_features(gd.read_synthetic_shard(data_dir, shard, fmt=fmt), backend="numpy")
+
+
+def split_mask(y, test_size, seed):
+    """
+    Boolean test mask holding out `test_size` of every class, chosen at random.
+
+    Args:
+        y (numpy.ndarray): Labels of one shard
+        test_size (float): Fraction of each class held out
+        seed: Seed (or SeedSequence) for this shard
+
+    Returns:
+        numpy.ndarray: True for test rows
+    """
+    rng = np.random.default_rng(seed)
+    test = np.zeros(len(y), dtype=bool)
+    for label in np.unique(y):
+        idx = np.flatnonzero(y == label)
+        test[rng.choice(idx, size=int(round(test_size * len(idx))), replace=False)] = True
+    return test
+
+
+def merge_forests(forests):
+    """Combine fitted sub-forests that share classes and features into one forest."""
+    merged = forests[0]
+    for forest in forests[1:]:
+        if not np.array_equal(forest.classes_, merged.classes_):
+            raise ValueError("sub-forests were trained on different classes")
+        merged.estimators_ += forest.estimators_
+    merged.n_estimators = len(merged.estimators_)
+    return merged
+
+
+def train_sharded_forest(data_dir, features=None, n_estimators=100, test_size=0.2, seed=42, n_jobs=-1):
+    """
+    Train a RandomForest shard by shard and evaluate it on a stratified held-out split.
+
+    Shards whose training rows hold a single class are carried over and trained together with
+    the next shard, so every sub-forest sees both classes.
+
+    Args:
+        data_dir (str): Dataset directory written by generate_data.write_synthetic_dataset()
+        features (list, optional): Feature names. If None, loads from JSON.
+        n_estimators (int): Total trees, spread evenly over the shards
+        test_size (float): Fraction of each class held out per shard
+        seed (int): Seed for the split and the sub-forests
+        n_jobs (int): Cores used to fit each sub-forest
+
+    Returns:
+        tuple: (fitted RandomForestClassifier, report dict)
+    """
+    start = time.perf_counter()
+    features = features or utils.load_feature_names()
+    manifest = gd.load_manifest(data_dir)
+    shards = manifest["shards"]
+    shard_seeds = np.random.SeedSequence(seed).spawn(len(shards))
+    trees_per_shard = max(1, int(round(n_estimators / len(shards))))
+
+    forests, pending = [], []
+    rows = {"train": 0, "test": 0}
+    for i, shard in enumerate(shards):
+        df = engineered_shard(data_dir, shard, manifest["format"])
+        y = df[TARGET].to_numpy()
+        test = split_mask(y, test_size, shard_seeds[i])
+        rows["train"] += int((~test).sum())
+        rows["test"] += int(test.sum())
+        pending.append((df.loc[~test, features], y[~test]))
+        del df
+
+        y_train = np.concatenate([p[1] for p in pending])
+        last = i == len(shards) - 1
+        if len(np.unique(y_train)) < 2 and not last:
+            continue
+        X_train = pd.concat([p[0] for p in pending], ignore_index=True)
+        n_trees = trees_per_shard * len(pending)
+        pending = []
+        forest = RandomForestClassifier(n_estimators=n_trees, class_weight="balanced",
+                                        random_state=int(shard_seeds[i].generate_state(1)[0]), n_jobs=n_jobs)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            forest.fit(X_train, y_train)
+        forests.append(forest)
+        del X_train, y_train
+    train_s = time.perf_counter() - start
+
+    clf = merge_forests(forests)
+
+    # Second pass: score the held-out rows of every shard
+    y_true, y_pred = [], []
+    for i, shard in enumerate(shards):
+        df = engineered_shard(data_dir, shard, manifest["format"])
+        y = df[TARGET].to_numpy()
+        test = split_mask(y, test_size, shard_seeds[i])
+        y_true.append(y[test])
+        y_pred.append(clf.predict(df.loc[test, features]))
+        del df
+    y_true, y_pred = np.concatenate(y_true), np.concatenate(y_pred)
+
+    report = {
+        "mode": "sharded",
+        "shards": len(shards),
+        "sub_forests": len(forests),
+        "n_estimators": clf.n_estimators,
+        "train_rows": rows["train"],
+        "test_rows": rows["test"],
+        "train_s": round(train_s, 2),
+        "wall_s": round(time.perf_counter() - start, 2),
+        "peak_rss_mib": round(peak_rss_mib(), 1),
+        "accuracy": round(float(accuracy_score(y_true, y_pred)), 4),
+        "f1_failure": round(float(f1_score(y_true, y_pred, zero_division=0)), 4),
+        "classification_report": classification_report(y_true, y_pred, zero_division=0),
+    }
+    # Serving scores a row at a time; a per-call thread pool would only add latency
+    clf.n_jobs = None
+    return clf, report
+
+
+def train_in_memory(data_dir, features=None, n_estimators=100, test_size=0.2, seed=42, n_jobs=-1):
+    """
+    Baseline: concatenate every shard, then split and fit as save_model.main() does.
+
+    Returns:
+        tuple: (fitted RandomForestClassifier, report dict)
+    """
+    start = time.perf_counter()
+    features = features or utils.load_feature_names()
+    manifest = gd.load_manifest(data_dir)
+    df = pd.concat([engineered_shard(data_dir, s, manifest["format"]) for s in manifest["shards"]],
+                   ignore_index=True)
+    X_train, X_test, y_train, y_test = train_test_split(
+        df[features], df[TARGET], test_size=test_size, random_state=seed, stratify=df[TARGET]
+    )
+    clf = RandomForestClassifier(n_estimators=n_estimators, class_weight="balanced", random_state=seed, n_jobs=n_jobs)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        clf.fit(X_train, y_train)
+    train_s = time.perf_counter() - start
+    y_pred = clf.predict(X_test)
+    report = {
+        "mode": "in-memory",
+        "n_estimators": clf.n_estimators,
+        "train_rows": len(X_train),
+        "test_rows": len(X_test),
+        "train_s": round(train_s, 2),
+        "wall_s": round(time.perf_counter() - start, 2),
+        "peak_rss_mib": round(peak_rss_mib(), 1),
+        "accuracy": round(float(accuracy_score(y_test, y_pred)), 4),
+        "f1_failure": round(float(f1_score(y_test, y_pred, zero_division=0)), 4),
+        "classification_report": classification_report(y_test, y_pred, zero_division=0),
+    }
+    clf.n_jobs = None
+    return clf, report
+
+
+def run_isolated(mode, args):
+    """Run one training mode in a fresh process so its peak RSS is measured on its own."""
+    cmd = [sys.executable, __file__, args.data_dir, "--mode", mode, "--json",
+           "--n-estimators", str(args.n_estimators), "--seed", str(args.seed), "--n-jobs", str(args.n_jobs)]
+    out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("data_dir", help="Dataset directory written by generate_data.py --out")
+    parser.add_argument("--mode", choices=["sharded", "in-memory"], default="sharded")
+    parser.add_argument("--n-estimators", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--n-jobs", type=int, default=-1)
+    parser.add_argument("--output-dir", help="Save model.joblib, model_features.json and model_packed/ here")
+    parser.add_argument("--compare", action="store_true", help="Also run the in-memory path and compare")
+    parser.add_argument("--json", action="store_true", help="Print the report as one JSON line")
+    args = parser.parse_args()
+
+    if args.compare:
+        reports = [run_isolated("sharded", args), run_isolated("in-memory", args)]
+        print(f"{'mode':<12}{'rows':>12}{'trees':>8}{'wall (s)':>10}{'peak RSS (MiB)':>16}{'accuracy':>10}{'F1 (fail)':>11}")
+        print("=" * 79)
+        for r in reports:
+            rows = r["train_rows"] + r["test_rows"]
+            print(f"{r['mode']:<12}{rows:>12,}{r['n_estimators']:>8}{r['wall_s']:>10.1f}"
+                  f"{r['peak_rss_mib']:>16.0f}{r['accuracy']:>10.4f}{r['f1_failure']:>11.4f}")
+        return
+
+    train = train_sharded_forest if args.mode == "sharded" else train_in_memory
+    clf, report = train(args.data_dir, n_estimators=args.n_estimators, seed=args.seed, n_jobs=args.n_jobs)
+    if args.output_dir:
+        import save_model
+
+        save_model.save_artifacts(clf, utils.load_feature_names(), args.output_dir)
+    if args.json:
+        print(json.dumps({k: v for k, v in report.items() if k != "classification_report"}))
+        return
+    print(f"--- {report['mode']} training ---")
+    for key, value in report.items():
+        if key != "classification_report":
+            print(f"{key:<16}{value}")
+    print(report["classification_report"])
+
+
+if __name__ == "__main__":
+    main()
@@ -2,47 +2,45 @@
 Shared utility functions for the Verity AI system.
 
 This module provides common functions used across different components,
-particularly for loading feature names from the model_features.json file.
+particularly for loading feature names from the model_features.json file
+(parsed once into a cached `FeatureSchema`, see feature_schema.py).
 """
 
-import os
 import json
 
+from feature_schema import FeatureSchema, load_feature_schema
+
 
 def load_feature_names(file_path=None):
     """
     Load feature names from model_features.json file.
-    
+
+    The file is parsed once and cached (see `feature_schema.load_feature_schema`).
+
     Args:
         file_path (str, optional): Path to the JSON file. If None, uses default location.
-    
+
     Returns:
         list: List of feature names in the correct order
     """
-    if file_path is None:
-        file_path = os.path.join(os.path.dirname(__file__), "model_features.json")
-    
-    # Default features (same as used throughout the codebase)
-    default_features = [
-        "vibration",
-        "temperature",
-        "operating_hours",
-        "temp_vibration_interaction",
-        "vibration_rate_of_change",
-        "temp_rolling_avg"
-    ]
-    
-    try:
-        if os.path.exists(file_path):
-            with open(file_path, "r") as fh:
-                features = json.load(fh)
-            return features
-        else:
-            print(f"Warning: model_features.json not found at {file_path}, using default feature list")
-            return default_features
-    except Exception as e:
-        print(f"Error loading features from JSON: {e}, using default feature list")
-        return default_features
+    return load_feature_schema(file_path).to_list()
+
+
+def feature_schema(feature_names=None):
+    """
+    FeatureSchema for an explicit list of feature names, or the cached default schema.
+
+    Args:
+        feature_names (list or FeatureSchema, optional): Ordered feature names. If None, loads from JSON.
+
+    Returns:
+        FeatureSchema: Compiled schema
+    """
+    if feature_names is None:
+        return load_feature_schema()
+    if isinstance(feature_names, FeatureSchema):
+        return feature_names
+    return FeatureSchema(feature_names)
 
 
 def get_feature_dict_ordered(feature_dict, feature_names=None):
@@ -56,10 +54,8 @@ def get_feature_dict_ordered(feature_dict, feature_names=None):
     Returns:
         list: Feature values in the correct order
     """
-    if feature_names is None:
-        feature_names = load_feature_names()
-    
-    return [feature_dict.get(f, 0.0) for f in feature_names]
+    names = feature_schema(feature_names).names if feature_names is None else feature_names
+    return [feature_dict.get(f, 0.0) for f in names]
 
 
 def validate_feature_dict(feature_dict, feature_names=None):
@@ -73,12 +69,70 @@ def validate_feature_dict(feature_dict, feature_names=None):
     Returns:
         tuple: (is_valid, missing_features)
     """
-    if feature_names is None:
-        feature_names = load_feature_names()
-    
-    missing_features = []
-    for feature in feature_names:
-        if feature not in feature_dict:
-            missing_features.append(feature)
-    
-    return len(missing_features) == 0, missing_features
\ No newline at end of file
+    names = feature_schema(feature_names).names if feature_names is None else feature_names
+    missing_features = [feature for feature in names if feature not in feature_dict]
+    return len(missing_features) == 0, missing_features
+
+
+def build_feature_matrix(rows=None, columns=None, feature_names=None):
+    """
+    Convert many rows of features into one 2-D float array in model feature order.
+
+    Accepts any one of:
+        rows as a list of dicts: [{"vibration": 25.5, ...}, ...]
+        rows as a list of lists: [[25.5, 75.2, ...], ...] (already in model order)
+        columns as a dict of arrays: {"vibration": [25.5, ...], ...}
+    Missing, non-finite and out-of-bounds values raise FeatureValidationError (see FeatureSchema.matrix).
+
+    Args:
+        rows (list, optional): List of feature dicts or list of ordered feature lists
+        columns (dict, optional): Column-oriented mapping of feature name to values
+        feature_names (list or FeatureSchema, optional): Ordered feature names. If None, loads from JSON.
+
+    Returns:
+        numpy.ndarray: Array of shape (n_rows, n_features) with dtype float64
+    """
+    return feature_schema(feature_names).matrix(rows=rows, columns=columns)
+
+
+def process_memory(pid="self"):
+    """
+    Read resident memory for a process from /proc (Linux only).
+
+    Rss counts every resident page the process maps, including pages shared with other
+    gunicorn workers; Pss splits shared pages evenly between the processes that map them,
+    so summing Pss over all workers gives the pod's real footprint.
+
+    Args:
+        pid (int or str, optional): Process id, defaults to the current process
+
+    Returns:
+        dict: Sizes in MiB (rss, pss, shared, private), empty if /proc is unavailable
+    """
+    fields = {"Rss": "rss", "Pss": "pss", "Shared_Clean": "shared", "Shared_Dirty": "shared",
+              "Private_Clean": "private", "Private_Dirty": "private"}
+    usage = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", "r") as fh:
+            for line in fh:
+                parts = line.split()
+                key = parts[0].rstrip(":")
+                if key in fields:
+                    usage[fields[key]] = usage.get(fields[key], 0.0) + int(parts[1]) / 1024.0
+    except OSError:
+        return {}
+    return {k: round(v, 2) for k, v in usage.items()}
+
+
+def format_sse(event, data):
+    """
+    Format one Server-Sent Event with a JSON payload.
+
+    Args:
+        event (str): Event name
+        data: JSON-serializable payload
+
+    Returns:
+        str: Event text terminated by a blank line
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
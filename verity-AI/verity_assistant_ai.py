@@ -1,54 +1,32 @@
-import engineer_feature as ef
-import verity_pt_model as vpm
-import os
-import json
+from utils import load_feature_names
 
 # Once the Pretrained Verity Model is built and evaluated, we can now use an LLM to simulate a conversation around the model and provide "Intelligent" actionalbe insights
 # This is a simulation of how a larger LLM could use this trained ML model to provide a conversation response
 # Note: This is a simplified simulation and does not involve actual LLM integration
 
 
-def load_feature_names():
-    """
-    Load feature names from model_features.json file.
-    
-    Returns:
-        list: List of feature names in the correct order
-    """
-    try:
-        features_path = os.path.join(os.path.dirname(__file__), "model_features.json")
-        with open(features_path, "r") as fh:
-            features = json.load(fh)
-        return features
-    except FileNotFoundError:
-        # Fallback to hardcoded features if file not found
-        print("Warning: model_features.json not found, using fallback feature list")
-        return [
-            "vibration",
-            "temperature",
-            "operating_hours",
-            "temp_vibration_interaction",
-            "vibration_rate_of_change",
-            "temp_rolling_avg"
-        ]
-    except Exception as e:
-        print(f"Error loading features from JSON: {e}")
-        return [
-            "vibration",
-            "temperature",
-            "operating_hours",
-            "temp_vibration_interaction",
-            "vibration_rate_of_change",
-            "temp_rolling_avg"
-        ]
-
-
 def maintenance_assistance_response(machine_id, ml_model, data_point, knowledge_base):
     """
     Generate a conversational response using the Verity Pretrained Model and a knowledge base from a larger LLM.
     """
     failure_probability = ml_model.predict_proba(data_point.values)[0][1]*100  # Probability of failure_imminent being 1
+    return rule_based_advice(machine_id, failure_probability, knowledge_base)
+
 
+def rule_based_advice(machine_id, failure_probability, knowledge_base=None, passages=None):
+    """
+    Template advice for a scored machine from the knowledge base; instant, no LLM involved.
+
+    Args:
+        machine_id (str): Unique identifier for the machine
+        failure_probability (float): Predicted failure probability (0-100)
+        knowledge_base (dict, optional): Protocols by risk level. Defaults to knowledge_base_data.
+        passages (list, optional): Manual passages to quote (from manual_index.retrieve_for_advice)
+
+    Returns:
+        str: Advice text
+    """
+    knowledge_base = knowledge_base_data if knowledge_base is None else knowledge_base
     response = f"Machine {machine_id}: "
 
     if failure_probability > 70:
@@ -66,7 +44,16 @@ def maintenance_assistance_response(machine_id, ml_model, data_point, knowledge_
         action = knowledge_base.get("normal_operation_protocol")
         response += f" Continue regular monitoring. Protocol: '{action}'. "
 
+    if passages:
+        import manual_index
+
+        response += "Manual references: " + " ".join(
+            f"[{p['id']}] {p['title']}: {manual_index.snippet(p['text'], 200)}" for p in passages
+        )
+
     return response
+
+
 # Simulated knowledge base from a larger LLM
 # RAG - Retrieval Augmented Generation simulated here with a simple dictionary. Vectory like DBs could be used for larger knowledge bases
 knowledge_base_data = {
@@ -75,24 +62,33 @@ knowledge_base_data = {
     'normal_operation_protocol': "No action required. All systems are within normal operating parameters."
 }
 
-# Required to specify all features to train the model [personally struggled with this as I presumed only certain features can be pulled out for suimulation]
-# for thousands of features, better to use  config file like features.py
-feature_cols = load_feature_names()
-
-# Simulate a new data point for a specific machine showing signs of potential failure
-machine_to_check = ef.df_engineered[ef.df_engineered['machine_id'] == 10].iloc[-1]  # Latest data point for machine_id 8
-data_for_ai = machine_to_check.to_frame().T
-data_for_ai = data_for_ai[feature_cols]
-data_for_ai["vibration"] += 20 # Simulate a spike in vibration
-data_for_ai["temperature"] += 10 # Simulate a spike in temperature
-data_for_ai["temp_rolling_avg"] +=10 # Simulate a spike in temperature
-
-ai_response = maintenance_assistance_response(
-    machine_id=8,
-    ml_model=vpm.rf_model,
-    data_point=data_for_ai,
-    knowledge_base=knowledge_base_data
-)
-print("--- Verity Assistant AI Response ---")
-print(ai_response)
-    
\ No newline at end of file
+
+def main():
+    # The demo trains on synthetic data; keep pandas and sklearn out of the advice import path
+    import engineer_feature as ef
+    import verity_pt_model as vpm
+
+    # Required to specify all features to train the model [personally struggled with this as I presumed only certain features can be pulled out for suimulation]
+    # for thousands of features, better to use  config file like features.py
+    feature_cols = load_feature_names()
+
+    # Simulate a new data point for a specific machine showing signs of potential failure
+    machine_to_check = ef.df_engineered[ef.df_engineered['machine_id'] == 10].iloc[-1]  # Latest data point for machine_id 8
+    data_for_ai = machine_to_check.to_frame().T
+    data_for_ai = data_for_ai[feature_cols]
+    data_for_ai["vibration"] += 20 # Simulate a spike in vibration
+    data_for_ai["temperature"] += 10 # Simulate a spike in temperature
+    data_for_ai["temp_rolling_avg"] +=10 # Simulate a spike in temperature
+
+    ai_response = maintenance_assistance_response(
+        machine_id=8,
+        ml_model=vpm.rf_model,
+        data_point=data_for_ai,
+        knowledge_base=knowledge_base_data
+    )
+    print("--- Verity Assistant AI Response ---")
+    print(ai_response)
+
+
+if __name__ == "__main__":
+    main()
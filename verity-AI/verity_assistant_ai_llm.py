@@ -1,54 +1,123 @@
-import openai
+import asyncio
+import contextvars
 import os
+import time
+import weakref
 import dotenv
-import numpy as np
-import json
 
-import engineer_feature as ef
-import verity_pt_model as vpm
+import advice_cache
+import manual_index
+import metrics
+import utils
 
 # Once the Pretrained Verity Model is built and evaluated, we can now use an LLM to simulate a 
 # conversation around the model and provide "Intelligent" actionalbe insights
-client = openai.OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+_client = None
+
+# Async advice path: max LLM calls in flight per worker and per-call timeout in seconds
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "64"))
+LLM_TIMEOUT_S = float(os.getenv("LLM_TIMEOUT_S", "30"))
+# asyncio primitives belong to one event loop, so keep one semaphore per loop
+_llm_semaphores = weakref.WeakKeyDictionary()
+# So does the AsyncOpenAI connection pool: one client per loop (asyncio.run starts a new loop per call)
+_async_clients = weakref.WeakKeyDictionary()
+# Advice cache keyed on risk bucket + quantized features (see advice_cache.py), built on first use
+_advice_cache = None
+_advice_cache_ready = False
 
 # Alternate way to pull the key from the .env file if needed
 #dotenv.load_dotenv()
 
-def load_feature_names():
+
+def get_client():
     """
-    Load feature names from model_features.json file.
-    
+    Return the shared OpenAI client, creating it on first use.
+
+    Creating the client lazily keeps importing this module free of side effects, so the
+    serving app can import it without touching the network or the environment.
+    """
+    global _client
+    if _client is None:
+        # openai is the slowest import in the serving path, so defer it to the first LLM call
+        import openai
+
+        _client = openai.OpenAI(api_key=os.getenv('OPENAI_API_KEY'), timeout=LLM_TIMEOUT_S)
+    return _client
+
+
+def get_async_client():
+    """Return the running event loop's AsyncOpenAI client used by the asyncio advice path."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        import openai
+
+        client = _async_clients[loop] = openai.AsyncOpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+    return client
+
+
+async def close_async_client():
+    """Close the running loop's AsyncOpenAI client; call it before a short-lived loop ends."""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.close()
+
+
+def get_advice_cache():
+    """Return the process-wide AdviceCache, or None when ADVICE_CACHE_ENABLED is false."""
+    global _advice_cache, _advice_cache_ready
+    if not _advice_cache_ready:
+        _advice_cache = advice_cache.advice_cache_from_env()
+        _advice_cache_ready = True
+    return _advice_cache
+
+
+def _llm_semaphore():
+    loop = asyncio.get_running_loop()
+    semaphore = _llm_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _llm_semaphores[loop] = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    return semaphore
+
+
+def build_advice_request(machine_id, failure_probability, feature_values):
+    """
+    Build the chat completion arguments for a maintenance advice request.
+
+    Args:
+        machine_id (str): Unique identifier for the machine
+        failure_probability (float): Predicted failure probability (0-100)
+        feature_values (dict): Dictionary of sensor readings/feature values
+
     Returns:
-        list: List of feature names in the correct order
+        dict: Keyword arguments for `chat.completions.create`
     """
-    try:
-        features_path = os.path.join(os.path.dirname(__file__), "model_features.json")
-        with open(features_path, "r") as fh:
-            features = json.load(fh)
-        return features
-    except FileNotFoundError:
-        # Fallback to hardcoded features if file not found
-        print("Warning: model_features.json not found, using fallback feature list")
-        return [
-            "vibration",
-            "temperature",
-            "operating_hours",
-            "temp_vibration_interaction",
-            "vibration_rate_of_change",
-            "temp_rolling_avg"
-        ]
-    except Exception as e:
-        print(f"Error loading features from JSON: {e}")
-        return [
-            "vibration",
-            "temperature",
-            "operating_hours",
-            "temp_vibration_interaction",
-            "vibration_rate_of_change",
-            "temp_rolling_avg"
-        ]
-
-def get_llm_maintenance_advice(machine_id, failure_probability, feature_values):
+    prompt = (
+        f"Machine {machine_id} has a predicted failure probability of {failure_probability:.1f}%.\n"
+        f"Sensor readings: {feature_values}\n"
+    )
+    # Manual sections retrieved for this risk level (MANUAL_INDEX_PATH), quoted for the model
+    passages = manual_index.retrieve_for_advice(failure_probability)
+    if passages:
+        prompt += "Relevant maintenance manual sections:\n" + "".join(
+            f"[{p['id']}] {p['title']}: {manual_index.snippet(p['text'])}\n" for p in passages
+        )
+    prompt += "What maintenance action should be taken? Respond in clear, actionable steps for a technician."
+    system = "You are an expert maintenance assistant."
+    if passages:
+        system += " Base your advice on the manual sections provided and cite them by their [id]."
+    return {
+        "model": "gpt-3.5-turbo",  # Changed to a more stable model
+        "messages": [
+            {"role": "system", "content": system},
+            {"role": "user", "content": prompt}
+        ],
+        "max_tokens": 300,
+        "temperature": 0.7,
+    }
+
+
+def get_llm_maintenance_advice(machine_id, failure_probability, feature_values, use_cache=True, raise_errors=False):
     """
     Use OpenAI LLM to generate maintenance advice based on model prediction and features.
     
@@ -56,28 +125,188 @@ def get_llm_maintenance_advice(machine_id, failure_probability, feature_values):
         machine_id (str): Unique identifier for the machine
         failure_probability (float): Predicted failure probability (0-100)
         feature_values (dict): Dictionary of sensor readings/feature values
+        use_cache (bool): Look up and store the advice in the advice cache
+        raise_errors (bool): Raise LLM errors instead of returning an error message
     
     Returns:
         str: LLM-generated maintenance advice
     """
-    prompt = (
-        f"Machine {machine_id} has a predicted failure probability of {failure_probability:.1f}%.\n"
-        f"Sensor readings: {feature_values}\n"
-        "What maintenance action should be taken? Respond in clear, actionable steps for a technician."
-    )
+    cache = get_advice_cache() if use_cache else None
+    key = cache.key(failure_probability, feature_values) if cache is not None else None
+    if key is not None:
+        cached = cache.get(key, machine_id)
+        if cached is not None:
+            metrics.observe_llm("sync", "cached")
+            return cached
+    start = time.perf_counter()
     try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",  # Changed to a more stable model
-            messages=[
-                {"role": "system", "content": "You are an expert maintenance assistant."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=300,
-            temperature=0.7
+        response = get_client().chat.completions.create(
+            **build_advice_request(machine_id, failure_probability, feature_values)
         )
-        return response.choices[0].message.content
+        advice = response.choices[0].message.content
     except Exception as e:
+        metrics.observe_llm("sync", "error", time.perf_counter() - start)
+        if raise_errors:
+            raise
         return f"Error generating maintenance advice: {str(e)}"
+    metrics.observe_llm("sync", "ok", time.perf_counter() - start, getattr(response, "usage", None))
+    if key is not None:
+        cache.put(key, machine_id, advice)
+    return advice
+
+
+async def get_llm_maintenance_advice_async(machine_id, failure_probability, feature_values, timeout=None,
+                                           use_cache=True, raise_errors=False):
+    """
+    Asyncio version of get_llm_maintenance_advice().
+
+    Waiting on the LLM does not hold a thread, so one worker can keep thousands of advice
+    calls in flight. At most LLM_MAX_CONCURRENCY calls per event loop run at once; the rest
+    wait for a slot.
+
+    Args:
+        machine_id (str): Unique identifier for the machine
+        failure_probability (float): Predicted failure probability (0-100)
+        feature_values (dict): Dictionary of sensor readings/feature values
+        timeout (float, optional): Seconds allowed for the LLM call. Defaults to LLM_TIMEOUT_S.
+        use_cache (bool): Look up and store the advice in the advice cache
+        raise_errors (bool): Raise LLM errors (e.g. for callers that retry) instead of
+            returning an error message
+
+    Returns:
+        str: LLM-generated maintenance advice
+    """
+    timeout = LLM_TIMEOUT_S if timeout is None else timeout
+    cache = get_advice_cache() if use_cache else None
+    key = cache.key(failure_probability, feature_values) if cache is not None else None
+    if key is not None:
+        cached = await cache.get_async(key, machine_id)
+        if cached is not None:
+            metrics.observe_llm("async", "cached")
+            return cached
+    start = time.perf_counter()
+    try:
+        async with _llm_semaphore():
+            response = await asyncio.wait_for(
+                get_async_client().chat.completions.create(
+                    **build_advice_request(machine_id, failure_probability, feature_values)
+                ),
+                timeout=timeout,
+            )
+        advice = response.choices[0].message.content
+    except asyncio.TimeoutError:
+        metrics.observe_llm("async", "timeout", time.perf_counter() - start)
+        if raise_errors:
+            raise
+        return f"Error generating maintenance advice: LLM call timed out after {timeout:.1f}s"
+    except Exception as e:
+        metrics.observe_llm("async", "error", time.perf_counter() - start)
+        if raise_errors:
+            raise
+        return f"Error generating maintenance advice: {str(e)}"
+    metrics.observe_llm("async", "ok", time.perf_counter() - start, getattr(response, "usage", None))
+    if key is not None:
+        await cache.put_async(key, machine_id, advice)
+    return advice
+
+
+def stream_llm_maintenance_advice(machine_id, failure_probability, feature_values):
+    """
+    Streaming version of get_llm_maintenance_advice(): yield advice text as the LLM produces it.
+
+    A cached answer is yielded in one piece. The full text is cached once the stream completes.
+
+    Args:
+        machine_id (str): Unique identifier for the machine
+        failure_probability (float): Predicted failure probability (0-100)
+        feature_values (dict): Dictionary of sensor readings/feature values
+
+    Yields:
+        str: Chunks of LLM-generated maintenance advice
+    """
+    cache = get_advice_cache()
+    key = cache.key(failure_probability, feature_values) if cache is not None else None
+    if key is not None:
+        cached = cache.get(key, machine_id)
+        if cached is not None:
+            metrics.observe_llm("stream", "cached")
+            yield cached
+            return
+
+    parts = []
+    start = time.perf_counter()
+    try:
+        stream = get_client().chat.completions.create(
+            stream=True, **build_advice_request(machine_id, failure_probability, feature_values)
+        )
+        for chunk in stream:
+            text = chunk.choices[0].delta.content if chunk.choices else None
+            if text:
+                parts.append(text)
+                yield text
+    except Exception:
+        metrics.observe_llm("stream", "error", time.perf_counter() - start)
+        raise
+    metrics.observe_llm("stream", "ok", time.perf_counter() - start)
+    if key is not None and parts:
+        cache.put(key, machine_id, "".join(parts))
+
+
+async def stream_llm_maintenance_advice_async(machine_id, failure_probability, feature_values, timeout=None):
+    """
+    Asyncio version of stream_llm_maintenance_advice(), bounded by LLM_MAX_CONCURRENCY.
+
+    Args:
+        machine_id (str): Unique identifier for the machine
+        failure_probability (float): Predicted failure probability (0-100)
+        feature_values (dict): Dictionary of sensor readings/feature values
+        timeout (float, optional): Seconds allowed for the whole stream. Defaults to LLM_TIMEOUT_S.
+
+    Yields:
+        str: Chunks of LLM-generated maintenance advice
+    """
+    timeout = LLM_TIMEOUT_S if timeout is None else timeout
+    cache = get_advice_cache()
+    key = cache.key(failure_probability, feature_values) if cache is not None else None
+    if key is not None:
+        cached = await cache.get_async(key, machine_id)
+        if cached is not None:
+            metrics.observe_llm("stream_async", "cached")
+            yield cached
+            return
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    parts = []
+    start = time.perf_counter()
+    try:
+        async with _llm_semaphore():
+            stream = await asyncio.wait_for(
+                get_async_client().chat.completions.create(
+                    stream=True, **build_advice_request(machine_id, failure_probability, feature_values)
+                ),
+                timeout=timeout,
+            )
+            iterator = stream.__aiter__()
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(iterator.__anext__(), timeout=max(0.0, deadline - loop.time()))
+                except StopAsyncIteration:
+                    break
+                text = chunk.choices[0].delta.content if chunk.choices else None
+                if text:
+                    parts.append(text)
+                    yield text
+    except asyncio.TimeoutError:
+        metrics.observe_llm("stream_async", "timeout", time.perf_counter() - start)
+        raise
+    except Exception:
+        metrics.observe_llm("stream_async", "error", time.perf_counter() - start)
+        raise
+    metrics.observe_llm("stream_async", "ok", time.perf_counter() - start)
+    if key is not None and parts:
+        await cache.put_async(key, machine_id, "".join(parts))
+
 
 def maintenance_assistance_response_llm(machine_id, ml_model, data_point):
     """
@@ -100,7 +329,32 @@ def maintenance_assistance_response_llm(machine_id, ml_model, data_point):
         return f"Machine {machine_id}: Error generating response: {str(e)}"
 
 
-def get_maintenance_advice_api(machine_id, feature_dict, ml_model):
+def predict_failure_probability(feature_dict, ml_model, feature_order=None):
+    """
+    Score one machine and return its failure probability as a percentage.
+
+    Args:
+        feature_dict (dict): Dictionary of feature values
+        ml_model: Trained ML model with predict_proba method
+        feature_order (list or FeatureSchema, optional): Ordered feature names or compiled
+            schema. If None, uses the cached schema from model_features.json.
+
+    Returns:
+        float: Failure probability (0-100)
+    """
+    # Extract features in correct order (missing features score as 0.0)
+    start = time.perf_counter()
+    feature_array = utils.feature_schema(feature_order).row(feature_dict, fill_missing=True)
+    scored = time.perf_counter()
+    metrics.observe_stage("features", scored - start)
+
+    # Get prediction
+    probability = ml_model.predict_proba(feature_array)[0][1] * 100
+    metrics.observe_stage("predict_proba", time.perf_counter() - scored)
+    return probability
+
+
+def get_maintenance_advice_api(machine_id, feature_dict, ml_model, schema=None):
     """
     API-friendly function to get maintenance advice for a specific machine.
     
@@ -108,20 +362,13 @@ def get_maintenance_advice_api(machine_id, feature_dict, ml_model):
         machine_id (str): Unique identifier for the machine
         feature_dict (dict): Dictionary of feature values
         ml_model: Trained ML model with predict_proba method
+        schema (FeatureSchema, optional): Feature order of ml_model. Defaults to model_features.json.
     
     Returns:
         dict: Response containing machine_id, failure_probability, and advice
     """
     try:
-        # Load feature order from JSON file
-        feature_order = load_feature_names()
-        
-        # Extract features in correct order
-        feature_values = [feature_dict.get(f, 0.0) for f in feature_order]
-        feature_array = np.array(feature_values).reshape(1, -1)
-        
-        # Get prediction
-        failure_probability = ml_model.predict_proba(feature_array)[0][1] * 100
+        failure_probability = predict_failure_probability(feature_dict, ml_model, schema)
         
         # Get LLM advice
         advice = get_llm_maintenance_advice(machine_id, failure_probability, feature_dict)
@@ -141,23 +388,147 @@ def get_maintenance_advice_api(machine_id, feature_dict, ml_model):
         }
 
 
-# Required to specify all features to train the model [personally struggled with this as I presumed only certain features can be pulled out for suimulation]
-# for thousands of features, better to use  config file like features.py
-feature_cols = load_feature_names()
-
-# Simulate a new data point for a specific machine showing signs of potential failure
-machine_to_check = ef.df_engineered[ef.df_engineered['machine_id'] == 8].iloc[-1]  # Latest data point for machine_id 8
-data_for_ai = machine_to_check.to_frame().T
-data_for_ai = data_for_ai[feature_cols]
-data_for_ai["vibration"] += 20 # Simulate a spike in vibration
-data_for_ai["temperature"] += 10 # Simulate a spike in temperature
-data_for_ai["temp_rolling_avg"] +=10 # Simulate a spike in temperature
-
-# Example usage:
-ai_response_llm = maintenance_assistance_response_llm(
-    machine_id=8,
-    ml_model=vpm.rf_model,
-    data_point=data_for_ai
-)
-print("--- Verity Assistant AI LLM Response ---")
-print(ai_response_llm)
+async def get_maintenance_advice_api_async(machine_id, feature_dict, ml_model, timeout=None, schema=None):
+    """
+    Asyncio version of get_maintenance_advice_api() for the async server (asgi.py).
+
+    Model scoring runs in the default thread pool so a slow or batched predict_proba call
+    never blocks the event loop; the LLM call is awaited without holding a thread.
+
+    Args:
+        machine_id (str): Unique identifier for the machine
+        feature_dict (dict): Dictionary of feature values
+        ml_model: Trained ML model with predict_proba method
+        timeout (float, optional): Seconds allowed for the LLM call. Defaults to LLM_TIMEOUT_S.
+        schema (FeatureSchema, optional): Feature order of ml_model. Defaults to model_features.json.
+
+    Returns:
+        dict: Response containing machine_id, failure_probability, and advice
+    """
+    try:
+        loop = asyncio.get_running_loop()
+        # run_in_executor does not carry contextvars; copy them so stages keep the endpoint label
+        failure_probability = await loop.run_in_executor(
+            None, contextvars.copy_context().run, predict_failure_probability, feature_dict, ml_model, schema
+        )
+
+        advice = await get_llm_maintenance_advice_async(
+            machine_id, failure_probability, feature_dict, timeout=timeout
+        )
+
+        return {
+            "machine_id": machine_id,
+            "failure_probability": round(failure_probability, 2),
+            "feature_values": feature_dict,
+            "maintenance_advice": advice,
+            "status": "success"
+        }
+    except Exception as e:
+        return {
+            "machine_id": machine_id,
+            "error": str(e),
+            "status": "error"
+        }
+
+
+def iter_maintenance_advice_events(machine_id, feature_dict, ml_model, schema=None):
+    """
+    Streaming version of get_maintenance_advice_api() as a sequence of events.
+
+    The failure probability is available right after scoring, so it is emitted before the LLM
+    is called; advice text follows chunk by chunk.
+
+    Args:
+        machine_id (str): Unique identifier for the machine
+        feature_dict (dict): Dictionary of feature values
+        ml_model: Trained ML model with predict_proba method
+        schema (FeatureSchema, optional): Feature order of ml_model. Defaults to model_features.json.
+
+    Yields:
+        tuple: (event, data) pairs - "prediction", then "advice" chunks, then "done" or "error"
+    """
+    try:
+        failure_probability = predict_failure_probability(feature_dict, ml_model, schema)
+    except Exception as e:
+        yield "error", {"machine_id": machine_id, "error": str(e), "status": "error"}
+        return
+    yield "prediction", {
+        "machine_id": machine_id,
+        "failure_probability": round(float(failure_probability), 2),
+        "feature_values": feature_dict,
+    }
+
+    parts = []
+    try:
+        for text in stream_llm_maintenance_advice(machine_id, failure_probability, feature_dict):
+            parts.append(text)
+            yield "advice", {"text": text}
+    except Exception as e:
+        yield "error", {"machine_id": machine_id, "error": f"Error generating maintenance advice: {str(e)}", "status": "error"}
+        return
+    yield "done", {"machine_id": machine_id, "maintenance_advice": "".join(parts), "status": "success"}
+
+
+async def iter_maintenance_advice_events_async(machine_id, feature_dict, ml_model, timeout=None, schema=None):
+    """Asyncio version of iter_maintenance_advice_events() for the async server (asgi.py)."""
+    try:
+        loop = asyncio.get_running_loop()
+        # run_in_executor does not carry contextvars; copy them so stages keep the endpoint label
+        failure_probability = await loop.run_in_executor(
+            None, contextvars.copy_context().run, predict_failure_probability, feature_dict, ml_model, schema
+        )
+    except Exception as e:
+        yield "error", {"machine_id": machine_id, "error": str(e), "status": "error"}
+        return
+    yield "prediction", {
+        "machine_id": machine_id,
+        "failure_probability": round(float(failure_probability), 2),
+        "feature_values": feature_dict,
+    }
+
+    parts = []
+    try:
+        async for text in stream_llm_maintenance_advice_async(
+            machine_id, failure_probability, feature_dict, timeout=timeout
+        ):
+            parts.append(text)
+            yield "advice", {"text": text}
+    except asyncio.TimeoutError:
+        yield "error", {"machine_id": machine_id, "error": "Error generating maintenance advice: LLM call timed out", "status": "error"}
+        return
+    except Exception as e:
+        yield "error", {"machine_id": machine_id, "error": f"Error generating maintenance advice: {str(e)}", "status": "error"}
+        return
+    yield "done", {"machine_id": machine_id, "maintenance_advice": "".join(parts), "status": "success"}
+
+
+def main():
+    # The demo needs the training data and a freshly trained model; import them here so the
+    # serving app can import this module without generating data or fitting a forest.
+    import engineer_feature as ef
+    import verity_pt_model as vpm
+
+    # Required to specify all features to train the model [personally struggled with this as I presumed only certain features can be pulled out for suimulation]
+    # for thousands of features, better to use  config file like features.py
+    feature_cols = utils.load_feature_names()
+
+    # Simulate a new data point for a specific machine showing signs of potential failure
+    machine_to_check = ef.df_engineered[ef.df_engineered['machine_id'] == 8].iloc[-1]  # Latest data point for machine_id 8
+    data_for_ai = machine_to_check.to_frame().T
+    data_for_ai = data_for_ai[feature_cols]
+    data_for_ai["vibration"] += 20 # Simulate a spike in vibration
+    data_for_ai["temperature"] += 10 # Simulate a spike in temperature
+    data_for_ai["temp_rolling_avg"] +=10 # Simulate a spike in temperature
+
+    # Example usage:
+    ai_response_llm = maintenance_assistance_response_llm(
+        machine_id=8,
+        ml_model=vpm.rf_model,
+        data_point=data_for_ai
+    )
+    print("--- Verity Assistant AI LLM Response ---")
+    print(ai_response_llm)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,8 @@
 
 # Verity Pretrained Model Script
 
-import os
-import json
 import engineer_feature as ef
+from utils import load_feature_names
 
 # Building the predictive model using RandomForestClassifier for classification
 # Random Forest classifier is a machine learning classifiation algorithm that uses multiple decision trees to make predictions usually via majority voting.
@@ -14,58 +13,59 @@ from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import classification_report, accuracy_score
 
 
-def load_feature_names():
+target = "failure_imminent"
+
+
+def train_model(df=None):
     """
-    Load feature names from model_features.json file.
-    
+    Train the Verity RandomForest model on an engineered dataset.
+
+    Args:
+        df (DataFrame, optional): Engineered dataset. If None, uses `ef.df_engineered`.
+
     Returns:
-        list: List of feature names in the correct order
+        tuple: (rf_model, X_test, y_test)
     """
-    try:
-        features_path = os.path.join(os.path.dirname(__file__), "model_features.json")
-        with open(features_path, "r") as fh:
-            features = json.load(fh)
-        return features
-    except FileNotFoundError:
-        # Fallback to hardcoded features if file not found
-        print("Warning: model_features.json not found, using fallback feature list")
-        return [
-            "vibration",
-            "temperature",
-            "operating_hours",
-            "temp_vibration_interaction",
-            "vibration_rate_of_change",
-            "temp_rolling_avg"
-        ]
-    except Exception as e:
-        print(f"Error loading features from JSON: {e}")
-        return [
-            "vibration",
-            "temperature",
-            "operating_hours",
-            "temp_vibration_interaction",
-            "vibration_rate_of_change",
-            "temp_rolling_avg"
-        ]
-
-
-# Prepare data for the model
-features = load_feature_names()
+    if df is None:
+        df = ef.df_engineered
 
-target = "failure_imminent"
+    # Prepare data for the model
+    features = load_feature_names()
+
+    X = df[features]
+    y = df[target]
+
+    # Split data into training and testing sets
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+
+    rf_model = RandomForestClassifier(n_estimators=100, class_weight='balanced', random_state=42)
+    rf_model.fit(X_train, y_train)
+    return rf_model, X_test, y_test
+
+
+def evaluate_model(rf_model, X_test, y_test):
+    """Print accuracy and the classification report for a trained model."""
+    y_pred = rf_model.predict(X_test)
+    print("--- Model Evaluation ---")
+    print(f"Accuracy: {accuracy_score(y_test, y_pred):.2f}")
+    print("\nClassification Report:")
+    print(classification_report(y_test, y_pred))
+
+
+_rf_model = None
 
-X = ef.df_engineered[features]
-y = ef.df_engineered[target]
 
-# Split data into training and testing sets
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+def __getattr__(name):
+    # `rf_model` used to be trained at import time; train it lazily on first access instead.
+    global _rf_model
+    if name == "rf_model":
+        if _rf_model is None:
+            _rf_model, _, _ = train_model()
+        return _rf_model
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-rf_model = RandomForestClassifier(n_estimators=100, class_weight='balanced', random_state=42)
-rf_model.fit(X_train, y_train)
 
-# Evaluate the model
-y_pred = rf_model.predict(X_test)
-print("--- Model Evaluation ---")
-print(f"Accuracy: {accuracy_score(y_test, y_pred):.2f}")
-print("\nClassification Report:")
-print(classification_report(y_test, y_pred))
\ No newline at end of file
+if __name__ == "__main__":
+    rf_model, X_test, y_test = train_model()
+    # Evaluate the model
+    evaluate_model(rf_model, X_test, y_test)